@@ -0,0 +1,11 @@
+"""
+Benchmarks for ElasticFeeds.
+
+Builds a synthetic network and activity stream, then times ingestion, link changes, network loading and
+every aggregator. Run it from the repository root:
+
+    python -m benchmarks --backend memory
+    python -m benchmarks --backend elasticsearch --actors 2000 --activities 100000
+
+See ``python -m benchmarks --help`` for the workload options. This package is not installed with elasticfeeds.
+"""
@@ -0,0 +1,192 @@
+"""
+Command line entry point: python -m benchmarks
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+
+from benchmarks.measure import format_report
+from benchmarks.suite import AGGREGATORS, Suite, create_client
+from benchmarks.workload import Workload
+
+
+def parse_arguments(arguments=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Times ElasticFeeds ingestion, link changes, network loading and every aggregator "
+        "on a synthetic workload.",
+    )
+    target = parser.add_argument_group("target")
+    target.add_argument(
+        "--backend",
+        default=os.environ.get("EF_BACKEND", "memory"),
+        choices=["memory", "elasticsearch", "opensearch"],
+        help="memory (in-process, the default), elasticsearch or opensearch",
+    )
+    target.add_argument("--host", default=os.environ.get("ES_HOST", "localhost"))
+    target.add_argument(
+        "--port", type=int, default=int(os.environ.get("ES_PORT", "9200"))
+    )
+    target.add_argument("--scheme", default="http")
+    target.add_argument("--user", default=os.environ.get("ES_USER", "elastic"))
+    target.add_argument("--password", default=os.environ.get("ES_PASS", ""))
+    target.add_argument(
+        "--serializer",
+        choices=["json", "orjson"],
+        default="json",
+        help="JSON serializer of the client. The memory backend only writes native dates",
+    )
+    target.add_argument(
+        "--prefix",
+        default="ef_bench",
+        help="Prefix of the index names. These indices are deleted and created again",
+    )
+    target.add_argument(
+        "--keep", action="store_true", help="Keep the indices after the run"
+    )
+
+    workload = parser.add_argument_group("workload")
+    workload.add_argument("--actors", type=int, default=200)
+    workload.add_argument(
+        "--follows", type=int, default=20, help="Actors followed by each actor"
+    )
+    workload.add_argument(
+        "--watches", type=int, default=5, help="Objects watched by each actor"
+    )
+    workload.add_argument("--objects", type=int, default=100)
+    workload.add_argument("--activities", type=int, default=2000)
+    workload.add_argument(
+        "--skew",
+        type=float,
+        default=1.0,
+        help="Zipf exponent of actor / object popularity. 0 for uniform",
+    )
+    workload.add_argument(
+        "--embedding-dims",
+        type=int,
+        default=8,
+        help="Activity embedding length. 0 disables embeddings and the Semantic aggregator",
+    )
+    workload.add_argument("--seed", type=int, default=1)
+
+    run = parser.add_argument_group("run")
+    run.add_argument(
+        "--samples", type=int, default=50, help="Calls per read and link scenario"
+    )
+    run.add_argument(
+        "--single-ingest",
+        type=int,
+        default=200,
+        help="Activities added one at a time before the bulk ingestion",
+    )
+    run.add_argument("--chunk-size", type=int, default=500)
+    run.add_argument(
+        "--timeline",
+        action="store_true",
+        help="Use fan-out-on-write and include the Materialized aggregator",
+    )
+    run.add_argument(
+        "--aggregators",
+        help="Comma separated aggregator names. Choose from: %s"
+        % ", ".join(AGGREGATORS),
+    )
+    run.add_argument(
+        "--feed-mapping",
+        choices=["default", "tuned"],
+        default="default",
+        help="Mapping profile of the feed index",
+    )
+    run.add_argument(
+        "--query-cache",
+        action="store_true",
+        help="Cache the compiled feed queries (Manager(query_cache=...))",
+    )
+    run.add_argument(
+        "--feed-cache",
+        action="store_true",
+        help="Cache the results of get_feeds (Manager(feed_cache=...))",
+    )
+    run.add_argument("--json", help="Also write the results to this JSON file")
+    return parser.parse_args(arguments)
+
+
+def main(arguments=None):
+    options = parse_arguments(arguments)
+    aggregators = None
+    if options.aggregators:
+        aggregators = [name.strip() for name in options.aggregators.split(",")]
+        unknown = [name for name in aggregators if name not in AGGREGATORS]
+        if unknown:
+            sys.exit("Unknown aggregator(s): %s" % ", ".join(unknown))
+
+    workload = Workload(
+        actors=options.actors,
+        follows=options.follows,
+        watches=options.watches,
+        objects=options.objects,
+        activities=options.activities,
+        skew=options.skew,
+        embedding_dims=options.embedding_dims,
+        seed=options.seed,
+    )
+    client = create_client(
+        options.backend,
+        serializer=options.serializer,
+        host=options.host,
+        port=options.port,
+        scheme=options.scheme,
+        url_prefix=None,
+        use_ssl=False,
+        user_name=options.user,
+        user_password=options.password,
+        max_retries=1,
+        request_timeout=60,
+    )
+    suite = Suite(
+        workload,
+        client,
+        backend=options.backend,
+        prefix=options.prefix,
+        samples=options.samples,
+        single_ingest=options.single_ingest,
+        chunk_size=options.chunk_size,
+        timeline=options.timeline,
+        aggregators=aggregators,
+        feed_mapping=options.feed_mapping,
+        query_cache=options.query_cache,
+        feed_cache=options.feed_cache,
+        serializer=options.serializer,
+    )
+    try:
+        summaries = suite.run()
+    finally:
+        if not options.keep:
+            suite.clean()
+
+    print(
+        "backend=%s actors=%d follows=%d watches=%d activities=%d skew=%s samples=%d"
+        % (
+            options.backend,
+            options.actors,
+            options.follows,
+            options.watches,
+            options.activities,
+            options.skew,
+            options.samples,
+        )
+    )
+    print(format_report(summaries))
+    if options.json:
+        with open(options.json, "w") as output:
+            json.dump(
+                {
+                    "options": vars(options),
+                    "python": platform.python_version(),
+                    "results": summaries,
+                },
+                output,
+                indent=2,
+            )
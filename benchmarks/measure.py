@@ -0,0 +1,151 @@
+"""
+Timing and request accounting.
+"""
+
+import json
+import math
+import time
+
+#: Client calls that send a request body. indices.* and ping are passed through without being counted.
+_RECORDED_CALLS = (
+    "search",
+    "msearch",
+    "count",
+    "bulk",
+    "index",
+    "create",
+    "update",
+    "delete",
+    "delete_by_query",
+    "get",
+    "exists",
+    "open_point_in_time",
+    "close_point_in_time",
+)
+_NOT_BODY = ("index", "id", "retry_on_conflict", "refresh", "op_type")
+
+
+def _body_bytes(kwargs):
+    """Approximate size of the request body: JSON, or NDJSON for _bulk / _msearch lines"""
+    size = 0
+    for key, value in kwargs.items():
+        if key in _NOT_BODY:
+            continue
+        if isinstance(value, list) and key in ("operations", "searches", "body"):
+            size += sum(len(json.dumps(line, default=str)) + 1 for line in value)
+        else:
+            size += len(json.dumps(value, default=str))
+    return size
+
+
+class RecordingClient(object):
+    """
+    Wraps a client and counts the requests sent through it and the bytes of their bodies. Pass it to the
+    Manager as ``connection``.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self.requests = 0
+        self.bytes = 0
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if name not in _RECORDED_CALLS:
+            return attribute
+
+        def call(*args, **kwargs):
+            self.requests += 1
+            self.bytes += _body_bytes(kwargs)
+            return attribute(*args, **kwargs)
+
+        return call
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(math.ceil(fraction * len(ordered))))
+    return ordered[rank - 1]
+
+
+class Measurement(object):
+    """
+    The samples of one operation: latency, requests and request bytes per call
+    """
+
+    def __init__(self, name):
+        """
+        :param name: Operation name
+        """
+        self.name = name
+        self.latencies = []
+        self.items = 0
+        self.requests = 0
+        self.bytes = 0
+
+    def time(self, recorder, function, *args, items=1, **kwargs):
+        """
+        Calls a function and records its latency and the requests it sent. ``items`` is how many items the
+        call handled (activities in a bulk chunk, for example); throughput is items per second.
+        :return: The function's result
+        """
+        requests, sent = recorder.requests, recorder.bytes
+        started = time.perf_counter()
+        result = function(*args, **kwargs)
+        self.latencies.append(time.perf_counter() - started)
+        self.items += items
+        self.requests += recorder.requests - requests
+        self.bytes += recorder.bytes - sent
+        return result
+
+    def summary(self):
+        calls = len(self.latencies)
+        elapsed = sum(self.latencies)
+        return {
+            "name": self.name,
+            "calls": calls,
+            "items": self.items,
+            "p50_ms": percentile(self.latencies, 0.50) * 1000 if calls else None,
+            "p95_ms": percentile(self.latencies, 0.95) * 1000 if calls else None,
+            "p99_ms": percentile(self.latencies, 0.99) * 1000 if calls else None,
+            "throughput": self.items / elapsed if elapsed else None,
+            "requests_per_call": self.requests / calls if calls else None,
+            "bytes_per_call": self.bytes / calls if calls else None,
+        }
+
+
+def format_report(summaries):
+    """
+    Formats summaries as a text table
+    """
+    header = "%-32s %6s %9s %9s %9s %10s %7s %10s" % (
+        "operation",
+        "calls",
+        "p50 ms",
+        "p95 ms",
+        "p99 ms",
+        "items/s",
+        "req",
+        "bytes",
+    )
+    lines = [header, "-" * len(header)]
+    for summary in summaries:
+        if not summary["calls"]:
+            continue
+        lines.append(
+            "%-32s %6d %9.2f %9.2f %9.2f %10.0f %7.1f %10.0f"
+            % (
+                summary["name"],
+                summary["calls"],
+                summary["p50_ms"],
+                summary["p95_ms"],
+                summary["p99_ms"],
+                summary["throughput"],
+                summary["requests_per_call"],
+                summary["bytes_per_call"],
+            )
+        )
+    return "\n".join(lines)
@@ -0,0 +1,260 @@
+"""
+The benchmark scenarios: ingestion, link changes, network loading and feed reads.
+"""
+
+import random
+
+from elasticfeeds.aggregators import (
+    UnAggregated,
+    CursorAggregator,
+    CollapseAggregator,
+    DecayRankedAggregator,
+    NotificationAggregator,
+    RecentTypeAggregator,
+    RecentTypeObjectAggregator,
+    RecentObjectTypeAggregator,
+    DateWeightAggregator,
+    YearMonthAggregator,
+    YearMonthTypeAggregator,
+    SemanticAggregator,
+    MaterializedFeedAggregator,
+)
+from elasticfeeds.backends import get_backend
+from elasticfeeds.caches import LRUCache
+from elasticfeeds.manager import Manager
+
+from benchmarks.measure import Measurement, RecordingClient
+
+
+def _weight_lookup(aggregator, weight_lookup):
+    aggregator.weight_lookup = weight_lookup
+    return aggregator
+
+
+def _paged(aggregator):
+    # The first page of 10 groups, with 10 activities each
+    aggregator.bucket_size = 10
+    aggregator.top_hits_size = 10
+    return aggregator
+
+
+#: Aggregator name -> factory(actor_id, workload, rnd). Semantic needs embeddings and Materialized a timeline.
+AGGREGATORS = {
+    "UnAggregated": lambda actor_id, workload, rnd: UnAggregated(actor_id),
+    "Cursor": lambda actor_id, workload, rnd: CursorAggregator(actor_id),
+    "CursorPIT": lambda actor_id, workload, rnd: CursorAggregator(
+        actor_id, point_in_time=True
+    ),
+    "Collapse": lambda actor_id, workload, rnd: CollapseAggregator(actor_id),
+    "DecayRanked": lambda actor_id, workload, rnd: DecayRankedAggregator(actor_id),
+    "DecayRankedMap": lambda actor_id, workload, rnd: _weight_lookup(
+        DecayRankedAggregator(actor_id), "map"
+    ),
+    "DecayRankedFilter": lambda actor_id, workload, rnd: _weight_lookup(
+        DecayRankedAggregator(actor_id), "filter"
+    ),
+    "Notification": lambda actor_id, workload, rnd: NotificationAggregator(actor_id),
+    "RecentType": lambda actor_id, workload, rnd: RecentTypeAggregator(actor_id),
+    "RecentTypeObject": lambda actor_id, workload, rnd: RecentTypeObjectAggregator(
+        actor_id
+    ),
+    "RecentObjectType": lambda actor_id, workload, rnd: RecentObjectTypeAggregator(
+        actor_id
+    ),
+    "RecentObjectTypePaged": lambda actor_id, workload, rnd: _paged(
+        RecentObjectTypeAggregator(actor_id)
+    ),
+    "DateWeight": lambda actor_id, workload, rnd: DateWeightAggregator(actor_id),
+    "DateWeightFilter": lambda actor_id, workload, rnd: _weight_lookup(
+        DateWeightAggregator(actor_id), "filter"
+    ),
+    "DateWeightPaged": lambda actor_id, workload, rnd: _paged(
+        DateWeightAggregator(actor_id)
+    ),
+    "YearMonth": lambda actor_id, workload, rnd: YearMonthAggregator(actor_id),
+    "YearMonthType": lambda actor_id, workload, rnd: YearMonthTypeAggregator(actor_id),
+    "Semantic": lambda actor_id, workload, rnd: SemanticAggregator(
+        actor_id, workload.embedding(rnd)
+    ),
+    "Materialized": lambda actor_id, workload, rnd: MaterializedFeedAggregator(
+        actor_id
+    ),
+}
+
+
+def create_client(backend, serializer="json", **options):
+    """
+    Creates the client of a backend.
+    :param backend: "memory", "elasticsearch" or "opensearch"
+    :param serializer: The JSON serializer of the client, "json" or "orjson" (see get_backend)
+    :param options: host, port, scheme, url_prefix, use_ssl, user_name, user_password, max_retries and
+                    request_timeout. Ignored by the memory backend
+    :return: The client
+    """
+    client = get_backend(backend, serializer).create_client(**options)
+    if client is None:
+        raise RuntimeError("Cannot connect to the %s backend" % backend)
+    return client
+
+
+class Suite(object):
+    """
+    Loads a workload into a fresh set of indices and runs the scenarios against it
+    """
+
+    def __init__(
+        self,
+        workload,
+        client,
+        backend="memory",
+        prefix="ef_bench",
+        samples=50,
+        single_ingest=200,
+        chunk_size=500,
+        timeline=False,
+        aggregators=None,
+        feed_mapping="default",
+        query_cache=False,
+        feed_cache=False,
+        serializer="json",
+    ):
+        """
+        :param workload: A Workload
+        :param client: The client to use (see create_client). It is wrapped to count requests and bytes
+        :param backend: The backend the client belongs to
+        :param prefix: Prefix of the index names. The indices are deleted and created again
+        :param samples: Number of calls for each read and link scenario
+        :param single_ingest: Number of activities added one at a time with add_activity_feed. The rest of the
+                              stream goes through add_activity_feeds in chunks
+        :param chunk_size: Activities per add_activity_feeds call
+        :param timeline: Use a timeline index (fan-out-on-write) and include MaterializedFeedAggregator
+        :param aggregators: Names of the aggregators to read with (see AGGREGATORS). All by default
+        :param feed_mapping: The mapping profile of the feed index (see Manager(feed_mapping=...))
+        :param query_cache: Cache the compiled feed queries in an LRUCache (see Manager(query_cache=...))
+        :param feed_cache: Cache the results of get_feeds in an LRUCache (see Manager(feed_cache=...))
+        :param serializer: The serializer the client was created with (see Manager(serializer=...))
+        """
+        self.workload = workload
+        self.samples = samples
+        self.single_ingest = min(single_ingest, workload.activities)
+        self.chunk_size = chunk_size
+        self.recorder = RecordingClient(client)
+        self.measurements = []
+        if aggregators is None:
+            aggregators = [
+                name
+                for name in AGGREGATORS
+                if (name != "Semantic" or workload.embedding_dims)
+                and (name != "Materialized" or timeline)
+            ]
+        self.aggregators = aggregators
+        self.manager = Manager(
+            prefix + "_feeds",
+            prefix + "_network",
+            connection=self.recorder,
+            backend=backend,
+            delete_feeds_if_exists=True,
+            delete_network_if_exists=True,
+            embedding_dims=workload.embedding_dims or None,
+            timeline_index=prefix + "_timeline" if timeline else None,
+            delete_timeline_if_exists=timeline,
+            feed_mapping=feed_mapping,
+            query_cache=LRUCache(ttl=None) if query_cache else None,
+            feed_cache=LRUCache(ttl=None) if feed_cache else None,
+            serializer=serializer,
+        )
+
+    def measurement(self, name):
+        measurement = Measurement(name)
+        self.measurements.append(measurement)
+        return measurement
+
+    def refresh(self):
+        indices = [self.manager.feed_index, self.manager.network_index]
+        if self.manager.timeline_index is not None:
+            indices.append(self.manager.timeline_index)
+        self.manager.connection.indices.refresh(index=",".join(indices))
+
+    def load_network(self):
+        links = list(self.workload.links())
+        measurement = self.measurement("add_network_links")
+        for start in range(0, len(links), self.chunk_size):
+            chunk = links[start : start + self.chunk_size]
+            measurement.time(
+                self.recorder, self.manager.add_network_links, chunk, items=len(chunk)
+            )
+        self.refresh()
+
+    def ingest(self):
+        single = self.measurement("add_activity_feed")
+        bulk = self.measurement("add_activity_feeds (chunk)")
+        stream = self.workload.activity_stream()
+        for _ in range(self.single_ingest):
+            single.time(self.recorder, self.manager.add_activity_feed, next(stream))
+        chunk = []
+        for activity in stream:
+            chunk.append(activity)
+            if len(chunk) == self.chunk_size:
+                bulk.time(
+                    self.recorder,
+                    self.manager.add_activity_feeds,
+                    chunk,
+                    items=len(chunk),
+                )
+                chunk = []
+        if chunk:
+            bulk.time(
+                self.recorder, self.manager.add_activity_feeds, chunk, items=len(chunk)
+            )
+        self.refresh()
+
+    def link_operations(self):
+        """
+        Follows / un-follows and watches / un-watches, so the network is unchanged afterwards
+        """
+        follow = self.measurement("follow")
+        un_follow = self.measurement("un_follow")
+        watch = self.measurement("watch")
+        un_watch = self.measurement("un_watch")
+        for number, actor_id in enumerate(self.workload.readers(self.samples)):
+            target = "bench_target_%d" % number
+            follow.time(self.recorder, self.manager.follow, actor_id, target)
+            un_follow.time(self.recorder, self.manager.un_follow, actor_id, target)
+            watch.time(self.recorder, self.manager.watch, actor_id, target, "project")
+            un_watch.time(
+                self.recorder, self.manager.un_watch, actor_id, target, "project"
+            )
+        self.refresh()
+
+    def read_network(self):
+        measurement = self.measurement("get_network")
+        for actor_id in self.workload.readers(self.samples):
+            measurement.time(self.recorder, self.manager.get_network, actor_id)
+
+    def read_feeds(self):
+        rnd = random.Random(self.workload.seed + 3)
+        readers = self.workload.readers(self.samples)
+        for name in self.aggregators:
+            factory = AGGREGATORS[name]
+            measurement = self.measurement("get_feeds %s" % name)
+            for actor_id in readers:
+                aggregator = factory(actor_id, self.workload, rnd)
+                measurement.time(self.recorder, self.manager.get_feeds, aggregator)
+
+    def run(self):
+        """
+        Runs every scenario
+        :return: A list with the summary of each measurement
+        """
+        self.load_network()
+        self.ingest()
+        self.link_operations()
+        self.read_network()
+        self.read_feeds()
+        return [measurement.summary() for measurement in self.measurements]
+
+    def clean(self):
+        self.manager.delete_feeds_index()
+        self.manager.delete_network_index()
+        if self.manager.timeline_index is not None:
+            self.manager.delete_timeline_index()
@@ -0,0 +1,145 @@
+"""
+Synthetic networks and activity streams.
+
+Popularity follows a Zipf-like law: the actor (or object) of rank ``r`` is picked with weight
+``1 / (r + 1) ** skew``. With ``skew=0`` every actor is equally likely to be followed and to post; with the
+default ``skew=1`` a handful of actors have most of the followers and produce most of the activities, which is
+what real feeds look like and what makes some networks far larger than others.
+"""
+
+import datetime
+import random
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.network import Link, LinkedActivity
+
+_VERBS = ["add", "edit", "comment", "share"]
+_OBJECT_TYPES = ["project", "form", "document"]
+
+
+class Workload(object):
+    """
+    A reproducible workload. The same arguments (including the seed) always produce the same links and
+    activities.
+    """
+
+    def __init__(
+        self,
+        actors=200,
+        follows=20,
+        watches=5,
+        objects=100,
+        activities=2000,
+        skew=1.0,
+        embedding_dims=8,
+        seed=1,
+        start=None,
+    ):
+        """
+        :param actors: Number of actors
+        :param follows: Number of actors each actor follows
+        :param watches: Number of objects each actor watches
+        :param objects: Number of objects the activities are about
+        :param activities: Number of activities in the stream
+        :param skew: Popularity skew of actors and objects. 0 for uniform
+        :param embedding_dims: Length of the activity embeddings. 0 to store no embeddings
+        :param seed: Random seed
+        :param start: Date and time of the links. The activities are published after it, one second apart.
+                      Defaults to the current date and time minus one second per activity.
+        """
+        if follows >= actors:
+            raise ValueError("follows must be lower than actors")
+        if watches > objects:
+            raise ValueError("watches can not be greater than objects")
+        self.actors = actors
+        self.follows = follows
+        self.watches = watches
+        self.objects = objects
+        self.activities = activities
+        self.skew = skew
+        self.embedding_dims = embedding_dims
+        self.seed = seed
+        if start is None:
+            start = datetime.datetime.now() - datetime.timedelta(seconds=activities + 1)
+        self.start = start
+        self._actor_weights = self._weights(actors)
+        self._object_weights = self._weights(objects)
+
+    def _weights(self, count):
+        return [1.0 / (rank + 1) ** self.skew for rank in range(count)]
+
+    @staticmethod
+    def actor_id(number):
+        return "actor_%d" % number
+
+    @staticmethod
+    def object_id(number):
+        return "object_%d" % number
+
+    @staticmethod
+    def object_type(number):
+        return _OBJECT_TYPES[number % len(_OBJECT_TYPES)]
+
+    def _pick(self, rnd, weights, count, exclude=None):
+        """Picks ``count`` distinct ranks by weight"""
+        chosen = set()
+        while len(chosen) < count:
+            rank = rnd.choices(range(len(weights)), weights=weights)[0]
+            if rank != exclude:
+                chosen.add(rank)
+        return sorted(chosen)
+
+    def links(self):
+        """
+        Yields the follow and watch links of every actor
+        """
+        rnd = random.Random(self.seed)
+        for number in range(self.actors):
+            actor_id = self.actor_id(number)
+            for followed in self._pick(
+                rnd, self._actor_weights, self.follows, exclude=number
+            ):
+                yield Link(
+                    actor_id,
+                    LinkedActivity(self.actor_id(followed)),
+                    linked=self.start,
+                )
+            for watched in self._pick(rnd, self._object_weights, self.watches):
+                yield Link(
+                    actor_id,
+                    LinkedActivity(
+                        self.object_id(watched),
+                        activity_class="object",
+                        activity_type=self.object_type(watched),
+                    ),
+                    linked=self.start,
+                    link_type="watch",
+                )
+
+    def embedding(self, rnd):
+        return [round(rnd.uniform(-1, 1), 4) for _ in range(self.embedding_dims)]
+
+    def activity_stream(self):
+        """
+        Yields the activities, published one second apart after the links
+        """
+        rnd = random.Random(self.seed + 1)
+        actor_ranks = range(self.actors)
+        object_ranks = range(self.objects)
+        for number in range(self.activities):
+            actor = rnd.choices(actor_ranks, weights=self._actor_weights)[0]
+            an_object = rnd.choices(object_ranks, weights=self._object_weights)[0]
+            yield Activity(
+                rnd.choice(_VERBS),
+                Actor(self.actor_id(actor), "person"),
+                Object(self.object_id(an_object), self.object_type(an_object)),
+                published=self.start + datetime.timedelta(seconds=number + 1),
+                embedding=self.embedding(rnd) if self.embedding_dims else None,
+            )
+
+    def readers(self, count):
+        """
+        The actors whose feeds are read. Sampled uniformly: the skew is in who is followed, not in who reads.
+        """
+        rnd = random.Random(self.seed + 2)
+        return [self.actor_id(rnd.randrange(self.actors)) for _ in range(count)]
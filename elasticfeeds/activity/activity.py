@@ -221,17 +221,29 @@ class Activity(object):
     def embedding(self, value):
         self._embedding = self._validate_embedding(value)
 
-    def get_dict(self):
+    def get_dict(self, native_dates=False):
         """
         Creates a dict based on the activity definition. The ``published`` date provided when the activity was
         created (or ``now`` if none was provided) is honoured here, which allows back-dating or importing
         historical activities.
+        :param native_dates: Keep published, published_date and published_time as datetime, date and time
+                             values instead of formatting them as strings, for a serializer that encodes them
+                             itself (see elasticfeeds.serializers). Encoded in ISO 8601 they are the same
+                             strings. False by default
         :return: Dict
         """
+        if native_dates:
+            published = self.published
+            published_date = published.date()
+            published_time = published.time().replace(microsecond=0)
+        else:
+            published = self.published.isoformat()
+            published_date = self.published.strftime("%Y-%m-%d")
+            published_time = self.published.strftime("%H:%M:%S")
         _dict = {
-            "published": self.published.isoformat(),
-            "published_date": self.published.strftime("%Y-%m-%d"),
-            "published_time": self.published.strftime("%H:%M:%S"),
+            "published": published,
+            "published_date": published_date,
+            "published_time": published_time,
             "published_year": self.published.year,
             "published_month": self.published.month,
             "actor": self.activity_actor.get_dict(),
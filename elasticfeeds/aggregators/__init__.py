@@ -11,3 +11,4 @@ from .decayranked import DecayRankedAggregator
 from .cursor import CursorAggregator
 from .collapse import CollapseAggregator
 from .semantic import SemanticAggregator
+from .materialized import MaterializedFeedAggregator
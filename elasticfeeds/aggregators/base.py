@@ -1,7 +1,96 @@
-from elasticfeeds.exceptions import IDError, OrderError, SizeError, FromError
+import datetime
+import json
+from collections import OrderedDict
+
+from elasticfeeds.network import network_lookup_id
+from elasticfeeds.exceptions import (
+    IDError,
+    OrderError,
+    SizeError,
+    FromError,
+    NetworkFilterError,
+    SinceGranularityError,
+    SinceWindowError,
+    WeightLookupError,
+    SourceFilterError,
+    CursorError,
+)
 
 __all__ = ["BaseAggregator"]
 
+#: Ways of turning the network into a query. See BaseAggregator.network_filter
+_NETWORK_FILTERS = ("clauses", "terms", "lookup")
+
+#: Ways of looking up the connection weight of an activity's actor. See BaseAggregator.weight_lookup
+_WEIGHT_LOOKUPS = ("script", "map", "filter")
+
+#: Painless script that returns the weight of the connection to the activity's actor (1 by default). It walks
+#: params.weights, a list of {"id": ..., "weight": ...}
+_WEIGHT_SOURCE = (
+    "double weight = 1; "
+    "for (int i = 0; i < params.weights.length; ++i) { "
+    "if (params.weights[i].id == doc['actor.id'].value) { return params.weights[i].weight; } "
+    "} return weight;"
+)
+
+#: Same as _WEIGHT_SOURCE, but params.weights is a map of actor id to weight
+_WEIGHT_MAP_SOURCE = (
+    "def weight = params.weights.get(doc['actor.id'].value); "
+    "return weight == null ? 1 : weight;"
+)
+
+#: Number of characters of an ISO 8601 date that identify a year, a month or a day
+_SINCE_GRANULARITY = {"year": 4, "month": 7, "day": 10}
+
+
+def _iso(value):
+    """
+    Links read from the network index carry "linked" as an ISO 8601 string, links built in Python as datetime.
+    :return: String
+    """
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def _linked_after(linked, cutoff):
+    """
+    Whether an ISO 8601 "linked" date is later than ``cutoff`` (a naive local datetime). Dates that cannot be
+    parsed are treated as recent, so they keep exact per-link semantics.
+    """
+    try:
+        value = datetime.datetime.fromisoformat(linked)
+    except (TypeError, ValueError):
+        return True
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value > cutoff
+
+
+def _utc(value):
+    """
+    :return: A naive UTC datetime from an ISO 8601 string or a datetime. Naive values are taken as UTC, as the
+             backend does
+    """
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _source_fields(value):
+    """
+    :return: A list of field names as a copy of value, or None. Raises SourceFilterError for anything else
+    """
+    if value is None:
+        return None
+    if not isinstance(value, (list, tuple)) or not all(
+        isinstance(field, str) for field in value
+    ):
+        raise SourceFilterError()
+    return list(value)
+
 
 class BaseAggregator(object):
     """
@@ -9,6 +98,21 @@ class BaseAggregator(object):
     works (set_aggregation_section) and how the results are returned (get_feeds).
     """
 
+    #: Attributes given by the Manager or filled by the searches. They are not parameters of the feed (see
+    #: query_parameters)
+    _runtime_attributes = (
+        "_connection",
+        "_backend",
+        "_feed_index",
+        "_network_index",
+        "_network_array",
+        "query_dict",
+        "es_feed_result",
+    )
+    #: Attributes that set_query_dict, set_aggregation_section and the Manager's narrowing of the feed index
+    #: compile the query into (see Manager(query_cache=...))
+    compiled_attributes = ("feed_index", "query_dict")
+
     def __init__(self, actor_id):
         """
         Initialize the base aggregator
@@ -23,6 +127,7 @@ class BaseAggregator(object):
         self._connection = None
         self._backend = None
         self._feed_index = None
+        self._network_index = None
         self._network_array = []
         self.query_dict = (
             None  #: The query dict that ES will execute to fetch activity feeds
@@ -31,9 +136,23 @@ class BaseAggregator(object):
             None  #: The fetched activity feeds by ES. Used by subclasses in get_feeds()
         )
         self._order = "desc"  #: Order is descending at start
-        self._result_size = 10000  #: Result size is 10000 records at start
+        self._result_size = 100  #: Result size is 100 records at start
         self._result_from = 0  #: From is 0 at start
         self._top_hits_size = 100  #: Top hits size is 100 at start
+        self._top_hits_from = 0  #: Top hits from is 0 at start
+        #: Buckets are not paged at start: a terms aggregation returns them
+        self._bucket_size = None
+        self._after_key = None
+        self._network_filter = "clauses"  #: One bool clause per link at start
+        #: Connection weights are looked up by a painless loop at start
+        self._weight_lookup = "script"
+        #: Every field of the activities but the embedding vector is returned at start
+        self._source_includes = None
+        self._source_excludes = ["embedding"]
+        #: With network_filter = "terms", links are grouped by the year, month or day they were created
+        self._since_granularity = "day"
+        #: With network_filter = "terms", links created within this window keep exact per-link clauses
+        self._exact_since_window = datetime.timedelta(days=1)
 
     @property
     def result_from(self):
@@ -78,6 +197,149 @@ class BaseAggregator(object):
             raise SizeError
         self._top_hits_size = value
 
+    @property
+    def top_hits_from(self):
+        """
+        In an aggregation top_hits_from is the offset of the first hit of each bucket. With top_hits_size it pages
+        the hits of the buckets. from + size cannot go beyond the index.max_inner_result_window setting of the
+        feed index (100 by default)
+        :return: Integer
+        """
+        return self._top_hits_from
+
+    @top_hits_from.setter
+    def top_hits_from(self, value):
+        if not isinstance(value, int):
+            raise FromError
+        self._top_hits_from = value
+
+    @property
+    def bucket_size(self):
+        """
+        The number of groups per page of the aggregators that group activities by date, type or object
+        (DateWeightAggregator, RecentTypeAggregator, RecentObjectTypeAggregator and RecentTypeObjectAggregator).
+        None (default) returns the groups of a terms aggregation (10 of them) in one response. With a size they
+        are paged with a composite aggregation, ordered by their key (the newest date first, the types and object
+        IDs in alphabetical order) instead of by their most recent activity, and get_feeds returns a dict with
+        the groups and the next_cursor to pass as after_key
+        :return: Integer or None
+        """
+        return self._bucket_size
+
+    @bucket_size.setter
+    def bucket_size(self, value):
+        if value is not None and (not isinstance(value, int) or value < 1):
+            raise SizeError
+        self._bucket_size = value
+
+    @property
+    def after_key(self):
+        """
+        The next_cursor returned with the previous page of groups (see bucket_size), or None for the first page
+        :return: Dict or None
+        """
+        return self._after_key
+
+    @after_key.setter
+    def after_key(self, value):
+        if value is not None and not isinstance(value, dict):
+            raise CursorError()
+        self._after_key = value
+
+    def _bucket_aggregation(self, name, field, terms, aggs):
+        """
+        The aggregation that groups the activities
+        :param name: The name of the key of the groups when they are paged
+        :param field: The field the activities are grouped by
+        :param terms: The terms aggregation that returns the groups when they are not paged
+        :param aggs: The sub-aggregations of each group
+        :return: A terms aggregation, or a composite aggregation after after_key when bucket_size is set
+        """
+        if self.bucket_size is None:
+            return {"terms": terms, "aggs": aggs}
+        if field == "published_date":
+            source = {
+                "date_histogram": {
+                    "field": field,
+                    "calendar_interval": "1d",
+                    "format": "yyyy-MM-dd",
+                    "order": "desc",
+                }
+            }
+        else:
+            source = {"terms": {"field": field, "order": "asc"}}
+        composite = {"size": self.bucket_size, "sources": [{name: source}]}
+        if self.after_key is not None:
+            composite["after"] = self.after_key
+        return {"composite": composite, "aggs": aggs}
+
+    def _bucket_page(self, aggregation, groups):
+        """
+        :param aggregation: The result of the aggregation built by _bucket_aggregation
+        :param groups: The groups built from its buckets
+        :return: The groups, or when they are paged a dict with:
+            groups: The groups of this page
+            next_cursor: The after_key of the next page, or None when the last group was reached
+        """
+        if self.bucket_size is None:
+            return groups
+        next_cursor = None
+        if aggregation is not None and len(aggregation["buckets"]) == self.bucket_size:
+            next_cursor = aggregation.get("after_key")
+        return {"groups": groups, "next_cursor": next_cursor}
+
+    @staticmethod
+    def _bucket_key(bucket, name):
+        """
+        :return: The key of a group, from a terms bucket or from the source called name of a composite bucket
+        """
+        key = bucket["key"]
+        return key[name] if isinstance(key, dict) else key
+
+    @property
+    def source_includes(self):
+        """
+        The fields of the activities to return, e.g. ["published", "type", "actor", "object"]. Wildcards are
+        allowed. None returns every field, or for the aggregators that group activities (top hits) the fields
+        they have always returned.
+        :return: List or None
+        """
+        return self._source_includes
+
+    @source_includes.setter
+    def source_includes(self, value):
+        self._source_includes = _source_fields(value)
+
+    @property
+    def source_excludes(self):
+        """
+        The fields of the activities not to return. ["embedding"] by default, so the vector of the semantic
+        feeds does not travel with every feed. None returns them all.
+        :return: List or None
+        """
+        return self._source_excludes
+
+    @source_excludes.setter
+    def source_excludes(self, value):
+        self._source_excludes = _source_fields(value)
+
+    def _source_filter(self, default_includes=None, prefix=""):
+        """
+        The _source option of the searches and top hits that return activities
+        :param default_includes: The fields returned when source_includes is None. None for every field
+        :param prefix: Prefix of the field names, for documents that hold the activity in a field
+        :return: A dict with "includes" and / or "excludes", or True to return every field
+        """
+        result = {}
+        includes = self.source_includes
+        if includes is None:
+            includes = default_includes
+        if includes:
+            result["includes"] = [prefix + field for field in includes]
+        if self.source_excludes:
+            result["excludes"] = [prefix + field for field in self.source_excludes]
+        return result or True
+
     @property
     def actor_id(self):
         """
@@ -131,6 +393,18 @@ class BaseAggregator(object):
     def feed_index(self, value):
         self._feed_index = value
 
+    @property
+    def network_index(self):
+        """
+        The name of the network index. Only needed by the "lookup" network filter.
+        :return: String
+        """
+        return self._network_index
+
+    @network_index.setter
+    def network_index(self, value):
+        self._network_index = value
+
     @property
     def order(self):
         """
@@ -158,57 +432,238 @@ class BaseAggregator(object):
     def network_array(self, value):
         self._network_array = value
 
+    @property
+    def network_filter(self):
+        """
+        How the network is turned into the feed query:
+
+        * "clauses" (default): one bool clause per actor link and two per object link, each with the exact
+          date the link was created.
+        * "terms": links are grouped by activity class, type and creation date (see ``since_granularity``)
+          and each group becomes one ``terms`` query. The earliest creation date of a group is used for the
+          whole group, so an activity published shortly before a link was created may be included. Links
+          created within ``exact_since_window`` keep their own exact clause. This keeps the query small for
+          actors with large networks.
+        * "lookup": the cluster reads the followed ids itself with a terms lookup against the actor's lookup
+          document in the network index (see Manager(network_lookup=True)). The Manager then skips loading
+          the network, and the query has the same small size for any network. The date each link was created
+          is not taken into account (all activities of the linked actors and objects are included) and the
+          type of the linked actors / objects is not checked. Ranking by connection weight uses a weight of 1.
+        :return: String
+        """
+        return self._network_filter
+
+    @network_filter.setter
+    def network_filter(self, value):
+        if value not in _NETWORK_FILTERS:
+            raise NetworkFilterError()
+        self._network_filter = value
+
+    @property
+    def since_granularity(self):
+        """
+        With network_filter = "terms", the part of their creation date by which links are grouped: "year",
+        "month" or "day" (default). Coarser groups give a smaller query but include more activities published
+        before a link was created.
+        :return: String
+        """
+        return self._since_granularity
+
+    @since_granularity.setter
+    def since_granularity(self, value):
+        if value not in _SINCE_GRANULARITY:
+            raise SinceGranularityError()
+        self._since_granularity = value
+
+    @property
+    def exact_since_window(self):
+        """
+        With network_filter = "terms", links created within this window (one day by default) keep their own
+        exact clause instead of joining a group.
+        :return: datetime.timedelta
+        """
+        return self._exact_since_window
+
+    @exact_since_window.setter
+    def exact_since_window(self, value):
+        if not isinstance(value, datetime.timedelta):
+            raise SinceWindowError()
+        self._exact_since_window = value
+
+    @property
+    def weight_lookup(self):
+        """
+        How aggregators that rank by connection weight (DecayRankedAggregator, DateWeightAggregator) find the
+        weight of each activity's actor:
+
+        * "script" (default): a painless script walks the list of weights for every candidate activity. The
+          cost grows with the size of the network times the number of hits.
+        * "map": the painless script reads the weight from a map of actor id to weight, one lookup per
+          activity.
+        * "filter": no script. Actors are grouped by distinct weight and each group becomes a function_score
+          function with a ``terms`` filter on actor.id and that weight. Actors with weight 1 need no function.
+
+        The three modes rank the feed in the same way.
+        :return: String
+        """
+        return self._weight_lookup
+
+    @weight_lookup.setter
+    def weight_lookup(self, value):
+        if value not in _WEIGHT_LOOKUPS:
+            raise WeightLookupError()
+        self._weight_lookup = value
+
+    @property
+    def uses_network(self):
+        """
+        Whether the query needs the actor's network. The Manager does not load the network when False.
+        :return: Bool
+        """
+        return self.network_filter != "lookup"
+
+    @property
+    def feed_cacheable(self):
+        """
+        Whether Manager(feed_cache=...) may keep the result of get_feeds. The result must depend only on the
+        query parameters (see query_parameters), the actor's network and the activities.
+        :return: Bool
+        """
+        return True
+
+    def query_parameters(self):
+        """
+        Everything the query is built from, apart from the actor's network: the aggregator class and its
+        attributes. Manager(query_cache=...) keys the compiled queries on it.
+        :return: String
+        """
+        parameters = dict(
+            (name, value)
+            for name, value in vars(self).items()
+            if name not in self._runtime_attributes
+        )
+        return json.dumps(
+            ["%s.%s" % (type(self).__module__, type(self).__name__), parameters],
+            sort_keys=True,
+            default=str,
+        )
+
     def get_sort_array(self):
         result = [{"published": {"order": self.order}}]
         return result
 
-    def _network_should_clauses(self):
+    @staticmethod
+    def _link_clauses(activity_class, ids, activity_type, since, extra_must):
+        """
+        Builds the bool clauses that match activities flowing from one link, or from a group of links that share
+        class, type and since date. An "actor" link matches the actor. An "object" link matches the object and
+        the target.
+        """
+        fields = ["actor"] if activity_class == "actor" else ["object", "target"]
+        clauses = []
+        for field in fields:
+            if len(ids) == 1:
+                id_query = {"term": {field + ".id": ids[0]}}
+            else:
+                id_query = {"terms": {field + ".id": ids}}
+            must = [
+                id_query,
+                {"term": {field + ".type": activity_type}},
+                {"range": {"published": {"gte": since}}},
+            ]
+            must.extend(extra_must)
+            clauses.append({"bool": {"must": must}})
+        return clauses
+
+    def _network_lookup_clauses(self, activity_classes, extra_must):
+        """
+        Builds the "should" clauses of the "lookup" network filter: terms lookups against the actor's lookup
+        document, so the cluster fetches the linked ids itself.
+        """
+        should = []
+        fields = []
+        if "actor" in activity_classes:
+            fields.append(("actor.id", "lookup_actors"))
+        if "object" in activity_classes:
+            fields.append(("object.id", "lookup_objects"))
+            fields.append(("target.id", "lookup_objects"))
+        for field, path in fields:
+            lookup = {
+                "index": self.network_index,
+                "id": network_lookup_id(self.actor_id),
+                "path": path,
+            }
+            must = [{"terms": {field: lookup}}]
+            must.extend(extra_must)
+            should.append({"bool": {"must": must}})
+        return should
+
+    def _network_should_clauses(
+        self, activity_classes=("actor", "object"), extra_must=None
+    ):
         """
         Builds the list of "should" bool clauses that match every activity flowing from the actor's network.
         An "actor" link contributes one clause (matching the actor). An "object" link contributes two clauses
         (matching the object and the target). Each clause only matches activities published on or after the date
         the link was created. Shared by every aggregator that reads the following feed.
+
+        With network_filter = "terms" the links are grouped first so that each group contributes the clauses
+        of a single link with a ``terms`` query on the ids.
+
+        :param activity_classes: The link classes to include. Both "actor" and "object" by default
+        :param extra_must: Optional list of queries added to every clause (e.g. a year filter)
         :return: List of bool clauses (possibly empty)
         """
+        extra_must = extra_must or []
+        if self.network_filter == "lookup":
+            return self._network_lookup_clauses(activity_classes, extra_must)
+        links = [
+            link
+            for link in self.network_array
+            if link["linked_activity"]["activity_class"] in activity_classes
+        ]
         should = []
-        for link in self.network_array:
-            since = link["linked"]
-            linked_activity = link["linked_activity"]
-            if linked_activity["activity_class"] == "actor":
-                should.append(
-                    {
-                        "bool": {
-                            "must": [
-                                {"term": {"actor.id": linked_activity["id"]}},
-                                {"term": {"actor.type": linked_activity["type"]}},
-                                {"range": {"published": {"gte": since}}},
-                            ]
-                        }
-                    }
+        if self.network_filter == "terms":
+            cutoff = datetime.datetime.now() - self.exact_since_window
+            length = _SINCE_GRANULARITY[self.since_granularity]
+            groups = OrderedDict()
+            exact = []
+            for link in links:
+                since = _iso(link["linked"])
+                if _linked_after(since, cutoff):
+                    exact.append(link)
+                    continue
+                linked_activity = link["linked_activity"]
+                key = (
+                    linked_activity["activity_class"],
+                    linked_activity["type"],
+                    since[:length],
                 )
-            else:
-                should.append(
-                    {
-                        "bool": {
-                            "must": [
-                                {"term": {"object.id": linked_activity["id"]}},
-                                {"term": {"object.type": linked_activity["type"]}},
-                                {"range": {"published": {"gte": since}}},
-                            ]
-                        }
-                    }
+                group = groups.setdefault(key, {"ids": [], "since": since})
+                group["ids"].append(linked_activity["id"])
+                group["since"] = min(group["since"], since)
+            for (activity_class, activity_type, _), group in groups.items():
+                should.extend(
+                    self._link_clauses(
+                        activity_class,
+                        group["ids"],
+                        activity_type,
+                        group["since"],
+                        extra_must,
+                    )
                 )
-                should.append(
-                    {
-                        "bool": {
-                            "must": [
-                                {"term": {"target.id": linked_activity["id"]}},
-                                {"term": {"target.type": linked_activity["type"]}},
-                                {"range": {"published": {"gte": since}}},
-                            ]
-                        }
-                    }
+            links = exact
+        for link in links:
+            linked_activity = link["linked_activity"]
+            should.extend(
+                self._link_clauses(
+                    linked_activity["activity_class"],
+                    [linked_activity["id"]],
+                    linked_activity["type"],
+                    _iso(link["linked"]),
+                    extra_must,
                 )
+            )
         return should
 
     def _actor_weights(self):
@@ -228,6 +683,49 @@ class BaseAggregator(object):
                 )
         return weights
 
+    def _weight_script(self):
+        """
+        The painless script of the "script" and "map" weight lookups.
+        :return: Dict
+        """
+        weights = self._actor_weights()
+        if self.weight_lookup == "map":
+            lookup = {}
+            for weight in weights:
+                lookup.setdefault(weight["id"], weight["weight"])
+            return {
+                "lang": "painless",
+                "source": _WEIGHT_MAP_SOURCE,
+                "params": {"weights": lookup},
+            }
+        return {
+            "lang": "painless",
+            "source": _WEIGHT_SOURCE,
+            "params": {"weights": weights},
+        }
+
+    def _weight_functions(self):
+        """
+        The function_score functions of the "filter" weight lookup: one ``terms`` filter on actor.id per distinct
+        weight other than 1, ordered by descending weight. An actor that appears more than once keeps its first
+        weight, as in the scripts.
+        :return: List of dicts
+        """
+        groups = OrderedDict()
+        seen = set()
+        for weight in self._actor_weights():
+            if weight["id"] in seen:
+                continue
+            seen.add(weight["id"])
+            if weight["weight"] != 1:
+                groups.setdefault(weight["weight"], []).append(weight["id"])
+        return [
+            {"filter": {"terms": {"actor.id": ids}}, "weight": weight}
+            for weight, ids in sorted(
+                groups.items(), key=lambda item: item[0], reverse=True
+            )
+        ]
+
     def set_query_dict(self):
         """
         Setup the query section of the ES dict that will search for activities in the feed index
@@ -241,6 +739,24 @@ class BaseAggregator(object):
         else:
             self.query_dict = None
 
+    def published_range(self):
+        """
+        The dates between which the feed query can match activities. With monthly feed partitions (see
+        Manager(feed_partitioning=...)) the Manager reads only the partitions that overlap them. No activity
+        published before the earliest link of the network is in the feed (the range starts a day earlier, as the
+        partitions follow the local date an activity carries while the link dates are compared in UTC). The
+        "lookup" network filter does not check the link dates, so it is unbounded. Subclasses with a date filter
+        narrow it further.
+        :return: Tuple (since, until) of naive UTC datetimes, each one None when unbounded
+        """
+        if self.network_filter == "lookup" or not self.network_array:
+            return None, None
+        try:
+            since = min(_utc(link["linked"]) for link in self.network_array)
+        except (KeyError, TypeError, ValueError):
+            return None, None
+        return since - datetime.timedelta(days=1), None
+
     def query_feeds(self):
         if self.connection is not None:
             es_result = self.connection.search(
@@ -248,6 +764,52 @@ class BaseAggregator(object):
             )
             self.es_feed_result = es_result
 
+    def prepare_searches(self):
+        """
+        Sends the requests the feed searches depend on (e.g. opening a point in time). The managers call it after
+        set_aggregation_section and before query_feeds or feed_searches. Does nothing by default.
+        """
+
+    async def prepare_searches_async(self):
+        """
+        prepare_searches for an asyncio client (see AsyncManager)
+        """
+
+    def feed_searches(self):
+        """
+        The searches query_feeds sends, for managers that batch the searches of many aggregators
+        (Manager.get_feeds_many).
+        :return: List of (index, body) tuples
+        """
+        return [(self.feed_index, self.query_dict)]
+
+    def set_feed_results(self, responses):
+        """
+        Takes the responses of the searches returned by feed_searches, in the same order, as query_feeds would.
+        :param responses: List of search responses
+        :return: The id of a point in time the caller must close, or None
+        """
+        self.es_feed_result = responses[0]
+        return None
+
+    def feed_results(self):
+        """
+        The responses of the searches sent by query_feeds, in the order of feed_searches. Used by the Manager
+        instrumentation to report the server-side time and hits.
+        :return: List of search responses
+        """
+        return [self.es_feed_result]
+
+    async def query_feeds_async(self):
+        """
+        query_feeds for an asyncio client (see AsyncManager)
+        """
+        if self.connection is not None:
+            es_result = await self.connection.search(
+                index=self.feed_index, body=self.query_dict
+            )
+            self.es_feed_result = es_result
+
     def set_aggregation_section(self):
         """
         Reimplemented by subclasses, this function should set the 'aggs' section in self.query_dict by doing
@@ -22,6 +22,7 @@ class CollapseAggregator(BaseAggregator):
         self.query_dict["size"] = self.result_size
         self.query_dict["from"] = self.result_from
         self.query_dict["collapse"] = {"field": self.collapse_field}
+        self.query_dict["_source"] = self._source_filter()
 
     def get_feeds(self):
         """
@@ -1,4 +1,34 @@
+import base64
+import json
+
 from .base import BaseAggregator
+from elasticfeeds.exceptions import CursorError
+
+
+def _encode_cursor(pit_id, search_after):
+    """
+    :return: An opaque, URL-safe cursor holding a point-in-time id and the sort values of the last hit
+    """
+    payload = json.dumps({"pit": pit_id, "after": search_after}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _response_pit_id(response, default):
+    """
+    :return: The PIT id returned with a search response (it can change from page to page), or default
+    """
+    return getattr(response, "body", response).get("pit_id", default)
+
+
+def _decode_cursor(cursor):
+    """
+    :return: A tuple (pit_id, search_after). Raises CursorError if the cursor was not made by _encode_cursor
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return payload["pit"], payload["after"]
+    except (AttributeError, TypeError, ValueError, KeyError):
+        raise CursorError()
 
 
 class CursorAggregator(BaseAggregator):
@@ -10,18 +40,32 @@ class CursorAggregator(BaseAggregator):
     activities arrive between page loads.
 
     ``result_size`` controls the page size (25 by default). A stable tie-breaker (``feed_id``) is appended to the
-    sort so the cursor is deterministic; for very high write volumes consider a point-in-time search on top of
-    this.
+    sort so the cursor is deterministic.
+
+    With ``point_in_time=True`` the first page opens a point in time (PIT) on the feed index and every page
+    searches that frozen view of the index, so a busy feed does not shift while the user scrolls. The PIT id
+    travels inside ``next_cursor``, which becomes an opaque string, and each page extends its ``keep_alive``.
+    The tie-breaker is the backend's cheapest one for PIT searches (``_shard_doc`` on Elasticsearch) instead of
+    the ``feed_id`` keyword. The PIT is closed when the last page is read; a reader that stops scrolling leaves
+    it to expire after ``keep_alive``.
     """
 
-    def __init__(self, actor_id, search_after=None):
+    def __init__(
+        self, actor_id, search_after=None, point_in_time=False, keep_alive="1m"
+    ):
         """
         :param actor_id: The actor ID that will be used to query for activity feeds
         :param search_after: The ``next_cursor`` returned by a previous call, or None for the first page.
+        :param point_in_time: Page through a point in time of the feed index. False by default
+        :param keep_alive: How long the point in time is kept between two pages. "1m" by default
         """
         BaseAggregator.__init__(self, actor_id)
         self._result_size = 25  #: Page size. Override via the result_size property.
-        self._search_after = search_after
+        self.point_in_time = point_in_time
+        self.keep_alive = keep_alive
+        self._pit_id = None
+        self._search_after = None
+        self.search_after = search_after
 
     @property
     def search_after(self):
@@ -33,9 +77,30 @@ class CursorAggregator(BaseAggregator):
 
     @search_after.setter
     def search_after(self, value):
+        if self.point_in_time and value is not None:
+            self._pit_id, value = _decode_cursor(value)
         self._search_after = value
 
+    @property
+    def pit_id(self):
+        """
+        The id of the point in time being paged, or None
+        :return: String or None
+        """
+        return self._pit_id
+
+    @property
+    def feed_cacheable(self):
+        # Each page of a point in time depends on the PIT, which the cache must not share
+        return not self.point_in_time
+
     def get_sort_array(self):
+        if self.point_in_time:
+            if self.backend is not None:
+                tiebreaker = self.backend.point_in_time_tiebreaker(self.order)
+            else:
+                tiebreaker = {"_shard_doc": {"order": self.order}}
+            return [{"published": {"order": self.order}}, tiebreaker]
         return [
             {"published": {"order": self.order}},
             {"feed_id": {"order": self.order}},
@@ -43,14 +108,74 @@ class CursorAggregator(BaseAggregator):
 
     def set_aggregation_section(self):
         self.query_dict["size"] = self.result_size
+        self.query_dict["_source"] = self._source_filter()
         if self._search_after is not None:
             self.query_dict["search_after"] = self._search_after
+        if self._pit_id is not None:
+            self.query_dict["pit"] = {"id": self._pit_id, "keep_alive": self.keep_alive}
+
+    def prepare_searches(self):
+        if self.point_in_time and self._pit_id is None and self.connection is not None:
+            self._pit_id = self.backend.open_point_in_time(
+                self.connection, self.feed_index, self.keep_alive
+            )
+            self.query_dict["pit"] = {"id": self._pit_id, "keep_alive": self.keep_alive}
+
+    async def prepare_searches_async(self):
+        if self.point_in_time and self._pit_id is None and self.connection is not None:
+            self._pit_id = await self.backend.open_point_in_time(
+                self.connection, self.feed_index, self.keep_alive
+            )
+            self.query_dict["pit"] = {"id": self._pit_id, "keep_alive": self.keep_alive}
+
+    def _search_index(self):
+        # A point-in-time search must not name an index: the point in time already does
+        return None if self._pit_id is not None else self.feed_index
+
+    def _finished_pit(self):
+        """
+        Takes the (possibly renewed) PIT id from the last response.
+        :return: The id of the point in time to close when the last page was read, otherwise None
+        """
+        if self._pit_id is None:
+            return None
+        self._pit_id = _response_pit_id(self.es_feed_result, self._pit_id)
+        if len(self.es_feed_result["hits"]["hits"]) < self.result_size:
+            return self._pit_id
+        return None
+
+    def query_feeds(self):
+        if self.connection is not None:
+            self.es_feed_result = self.connection.search(
+                index=self._search_index(), body=self.query_dict
+            )
+            finished = self._finished_pit()
+            if finished is not None:
+                self.backend.close_point_in_time(self.connection, finished)
+
+    async def query_feeds_async(self):
+        if self.connection is not None:
+            self.es_feed_result = await self.connection.search(
+                index=self._search_index(), body=self.query_dict
+            )
+            finished = self._finished_pit()
+            if finished is not None:
+                await self.backend.close_point_in_time(self.connection, finished)
+
+    def feed_searches(self):
+        return [(self._search_index(), self.query_dict)]
+
+    def set_feed_results(self, responses):
+        self.es_feed_result = responses[0]
+        # The batched searches are sent by the Manager, so it closes the PIT of the last page
+        return self._finished_pit()
 
     def get_feeds(self):
         """
         Construct one page of the chronological feed. Returns a dict with:
             activities: An array of activities (usual shape) for this page, ordered by published datetime
-            next_cursor: The cursor to pass as ``search_after`` for the next page, or None when the end is reached
+            next_cursor: The cursor to pass as ``search_after`` for the next page, or None when the end is reached.
+                         An opaque string with point_in_time, otherwise the sort values of the last hit
 
         :return: Dict
         """
@@ -59,4 +184,6 @@ class CursorAggregator(BaseAggregator):
         next_cursor = (
             hits[-1]["sort"] if hits and len(hits) == self.result_size else None
         )
+        if next_cursor is not None and self._pit_id is not None:
+            next_cursor = _encode_cursor(self._pit_id, next_cursor)
         return {"activities": activities, "next_cursor": next_cursor}
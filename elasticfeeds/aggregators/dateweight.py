@@ -5,27 +5,17 @@ class DateWeightAggregator(BaseAggregator):
     """
     This aggregator returns activity feeds based on the same date and ordered by the weight of the connection. The
     aggregator only return feeds with activity_class = 'actor'
+
+    Set ``weight_lookup`` to "map" or "filter" for large networks (see BaseAggregator.weight_lookup). With
+    "filter" the query is wrapped in a function_score that scores each activity with its weight, and the hits of
+    each date are sorted by that score. In every mode the activities of the same weight are sorted newest first.
     """
 
     def set_query_dict(self):
         """
         We overwrite this method so only feeds with activity_class = 'actor' are retrieved
         """
-        should = []
-        for link in self.network_array:
-            since = link["linked"]
-            linked_activity = link["linked_activity"]
-            if linked_activity["activity_class"] == "actor":
-                should_item = {
-                    "bool": {
-                        "must": [
-                            {"term": {"actor.id": linked_activity["id"]}},
-                            {"term": {"actor.type": linked_activity["type"]}},
-                            {"range": {"published": {"gte": since}}},
-                        ]
-                    }
-                }
-                should.append(should_item)
+        should = self._network_should_clauses(activity_classes=("actor",))
         if len(should) > 0:
             self.query_dict = {
                 "query": {"bool": {"should": should}},
@@ -35,28 +25,42 @@ class DateWeightAggregator(BaseAggregator):
             self.query_dict = None
 
     def set_aggregation_section(self):
-        # Get the weights from the network
-        weights = self._actor_weights()
+        if self.weight_lookup == "filter":
+            # Every activity scores 1 unless a weight function matches it, as with the scripts, instead of the
+            # number of network clauses it matches
+            query = {"constant_score": {"filter": self.query_dict["query"]}}
+            functions = self._weight_functions()
+            if functions:
+                query = {
+                    "function_score": {
+                        "query": query,
+                        "functions": functions,
+                        "score_mode": "first",
+                        "boost_mode": "replace",
+                    }
+                }
+            self.query_dict["query"] = query
+            weight_sort = {"_score": {"order": "desc"}}
+        else:
+            weight_sort = {
+                "_script": {
+                    "type": "number",
+                    "script": self._weight_script(),
+                    "order": "desc",
+                }
+            }
         self.query_dict["size"] = 0
         self.query_dict["aggs"] = {
-            "dates": {
-                "terms": {"field": "published_date"},
-                "aggs": {
+            "dates": self._bucket_aggregation(
+                "date",
+                "published_date",
+                {"field": "published_date"},
+                {
                     "top_date_hits": {
                         "top_hits": {
-                            "sort": {
-                                "_script": {
-                                    "type": "number",
-                                    "script": {
-                                        "lang": "painless",
-                                        "source": "def weight = 1; for (int i = 0; i < params.weights.length; ++i) { if (params.weights[i].id == doc['actor.id'].value) return params.weights[i].weight; } return weight;",
-                                        "params": {"weights": weights},
-                                    },
-                                    "order": "desc",
-                                }
-                            },
-                            "_source": {
-                                "includes": [
+                            "sort": [weight_sort, {"published": {"order": "desc"}}],
+                            "_source": self._source_filter(
+                                [
                                     "published",
                                     "actor",
                                     "object",
@@ -64,12 +68,13 @@ class DateWeightAggregator(BaseAggregator):
                                     "target",
                                     "extra",
                                 ]
-                            },
+                            ),
                             "size": self.top_hits_size,
+                            "from": self.top_hits_from,
                         }
                     }
                 },
-            }
+            )
         }
 
     def get_feeds(self):
@@ -98,15 +103,23 @@ class DateWeightAggregator(BaseAggregator):
                     type
                     extra (optional)
 
+        With bucket_size the dates are paged, newest first, and this returns a dict with the dates of the page
+        ("groups") and the "next_cursor" to pass as after_key (see BaseAggregator.bucket_size).
+
         :return: Dict array
         """
         result = []
+        aggregation = None
         if self.es_feed_result["hits"]["total"]["value"] > 0:
-            for a_date in self.es_feed_result["aggregations"]["dates"]["buckets"]:
-                _dict = {"date": a_date["key_as_string"]}
+            aggregation = self.es_feed_result["aggregations"]["dates"]
+            for a_date in aggregation["buckets"]:
+                if self.bucket_size is None:
+                    _dict = {"date": a_date["key_as_string"]}
+                else:
+                    _dict = {"date": a_date["key"]["date"]}
                 hit_array = []
                 for hit in a_date["top_date_hits"]["hits"]["hits"]:
                     hit_array.append(hit["_source"])
                 _dict["activities"] = hit_array
                 result.append(_dict)
-        return result
+        return self._bucket_page(aggregation, result)
@@ -1,13 +1,5 @@
 from .base import BaseAggregator
 
-#: Painless script that returns the weight of the connection to the activity's actor (1 by default).
-_WEIGHT_SOURCE = (
-    "double weight = 1; "
-    "for (int i = 0; i < params.weights.length; ++i) { "
-    "if (params.weights[i].id == doc['actor.id'].value) { return params.weights[i].weight; } "
-    "} return weight;"
-)
-
 
 class DecayRankedAggregator(BaseAggregator):
     """
@@ -20,6 +12,8 @@ class DecayRankedAggregator(BaseAggregator):
 
     This turns the static, date-bucketed DateWeightAggregator into a proper ranked feed, which is closer to how
     modern feeds order content.
+
+    Set ``weight_lookup`` to "map" or "filter" for large networks (see BaseAggregator.weight_lookup).
     """
 
     def __init__(self, actor_id, scale="7d", offset=None, decay=0.5):
@@ -36,26 +30,19 @@ class DecayRankedAggregator(BaseAggregator):
         self.decay = decay
 
     def set_aggregation_section(self):
-        weights = self._actor_weights()
         base_query = self.query_dict["query"]
         decay_params = {"scale": self.scale, "decay": self.decay}
         if self.offset is not None:
             decay_params["offset"] = self.offset
+        functions = [{"gauss": {"published": decay_params}}]
+        if self.weight_lookup == "filter":
+            functions.extend(self._weight_functions())
+        else:
+            functions.append({"script_score": {"script": self._weight_script()}})
         self.query_dict["query"] = {
             "function_score": {
                 "query": base_query,
-                "functions": [
-                    {"gauss": {"published": decay_params}},
-                    {
-                        "script_score": {
-                            "script": {
-                                "lang": "painless",
-                                "source": _WEIGHT_SOURCE,
-                                "params": {"weights": weights},
-                            }
-                        }
-                    },
-                ],
+                "functions": functions,
                 "score_mode": "multiply",
                 "boost_mode": "replace",
             }
@@ -63,6 +50,7 @@ class DecayRankedAggregator(BaseAggregator):
         self.query_dict["sort"] = [{"_score": {"order": "desc"}}]
         self.query_dict["size"] = self.result_size
         self.query_dict["from"] = self.result_from
+        self.query_dict["_source"] = self._source_filter()
 
     def get_feeds(self):
         """
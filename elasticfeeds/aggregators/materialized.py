@@ -0,0 +1,158 @@
+import asyncio
+
+from .base import BaseAggregator
+
+
+class MaterializedFeedAggregator(BaseAggregator):
+    """
+    Reads the feed that was materialized at write time (see Manager(timeline_index=...)). Every activity written
+    through the manager is copied into the timeline of each follower, so the feed of an actor is a single term
+    query on the timeline index instead of a query built from the whole network.
+
+    Activities of actors or objects with more followers than the manager's fanout_threshold are not copied
+    (fan-out-on-read). With ``hybrid=True`` (the default) the aggregator also queries the feed index for those,
+    using the network like the other aggregators, and merges both result sets by published date. With
+    ``hybrid=False`` only the timeline is read and the manager does not load the network.
+    """
+
+    _runtime_attributes = BaseAggregator._runtime_attributes + (
+        "_timeline_index",
+        "network_query_dict",
+        "es_network_result",
+    )
+    compiled_attributes = BaseAggregator.compiled_attributes + ("network_query_dict",)
+
+    def __init__(self, actor_id, hybrid=True):
+        """
+        :param actor_id: The actor ID that will be used to query for activity feeds
+        :param hybrid: Also read the activities that were not fanned out. True by default
+        """
+        BaseAggregator.__init__(self, actor_id)
+        self.hybrid = hybrid
+        self._timeline_index = None
+        self.network_query_dict = None
+        self.es_network_result = None
+
+    @property
+    def timeline_index(self):
+        """
+        The name of the timeline index. Set by the Manager
+        :return: String
+        """
+        return self._timeline_index
+
+    @timeline_index.setter
+    def timeline_index(self, value):
+        self._timeline_index = value
+
+    @property
+    def uses_network(self):
+        return self.hybrid and BaseAggregator.uses_network.fget(self)
+
+    def set_query_dict(self):
+        """
+        Sets the timeline query and, for a hybrid feed, the query of the activities that were not fanned out
+        """
+        self.query_dict = {
+            "query": {"bool": {"filter": [{"term": {"owner": self.actor_id}}]}},
+            "sort": self.get_sort_array(),
+        }
+        self.network_query_dict = None
+        if self.hybrid:
+            should = self._network_should_clauses()
+            if len(should) > 0:
+                self.network_query_dict = {
+                    "query": {
+                        "bool": {
+                            "should": should,
+                            "minimum_should_match": 1,
+                            "must_not": [{"term": {"fanned_out": True}}],
+                        }
+                    },
+                    "sort": self.get_sort_array(),
+                }
+
+    def set_aggregation_section(self):
+        # The timeline copies hold the activity in their "activity" field
+        self.query_dict["_source"] = self._source_filter(prefix="activity.")
+        if self.network_query_dict is None:
+            self.query_dict["size"] = self.result_size
+            self.query_dict["from"] = self.result_from
+        else:
+            # Both sides are merged, so each one must return everything up to the end of the page
+            self.query_dict["size"] = self.result_from + self.result_size
+            self.network_query_dict["size"] = self.result_from + self.result_size
+            self.network_query_dict["_source"] = self._source_filter()
+
+    def query_feeds(self):
+        if self.connection is not None:
+            self.es_feed_result = self.connection.search(
+                index=self.timeline_index, body=self.query_dict
+            )
+            if self.network_query_dict is not None:
+                self.es_network_result = self.connection.search(
+                    index=self.feed_index, body=self.network_query_dict
+                )
+            else:
+                self.es_network_result = None
+
+    def feed_searches(self):
+        searches = [(self.timeline_index, self.query_dict)]
+        if self.network_query_dict is not None:
+            searches.append((self.feed_index, self.network_query_dict))
+        return searches
+
+    def set_feed_results(self, responses):
+        self.es_feed_result = responses[0]
+        self.es_network_result = responses[1] if len(responses) > 1 else None
+        return None
+
+    def feed_results(self):
+        if self.es_network_result is None:
+            return [self.es_feed_result]
+        return [self.es_feed_result, self.es_network_result]
+
+    async def query_feeds_async(self):
+        if self.connection is not None:
+            if self.network_query_dict is not None:
+                # The two searches are independent, so they are sent concurrently
+                self.es_feed_result, self.es_network_result = await asyncio.gather(
+                    self.connection.search(
+                        index=self.timeline_index, body=self.query_dict
+                    ),
+                    self.connection.search(
+                        index=self.feed_index, body=self.network_query_dict
+                    ),
+                )
+            else:
+                self.es_feed_result = await self.connection.search(
+                    index=self.timeline_index, body=self.query_dict
+                )
+                self.es_network_result = None
+
+    def get_feeds(self):
+        """
+        Construct an array of the activity feeds ordered by published datetime. The activities have the same
+        keys as the ones returned by UnAggregated.
+
+        :return: Dict array
+        """
+        # With source_includes / source_excludes a hit may return no activity fields at all
+        timeline_hits = self.es_feed_result["hits"]["hits"]
+        if self.es_network_result is None:
+            return [hit["_source"].get("activity", {}) for hit in timeline_hits]
+        hits = [
+            (hit["sort"], hit["_source"].get("activity", {})) for hit in timeline_hits
+        ]
+        hits.extend(
+            (hit["sort"], hit["_source"])
+            for hit in self.es_network_result["hits"]["hits"]
+        )
+        # Both searches sort on the published date, so the sort values merge them whatever _source returns
+        hits.sort(key=lambda hit: hit[0][0], reverse=self.order == "desc")
+        return [
+            activity
+            for _, activity in hits[
+                self.result_from : self.result_from + self.result_size
+            ]
+        ]
@@ -45,8 +45,8 @@ class NotificationAggregator(BaseAggregator):
                                 "top_hits": {
                                     "size": 1,
                                     "sort": [{"published": {"order": "desc"}}],
-                                    "_source": {
-                                        "includes": [
+                                    "_source": self._source_filter(
+                                        [
                                             "published",
                                             "type",
                                             "actor",
@@ -55,7 +55,7 @@ class NotificationAggregator(BaseAggregator):
                                             "target",
                                             "extra",
                                         ]
-                                    },
+                                    ),
                                 }
                             },
                         },
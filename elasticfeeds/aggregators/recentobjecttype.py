@@ -9,9 +9,11 @@ class RecentObjectTypeAggregator(BaseAggregator):
     def set_aggregation_section(self):
         self.query_dict["size"] = 0
         self.query_dict["aggs"] = {
-            "objects": {
-                "terms": {"field": "object.id", "order": {"max_obj_date": "desc"}},
-                "aggs": {
+            "objects": self._bucket_aggregation(
+                "object",
+                "object.id",
+                {"field": "object.id", "order": {"max_obj_date": "desc"}},
+                {
                     "max_obj_date": {"max": {"script": "doc.published"}},
                     "types": {
                         "terms": {"field": "type", "order": {"max_type_date": "desc"}},
@@ -20,8 +22,8 @@ class RecentObjectTypeAggregator(BaseAggregator):
                             "top_type_hits": {
                                 "top_hits": {
                                     "sort": [{"published": {"order": "desc"}}],
-                                    "_source": {
-                                        "includes": [
+                                    "_source": self._source_filter(
+                                        [
                                             "published",
                                             "actor",
                                             "object",
@@ -29,14 +31,15 @@ class RecentObjectTypeAggregator(BaseAggregator):
                                             "target",
                                             "extra",
                                         ]
-                                    },
+                                    ),
                                     "size": self.top_hits_size,
+                                    "from": self.top_hits_from,
                                 }
                             },
                         },
                     },
                 },
-            }
+            )
         }
 
     def get_feeds(self):
@@ -68,13 +71,18 @@ class RecentObjectTypeAggregator(BaseAggregator):
                         type
                         extra (optional)
 
+        With bucket_size the objects are paged in alphabetical order of their ID, and this returns a dict with the
+        objects of the page ("groups") and the "next_cursor" to pass as after_key (see BaseAggregator.bucket_size).
+
         :return: Dict array
         """
         result = []
+        aggregation = None
         # pprint.pprint(self.es_feed_result)
         if self.es_feed_result["hits"]["total"]["value"] > 0:
-            for an_object in self.es_feed_result["aggregations"]["objects"]["buckets"]:
-                _dict = {"id": an_object["key"]}
+            aggregation = self.es_feed_result["aggregations"]["objects"]
+            for an_object in aggregation["buckets"]:
+                _dict = {"id": self._bucket_key(an_object, "object")}
                 types_array = []
                 for a_type in an_object["types"]["buckets"]:
                     _dict2 = {"type": a_type["key"]}
@@ -85,4 +93,4 @@ class RecentObjectTypeAggregator(BaseAggregator):
                     types_array.append(_dict2)
                 _dict["types"] = types_array
                 result.append(_dict)
-        return result
+        return self._bucket_page(aggregation, result)
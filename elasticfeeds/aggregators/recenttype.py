@@ -9,15 +9,17 @@ class RecentTypeAggregator(BaseAggregator):
     def set_aggregation_section(self):
         self.query_dict["size"] = 0
         self.query_dict["aggs"] = {
-            "types": {
-                "terms": {"field": "type", "order": {"max_date": "desc"}},
-                "aggs": {
+            "types": self._bucket_aggregation(
+                "type",
+                "type",
+                {"field": "type", "order": {"max_date": "desc"}},
+                {
                     "max_date": {"max": {"script": "doc.published"}},
                     "top_type_hits": {
                         "top_hits": {
                             "sort": [{"published": {"order": "desc"}}],
-                            "_source": {
-                                "includes": [
+                            "_source": self._source_filter(
+                                [
                                     "published",
                                     "actor",
                                     "object",
@@ -25,12 +27,13 @@ class RecentTypeAggregator(BaseAggregator):
                                     "target",
                                     "extra",
                                 ]
-                            },
+                            ),
                             "size": self.top_hits_size,
+                            "from": self.top_hits_from,
                         }
                     },
                 },
-            }
+            )
         }
 
     def get_feeds(self):
@@ -60,17 +63,20 @@ class RecentTypeAggregator(BaseAggregator):
                     type
                     extra (optional)
 
+        With bucket_size the types are paged in alphabetical order, and this returns a dict with the types of
+        the page ("groups") and the "next_cursor" to pass as after_key (see BaseAggregator.bucket_size).
+
         :return: Dict array
         """
         result = []
+        aggregation = None
         if self.es_feed_result["hits"]["total"]["value"] > 0:
-            for activity_type in self.es_feed_result["aggregations"]["types"][
-                "buckets"
-            ]:
-                _dict = {"type": activity_type["key"]}
+            aggregation = self.es_feed_result["aggregations"]["types"]
+            for activity_type in aggregation["buckets"]:
+                _dict = {"type": self._bucket_key(activity_type, "type")}
                 hit_array = []
                 for hit in activity_type["top_type_hits"]["hits"]["hits"]:
                     hit_array.append(hit["_source"])
                 _dict["activities"] = hit_array
                 result.append(_dict)
-        return result
+        return self._bucket_page(aggregation, result)
@@ -9,9 +9,11 @@ class RecentTypeObjectAggregator(BaseAggregator):
     def set_aggregation_section(self):
         self.query_dict["size"] = 0
         self.query_dict["aggs"] = {
-            "types": {
-                "terms": {"field": "type", "order": {"max_type_date": "desc"}},
-                "aggs": {
+            "types": self._bucket_aggregation(
+                "type",
+                "type",
+                {"field": "type", "order": {"max_type_date": "desc"}},
+                {
                     "max_type_date": {"max": {"script": "doc.published"}},
                     "objects": {
                         "terms": {
@@ -23,8 +25,8 @@ class RecentTypeObjectAggregator(BaseAggregator):
                             "top_obj_hits": {
                                 "top_hits": {
                                     "sort": [{"published": {"order": "desc"}}],
-                                    "_source": {
-                                        "includes": [
+                                    "_source": self._source_filter(
+                                        [
                                             "published",
                                             "actor",
                                             "object",
@@ -32,14 +34,15 @@ class RecentTypeObjectAggregator(BaseAggregator):
                                             "target",
                                             "extra",
                                         ]
-                                    },
+                                    ),
                                     "size": self.top_hits_size,
+                                    "from": self.top_hits_from,
                                 }
                             },
                         },
                     },
                 },
-            }
+            )
         }
 
     def get_feeds(self):
@@ -70,14 +73,18 @@ class RecentTypeObjectAggregator(BaseAggregator):
                         id
                         type
                         extra (optional)
+
+        With bucket_size the types are paged in alphabetical order, and this returns a dict with the types of
+        the page ("groups") and the "next_cursor" to pass as after_key (see BaseAggregator.bucket_size).
+
         :return: Dict array
         """
         result = []
+        aggregation = None
         if self.es_feed_result["hits"]["total"]["value"] > 0:
-            for activity_type in self.es_feed_result["aggregations"]["types"][
-                "buckets"
-            ]:
-                _dict = {"type": activity_type["key"]}
+            aggregation = self.es_feed_result["aggregations"]["types"]
+            for activity_type in aggregation["buckets"]:
+                _dict = {"type": self._bucket_key(activity_type, "type")}
                 id_array = []
                 for an_object in activity_type["objects"]["buckets"]:
                     _dict2 = {"id": an_object["key"]}
@@ -88,4 +95,4 @@ class RecentTypeObjectAggregator(BaseAggregator):
                     id_array.append(_dict2)
                 _dict["ids"] = id_array
                 result.append(_dict)
-        return result
+        return self._bucket_page(aggregation, result)
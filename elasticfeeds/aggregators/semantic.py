@@ -79,6 +79,7 @@ class SemanticAggregator(BaseAggregator):
             filter_clause=filter_clause,
             source_includes=self._SOURCE_INCLUDES,
         )
+        self.query_dict["_source"] = self._source_filter(self._SOURCE_INCLUDES)
 
     def set_aggregation_section(self):
         # The backend already produced a complete search body (size + _source included).
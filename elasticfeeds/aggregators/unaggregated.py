@@ -10,6 +10,7 @@ class UnAggregated(BaseAggregator):
     def set_aggregation_section(self):
         self.query_dict["size"] = self.result_size
         self.query_dict["from"] = self.result_from
+        self.query_dict["_source"] = self._source_filter()
 
     def get_feeds(self):
         """
@@ -1,3 +1,5 @@
+import datetime
+
 from .base import BaseAggregator
 from ..exceptions import ElasticFeedException
 
@@ -33,58 +35,25 @@ class YearMonthTypeAggregator(BaseAggregator):
             raise ElasticFeedException("Year must be integer")
         self._year = value
 
+    def published_range(self):
+        """
+        We overwrite the range to end with the year
+        """
+        since, until = BaseAggregator.published_range(self)
+        if self.year is not None:
+            start = datetime.datetime(self.year, 1, 1)
+            since = start if since is None else max(since, start)
+            until = datetime.datetime(self.year, 12, 31, 23, 59, 59, 999999)
+        return since, until
+
     def set_query_dict(self):
         """
         We overwrite the query section to include the year
         """
-        should = []
-        for link in self.network_array:
-            since = link["linked"]
-            linked_activity = link["linked_activity"]
-            if linked_activity["activity_class"] == "actor":
-                should_item = {
-                    "bool": {
-                        "must": [
-                            {"term": {"actor.id": linked_activity["id"]}},
-                            {"term": {"actor.type": linked_activity["type"]}},
-                            {"range": {"published": {"gte": since}}},
-                        ]
-                    }
-                }
-                if self.year is not None:
-                    should_item["bool"]["must"].append(
-                        {"term": {"published_year": self.year}}
-                    )
-                should.append(should_item)
-            else:
-                should_item = {
-                    "bool": {
-                        "must": [
-                            {"term": {"object.id": linked_activity["id"]}},
-                            {"term": {"object.type": linked_activity["type"]}},
-                            {"range": {"published": {"gte": since}}},
-                        ]
-                    }
-                }
-                if self.year is not None:
-                    should_item["bool"]["must"].append(
-                        {"term": {"published_year": self.year}}
-                    )
-                should.append(should_item)
-                should_item = {
-                    "bool": {
-                        "must": [
-                            {"term": {"target.id": linked_activity["id"]}},
-                            {"term": {"target.type": linked_activity["type"]}},
-                            {"range": {"published": {"gte": since}}},
-                        ]
-                    }
-                }
-                if self.year is not None:
-                    should_item["bool"]["must"].append(
-                        {"term": {"published_year": self.year}}
-                    )
-                should.append(should_item)
+        extra_must = None
+        if self.year is not None:
+            extra_must = [{"term": {"published_year": self.year}}]
+        should = self._network_should_clauses(extra_must=extra_must)
         if len(should) > 0:
             self.query_dict = {
                 "query": {"bool": {"should": should}},
@@ -122,8 +91,8 @@ class YearMonthTypeAggregator(BaseAggregator):
                                     "top_type_hits": {
                                         "top_hits": {
                                             "sort": [{"published": {"order": "desc"}}],
-                                            "_source": {
-                                                "includes": [
+                                            "_source": self._source_filter(
+                                                [
                                                     "published",
                                                     "actor",
                                                     "object",
@@ -131,8 +100,9 @@ class YearMonthTypeAggregator(BaseAggregator):
                                                     "target",
                                                     "extra",
                                                 ]
-                                            },
+                                            ),
                                             "size": self.top_hits_size,
+                                            "from": self.top_hits_from,
                                         }
                                     },
                                 },
@@ -7,13 +7,55 @@ handful of places:
 
 * Building the connection (``basic_auth`` / ``request_timeout`` vs ``http_auth`` / ``timeout``).
 * Writing documents and creating indices (typed ``document=`` / ``settings=`` / ``mappings=`` vs ``body=``).
+* Bulk writes (``operations=`` vs ``body=``). Building the action lines and reading the per-item response is
+  shared.
+* Multi searches (``searches=`` vs ``body=``). Building the header / body lines is shared.
+* Points in time (``open_point_in_time`` / ``close_point_in_time`` vs ``create_point_in_time`` /
+  ``delete_point_in_time``) and the tie-breaker of point-in-time sorts.
 * Vector search (``dense_vector`` + a top-level ``knn`` clause vs ``knn_vector`` + a ``knn`` query).
 
+``InMemoryBackend`` ("memory") sends the Elasticsearch requests to an in-process ``InMemoryClient`` (see
+elasticfeeds.memory) so a whole Manager can run without a cluster.
+
 Everything else -- the activity/network query DSL produced by the aggregators -- is shared, so only these
 adapters (and SemanticAggregator, which calls ``knn_search_body``) need to know which backend is in use.
+
+The async adapters (``AsyncElasticsearchBackend`` / ``AsyncOpenSearchBackend``, used by ``AsyncManager``) send
+the same requests through ``AsyncElasticsearch`` / ``AsyncOpenSearch`` and await them.
 """
 
-__all__ = ["get_backend", "BaseBackend", "ElasticsearchBackend", "OpenSearchBackend"]
+from elasticfeeds.exceptions import MultiSearchError
+from elasticfeeds.serializers import (
+    SERIALIZERS,
+    document_size,
+    elasticsearch_serializer,
+    opensearch_serializer,
+)
+
+__all__ = [
+    "get_backend",
+    "get_async_backend",
+    "BaseBackend",
+    "ElasticsearchBackend",
+    "OpenSearchBackend",
+    "InMemoryBackend",
+    "AsyncBaseBackend",
+    "AsyncElasticsearchBackend",
+    "AsyncOpenSearchBackend",
+]
+
+#: Painless scripts that add / remove values of a keyword array field without reading the document first.
+_ADD_TO_SET_SOURCE = (
+    "if (ctx._source[params.field] == null) { ctx._source[params.field] = []; } "
+    "boolean changed = false; "
+    "for (def value : params.values) { "
+    "if (!ctx._source[params.field].contains(value)) { ctx._source[params.field].add(value); changed = true; } "
+    "} if (!changed) { ctx.op = 'noop'; }"
+)
+_REMOVE_FROM_SET_SOURCE = (
+    "if (ctx._source[params.field] == null "
+    "|| !ctx._source[params.field].removeIf(value -> params.values.contains(value))) { ctx.op = 'noop'; }"
+)
 
 # Map ElasticSearch dense_vector similarity names to OpenSearch knn_vector space types.
 _OS_SPACE_TYPE = {
@@ -23,6 +65,158 @@ _OS_SPACE_TYPE = {
 }
 
 
+def _error_status(error):
+    """
+    The HTTP status of a client error. Both clients expose it as ``status_code``.
+    :param error: The exception raised by the client
+    :return: Integer or None
+    """
+    return getattr(error, "status_code", None)
+
+
+def _set_script(source, field, values):
+    """
+    The painless script of add_to_set / remove_from_set
+    """
+    return {
+        "lang": "painless",
+        "source": source,
+        "params": {"field": field, "values": list(values)},
+    }
+
+
+def _index_operations(index, documents, op_type):
+    """
+    The _bulk action / source lines that write (doc_id, document) pairs. ``index`` is an index name or a callable
+    returning the index of each document (e.g. its monthly partition)
+    """
+    operations = []
+    for doc_id, document in documents:
+        target = index(document) if callable(index) else index
+        operations.append({op_type: {"_index": target, "_id": doc_id}})
+        operations.append(document)
+    return operations
+
+
+def _delete_operations(index, doc_ids):
+    """
+    The _bulk action lines that delete documents by id
+    """
+    return [{"delete": {"_index": index, "_id": doc_id}} for doc_id in doc_ids]
+
+
+def _add_to_set_operations(index, field, additions):
+    """
+    The _bulk action / source lines that add values to a keyword array field of documents by id, creating the
+    documents that do not exist
+    """
+    operations = []
+    for doc_id, values, upsert in additions:
+        operations.append({"update": {"_index": index, "_id": doc_id}})
+        operations.append(
+            {"script": _set_script(_ADD_TO_SET_SOURCE, field, values), "upsert": upsert}
+        )
+    return operations
+
+
+def _remove_from_set_operations(index, field, removals):
+    """
+    The _bulk action / source lines that remove values from a keyword array field of documents by id
+    """
+    operations = []
+    for doc_id, values in removals:
+        operations.append({"update": {"_index": index, "_id": doc_id}})
+        operations.append(
+            {"script": _set_script(_REMOVE_FROM_SET_SOURCE, field, values)}
+        )
+    return operations
+
+
+def _retention_phases(retention):
+    """
+    The ILM phases of a policy that deletes an index once it is ``retention`` old
+    """
+    return {
+        "hot": {"min_age": "0ms", "actions": {}},
+        "delete": {"min_age": retention, "actions": {"delete": {}}},
+    }
+
+
+def _retention_states(name, index_patterns, retention):
+    """
+    The ISM policy that deletes the indices matching ``index_patterns`` once they are ``retention`` old
+    """
+    return {
+        "policy": {
+            "description": "Deletes the %s indices after %s" % (name, retention),
+            "default_state": "hot",
+            "states": [
+                {
+                    "name": "hot",
+                    "actions": [],
+                    "transitions": [
+                        {
+                            "state_name": "delete",
+                            "conditions": {"min_index_age": retention},
+                        }
+                    ],
+                },
+                {"name": "delete", "actions": [{"delete": {}}], "transitions": []},
+            ],
+            "ism_template": [{"index_patterns": index_patterns, "priority": 100}],
+        }
+    }
+
+
+def _msearch_lines(searches):
+    """
+    The _msearch header / body lines of a list of (index, body) searches
+    """
+    lines = []
+    for index, body in searches:
+        # Point-in-time searches have no index: the point in time names it
+        lines.append({"index": index} if index is not None else {})
+        lines.append(body)
+    return lines
+
+
+def _msearch_result(response):
+    """
+    The per-search responses of a _msearch response. Raises MultiSearchError for a search that failed.
+    """
+    responses = response["responses"]
+    for item in responses:
+        if "error" in item:
+            raise MultiSearchError(item["error"])
+    return responses
+
+
+def _bulk_result(response):
+    """
+    Splits a _bulk response into the ids that were written and the items that failed. Both clients return the
+    same response shape.
+    :param response: The _bulk response
+    :return: A tuple (ids, failures)
+    """
+    ids = []
+    failures = []
+    for item in response["items"]:
+        # Every item is keyed by its action ("index", "create", "delete", ...)
+        result = next(iter(item.values()))
+        # A delete of a missing document is reported with status 404 but without an "error" key
+        if "error" in result or result.get("status", 200) >= 300:
+            failures.append(
+                {
+                    "id": result.get("_id"),
+                    "status": result.get("status"),
+                    "error": result.get("error", result.get("result")),
+                }
+            )
+        else:
+            ids.append(result["_id"])
+    return ids, failures
+
+
 class BaseBackend:
     """
     Operations shared by both clients. Both accept ``index=`` (keyword) for index management and ``body=``
@@ -30,8 +224,43 @@ class BaseBackend:
     """
 
     name = None
+    #: Seconds a write can take to become visible to searches: the default refresh interval of an index
+    search_delay = 1
+
+    def __init__(self, serializer="json"):
+        """
+        :param serializer: The JSON serializer given to the clients this backend creates: "json" (the client's
+                           own, the default) or "orjson" (see elasticfeeds.serializers)
+        """
+        if serializer not in SERIALIZERS:
+            raise ValueError(
+                "Unknown serializer '%s'. Choose from: %s"
+                % (serializer, list(SERIALIZERS))
+            )
+        self.serializer = serializer
+
+    @property
+    def native_dates(self):
+        """
+        Whether the serializer encodes dates and times itself, so the documents can carry them as they are
+        :return: Boolean
+        """
+        return self.serializer == "orjson"
+
+    def document_size(self, document):
+        """
+        :param document: A document about to be written
+        :return: Its approximate size in bytes, as encoded by the serializer of the client
+        """
+        return document_size(self.serializer, document)
 
     # --- connection -------------------------------------------------------
+    def client_serializer(self):
+        """
+        :return: The serializer to build the client with, or None to keep the client's default one
+        """
+        return None
+
     def create_client(
         self,
         *,
@@ -57,20 +286,204 @@ class BaseBackend:
     def refresh(self, client, index):
         client.indices.refresh(index=index)
 
+    def index_template_exists(self, client, name):
+        return bool(client.indices.exists_index_template(name=name))
+
+    def delete_index_template(self, client, name):
+        client.indices.delete_index_template(name=name)
+
+    def alias_indices(self, client, alias):
+        """
+        :return: The names of the indices behind an alias, or an empty list if the alias does not exist
+        """
+        try:
+            return sorted(client.indices.get_alias(name=alias))
+        except Exception as e:
+            if _error_status(e) == 404:
+                return []
+            raise
+
     # --- index management (divergent) ------------------------------------
     def create_index(self, client, index, definition):
         raise NotImplementedError
 
+    def put_index_template(self, client, name, index_patterns, definition, aliases):
+        """
+        Creates or replaces a composable index template: the indices created with a name matching
+        ``index_patterns`` get the settings and mappings of ``definition`` and are added to ``aliases``.
+        """
+        raise NotImplementedError
+
+    def put_retention_policy(self, client, name, index_patterns, retention):
+        """
+        Creates a lifecycle policy (ILM / ISM) that deletes the indices once they are ``retention`` old (e.g.
+        "365d"). The age counts from the creation of each index.
+        """
+        raise NotImplementedError
+
+    def add_lifecycle_policy(self, definition, name):
+        """
+        Makes the indices created from ``definition`` follow the lifecycle policy ``name``
+        """
+        raise NotImplementedError
+
     def index_document(self, client, index, doc_id, document):
         raise NotImplementedError
 
+    def create_document(self, client, index, doc_id, document):
+        """
+        Writes a document only if no document with the same id exists (``op_type=create``).
+        :return: True if the document was created, False if the id already existed
+        """
+        raise NotImplementedError
+
+    def update_script(self, client, index, doc_id, script, upsert):
+        """
+        Runs a script update on a document, creating it from ``upsert`` if it does not exist.
+        """
+        raise NotImplementedError
+
+    # --- documents by id (shared) ----------------------------------------
+    def document_exists(self, client, index, doc_id):
+        return bool(client.exists(index=index, id=doc_id))
+
+    def delete_document(self, client, index, doc_id):
+        """
+        Deletes a document by id.
+        :return: True if the document was deleted, False if it did not exist
+        """
+        try:
+            client.delete(index=index, id=doc_id)
+        except Exception as e:
+            if _error_status(e) == 404:
+                return False
+            raise
+        return True
+
+    def add_to_set(self, client, index, doc_id, field, values):
+        """
+        Adds values to a keyword array field, skipping values already present. Creates the document if needed.
+        """
+        self.update_script(
+            client,
+            index,
+            doc_id,
+            _set_script(_ADD_TO_SET_SOURCE, field, values),
+            {field: list(values)},
+        )
+
+    def remove_from_set(self, client, index, doc_id, field, values):
+        """
+        Removes values from a keyword array field. Creates an empty document if needed.
+        """
+        self.update_script(
+            client,
+            index,
+            doc_id,
+            _set_script(_REMOVE_FROM_SET_SOURCE, field, values),
+            {field: []},
+        )
+
+    # --- bulk (divergent request, shared response handling) -------------
+    def bulk(self, client, operations):
+        """
+        Sends a list of bulk action / source lines in a single _bulk request.
+        :return: The raw _bulk response
+        """
+        raise NotImplementedError
+
+    def bulk_index(self, client, index, documents, op_type="index"):
+        """
+        Indexes (doc_id, document) pairs in a single _bulk request.
+        :param documents: Iterable of (doc_id, document) tuples
+        :param op_type: "index" (default) overwrites existing ids. "create" rejects them with status 409
+        :return: A tuple (ids, failures). ``ids`` lists the ids that were written, in request order.
+                 ``failures`` lists a dict with "id", "status" and "error" for every rejected item.
+        """
+        operations = _index_operations(index, documents, op_type)
+        if not operations:
+            return [], []
+        return _bulk_result(self.bulk(client, operations))
+
+    def bulk_delete(self, client, index, doc_ids):
+        """
+        Deletes documents by id in a single _bulk request.
+        :param doc_ids: Iterable of document ids
+        :return: A tuple (ids, failures) as in bulk_index. Missing documents fail with status 404
+        """
+        operations = _delete_operations(index, doc_ids)
+        if not operations:
+            return [], []
+        return _bulk_result(self.bulk(client, operations))
+
+    def bulk_add_to_set(self, client, index, field, additions):
+        """
+        Adds values to a keyword array field of many documents in a single _bulk request (see add_to_set).
+        :param additions: Iterable of (doc_id, values, upsert) tuples. ``upsert`` is the document created when
+                          the id does not exist
+        :return: A tuple (ids, failures) as in bulk_index
+        """
+        operations = _add_to_set_operations(index, field, additions)
+        if not operations:
+            return [], []
+        return _bulk_result(self.bulk(client, operations))
+
+    def bulk_remove_from_set(self, client, index, field, removals):
+        """
+        Removes values from a keyword array field of many documents in a single _bulk request (see
+        remove_from_set).
+        :param removals: Iterable of (doc_id, values) tuples
+        :return: A tuple (ids, failures) as in bulk_index. Missing documents fail with status 404
+        """
+        operations = _remove_from_set_operations(index, field, removals)
+        if not operations:
+            return [], []
+        return _bulk_result(self.bulk(client, operations))
+
     # --- search (shared: both clients accept body=) ----------------------
     def search(self, client, index, body):
         return client.search(index=index, body=body)
 
+    # --- multi search (divergent request, shared response handling) -----
+    def msearch(self, client, lines):
+        """
+        Sends a list of _msearch header / body lines in a single request.
+        :return: The raw _msearch response
+        """
+        raise NotImplementedError
+
+    def search_many(self, client, searches):
+        """
+        Runs several searches in a single _msearch request.
+        :param searches: List of (index, body) tuples
+        :return: The list of search responses, in request order. MultiSearchError is raised if any failed
+        """
+        if not searches:
+            return []
+        return _msearch_result(self.msearch(client, _msearch_lines(searches)))
+
     def delete_by_query(self, client, index, body):
         client.delete_by_query(index=index, body=body)
 
+    # --- point in time (divergent) -------------------------------------------
+    def open_point_in_time(self, client, index, keep_alive):
+        """
+        Opens a point in time on an index
+        :param keep_alive: How long it is kept without being used, e.g. "1m"
+        :return: The point-in-time id
+        """
+        raise NotImplementedError
+
+    def close_point_in_time(self, client, pit_id):
+        raise NotImplementedError
+
+    def point_in_time_tiebreaker(self, order):
+        """
+        :param order: "asc" or "desc"
+        :return: The sort clause that makes the sort of a point-in-time search unique
+        """
+        return {"_shard_doc": {"order": order}}
+
     # --- vectors (divergent) ---------------------------------------------
     def add_vector_field(self, definition, field_name, dims, similarity):
         raise NotImplementedError
@@ -101,19 +514,54 @@ class ElasticsearchBackend(BaseBackend):
     ):
         from elasticsearch import Elasticsearch
 
+        client = Elasticsearch(
+            **self._client_options(
+                host,
+                port,
+                scheme,
+                url_prefix,
+                use_ssl,
+                user_name,
+                user_password,
+                max_retries,
+                request_timeout,
+            )
+        )
+        return client if client.ping() else None
+
+    def client_serializer(self):
+        if self.serializer == "orjson":
+            return elasticsearch_serializer()
+        return None
+
+    def _client_options(
+        self,
+        host,
+        port,
+        scheme,
+        url_prefix,
+        use_ssl,
+        user_name,
+        user_password,
+        max_retries,
+        request_timeout,
+    ):
         # SSL is derived from the scheme in the 8.x/9.x client; use_ssl just forces https.
         scheme = "https" if use_ssl else scheme
         node = {"host": host, "port": port, "scheme": scheme}
         if url_prefix is not None:
             node["path_prefix"] = url_prefix
-        client = Elasticsearch(
-            hosts=[node],
-            basic_auth=(user_name, user_password),
-            max_retries=max_retries,
-            retry_on_timeout=True,
-            request_timeout=request_timeout,
-        )
-        return client if client.ping() else None
+        options = {
+            "hosts": [node],
+            "basic_auth": (user_name, user_password),
+            "max_retries": max_retries,
+            "retry_on_timeout": True,
+            "request_timeout": request_timeout,
+        }
+        serializer = self.client_serializer()
+        if serializer is not None:
+            options["serializer"] = serializer
+        return options
 
     def create_index(self, client, index, definition):
         client.indices.create(
@@ -122,9 +570,55 @@ class ElasticsearchBackend(BaseBackend):
             mappings=definition["mappings"],
         )
 
+    def put_index_template(self, client, name, index_patterns, definition, aliases):
+        client.indices.put_index_template(
+            name=name,
+            index_patterns=index_patterns,
+            priority=200,
+            template={
+                "settings": definition["settings"],
+                "mappings": definition["mappings"],
+                "aliases": dict((alias, {}) for alias in aliases),
+            },
+        )
+
+    def put_retention_policy(self, client, name, index_patterns, retention):
+        client.ilm.put_lifecycle(
+            name=name, policy={"phases": _retention_phases(retention)}
+        )
+
+    def add_lifecycle_policy(self, definition, name):
+        definition["settings"]["index"]["lifecycle"] = {"name": name}
+
     def index_document(self, client, index, doc_id, document):
         client.index(index=index, id=doc_id, document=document)
 
+    def create_document(self, client, index, doc_id, document):
+        try:
+            client.create(index=index, id=doc_id, document=document)
+        except Exception as e:
+            if _error_status(e) == 409:
+                return False
+            raise
+        return True
+
+    def update_script(self, client, index, doc_id, script, upsert):
+        client.update(
+            index=index, id=doc_id, script=script, upsert=upsert, retry_on_conflict=5
+        )
+
+    def bulk(self, client, operations):
+        return client.bulk(operations=operations)
+
+    def msearch(self, client, lines):
+        return client.msearch(searches=lines)
+
+    def open_point_in_time(self, client, index, keep_alive):
+        return client.open_point_in_time(index=index, keep_alive=keep_alive)["id"]
+
+    def close_point_in_time(self, client, pit_id):
+        client.close_point_in_time(id=pit_id)
+
     def add_vector_field(self, definition, field_name, dims, similarity):
         definition["mappings"]["properties"][field_name] = {
             "type": "dense_vector",
@@ -174,22 +668,121 @@ class OpenSearchBackend(BaseBackend):
             ) from e
 
         client = OpenSearch(
-            hosts=[{"host": host, "port": port}],
-            http_auth=(user_name, user_password),
-            use_ssl=use_ssl or scheme == "https",
-            url_prefix=url_prefix or "",
-            max_retries=max_retries,
-            retry_on_timeout=True,
-            timeout=request_timeout,
+            **self._client_options(
+                host,
+                port,
+                scheme,
+                url_prefix,
+                use_ssl,
+                user_name,
+                user_password,
+                max_retries,
+                request_timeout,
+            )
         )
         return client if client.ping() else None
 
+    def client_serializer(self):
+        if self.serializer == "orjson":
+            return opensearch_serializer()
+        return None
+
+    def _client_options(
+        self,
+        host,
+        port,
+        scheme,
+        url_prefix,
+        use_ssl,
+        user_name,
+        user_password,
+        max_retries,
+        request_timeout,
+    ):
+        options = {
+            "hosts": [{"host": host, "port": port}],
+            "http_auth": (user_name, user_password),
+            "use_ssl": use_ssl or scheme == "https",
+            "url_prefix": url_prefix or "",
+            "max_retries": max_retries,
+            "retry_on_timeout": True,
+            "timeout": request_timeout,
+        }
+        serializer = self.client_serializer()
+        if serializer is not None:
+            options["serializer"] = serializer
+        return options
+
     def create_index(self, client, index, definition):
         client.indices.create(index=index, body=definition)
 
+    def put_index_template(self, client, name, index_patterns, definition, aliases):
+        client.indices.put_index_template(
+            name=name,
+            body={
+                "index_patterns": index_patterns,
+                "priority": 200,
+                "template": {
+                    "settings": definition["settings"],
+                    "mappings": definition["mappings"],
+                    "aliases": dict((alias, {}) for alias in aliases),
+                },
+            },
+        )
+
+    def put_retention_policy(self, client, name, index_patterns, retention):
+        # ISM has no client namespace in every opensearch-py release, so the REST endpoint is called directly.
+        # An existing policy is kept: ISM only replaces one given its sequence number
+        try:
+            client.transport.perform_request(
+                "PUT",
+                "/_plugins/_ism/policies/%s" % name,
+                body=_retention_states(name, index_patterns, retention),
+            )
+        except Exception as e:
+            if _error_status(e) != 409:
+                raise
+
+    def add_lifecycle_policy(self, definition, name):
+        # The ism_template of the policy attaches it to the new indices
+        pass
+
     def index_document(self, client, index, doc_id, document):
         client.index(index=index, id=doc_id, body=document)
 
+    def create_document(self, client, index, doc_id, document):
+        try:
+            client.create(index=index, id=doc_id, body=document)
+        except Exception as e:
+            if _error_status(e) == 409:
+                return False
+            raise
+        return True
+
+    def update_script(self, client, index, doc_id, script, upsert):
+        client.update(
+            index=index,
+            id=doc_id,
+            body={"script": script, "upsert": upsert},
+            retry_on_conflict=5,
+        )
+
+    def bulk(self, client, operations):
+        return client.bulk(body=operations)
+
+    def msearch(self, client, lines):
+        return client.msearch(body=lines)
+
+    def open_point_in_time(self, client, index, keep_alive):
+        return client.create_point_in_time(index=index, keep_alive=keep_alive)["pit_id"]
+
+    def close_point_in_time(self, client, pit_id):
+        client.delete_point_in_time(body={"pit_id": [pit_id]})
+
+    def point_in_time_tiebreaker(self, order):
+        # _shard_doc is not a documented sort field on OpenSearch, so the feed_id keyword stays the tie-breaker
+        return {"feed_id": {"order": order}}
+
     def add_vector_field(self, definition, field_name, dims, similarity):
         # OpenSearch needs the index-level knn flag plus a knn_vector field.
         definition["settings"]["index"]["knn"] = True
@@ -217,21 +810,424 @@ class OpenSearchBackend(BaseBackend):
         }
 
 
+class InMemoryBackend(ElasticsearchBackend):
+    """
+    Keeps everything in process (elasticfeeds.memory.InMemoryClient). It sends the Elasticsearch requests, so the
+    aggregators and the manager run unchanged; the connection settings are ignored.
+    """
+
+    name = "memory"
+    #: Writes are searchable as soon as they return
+    search_delay = 0
+
+    def create_client(self, **kwargs):
+        from elasticfeeds.memory import InMemoryClient
+
+        return InMemoryClient()
+
+    def client_serializer(self):
+        # The in-memory client does not serialize: its JSON round trips go through the json module
+        return None
+
+
+class AsyncBaseBackend:
+    """
+    Awaitable versions of the BaseBackend operations for the asyncio clients. The requests are the same as the
+    sync adapters send; only the client calls are awaited. The operations that do not talk to the cluster
+    (add_vector_field, knn_search_body) come from the sync adapter each async adapter also derives from.
+    """
+
+    name = None
+
+    # --- connection -------------------------------------------------------
+    async def create_client(
+        self,
+        *,
+        host,
+        port,
+        scheme,
+        url_prefix,
+        use_ssl,
+        user_name,
+        user_password,
+        max_retries,
+        request_timeout,
+    ):
+        raise NotImplementedError
+
+    async def _pinged(self, client):
+        if await client.ping():
+            return client
+        await client.close()
+        return None
+
+    async def close(self, client):
+        await client.close()
+
+    # --- index management (shared) ---------------------------------------
+    async def index_exists(self, client, index):
+        return bool(await client.indices.exists(index=index))
+
+    async def delete_index(self, client, index):
+        await client.indices.delete(index=index)
+
+    async def refresh(self, client, index):
+        await client.indices.refresh(index=index)
+
+    async def index_template_exists(self, client, name):
+        return bool(await client.indices.exists_index_template(name=name))
+
+    async def delete_index_template(self, client, name):
+        await client.indices.delete_index_template(name=name)
+
+    async def alias_indices(self, client, alias):
+        try:
+            return sorted(await client.indices.get_alias(name=alias))
+        except Exception as e:
+            if _error_status(e) == 404:
+                return []
+            raise
+
+    # --- index management (divergent) ------------------------------------
+    async def create_index(self, client, index, definition):
+        raise NotImplementedError
+
+    async def put_index_template(
+        self, client, name, index_patterns, definition, aliases
+    ):
+        raise NotImplementedError
+
+    async def put_retention_policy(self, client, name, index_patterns, retention):
+        raise NotImplementedError
+
+    async def index_document(self, client, index, doc_id, document):
+        raise NotImplementedError
+
+    async def create_document(self, client, index, doc_id, document):
+        raise NotImplementedError
+
+    async def update_script(self, client, index, doc_id, script, upsert):
+        raise NotImplementedError
+
+    # --- documents by id (shared) ----------------------------------------
+    async def document_exists(self, client, index, doc_id):
+        return bool(await client.exists(index=index, id=doc_id))
+
+    async def delete_document(self, client, index, doc_id):
+        try:
+            await client.delete(index=index, id=doc_id)
+        except Exception as e:
+            if _error_status(e) == 404:
+                return False
+            raise
+        return True
+
+    async def add_to_set(self, client, index, doc_id, field, values):
+        await self.update_script(
+            client,
+            index,
+            doc_id,
+            _set_script(_ADD_TO_SET_SOURCE, field, values),
+            {field: list(values)},
+        )
+
+    async def remove_from_set(self, client, index, doc_id, field, values):
+        await self.update_script(
+            client,
+            index,
+            doc_id,
+            _set_script(_REMOVE_FROM_SET_SOURCE, field, values),
+            {field: []},
+        )
+
+    # --- bulk (divergent request, shared response handling) -------------
+    async def bulk(self, client, operations):
+        raise NotImplementedError
+
+    async def bulk_index(self, client, index, documents, op_type="index"):
+        operations = _index_operations(index, documents, op_type)
+        if not operations:
+            return [], []
+        return _bulk_result(await self.bulk(client, operations))
+
+    async def bulk_delete(self, client, index, doc_ids):
+        operations = _delete_operations(index, doc_ids)
+        if not operations:
+            return [], []
+        return _bulk_result(await self.bulk(client, operations))
+
+    async def bulk_add_to_set(self, client, index, field, additions):
+        operations = _add_to_set_operations(index, field, additions)
+        if not operations:
+            return [], []
+        return _bulk_result(await self.bulk(client, operations))
+
+    async def bulk_remove_from_set(self, client, index, field, removals):
+        operations = _remove_from_set_operations(index, field, removals)
+        if not operations:
+            return [], []
+        return _bulk_result(await self.bulk(client, operations))
+
+    # --- search (shared: both clients accept body=) ----------------------
+    async def search(self, client, index, body):
+        return await client.search(index=index, body=body)
+
+    # --- multi search (divergent request, shared response handling) -----
+    async def msearch(self, client, lines):
+        raise NotImplementedError
+
+    async def search_many(self, client, searches):
+        if not searches:
+            return []
+        return _msearch_result(await self.msearch(client, _msearch_lines(searches)))
+
+    async def delete_by_query(self, client, index, body):
+        await client.delete_by_query(index=index, body=body)
+
+    # --- point in time (divergent) -------------------------------------------
+    async def open_point_in_time(self, client, index, keep_alive):
+        raise NotImplementedError
+
+    async def close_point_in_time(self, client, pit_id):
+        raise NotImplementedError
+
+
+class AsyncElasticsearchBackend(AsyncBaseBackend, ElasticsearchBackend):
+    """Elasticsearch through AsyncElasticsearch (``pip install elasticfeeds[async]``)."""
+
+    name = "elasticsearch"
+
+    async def create_client(
+        self,
+        *,
+        host,
+        port,
+        scheme,
+        url_prefix,
+        use_ssl,
+        user_name,
+        user_password,
+        max_retries,
+        request_timeout,
+    ):
+        from elasticsearch import AsyncElasticsearch
+
+        client = AsyncElasticsearch(
+            **self._client_options(
+                host,
+                port,
+                scheme,
+                url_prefix,
+                use_ssl,
+                user_name,
+                user_password,
+                max_retries,
+                request_timeout,
+            )
+        )
+        return await self._pinged(client)
+
+    async def create_index(self, client, index, definition):
+        await client.indices.create(
+            index=index,
+            settings=definition["settings"],
+            mappings=definition["mappings"],
+        )
+
+    async def put_index_template(
+        self, client, name, index_patterns, definition, aliases
+    ):
+        await client.indices.put_index_template(
+            name=name,
+            index_patterns=index_patterns,
+            priority=200,
+            template={
+                "settings": definition["settings"],
+                "mappings": definition["mappings"],
+                "aliases": dict((alias, {}) for alias in aliases),
+            },
+        )
+
+    async def put_retention_policy(self, client, name, index_patterns, retention):
+        await client.ilm.put_lifecycle(
+            name=name, policy={"phases": _retention_phases(retention)}
+        )
+
+    async def index_document(self, client, index, doc_id, document):
+        await client.index(index=index, id=doc_id, document=document)
+
+    async def create_document(self, client, index, doc_id, document):
+        try:
+            await client.create(index=index, id=doc_id, document=document)
+        except Exception as e:
+            if _error_status(e) == 409:
+                return False
+            raise
+        return True
+
+    async def update_script(self, client, index, doc_id, script, upsert):
+        await client.update(
+            index=index, id=doc_id, script=script, upsert=upsert, retry_on_conflict=5
+        )
+
+    async def bulk(self, client, operations):
+        return await client.bulk(operations=operations)
+
+    async def msearch(self, client, lines):
+        return await client.msearch(searches=lines)
+
+    async def open_point_in_time(self, client, index, keep_alive):
+        response = await client.open_point_in_time(index=index, keep_alive=keep_alive)
+        return response["id"]
+
+    async def close_point_in_time(self, client, pit_id):
+        await client.close_point_in_time(id=pit_id)
+
+
+class AsyncOpenSearchBackend(AsyncBaseBackend, OpenSearchBackend):
+    """OpenSearch through AsyncOpenSearch (``pip install elasticfeeds[opensearch-async]``)."""
+
+    name = "opensearch"
+
+    async def create_client(
+        self,
+        *,
+        host,
+        port,
+        scheme,
+        url_prefix,
+        use_ssl,
+        user_name,
+        user_password,
+        max_retries,
+        request_timeout,
+    ):
+        try:
+            from opensearchpy import AsyncOpenSearch
+        except ImportError as e:  # pragma: no cover - import guard
+            raise ImportError(
+                "opensearch-py with aiohttp is required for the async OpenSearch backend. "
+                "Install it with: pip install elasticfeeds[opensearch-async]"
+            ) from e
+
+        client = AsyncOpenSearch(
+            **self._client_options(
+                host,
+                port,
+                scheme,
+                url_prefix,
+                use_ssl,
+                user_name,
+                user_password,
+                max_retries,
+                request_timeout,
+            )
+        )
+        return await self._pinged(client)
+
+    async def create_index(self, client, index, definition):
+        await client.indices.create(index=index, body=definition)
+
+    async def put_index_template(
+        self, client, name, index_patterns, definition, aliases
+    ):
+        await client.indices.put_index_template(
+            name=name,
+            body={
+                "index_patterns": index_patterns,
+                "priority": 200,
+                "template": {
+                    "settings": definition["settings"],
+                    "mappings": definition["mappings"],
+                    "aliases": dict((alias, {}) for alias in aliases),
+                },
+            },
+        )
+
+    async def put_retention_policy(self, client, name, index_patterns, retention):
+        try:
+            await client.transport.perform_request(
+                "PUT",
+                "/_plugins/_ism/policies/%s" % name,
+                body=_retention_states(name, index_patterns, retention),
+            )
+        except Exception as e:
+            if _error_status(e) != 409:
+                raise
+
+    async def index_document(self, client, index, doc_id, document):
+        await client.index(index=index, id=doc_id, body=document)
+
+    async def create_document(self, client, index, doc_id, document):
+        try:
+            await client.create(index=index, id=doc_id, body=document)
+        except Exception as e:
+            if _error_status(e) == 409:
+                return False
+            raise
+        return True
+
+    async def update_script(self, client, index, doc_id, script, upsert):
+        await client.update(
+            index=index,
+            id=doc_id,
+            body={"script": script, "upsert": upsert},
+            retry_on_conflict=5,
+        )
+
+    async def bulk(self, client, operations):
+        return await client.bulk(body=operations)
+
+    async def msearch(self, client, lines):
+        return await client.msearch(body=lines)
+
+    async def open_point_in_time(self, client, index, keep_alive):
+        response = await client.create_point_in_time(index=index, keep_alive=keep_alive)
+        return response["pit_id"]
+
+    async def close_point_in_time(self, client, pit_id):
+        await client.delete_point_in_time(body={"pit_id": [pit_id]})
+
+
 _BACKENDS = {
     "elasticsearch": ElasticsearchBackend,
     "opensearch": OpenSearchBackend,
+    "memory": InMemoryBackend,
+}
+
+_ASYNC_BACKENDS = {
+    "elasticsearch": AsyncElasticsearchBackend,
+    "opensearch": AsyncOpenSearchBackend,
 }
 
 
-def get_backend(name):
+def get_backend(name, serializer="json"):
     """
     Return a backend adapter instance by name.
-    :param name: "elasticsearch" (default) or "opensearch"
+    :param name: "elasticsearch" (default), "opensearch" or "memory"
+    :param serializer: The JSON serializer of the clients it creates: "json" (default) or "orjson"
     :return: A BaseBackend subclass instance
     """
     try:
-        return _BACKENDS[name]()
+        backend_class = _BACKENDS[name]
     except KeyError:
         raise ValueError(
             "Unknown backend '%s'. Choose from: %s" % (name, sorted(_BACKENDS))
         )
+    return backend_class(serializer)
+
+
+def get_async_backend(name, serializer="json"):
+    """
+    Return an async backend adapter instance by name.
+    :param name: "elasticsearch" (default) or "opensearch"
+    :param serializer: The JSON serializer of the clients it creates: "json" (default) or "orjson"
+    :return: An AsyncBaseBackend subclass instance
+    """
+    try:
+        backend_class = _ASYNC_BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            "Unknown backend '%s'. Choose from: %s" % (name, sorted(_ASYNC_BACKENDS))
+        )
+    return backend_class(serializer)
@@ -0,0 +1,96 @@
+"""
+Caches that the Manager can consult before going to the backend.
+
+A cache is any object implementing the small ``BaseCache`` interface (get / set / delete / clear) with string
+keys. ``LRUCache`` is an in-process implementation with a size bound and a time-to-live. To share a cache
+between processes (e.g. several API workers), implement ``BaseCache`` on top of an external store such as
+Redis or memcached; values are plain lists / dicts, so they can be stored as JSON.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+__all__ = ["BaseCache", "LRUCache"]
+
+
+class BaseCache(object):
+    """
+    Interface for a cache store. Sub-classes must implement get, set, delete and clear.
+    """
+
+    def get(self, key):
+        """
+        :param key: String key
+        :return: The cached value or None if the key is missing or expired
+        """
+        raise NotImplementedError("get must be implemented in subclasses")
+
+    def set(self, key, value):
+        """
+        :param key: String key
+        :param value: The value to store
+        """
+        raise NotImplementedError("set must be implemented in subclasses")
+
+    def delete(self, key):
+        """
+        Removes a key. Removing a missing key is not an error.
+        :param key: String key
+        """
+        raise NotImplementedError("delete must be implemented in subclasses")
+
+    def clear(self):
+        """
+        Removes every key.
+        """
+        raise NotImplementedError("clear must be implemented in subclasses")
+
+
+class LRUCache(BaseCache):
+    """
+    In-process, thread-safe cache that holds at most ``max_size`` keys (evicting the least recently used) and
+    forgets values after ``ttl`` seconds.
+    """
+
+    def __init__(self, max_size=10000, ttl=60):
+        """
+        :param max_size: Maximum number of keys. 10000 by default
+        :param ttl: Seconds a value stays valid. 60 by default. None keeps values until evicted
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
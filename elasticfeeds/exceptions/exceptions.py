@@ -20,6 +20,14 @@ __all__ = [
     "SizeError",
     "FromError",
     "EmbeddingTypeError",
+    "NetworkFilterError",
+    "SinceGranularityError",
+    "SinceWindowError",
+    "WeightLookupError",
+    "SourceFilterError",
+    "TimelineIndexError",
+    "MultiSearchError",
+    "CursorError",
     "LinkNotExistError",
     "ElasticFeedConnectionError",
     "ElasticFeedException",
@@ -245,3 +253,81 @@ class EmbeddingTypeError(ElasticFeedException):
 
     def __str__(self):
         return "Embedding must be a list of numbers (int or float)"
+
+
+class NetworkFilterError(ElasticFeedException):
+    """
+    Exception raised when ElasticFeeds checks whether the network filter of an aggregator is a known mode.
+    """
+
+    def __str__(self):
+        return "Network filter must be clauses, terms or lookup"
+
+
+class SinceGranularityError(ElasticFeedException):
+    """
+    Exception raised when ElasticFeeds checks whether the since granularity of an aggregator is a known unit.
+    """
+
+    def __str__(self):
+        return "Since granularity must be year, month or day"
+
+
+class SinceWindowError(ElasticFeedException):
+    """
+    Exception raised when ElasticFeeds checks whether the exact since window of an aggregator is a timedelta.
+    """
+
+    def __str__(self):
+        return "Exact since window must be a datetime.timedelta"
+
+
+class WeightLookupError(ElasticFeedException):
+    """
+    Exception raised when ElasticFeeds checks whether the weight lookup of an aggregator is a known mode.
+    """
+
+    def __str__(self):
+        return "Weight lookup must be script, map or filter"
+
+
+class SourceFilterError(ElasticFeedException):
+    """
+    Exception raised when ElasticFeeds checks whether the source includes / excludes of an aggregator are lists
+    of field names.
+    """
+
+    def __str__(self):
+        return "Source includes and excludes must be None or a list of strings"
+
+
+class TimelineIndexError(ElasticFeedException):
+    """
+    Exception raised when ElasticFeeds reads a materialized feed from a manager without a timeline index.
+    """
+
+    def __str__(self):
+        return "The manager has no timeline index. Create it with Manager(timeline_index=...)"
+
+
+class MultiSearchError(ElasticFeedException):
+    """
+    Exception raised when one of the searches sent in a single _msearch request fails.
+    """
+
+    @property
+    def error(self):
+        """The error reported for the search."""
+        return self.args[0]
+
+    def __str__(self):
+        return "A search of a multi search request failed: %s" % self.error
+
+
+class CursorError(ElasticFeedException):
+    """
+    Exception raised when a point-in-time cursor cannot be decoded, or an after_key is not a dict.
+    """
+
+    def __str__(self):
+        return "The cursor is not valid. Pass the next_cursor returned by the previous page"
@@ -0,0 +1,504 @@
+"""
+Instrumentation hooks for the Manager.
+
+Pass an instrumentation to ``Manager(instrumentation=...)`` to see where the time of each call goes. Every public
+Manager operation (get_feeds, get_network, add_activity_feed, follow...) is reported as an ``Operation`` made of
+``Phase`` objects. For get_feeds, for example, the phases are network, query, search and process:
+
+* the operation has the attributes of the call: ``aggregator``, ``actor_id``, ``results``...
+* every phase has its duration and, when relevant, ``network_size``, ``request_bytes``, ``response_bytes``,
+  the server-side ``took_ms`` and ``hits``.
+
+An instrumentation is any object implementing ``BaseInstrumentation``. The hooks are called synchronously on the
+calling thread, so they must be cheap. Included:
+
+* ``MetricsInstrumentation``: in-process Prometheus-style counters and histograms, rendered in the Prometheus
+  text format by ``render()``.
+* ``LoggingInstrumentation``: logs the calls over a latency budget with their phase breakdown.
+* ``OpenTelemetryInstrumentation``: one span per operation and one child span per phase (requires the
+  ``opentelemetry-api`` package: pip install elasticfeeds[opentelemetry]).
+* ``CompositeInstrumentation``: several of the above at once.
+
+Request and response sizes are the length of the JSON bodies, measured only when an instrumentation sets
+``measure_sizes`` (``MetricsInstrumentation(measure_sizes=True)``, ...). Measuring serializes every body once
+more, so it is off by default. Without an instrumentation the Manager only pays for a few no-op calls.
+"""
+
+import json
+import logging
+import threading
+import time
+
+__all__ = [
+    "BaseInstrumentation",
+    "Operation",
+    "Phase",
+    "MetricsInstrumentation",
+    "LoggingInstrumentation",
+    "OpenTelemetryInstrumentation",
+    "CompositeInstrumentation",
+    "start_operation",
+    "body_size",
+    "search_stats",
+]
+
+
+class BaseInstrumentation(object):
+    """
+    Interface for instrumentations. Every hook is optional: the default implementations do nothing.
+    """
+
+    #: When True the Manager measures request and response sizes (this serializes the bodies once more)
+    measure_sizes = False
+
+    def operation_started(self, operation):
+        """
+        :param operation: The Operation that starts
+        """
+
+    def phase_started(self, operation, phase):
+        """
+        :param operation: The running Operation
+        :param phase: The Phase that starts
+        """
+
+    def phase_finished(self, operation, phase):
+        """
+        :param operation: The running Operation
+        :param phase: The Phase that finished. Its duration and attributes are set
+        """
+
+    def operation_finished(self, operation):
+        """
+        :param operation: The Operation that finished. Its duration, attributes, phases and error are set
+        """
+
+
+class Phase(object):
+    """
+    One step of an operation
+    """
+
+    def __init__(self, operation, name, attributes):
+        self.operation = operation
+        self.name = name
+        self.attributes = attributes
+        self.started = None
+        self.duration = None
+        self.error = None
+        #: Free storage for instrumentations (e.g. the span of this phase)
+        self.data = {}
+
+    @property
+    def measure_sizes(self):
+        return self.operation.instrumentation.measure_sizes
+
+    def set(self, **attributes):
+        """
+        Adds attributes to the phase
+        """
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.operation.instrumentation.phase_started(self.operation, self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.started
+        self.error = exc_value
+        self.operation.phases.append(self)
+        self.operation.instrumentation.phase_finished(self.operation, self)
+        return False
+
+
+class Operation(object):
+    """
+    One Manager call
+    """
+
+    def __init__(self, instrumentation, name, attributes):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.attributes = attributes
+        self.phases = []
+        self.started = None
+        self.duration = None
+        self.error = None
+        #: Free storage for instrumentations (e.g. the span of this operation)
+        self.data = {}
+
+    @property
+    def measure_sizes(self):
+        return self.instrumentation.measure_sizes
+
+    def set(self, **attributes):
+        """
+        Adds attributes to the operation
+        """
+        self.attributes.update(attributes)
+
+    def phase(self, name, **attributes):
+        """
+        :param name: Phase name
+        :return: A Phase to use as a context manager around the step
+        """
+        return Phase(self, name, attributes)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.instrumentation.operation_started(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.started
+        self.error = exc_value
+        self.instrumentation.operation_finished(self)
+        return False
+
+
+class _NullPhase(object):
+    measure_sizes = False
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class _NullOperation(_NullPhase):
+    def phase(self, name, **attributes):
+        return _NULL_PHASE
+
+
+_NULL_PHASE = _NullPhase()
+_NULL_OPERATION = _NullOperation()
+
+
+def start_operation(instrumentation, name, **attributes):
+    """
+    :param instrumentation: A BaseInstrumentation or None
+    :param name: Operation name
+    :param attributes: Attributes of the call
+    :return: An Operation to use as a context manager around the call. A shared no-op object when
+             instrumentation is None
+    """
+    if instrumentation is None:
+        return _NULL_OPERATION
+    return Operation(instrumentation, name, attributes)
+
+
+def body_size(body):
+    """
+    :param body: A request or response body (dict, list of NDJSON lines or a client response object)
+    :return: Its length as JSON, in bytes
+    """
+    body = getattr(body, "body", body)
+    if isinstance(body, list):
+        return sum(len(json.dumps(line, default=str)) + 1 for line in body)
+    return len(json.dumps(body, default=str))
+
+
+def search_stats(responses, measure_sizes=False):
+    """
+    Sums the server-side time and the hits of search responses
+    :param responses: List of search responses
+    :param measure_sizes: Also return the size of the responses
+    :return: Dict with took_ms, hits and, with measure_sizes, response_bytes
+    """
+    stats = {"took_ms": 0, "hits": 0}
+    for response in responses:
+        response = getattr(response, "body", response)
+        stats["took_ms"] += response.get("took", 0) or 0
+        total = response.get("hits", {}).get("total", 0)
+        stats["hits"] += total.get("value", 0) if isinstance(total, dict) else total
+    if measure_sizes:
+        stats["response_bytes"] = sum(body_size(response) for response in responses)
+    return stats
+
+
+_DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000)
+#: Numeric attributes that MetricsInstrumentation adds up per operation and phase
+_SUMMED_ATTRIBUTES = ("request_bytes", "response_bytes", "took_ms", "hits", "results")
+
+
+class _Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+
+
+def _labels(labels):
+    return ",".join(
+        '%s="%s"' % (key, str(value).replace('"', '\\"')) for key, value in labels
+    )
+
+
+class MetricsInstrumentation(BaseInstrumentation):
+    """
+    Prometheus-style metrics kept in process. ``render()`` returns them in the Prometheus text exposition format
+    (serve it from your /metrics endpoint) and ``collect()`` as a dict. Operations are labelled with the
+    aggregator class, never with the actor, to keep the number of series bounded.
+
+    * elasticfeeds_operations_total{operation, aggregator, status}
+    * elasticfeeds_operation_seconds{operation, aggregator} (histogram)
+    * elasticfeeds_phase_seconds{operation, phase} (histogram)
+    * elasticfeeds_network_size{operation} (histogram of the number of links loaded)
+    * elasticfeeds_<attribute>_total{operation, phase} for took_ms, hits, results and, with measure_sizes,
+      request_bytes and response_bytes
+    """
+
+    def __init__(
+        self, buckets=_DEFAULT_BUCKETS, prefix="elasticfeeds", measure_sizes=False
+    ):
+        """
+        :param buckets: Upper bounds, in seconds, of the latency histogram buckets
+        :param prefix: Prefix of the metric names
+        :param measure_sizes: Count request_bytes and response_bytes too. False by default
+        """
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self.measure_sizes = measure_sizes
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def _add(self, name, labels, value=1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def _observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        if key not in self.histograms:
+            self.histograms[key] = _Histogram(buckets)
+        self.histograms[key].observe(value)
+
+    def phase_finished(self, operation, phase):
+        labels = (("operation", operation.name), ("phase", phase.name))
+        with self._lock:
+            self._observe("phase_seconds", labels, phase.duration, self.buckets)
+            for attribute in _SUMMED_ATTRIBUTES:
+                if attribute in phase.attributes:
+                    self._add(attribute + "_total", labels, phase.attributes[attribute])
+            if "network_size" in phase.attributes:
+                self._observe(
+                    "network_size",
+                    (("operation", operation.name),),
+                    phase.attributes["network_size"],
+                    _SIZE_BUCKETS,
+                )
+
+    def operation_finished(self, operation):
+        aggregator = operation.attributes.get("aggregator", "")
+        labels = (("operation", operation.name), ("aggregator", aggregator))
+        status = "error" if operation.error is not None else "ok"
+        with self._lock:
+            self._add("operations_total", labels + (("status", status),))
+            self._observe("operation_seconds", labels, operation.duration, self.buckets)
+
+    def collect(self):
+        """
+        :return: Dict with "counters" {(name, labels): value} and "histograms" {(name, labels): {count, sum,
+                 buckets}}. labels is a tuple of (label, value) pairs
+        """
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": dict(
+                    (
+                        key,
+                        {
+                            "count": histogram.count,
+                            "sum": histogram.sum,
+                            "buckets": list(zip(histogram.buckets, histogram.counts)),
+                        },
+                    )
+                    for key, histogram in self.histograms.items()
+                ),
+            }
+
+    def render(self):
+        """
+        :return: The metrics in the Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            for name in sorted(set(key[0] for key in self.counters)):
+                metric = "%s_%s" % (self.prefix, name)
+                lines.append("# TYPE %s counter" % metric)
+                for (a_name, labels), value in sorted(self.counters.items()):
+                    if a_name == name:
+                        lines.append("%s{%s} %s" % (metric, _labels(labels), value))
+            for name in sorted(set(key[0] for key in self.histograms)):
+                metric = "%s_%s" % (self.prefix, name)
+                lines.append("# TYPE %s histogram" % metric)
+                for (a_name, labels), histogram in sorted(
+                    self.histograms.items(), key=lambda item: item[0]
+                ):
+                    if a_name != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(
+                            "%s_bucket{%s} %s"
+                            % (metric, _labels(labels + (("le", bound),)), count)
+                        )
+                    lines.append(
+                        "%s_bucket{%s} %s"
+                        % (metric, _labels(labels + (("le", "+Inf"),)), histogram.count)
+                    )
+                    lines.append(
+                        "%s_sum{%s} %s" % (metric, _labels(labels), histogram.sum)
+                    )
+                    lines.append(
+                        "%s_count{%s} %s" % (metric, _labels(labels), histogram.count)
+                    )
+        return "\n".join(lines) + "\n"
+
+
+class LoggingInstrumentation(BaseInstrumentation):
+    """
+    Logs every operation that takes longer than ``threshold`` seconds, with its attributes and the duration and
+    attributes of each phase, e.g.::
+
+        get_feeds 512.3 ms aggregator=UnAggregated actor_id=carlos results=25 | network 3.1 ms network_size=120 |
+        query 0.4 ms | search 500.2 ms took_ms=480 hits=25 | process 8.6 ms
+    """
+
+    def __init__(
+        self, threshold=0.5, logger=None, level=logging.WARNING, measure_sizes=False
+    ):
+        """
+        :param threshold: Latency budget in seconds. 0 logs every operation
+        :param logger: The logger to use. The "elasticfeeds" logger by default
+        :param level: Log level. WARNING by default
+        :param measure_sizes: Log request_bytes and response_bytes too. False by default
+        """
+        self.threshold = threshold
+        self.measure_sizes = measure_sizes
+        self.logger = (
+            logger if logger is not None else logging.getLogger("elasticfeeds")
+        )
+        self.level = level
+
+    @staticmethod
+    def _describe(name, duration, attributes):
+        text = "%s %.1f ms" % (name, duration * 1000)
+        if attributes:
+            text += " " + " ".join(
+                "%s=%s" % (key, value) for key, value in sorted(attributes.items())
+            )
+        return text
+
+    def operation_finished(self, operation):
+        if operation.duration < self.threshold:
+            return
+        parts = [
+            self._describe(operation.name, operation.duration, operation.attributes)
+        ]
+        parts.extend(
+            self._describe(phase.name, phase.duration, phase.attributes)
+            for phase in operation.phases
+        )
+        if operation.error is not None:
+            parts.append("error=%r" % operation.error)
+        self.logger.log(self.level, " | ".join(parts))
+
+
+def _span_attributes(attributes):
+    return dict(
+        (
+            "elasticfeeds." + key,
+            value if isinstance(value, (bool, int, float)) else str(value),
+        )
+        for key, value in attributes.items()
+        if value is not None
+    )
+
+
+class OpenTelemetryInstrumentation(BaseInstrumentation):
+    """
+    Reports every operation as an OpenTelemetry span ("elasticfeeds.<operation>") with one child span per phase.
+    The spans become the current span while they run, so they nest under the caller's span and the spans of an
+    instrumented client nest under them. Attributes are prefixed with "elasticfeeds.".
+    """
+
+    def __init__(self, tracer=None, measure_sizes=False):
+        """
+        :param tracer: An opentelemetry Tracer. By default the "elasticfeeds" tracer of the global provider
+        :param measure_sizes: Add request_bytes and response_bytes to the spans. False by default
+        """
+        self.measure_sizes = measure_sizes
+        from opentelemetry import context, trace
+
+        self._context = context
+        self._trace = trace
+        self.tracer = tracer if tracer is not None else trace.get_tracer("elasticfeeds")
+
+    def _start(self, holder, name):
+        span = self.tracer.start_span(name)
+        token = self._context.attach(self._trace.set_span_in_context(span))
+        holder.data[self] = (span, token)
+
+    def _end(self, holder):
+        span, token = holder.data.pop(self)
+        self._context.detach(token)
+        span.set_attributes(_span_attributes(holder.attributes))
+        if holder.error is not None:
+            span.record_exception(holder.error)
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+        span.end()
+
+    def operation_started(self, operation):
+        self._start(operation, "elasticfeeds." + operation.name)
+
+    def phase_started(self, operation, phase):
+        self._start(phase, phase.name)
+
+    def phase_finished(self, operation, phase):
+        self._end(phase)
+
+    def operation_finished(self, operation):
+        self._end(operation)
+
+
+class CompositeInstrumentation(BaseInstrumentation):
+    """
+    Calls several instrumentations, in order
+    """
+
+    def __init__(self, *instrumentations):
+        self.instrumentations = instrumentations
+
+    @property
+    def measure_sizes(self):
+        return any(item.measure_sizes for item in self.instrumentations)
+
+    def operation_started(self, operation):
+        for item in self.instrumentations:
+            item.operation_started(operation)
+
+    def phase_started(self, operation, phase):
+        for item in self.instrumentations:
+            item.phase_started(operation, phase)
+
+    def phase_finished(self, operation, phase):
+        for item in self.instrumentations:
+            item.phase_finished(operation, phase)
+
+    def operation_finished(self, operation):
+        for item in self.instrumentations:
+            item.operation_finished(operation)
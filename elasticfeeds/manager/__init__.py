@@ -1 +1,2 @@
 from .manager import *
+from .asyncmanager import *
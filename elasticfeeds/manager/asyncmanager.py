@@ -0,0 +1,953 @@
+from elasticfeeds.backends import get_async_backend
+from elasticfeeds.exceptions import (
+    LinkObjectError,
+    LinkExistError,
+    ActivityObjectError,
+    TimelineIndexError,
+    LinkNotExistError,
+    ElasticFeedConnectionError,
+)
+from elasticfeeds.network import Link, LinkedActivity, network_lookup_id
+from elasticfeeds.activity import Activity
+from elasticfeeds.aggregators import MaterializedFeedAggregator
+from .manager import (
+    BaseManager,
+    _partition_name,
+    _chunk_documents,
+    _get_network_index_definition,
+    _get_timeline_index_definition,
+    _link_ids_query,
+    _link_ids_from_result,
+    _links_exist_query,
+    _links_exist_from_result,
+    _new_link_documents,
+    _added_links,
+    _removed_links_by_id,
+    _removed_links_by_key,
+    _link_objects,
+    _lookup_changes,
+    _link_references_query,
+    _released_links,
+    _lookup_document,
+    _timeline_cleanup_query,
+    _timeline_cleanup,
+    _CLEANUP_PAGE_SIZE,
+    _BACKFILL_PAGE_SIZE,
+    _timeline_backfill_query,
+    _timeline_backfill,
+    _READERS_PAGE_SIZE,
+    _followers_query,
+    _followers_from_result,
+    _timeline_documents,
+    _searches_size,
+    _export_body,
+    _cache_held,
+    _readers_query,
+    _readers_from_result,
+    _restore_compiled_query,
+)
+from elasticfeeds.aggregators.cursor import _response_pit_id
+from elasticfeeds.instrumentation import start_operation, body_size, search_stats
+import asyncio
+import json
+import datetime
+import uuid
+
+__all__ = ["AsyncManager"]
+
+
+class AsyncManager(BaseManager):
+    """
+    The asyncio version of Manager, built on AsyncElasticsearch / AsyncOpenSearch. It sends the same requests as
+    Manager, but every operation that talks to the backend is a coroutine, so one event loop can serve many
+    concurrent feed requests without blocking or thread hops.
+
+    A constructor cannot await, so the connection is created and the indices are checked by initialize(), which
+    ``async with`` calls for you::
+
+        async with AsyncManager("feeds", "network") as manager:
+            await manager.follow("carlos", "mark")
+            feeds = await manager.get_feeds(UnAggregated("carlos"))
+
+    Requires ``pip install elasticfeeds[async]`` (or ``elasticfeeds[opensearch-async]``).
+    """
+
+    def __init__(
+        self,
+        feed_index="feeds",
+        network_index="network",
+        host="localhost",
+        port=9200,
+        user_name="elastic",
+        user_password="",
+        scheme="http",
+        url_prefix=None,
+        use_ssl=False,
+        number_of_shards_in_feeds=5,
+        number_of_replicas_in_feeds=1,
+        number_of_shards_in_network=5,
+        number_of_replicas_in_network=1,
+        delete_feeds_if_exists=False,
+        delete_network_if_exists=False,
+        embedding_dims=None,
+        embedding_similarity="cosine",
+        max_link_size=1000,
+        backend="elasticsearch",
+        connection=None,
+        link_id_strategy="uuid",
+        network_cache=None,
+        query_cache=None,
+        feed_cache=None,
+        cache_hold=None,
+        network_lookup=False,
+        timeline_index=None,
+        fanout_threshold=10000,
+        number_of_shards_in_timeline=5,
+        number_of_replicas_in_timeline=1,
+        delete_timeline_if_exists=False,
+        instrumentation=None,
+        feed_partitioning=None,
+        feed_retention=None,
+        feed_mapping="default",
+        feed_refresh_interval=None,
+        serializer="json",
+    ):
+        """
+        Stores the configuration. No request is sent until initialize() is awaited. The parameters are the ones of
+        Manager, except that ``connection`` must be an AsyncElasticsearch / AsyncOpenSearch client. The
+        instrumentation is told about add_activity_feed, get_network(s) and get_feeds(_many).
+        """
+        self._set_options(
+            get_async_backend(backend, serializer),
+            feed_index,
+            network_index,
+            host,
+            port,
+            user_name,
+            user_password,
+            scheme,
+            url_prefix,
+            use_ssl,
+            max_link_size,
+            backend,
+            serializer,
+            link_id_strategy,
+            network_cache,
+            query_cache,
+            feed_cache,
+            cache_hold,
+            network_lookup,
+            timeline_index,
+            fanout_threshold,
+            instrumentation,
+            feed_partitioning,
+            feed_retention,
+            feed_mapping,
+        )
+        self._connection = connection
+
+        feed_definition = self._feed_definition(
+            number_of_shards_in_feeds,
+            number_of_replicas_in_feeds,
+            feed_mapping,
+            feed_refresh_interval,
+            embedding_dims,
+            embedding_similarity,
+        )
+        self._indices = [
+            (
+                network_index,
+                _get_network_index_definition(
+                    number_of_shards_in_network, number_of_replicas_in_network
+                ),
+                delete_network_if_exists,
+            ),
+        ]
+        self._feed_partitions = None
+        if feed_partitioning is None:
+            self._indices.insert(
+                0, (feed_index, feed_definition, delete_feeds_if_exists)
+            )
+        else:
+            self._feed_partitions = (feed_definition, delete_feeds_if_exists)
+        if timeline_index is not None:
+            self._indices.append(
+                (
+                    timeline_index,
+                    _get_timeline_index_definition(
+                        number_of_shards_in_timeline, number_of_replicas_in_timeline
+                    ),
+                    delete_timeline_if_exists,
+                )
+            )
+
+    async def create_connection(self):
+        """
+        Creates a connection to the configured backend and pings it.
+        :return: A tested (pinged) client, or None if the ping fails
+        """
+        return await self._backend.create_client(**self._client_options())
+
+    async def initialize(self):
+        """
+        Creates the connection (unless one was given) and the indices that do not exist. The indices are checked
+        concurrently.
+        :return: The manager itself
+        """
+        if self._connection is None:
+            self._connection = await self.create_connection()
+            if self._connection is None:
+                raise ElasticFeedConnectionError()
+        ensure = [
+            self._ensure_index(index_name, definition, delete_if_exists)
+            for index_name, definition, delete_if_exists in self._indices
+        ]
+        if self._feed_partitions is not None:
+            ensure.append(self._ensure_feed_partitions(*self._feed_partitions))
+        await asyncio.gather(*ensure)
+        return self
+
+    async def close(self):
+        """
+        Closes the connection
+        """
+        if self._connection is not None:
+            await self._backend.close(self._connection)
+            self._connection = None
+
+    async def __aenter__(self):
+        return await self.initialize()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _ensure_index(self, index_name, definition, delete_if_exists):
+        """
+        Creates an index from its definition if it does not exist. If it exists and ``delete_if_exists`` is True
+        the index is dropped and recreated.
+        """
+        if await self._backend.index_exists(self._connection, index_name):
+            if delete_if_exists:
+                await self._backend.delete_index(self._connection, index_name)
+            else:
+                return
+        await self._backend.create_index(self._connection, index_name, definition)
+
+    async def _ensure_feed_partitions(self, definition, delete_if_exists):
+        """
+        The _ensure_index of a partitioned feed index. See Manager._ensure_feed_partitions
+        """
+        patterns = [self.feed_index + "-*"]
+        exists = await self._backend.index_template_exists(
+            self._connection, self.feed_index
+        )
+        if exists and delete_if_exists:
+            await self._delete_feed_partitions()
+            await self._backend.delete_index_template(self._connection, self.feed_index)
+            exists = False
+        if not exists:
+            if self.feed_retention is not None:
+                policy = self.feed_index + "-retention"
+                await self._backend.put_retention_policy(
+                    self._connection, policy, patterns, self.feed_retention
+                )
+                self._backend.add_lifecycle_policy(definition, policy)
+            await self._backend.put_index_template(
+                self._connection,
+                self.feed_index,
+                patterns,
+                definition,
+                [self.feed_index],
+            )
+        if await self._backend.alias_indices(self._connection, self.feed_index):
+            return
+        if await self._backend.index_exists(self._connection, self.feed_index):
+            raise ValueError(
+                "The index '%s' is not partitioned. Its name is needed for the alias of the partitions"
+                % self.feed_index
+            )
+        today = datetime.date.today()
+        await self._backend.create_index(
+            self._connection,
+            _partition_name(self.feed_index, today.year, today.month),
+            {"settings": {}, "mappings": {}},
+        )
+
+    async def _delete_feed_partitions(self):
+        partitions = await self._backend.alias_indices(
+            self._connection, self.feed_index
+        )
+        if partitions:
+            await self._backend.delete_index(self._connection, ",".join(partitions))
+
+    async def delete_feeds_index(self):
+        """
+        Deletes the feed index (with feed_partitioning, all its partitions)
+        :return: True if the index was deleted successfully
+        """
+        if self.feed_partitioning is not None:
+            await self._delete_feed_partitions()
+        else:
+            await self._backend.delete_index(self._connection, self.feed_index)
+        return True
+
+    async def delete_network_index(self):
+        """
+        Deleted the network index
+        :return: True if the index was deleted successfully
+        """
+        await self._backend.delete_index(self._connection, self.network_index)
+        return True
+
+    async def delete_timeline_index(self):
+        """
+        Deletes the timeline index
+        :return: True if the index was deleted successfully
+        """
+        if self.timeline_index is None:
+            raise TimelineIndexError()
+        await self._backend.delete_index(self._connection, self.timeline_index)
+        return True
+
+    async def link_network_exists(self, link_object):
+        """
+        Check whether a link object already exists in the network index
+        :param link_object: The link object to check if exists
+        :return: True if exists otherwise False
+        """
+        if not isinstance(link_object, Link):
+            raise LinkObjectError()
+        if self.link_id_strategy == "hash":
+            return await self._backend.document_exists(
+                self._connection, self.network_index, link_object.get_id()
+            )
+        res = await self._backend.search(
+            self._connection, self.network_index, link_object.get_search_dict()
+        )
+        return res["hits"]["total"]["value"] > 0
+
+    async def add_network_link(self, link_object):
+        """
+        Adds a link to the network index
+        :param link_object: The Link object being added to the index
+        :return: The unique ID give to the link
+        """
+        if not isinstance(link_object, Link):
+            raise LinkObjectError()
+        if self.link_id_strategy == "hash":
+            link_id = link_object.get_id()
+            if not await self._backend.create_document(
+                self._connection, self.network_index, link_id, link_object.get_dict()
+            ):
+                raise LinkExistError()
+            await self._network_changed([link_object])
+            return link_id
+        if await self.link_network_exists(link_object):
+            raise LinkExistError()
+        unique_id = str(uuid.uuid4())
+        await self._backend.index_document(
+            self._connection, self.network_index, unique_id, link_object.get_dict()
+        )
+        await self._network_changed([link_object])
+        return unique_id
+
+    async def remove_network_link(self, link_object):
+        """
+        Removes a link from the network
+        :param link_object: The Link object being removed from the index.
+        :return: Bool
+        """
+        if not isinstance(link_object, Link):
+            raise LinkObjectError()
+        if self.link_id_strategy == "hash":
+            if not await self._backend.delete_document(
+                self._connection, self.network_index, link_object.get_id()
+            ):
+                raise LinkNotExistError()
+            await self._network_changed([link_object], removed=True)
+            return True
+        res = await self._backend.search(
+            self._connection,
+            self.network_index,
+            _link_ids_query([link_object], self.max_link_size),
+        )
+        doc_ids = _link_ids_from_result(res).get(link_object.get_key())
+        if not doc_ids:
+            raise LinkNotExistError()
+        if len(doc_ids) == 1:
+            await self._backend.delete_document(
+                self._connection, self.network_index, doc_ids[0]
+            )
+        else:
+            await self._backend.bulk_delete(
+                self._connection, self.network_index, doc_ids
+            )
+        await self._network_changed([link_object], removed=True)
+        return True
+
+    async def add_network_links(self, link_objects):
+        """
+        Adds many links to the network index. See Manager.add_network_links
+        :param link_objects: List of Link objects
+        :return: Dict with the keys "ids", "existing" and "failures"
+        """
+        link_objects = _link_objects(link_objects)
+        if not link_objects:
+            return {"ids": [], "existing": [], "failures": []}
+        if self.link_id_strategy == "hash":
+            existing, by_id, documents = _new_link_documents(link_objects, "hash")
+            op_type = "create"
+        else:
+            res = await self._backend.search(
+                self._connection, self.network_index, _links_exist_query(link_objects)
+            )
+            existing, by_id, documents = _new_link_documents(
+                link_objects,
+                "uuid",
+                _links_exist_from_result(res, len(link_objects)),
+            )
+            op_type = "index"
+        ids, failures = await self._backend.bulk_index(
+            self._connection, self.network_index, documents, op_type=op_type
+        )
+        result, stored = _added_links(existing, by_id, ids, failures)
+        await self._network_changed(stored)
+        return result
+
+    async def remove_network_links(self, link_objects):
+        """
+        Removes many links from the network. See Manager.remove_network_links
+        :param link_objects: List of Link objects
+        :return: Dict with the keys "removed", "missing" and "failures"
+        """
+        link_objects = _link_objects(link_objects)
+        if not link_objects:
+            return {"removed": [], "missing": [], "failures": []}
+        if self.link_id_strategy == "hash":
+            by_id = {}
+            for link_object in link_objects:
+                by_id.setdefault(link_object.get_id(), link_object)
+            ids, failures = await self._backend.bulk_delete(
+                self._connection, self.network_index, list(by_id)
+            )
+            result = _removed_links_by_id(by_id, ids, failures)
+        else:
+            by_key = {}
+            for link_object in link_objects:
+                by_key.setdefault(link_object.get_key(), link_object)
+            res = await self._backend.search(
+                self._connection,
+                self.network_index,
+                _link_ids_query(list(by_key.values()), self.max_link_size),
+            )
+            result, doc_ids = _removed_links_by_key(by_key, _link_ids_from_result(res))
+            if doc_ids:
+                ids, failures = await self._backend.bulk_delete(
+                    self._connection, self.network_index, doc_ids
+                )
+                # A 404 here means a concurrent removal got there first, which is still a removal
+                result["failures"] = [f for f in failures if f["status"] != 404]
+        await self._network_changed(result["removed"], removed=True)
+        return result
+
+    async def follow(
+        self,
+        actor_id,
+        following,
+        linked=None,
+        activity_type="person",
+    ):
+        """
+        A convenience function to declare a follow link. See Manager.follow
+        """
+        a_linked_activity = LinkedActivity(following, activity_type=activity_type)
+        a_link = Link(actor_id, a_linked_activity, linked=linked)
+        await self.add_network_link(a_link)
+
+    async def un_follow(self, actor_id, following, activity_type="person"):
+        """
+        A convenience function to un-follow a person. See Manager.un_follow
+        :return: Bool
+        """
+        a_linked_activity = LinkedActivity(following, activity_type=activity_type)
+        a_link = Link(actor_id, a_linked_activity)
+        return await self.remove_network_link(a_link)
+
+    async def watch(self, actor_id, watch_id, watch_type, linked=None):
+        """
+        A convenience function to declare a watch link. See Manager.watch
+        """
+        a_linked_activity = LinkedActivity(watch_id, "object", watch_type)
+        a_link = Link(actor_id, a_linked_activity, link_type="watch", linked=linked)
+        await self.add_network_link(a_link)
+
+    async def un_watch(self, actor_id, watch_id, watch_type):
+        """
+        A convenience function to un-watch an object. See Manager.un_watch
+        :return: Bool
+        """
+        a_linked_activity = LinkedActivity(watch_id, "object", watch_type)
+        a_link = Link(actor_id, a_linked_activity, link_type="watch")
+        return await self.remove_network_link(a_link)
+
+    async def add_activity_feed(self, activity_object):
+        """
+        Adds an activity to the feed index and, with a timeline index, to the timelines of its followers
+        :param activity_object: The activity object being added to the index
+        :return: The unique ID given to the activity
+        """
+        if not isinstance(activity_object, Activity):
+            raise ActivityObjectError()
+        unique_id = str(uuid.uuid4())
+        document = activity_object.get_dict(native_dates=self._backend.native_dates)
+        document["feed_id"] = unique_id
+        with start_operation(
+            self.instrumentation,
+            "add_activity_feed",
+            actor_id=document["actor"]["id"],
+        ) as operation:
+            followers = None
+            if self.timeline_index is not None:
+                with operation.phase("followers") as phase:
+                    es_result = await self._backend.search(
+                        self._connection,
+                        self.network_index,
+                        _followers_query(document, self.fanout_threshold),
+                    )
+                    followers = _followers_from_result(es_result, self.fanout_threshold)
+                    document["fanned_out"] = bool(followers)
+                    phase.set(followers=len(followers) if followers else 0)
+            with operation.phase("index") as phase:
+                if phase.measure_sizes:
+                    phase.set(request_bytes=body_size(document))
+                await self._backend.index_document(
+                    self._connection,
+                    self._feed_write_index(document),
+                    unique_id,
+                    document,
+                )
+            if followers:
+                with operation.phase("fan_out"):
+                    for chunk in _chunk_documents(
+                        _timeline_documents([(unique_id, document, followers)]),
+                        500,
+                        10 * 1024 * 1024,
+                        self._backend.document_size,
+                    ):
+                        await self._backend.bulk_index(
+                            self._connection, self.timeline_index, chunk
+                        )
+            if self.feed_cache is not None:
+                with operation.phase("invalidate"):
+                    await self._feeds_changed([document], followers)
+            return unique_id
+
+    async def _network_changed(self, link_objects, removed=False):
+        """
+        See Manager._network_changed. The timeline clean-up and the lookup document updates are sent concurrently.
+        """
+        self._links_invalidated(link_objects)
+        requests = []
+        if removed and (self.timeline_index is not None or self.network_lookup):
+            if link_objects:
+                es_result = await self._backend.search(
+                    self._connection,
+                    self.network_index,
+                    _link_references_query(link_objects),
+                )
+                link_objects = _released_links(link_objects, es_result)
+            if self.timeline_index is not None and link_objects:
+                requests.append(self._clean_timelines(link_objects))
+        elif not removed and self.timeline_index is not None and link_objects:
+            requests.append(self._backfill_timelines(link_objects))
+        if self.network_lookup:
+            if removed:
+                update = self._backend.remove_from_set
+            else:
+                update = self._backend.add_to_set
+            for (actor_id, field), values in _lookup_changes(link_objects).items():
+                requests.append(
+                    update(
+                        self._connection,
+                        self.network_index,
+                        network_lookup_id(actor_id),
+                        field,
+                        values,
+                    )
+                )
+        if requests:
+            await asyncio.gather(*requests)
+
+    async def _clean_timelines(self, link_objects):
+        """
+        See Manager._clean_timelines
+        """
+        search_after = None
+        while True:
+            es_result = await self._backend.search(
+                self._connection,
+                self.timeline_index,
+                _timeline_cleanup_query(link_objects, _CLEANUP_PAGE_SIZE, search_after),
+            )
+            hits = es_result["hits"]["hits"]
+            deletes, removals = _timeline_cleanup(es_result, link_objects)
+            await asyncio.gather(
+                self._backend.bulk_delete(
+                    self._connection, self.timeline_index, deletes
+                ),
+                self._backend.bulk_remove_from_set(
+                    self._connection, self.timeline_index, "via", removals
+                ),
+            )
+            if len(hits) < _CLEANUP_PAGE_SIZE:
+                return
+            search_after = hits[-1]["sort"]
+
+    async def _backfill_timelines(self, link_objects):
+        """
+        See Manager._backfill_timelines
+        """
+        search_after = None
+        while True:
+            es_result = await self._backend.search(
+                self._connection,
+                self.feed_index,
+                _timeline_backfill_query(
+                    link_objects, _BACKFILL_PAGE_SIZE, search_after
+                ),
+            )
+            hits = es_result["hits"]["hits"]
+            await self._backend.bulk_add_to_set(
+                self._connection,
+                self.timeline_index,
+                "via",
+                _timeline_backfill(es_result, link_objects),
+            )
+            if len(hits) < _BACKFILL_PAGE_SIZE:
+                return
+            search_after = hits[-1]["sort"]
+
+    async def rebuild_network_lookup(self, actor_id):
+        """
+        Rewrites the lookup document of an actor from its links in the network index. See
+        Manager.rebuild_network_lookup
+        :param actor_id: The actor ID
+        :return: The lookup document
+        """
+        es_result = await self._backend.search(
+            self._connection, self.network_index, self.get_search_dict(actor_id)
+        )
+        document = _lookup_document(es_result)
+        await self._backend.index_document(
+            self._connection,
+            self.network_index,
+            network_lookup_id(actor_id),
+            document,
+        )
+        return document
+
+    async def get_network(self, actor_id):
+        """
+        Creates an array of the current network. When a network cache is configured it is consulted first.
+        :return: Dict array
+        """
+        with start_operation(
+            self.instrumentation, "get_network", actor_id=actor_id
+        ) as operation:
+            with operation.phase("network") as phase:
+                return await self._load_network(actor_id, phase)
+
+    async def _load_network(self, actor_id, phase):
+        """
+        get_network reporting to a phase of the running operation. See Manager._load_network
+        """
+        if self.network_cache is not None:
+            cached = self.network_cache.get(self._network_cache_key(actor_id))
+            if cached is not None:
+                phase.set(cached=True, network_size=len(cached))
+                return list(cached)
+        result = []
+        es_result = await self._backend.search(
+            self._connection, self.network_index, self.get_search_dict(actor_id)
+        )
+        if es_result["hits"]["total"]["value"] > 0:
+            for hit in es_result["hits"]["hits"]:
+                result.append(hit["_source"])
+        if self.network_cache is not None and not _cache_held(
+            self.network_cache, "network", actor_id
+        ):
+            self.network_cache.set(self._network_cache_key(actor_id), list(result))
+        phase.set(
+            cached=False,
+            network_size=len(result),
+            **search_stats([es_result], phase.measure_sizes)
+        )
+        return result
+
+    async def get_feeds(self, aggregator):
+        """
+        Return an array of feeds. The structure of the elements will depend of the aggregator. The feed query
+        needs the network, so the two are sent one after the other; aggregators that do not use the network
+        (network_filter = "lookup", MaterializedFeedAggregator(hybrid=False)) need a single request. When a feed
+        cache is configured it is consulted first.
+        :param aggregator: Aggregator class
+        :return: Array of feeds or empty array of the actor_id does not have any network links
+        """
+        self._prepare_aggregator(aggregator)
+        with start_operation(
+            self.instrumentation,
+            "get_feeds",
+            aggregator=type(aggregator).__name__,
+            actor_id=aggregator.actor_id,
+        ) as operation:
+            feed_key = self._feed_cache_key(aggregator)
+            if feed_key is not None:
+                with operation.phase("cache") as phase:
+                    cached = self.feed_cache.get(feed_key)
+                    phase.set(cached=cached is not None)
+                if cached is not None:
+                    feeds = json.loads(cached)
+                    operation.set(results=len(feeds))
+                    return feeds
+            feeds = await self._read_feeds(aggregator, operation)
+            if feed_key is not None and not _cache_held(
+                self.feed_cache, "feed", aggregator.actor_id
+            ):
+                self.feed_cache.set(feed_key, json.dumps(feeds))
+            operation.set(results=len(feeds))
+            return feeds
+
+    async def _read_feeds(self, aggregator, operation):
+        """
+        See Manager._read_feeds
+        """
+        key, compiled = self._cached_query(aggregator)
+        if compiled is None:
+            if aggregator.uses_network:
+                with operation.phase("network") as phase:
+                    aggregator.network_array = await self._load_network(
+                        aggregator.actor_id, phase
+                    )
+            else:
+                aggregator.network_array = []
+        with operation.phase("query") as phase:
+            if compiled is None:
+                self._compile_query(aggregator, key)
+            else:
+                _restore_compiled_query(aggregator, compiled)
+            if key is not None:
+                phase.set(cached=compiled is not None)
+            if aggregator.query_dict is not None:
+                await aggregator.prepare_searches_async()
+                if phase.measure_sizes:
+                    phase.set(request_bytes=_searches_size(aggregator.feed_searches()))
+        if aggregator.query_dict is None:
+            return []
+        with operation.phase("search") as phase:
+            await aggregator.query_feeds_async()
+            phase.set(**search_stats(aggregator.feed_results(), phase.measure_sizes))
+        with operation.phase("process"):
+            return aggregator.get_feeds()
+
+    async def _feeds_changed(self, documents, followers=None):
+        """
+        See Manager._feeds_changed
+        """
+        if self.feed_cache is None or not documents:
+            return
+        if followers is not None:
+            self._feeds_invalidated(followers)
+            return
+        after = None
+        while True:
+            es_result = await self._backend.search(
+                self._connection,
+                self.network_index,
+                _readers_query(documents, _READERS_PAGE_SIZE, after),
+            )
+            readers, after = _readers_from_result(es_result, _READERS_PAGE_SIZE)
+            self._feeds_invalidated(readers)
+            if after is None:
+                return
+
+    async def get_networks(self, actor_ids):
+        """
+        Loads the networks of many actors with a single _msearch request. See Manager.get_networks
+        :param actor_ids: Iterable of actor IDs
+        :return: Dict mapping each actor ID to its network
+        """
+        actor_ids = list(actor_ids)
+        with start_operation(
+            self.instrumentation, "get_networks", actors=len(actor_ids)
+        ) as operation:
+            with operation.phase("network") as phase:
+                return await self._load_networks(actor_ids, phase)
+
+    async def _load_networks(self, actor_ids, phase):
+        """
+        get_networks reporting to a phase of the running operation. See Manager._load_networks
+        """
+        result = {}
+        missing = []
+        for actor_id in actor_ids:
+            if actor_id in result or actor_id in missing:
+                continue
+            if self.network_cache is not None:
+                cached = self.network_cache.get(self._network_cache_key(actor_id))
+                if cached is not None:
+                    result[actor_id] = list(cached)
+                    continue
+            missing.append(actor_id)
+        responses = await self._backend.search_many(
+            self._connection,
+            [
+                (self.network_index, self.get_search_dict(actor_id))
+                for actor_id in missing
+            ],
+        )
+        for actor_id, es_result in zip(missing, responses):
+            network = [hit["_source"] for hit in es_result["hits"]["hits"]]
+            if self.network_cache is not None and not _cache_held(
+                self.network_cache, "network", actor_id
+            ):
+                self.network_cache.set(self._network_cache_key(actor_id), list(network))
+            result[actor_id] = network
+        phase.set(
+            cached=len(result) - len(missing),
+            network_size=sum(len(network) for network in result.values()),
+            **search_stats(responses, phase.measure_sizes)
+        )
+        return result
+
+    async def get_feeds_many(self, aggregators):
+        """
+        get_feeds for many aggregators in two _msearch requests. See Manager.get_feeds_many
+        :param aggregators: List of aggregator classes
+        :return: List with the result of get_feeds for each aggregator, in the same order
+        """
+        for aggregator in aggregators:
+            self._prepare_aggregator(aggregator)
+        with start_operation(
+            self.instrumentation, "get_feeds_many", aggregators=len(aggregators)
+        ) as operation:
+            feed_keys = [self._feed_cache_key(aggregator) for aggregator in aggregators]
+            feeds = {}
+            if self.feed_cache is not None:
+                with operation.phase("cache") as phase:
+                    for aggregator, feed_key in zip(aggregators, feed_keys):
+                        if feed_key is not None:
+                            cached_feeds = self.feed_cache.get(feed_key)
+                            if cached_feeds is not None:
+                                feeds[id(aggregator)] = json.loads(cached_feeds)
+                    phase.set(cached=len(feeds))
+            from_cache = set(feeds)
+            pending = [
+                aggregator for aggregator in aggregators if id(aggregator) not in feeds
+            ]
+            cached = [self._cached_query(aggregator) for aggregator in pending]
+            with operation.phase("network") as phase:
+                networks = await self._load_networks(
+                    [
+                        aggregator.actor_id
+                        for aggregator, (_, compiled) in zip(pending, cached)
+                        if compiled is None and aggregator.uses_network
+                    ],
+                    phase,
+                )
+            searches = []
+            queried = []
+            with operation.phase("query") as phase:
+                for aggregator, (key, compiled) in zip(pending, cached):
+                    if compiled is not None:
+                        _restore_compiled_query(aggregator, compiled)
+                    else:
+                        if aggregator.uses_network:
+                            aggregator.network_array = networks[aggregator.actor_id]
+                        else:
+                            aggregator.network_array = []
+                        self._compile_query(aggregator, key)
+                    if aggregator.query_dict is not None:
+                        await aggregator.prepare_searches_async()
+                        aggregator_searches = aggregator.feed_searches()
+                        queried.append(
+                            (aggregator, len(searches), len(aggregator_searches))
+                        )
+                        searches.extend(aggregator_searches)
+                if self.query_cache is not None:
+                    phase.set(
+                        cached=sum(compiled is not None for _, compiled in cached)
+                    )
+                if phase.measure_sizes:
+                    phase.set(request_bytes=_searches_size(searches))
+            with operation.phase("search") as phase:
+                responses = await self._backend.search_many(self._connection, searches)
+                phase.set(**search_stats(responses, phase.measure_sizes))
+            with operation.phase("process"):
+                for aggregator, start, count in queried:
+                    finished = aggregator.set_feed_results(
+                        responses[start : start + count]
+                    )
+                    feeds[id(aggregator)] = aggregator.get_feeds()
+                    if finished is not None:
+                        await self._backend.close_point_in_time(
+                            self._connection, finished
+                        )
+            for aggregator, feed_key in zip(aggregators, feed_keys):
+                if feed_key is None or id(aggregator) in from_cache:
+                    continue
+                if not _cache_held(self.feed_cache, "feed", aggregator.actor_id):
+                    self.feed_cache.set(
+                        feed_key, json.dumps(feeds.get(id(aggregator), []))
+                    )
+            operation.set(results=sum(len(feed) for feed in feeds.values()))
+            return [feeds.get(id(aggregator), []) for aggregator in aggregators]
+
+    def iter_feed(self, aggregator, page_size=1000, keep_alive="1m"):
+        """
+        Streams every activity of a feed through a point in time, one page at a time. See Manager.iter_feed;
+        the pages are read one after the other (no slices).
+        :param aggregator: Aggregator class
+        :param page_size: Activities fetched per request. 1000 by default
+        :param keep_alive: How long the point in time is kept between two pages. "1m" by default
+        :return: Async generator of activity dicts (use ``async for``)
+        """
+        if isinstance(aggregator, MaterializedFeedAggregator):
+            raise ValueError(
+                "iter_feed reads the feed index. Use UnAggregated for a materialized feed"
+            )
+        self._prepare_aggregator(aggregator)
+        return self._iter_feed(aggregator, page_size, keep_alive)
+
+    async def _iter_feed(self, aggregator, page_size, keep_alive):
+        if aggregator.uses_network:
+            aggregator.network_array = await self.get_network(aggregator.actor_id)
+        else:
+            aggregator.network_array = []
+        aggregator.set_query_dict()
+        self._narrow_feed_index(aggregator)
+        if aggregator.query_dict is None:
+            return
+        body = _export_body(
+            aggregator.query_dict["query"],
+            aggregator.order,
+            self._backend.point_in_time_tiebreaker(aggregator.order),
+            page_size,
+            0,
+            1,
+        )
+        pit_id = await self._backend.open_point_in_time(
+            self._connection, aggregator.feed_index, keep_alive
+        )
+        try:
+            while True:
+                body["pit"] = {"id": pit_id, "keep_alive": keep_alive}
+                response = await self._backend.search(self._connection, None, body)
+                pit_id = _response_pit_id(response, pit_id)
+                hits = response["hits"]["hits"]
+                for hit in hits:
+                    yield hit["_source"]
+                if len(hits) < page_size:
+                    return
+                body["search_after"] = hits[-1]["sort"]
+        finally:
+            await self._backend.close_point_in_time(self._connection, pit_id)
@@ -5,25 +5,870 @@ from elasticfeeds.exceptions import (
     ActivityObjectError,
     AggregatorObjectError,
     MaxLinkError,
+    TimelineIndexError,
     LinkNotExistError,
     ElasticFeedConnectionError,
 )
-from elasticfeeds.network import Link, LinkedActivity
+from elasticfeeds.network import Link, LinkedActivity, network_lookup_id
 from elasticfeeds.activity import Activity
-from elasticfeeds.aggregators import BaseAggregator
+from elasticfeeds.aggregators import BaseAggregator, MaterializedFeedAggregator
+from elasticfeeds.aggregators.base import _iso
+from elasticfeeds.aggregators.cursor import _response_pit_id
+from elasticfeeds.instrumentation import start_operation, body_size, search_stats
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import queue
+import threading
+import time
 import uuid
+import json
+import hashlib
 import datetime
 
-__all__ = ["Manager"]
+__all__ = ["BaseManager", "Manager"]
 
+#: How network link documents get their ids. See Manager(link_id_strategy=...)
+_LINK_ID_STRATEGIES = ("uuid", "hash")
 
-def _get_feed_index_definition(number_of_shards, number_of_replicas):
+#: How the feed index is split. See Manager(feed_partitioning=...)
+_FEED_PARTITIONINGS = (None, "monthly")
+
+#: Mapping profiles of the feed index. See Manager(feed_mapping=...)
+_FEED_MAPPINGS = ("default", "tuned")
+
+#: Number of timeline documents read per request when removed links are cleaned out of the timelines
+_CLEANUP_PAGE_SIZE = 1000
+
+#: Number of activities read per request when new links are copied into the timelines
+_BACKFILL_PAGE_SIZE = 1000
+
+#: Number of readers found per request when new activities invalidate the feed cache
+_READERS_PAGE_SIZE = 1000
+
+
+def _chunk_documents(documents, chunk_size, max_bytes, document_size):
+    """
+    Groups (doc_id, document) pairs into chunks that hold at most ``chunk_size`` documents and roughly
+    ``max_bytes`` of serialized source each. Chunks are produced lazily so arbitrarily long streams can be
+    ingested with flat memory.
+    :param documents: Iterable of (doc_id, document) tuples
+    :param chunk_size: Maximum number of documents per chunk
+    :param max_bytes: Maximum approximate size in bytes of the documents in a chunk
+    :param document_size: Callable returning the size of a document, normally BaseBackend.document_size so
+                          the documents are measured with the serializer that will encode them
+    :return: Generator of lists of (doc_id, document) tuples
+    """
+    chunk = []
+    chunk_bytes = 0
+    for doc_id, document in documents:
+        size = document_size(document)
+        if chunk and (len(chunk) >= chunk_size or chunk_bytes + size > max_bytes):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append((doc_id, document))
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+
+def _activities_query(
+    actor_id, actor_type, verb, object_id, object_type, target_id, target_type, since
+):
+    """
+    The query of Manager.get_activities: every given constraint combined with AND
+    :return: The query section
+    """
+    must = []
+    for field, value in (
+        ("actor.id", actor_id),
+        ("actor.type", actor_type),
+        ("type", verb),
+        ("object.id", object_id),
+        ("object.type", object_type),
+        ("target.id", target_id),
+        ("target.type", target_type),
+    ):
+        if value is not None:
+            must.append({"term": {field: value}})
+    if since is not None:
+        if isinstance(since, datetime.datetime):
+            since = since.isoformat()
+        must.append({"range": {"published": {"gte": since}}})
+    return {"bool": {"must": must}} if must else {"match_all": {}}
+
+
+def _export_body(query, order, tiebreaker, page_size, slice_id, slices):
+    """
+    The first page of a point-in-time export search (see Manager.iter_feed). The caller adds "pit" and, for the
+    following pages, "search_after".
+    """
+    body = {
+        "query": query,
+        "sort": [{"published": {"order": order}}, tiebreaker],
+        "size": page_size,
+        "track_total_hits": False,
+    }
+    if slices > 1:
+        body["slice"] = {"id": slice_id, "max": slices}
+    return body
+
+
+def _partition_name(feed_index, year, month):
+    """
+    :return: The name of the monthly partition of the feed index holding the activities published in a month
+    """
+    return "%s-%04d.%02d" % (feed_index, year, month)
+
+
+def _write_index(feed_index, feed_partitioning, document):
+    """
+    :return: The index an activity document is written to: its monthly partition with feed_partitioning,
+             otherwise the feed index
+    """
+    if feed_partitioning is None:
+        return feed_index
+    return _partition_name(
+        feed_index, document["published_year"], document["published_month"]
+    )
+
+
+def _partitions_before(feed_index, year, month):
+    """
+    Exclusion patterns ("-name*") matching every monthly partition before year.month. They are built digit by
+    digit (e.g. before 2019: "-feeds-0*", "-feeds-1*", "-feeds-200*", "-feeds-2010*" ... "-feeds-2018*"), so
+    there are never more than 47 of them, however old the data is.
+    """
+    digits = "%04d" % year
+    patterns = []
+    for position, digit in enumerate(digits):
+        for smaller in range(int(digit)):
+            patterns.append("-%s-%s%d*" % (feed_index, digits[:position], smaller))
+    for smaller in range(1, month):
+        patterns.append("-%s*" % _partition_name(feed_index, year, smaller))
+    return patterns
+
+
+def _partitions_expression(feed_index, since, until):
+    """
+    The index expression that reads only the monthly partitions of the feed index overlapping a date range.
+    Every part is a wildcard, so months without a partition do not make the search fail.
+    :param since: First datetime of the range, or None
+    :param until: Last datetime of the range, or None
+    :return: A comma-separated index expression, or None when no partition can overlap the range
+    """
+    if since is None:
+        return feed_index
+    if until is None:
+        patterns = ["%s-*" % feed_index]
+        patterns.extend(_partitions_before(feed_index, since.year, since.month))
+        return ",".join(patterns)
+    if since > until:
+        return None
+    patterns = []
+    for year in range(since.year, until.year + 1):
+        first = since.month if year == since.year else 1
+        last = until.month if year == until.year else 12
+        if first == 1 and last == 12:
+            patterns.append("%s-%04d.*" % (feed_index, year))
+        else:
+            patterns.extend(
+                "%s*" % _partition_name(feed_index, year, month)
+                for month in range(first, last + 1)
+            )
+    return ",".join(patterns)
+
+
+def _searches_size(searches):
+    """
+    :param searches: List of (index, body) tuples
+    :return: Size in bytes of the search bodies as JSON
+    """
+    return sum(body_size(body) for _, body in searches)
+
+
+def _cache_version_key(kind, actor_id):
+    """
+    :param kind: "query" or "feed"
+    :return: The key of the version of an actor's entries in the query or feed cache
+    """
+    return "%s-version:%s" % (kind, actor_id)
+
+
+def _cache_hold_key(kind, actor_id):
+    """
+    :param kind: "network", "query" or "feed"
+    :return: The key that holds back the entries of an actor in the network, query or feed cache
+    """
+    return "%s-hold:%s" % (kind, actor_id)
+
+
+def _invalidate(cache, kind, actor_id, key, hold):
+    """
+    Drops a cache entry of an actor (its network, or the version of its queries or feeds) and keeps new entries
+    of the actor out of the cache for ``hold`` seconds: until the indices are refreshed, a search may not see
+    the write that caused the invalidation, and its result would be cached until it expires.
+    :param cache: The network, query or feed cache
+    :param kind: "network", "query" or "feed"
+    :param actor_id: The actor ID
+    :param key: The key to drop
+    :param hold: Seconds during which the entries of the actor are not stored. 0 or None to store them at once
+    """
+    cache.delete(key)
+    if hold:
+        cache.set(_cache_hold_key(kind, actor_id), time.time() + hold)
+
+
+def _cache_held(cache, kind, actor_id):
+    """
+    :return: True if the entries of an actor must not be stored yet (see _invalidate)
+    """
+    until = cache.get(_cache_hold_key(kind, actor_id))
+    return until is not None and until > time.time()
+
+
+def _cache_key(cache, kind, feed_index, max_link_size, aggregator):
+    """
+    The key of an aggregator in the query or feed cache: the actor, the version of its entries (a random token,
+    replaced to invalidate them) and a digest of the feed parameters
+    :param cache: The query or feed cache
+    :param kind: "query" or "feed"
+    :param feed_index: The feed index of the manager
+    :param max_link_size: The max_link_size of the manager
+    :param aggregator: Aggregator class
+    :return: String
+    """
+    version_key = _cache_version_key(kind, aggregator.actor_id)
+    version = cache.get(version_key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(version_key, version)
+    parameters = json.dumps([feed_index, max_link_size, aggregator.query_parameters()])
+    digest = hashlib.sha1(parameters.encode("utf-8")).hexdigest()
+    return "%s:%s:%s:%s" % (kind, aggregator.actor_id, version, digest)
+
+
+def _readers_query(documents, size, after=None):
+    """
+    Builds the search that finds, a page at a time, the actors whose feeds can show some activities: the ones
+    linked to their actors, objects or targets, whenever the links were created. Used to invalidate the feed
+    cache. Uses a composite aggregation on actor_id, so every reader is found however many there are.
+    :param documents: Iterable of activity documents
+    :param size: The number of actors per page
+    :param after: The after_key of the previous page, or None for the first page
+    :return: A dict that will be passed to the backend
+    """
+    ids = {"actor": set(), "object": set()}
+    for document in documents:
+        ids["actor"].add(document["actor"]["id"])
+        for component in ("object", "target"):
+            if component in document:
+                ids["object"].add(document[component]["id"])
+    should = [
+        {
+            "bool": {
+                "filter": [
+                    {"term": {"linked_activity.activity_class": activity_class}},
+                    {"terms": {"linked_activity.id": sorted(ids[activity_class])}},
+                ]
+            }
+        }
+        for activity_class in ("actor", "object")
+        if ids[activity_class]
+    ]
+    readers = {
+        "size": size,
+        "sources": [{"actor_id": {"terms": {"field": "actor_id"}}}],
+    }
+    if after is not None:
+        readers["after"] = after
+    return {
+        "size": 0,
+        "query": {"bool": {"should": should, "minimum_should_match": 1}},
+        "aggs": {"readers": {"composite": readers}},
+    }
+
+
+def _readers_from_result(es_result, size):
+    """
+    Reads a page of _readers_query
+    :param size: The size given to _readers_query
+    :return: A tuple (readers, after): the actor IDs of the page and the after key of the next page, or None
+             after the last page
+    """
+    aggregation = es_result["aggregations"]["readers"]
+    readers = [bucket["key"]["actor_id"] for bucket in aggregation["buckets"]]
+    after = aggregation.get("after_key") if len(readers) == size else None
+    return readers, after
+
+
+def _compiled_query(aggregator):
+    """
+    :return: The compiled query of an aggregator (see BaseAggregator.compiled_attributes) serialized as JSON
+    """
+    return json.dumps(
+        dict(
+            (name, getattr(aggregator, name)) for name in aggregator.compiled_attributes
+        ),
+        separators=(",", ":"),
+    )
+
+
+def _restore_compiled_query(aggregator, compiled):
+    """
+    Gives an aggregator a compiled query returned by _compiled_query. Decoding it gives the aggregator its own
+    copy, which prepare_searches can modify.
+    """
+    for name, value in json.loads(compiled).items():
+        setattr(aggregator, name, value)
+
+
+def _is_rejected(error):
+    """
+    Tells whether a request failed because the cluster pushed back (HTTP 429 / rejected execution) and can
+    therefore be retried later. Both clients expose the HTTP status as ``status_code`` on their errors.
+    :param error: The exception raised by the client
+    :return: True if the request can be retried
+    """
+    return getattr(error, "status_code", None) == 429
+
+
+def _link_ids_query(link_objects, max_link_size):
+    """
+    Builds the search that resolves the document ids of a batch of links
+    :param link_objects: List of Link objects
+    :param max_link_size: Minimum number of hits to return
+    :return: A dict that will be passed to the backend
+    """
+    should = [link_object.get_search_dict()["query"] for link_object in link_objects]
+    return {
+        "size": max(len(link_objects), max_link_size),
+        "query": {"bool": {"should": should, "minimum_should_match": 1}},
+        "_source": [
+            "actor_id",
+            "link_type",
+            "linked_activity.activity_class",
+            "linked_activity.type",
+            "linked_activity.id",
+        ],
+    }
+
+
+def _link_ids_from_result(es_result):
+    """
+    Reads the result of _link_ids_query
+    :param es_result: The search result
+    :return: Dict mapping Link.get_key() to the list of document ids stored for that link
+    """
+    result = {}
+    for hit in es_result["hits"]["hits"]:
+        source = hit["_source"]
+        linked_activity = source["linked_activity"]
+        key = (
+            source["actor_id"],
+            source["link_type"],
+            linked_activity["activity_class"],
+            linked_activity["type"],
+            linked_activity["id"],
+        )
+        result.setdefault(key, []).append(hit["_id"])
+    return result
+
+
+def _links_exist_query(link_objects):
+    """
+    Builds the search that checks which of a batch of links already exist. Each link becomes a named bucket of
+    a "filters" aggregation, so no hits need to be fetched.
+    :param link_objects: List of Link objects
+    :return: A dict that will be passed to the backend
+    """
+    filters = {}
+    for position, link_object in enumerate(link_objects):
+        filters[str(position)] = link_object.get_search_dict()["query"]
+    return {"size": 0, "aggs": {"links": {"filters": {"filters": filters}}}}
+
+
+def _links_exist_from_result(es_result, count):
+    """
+    Reads the result of _links_exist_query
+    :param es_result: The search result
+    :param count: The number of links checked
+    :return: List of booleans, one per link
+    """
+    buckets = es_result["aggregations"]["links"]["buckets"]
+    return [buckets[str(position)]["doc_count"] > 0 for position in range(count)]
+
+
+def _new_link_documents(link_objects, link_id_strategy, exists=None):
+    """
+    Prepares the _bulk request of add_network_links. A link repeated in the batch is written once.
+    :param link_objects: List of Link objects
+    :param link_id_strategy: "uuid" or "hash"
+    :param exists: With "uuid", the result of _links_exist_from_result. Links that exist are not written
+    :return: Tuple (existing, by_id, documents): the Link objects skipped, the Link object of every document id
+             and the (id, document) pairs to write
+    """
+    existing = []
+    by_id = {}
+    documents = []
+    seen = set()
+    if exists is None:
+        exists = [False] * len(link_objects)
+    for link_object, link_exists in zip(link_objects, exists):
+        key = link_object.get_key()
+        if link_exists or key in seen:
+            existing.append(link_object)
+            continue
+        seen.add(key)
+        if link_id_strategy == "hash":
+            link_id = link_object.get_id()
+        else:
+            link_id = str(uuid.uuid4())
+        by_id[link_id] = link_object
+        documents.append((link_id, link_object.get_dict()))
+    return existing, by_id, documents
+
+
+def _added_links(existing, by_id, ids, failures):
+    """
+    Reads the result of the _bulk request of add_network_links. A create the backend rejects with 409 (the
+    "hash" strategy) is a link that already exists.
+    :param existing: The Link objects skipped by _new_link_documents
+    :param by_id: The Link object of every document id
+    :param ids: The ids written
+    :param failures: The failures of the request
+    :return: A tuple (result, stored): the result of add_network_links and the Link objects that were stored
+    """
+    result = {"ids": ids, "existing": list(existing), "failures": []}
+    for failure in failures:
+        if failure["status"] == 409:
+            result["existing"].append(by_id[failure["id"]])
+        else:
+            result["failures"].append(failure)
+    return result, [by_id[link_id] for link_id in ids]
+
+
+def _removed_links_by_id(by_id, ids, failures):
+    """
+    Reads the result of the _bulk delete request of remove_network_links with the "hash" strategy
+    :param by_id: The Link object of every document id
+    :param ids: The ids deleted
+    :param failures: The failures of the request
+    :return: The result of remove_network_links
+    """
+    result = {
+        "removed": [by_id[link_id] for link_id in ids],
+        "missing": [],
+        "failures": [],
+    }
+    for failure in failures:
+        if failure["status"] == 404:
+            result["missing"].append(by_id[failure["id"]])
+        else:
+            result["failures"].append(failure)
+    return result
+
+
+def _removed_links_by_key(by_key, found):
+    """
+    Splits the links of remove_network_links with the "uuid" strategy into the ones found and the missing ones
+    :param by_key: The Link objects by Link.get_key(). A link repeated in the batch is removed and reported once
+    :param found: The result of _link_ids_from_result
+    :return: Tuple (result, doc_ids): the result of remove_network_links and the document ids to delete
+    """
+    result = {"removed": [], "missing": [], "failures": []}
+    doc_ids = []
+    for key, link_object in by_key.items():
+        if key in found:
+            result["removed"].append(link_object)
+            doc_ids.extend(found[key])
+        else:
+            result["missing"].append(link_object)
+    return result, doc_ids
+
+
+def _link_objects(link_objects):
+    """
+    :param link_objects: An iterable of Link objects
+    :return: The Link objects as a list
+    """
+    link_objects = list(link_objects)
+    for link_object in link_objects:
+        if not isinstance(link_object, Link):
+            raise LinkObjectError()
+    return link_objects
+
+
+def _lookup_field(activity_class):
+    """
+    The field of the lookup document that lists the linked ids of an activity class
+    """
+    if activity_class == "actor":
+        return "lookup_actors"
+    return "lookup_objects"
+
+
+def _lookup_changes(link_objects):
+    """
+    Groups the linked ids of some links by the lookup document and field they belong to
+    :param link_objects: Iterable of Link objects
+    :return: Dict mapping (actor_id, field) to the list of linked IDs
+    """
+    changes = {}
+    for link in link_objects:
+        field = _lookup_field(link.linked_activity.activity_class)
+        values = changes.setdefault((link.actor_id, field), [])
+        if link.linked_activity.activity_id not in values:
+            values.append(link.linked_activity.activity_id)
+    return changes
+
+
+def _link_references_query(link_objects):
+    """
+    Builds the search that finds which linked ids of some removed links are still referenced by another link of
+    the same actor, e.g. an actor followed both as a "person" and as a "user". The removed links are excluded
+    by their fields, so the result does not depend on their deletion being visible to searches yet.
+    :param link_objects: List of the removed Link objects
+    :return: A dict that will be passed to the backend
+    """
+    groups = {}
+    for link in link_objects:
+        ids = groups.setdefault(
+            (link.actor_id, link.linked_activity.activity_class), set()
+        )
+        ids.add(link.linked_activity.activity_id)
+    should = [
+        {
+            "bool": {
+                "filter": [
+                    {"term": {"actor_id": actor_id}},
+                    {"term": {"linked_activity.activity_class": activity_class}},
+                    {"terms": {"linked_activity.id": sorted(ids)}},
+                ]
+            }
+        }
+        for (actor_id, activity_class), ids in groups.items()
+    ]
+    return {
+        "size": 0,
+        "query": {
+            "bool": {
+                "should": should,
+                "minimum_should_match": 1,
+                "must_not": [link.get_search_dict()["query"] for link in link_objects],
+            }
+        },
+        "aggs": {
+            "references": {
+                "composite": {
+                    "size": sum(len(ids) for ids in groups.values()),
+                    "sources": [
+                        {"actor_id": {"terms": {"field": "actor_id"}}},
+                        {
+                            "activity_class": {
+                                "terms": {"field": "linked_activity.activity_class"}
+                            }
+                        },
+                        {"id": {"terms": {"field": "linked_activity.id"}}},
+                    ],
+                }
+            }
+        },
+    }
+
+
+def _released_links(link_objects, es_result):
+    """
+    Reads the result of _link_references_query
+    :param link_objects: List of the removed Link objects
+    :param es_result: The search result
+    :return: The removed links whose linked id no other link of their actor references
+    """
+    referenced = set(
+        (
+            bucket["key"]["actor_id"],
+            bucket["key"]["activity_class"],
+            bucket["key"]["id"],
+        )
+        for bucket in es_result["aggregations"]["references"]["buckets"]
+    )
+    return [
+        link
+        for link in link_objects
+        if (
+            link.actor_id,
+            link.linked_activity.activity_class,
+            link.linked_activity.activity_id,
+        )
+        not in referenced
+    ]
+
+
+def _lookup_document(es_result):
+    """
+    Builds a lookup document from the result of a network search
+    :param es_result: The search result
+    :return: Dict with the lookup_actors and lookup_objects lists
+    """
+    document = {"lookup_actors": [], "lookup_objects": []}
+    for hit in es_result["hits"]["hits"]:
+        linked_activity = hit["_source"]["linked_activity"]
+        field = _lookup_field(linked_activity["activity_class"])
+        if linked_activity["id"] not in document[field]:
+            document[field].append(linked_activity["id"])
+    return document
+
+
+def _timeline_cleanup_query(link_objects, size, search_after=None):
+    """
+    Finds, a page at a time, the timeline documents that some removed links brought to their actors
+    :param link_objects: The removed Link objects whose linked ids no other link of their actor references
+    :param size: The number of documents per page
+    :param search_after: The sort values of the last document of the previous page, or None for the first page
+    :return: A dict that will be passed to the backend
+    """
+    released = _released_ids(link_objects)
+    body = {
+        "size": size,
+        "query": {
+            "bool": {
+                "should": [
+                    {
+                        "bool": {
+                            "filter": [
+                                {"term": {"owner": owner}},
+                                {"terms": {"via": sorted(ids)}},
+                            ]
+                        }
+                    }
+                    for owner, ids in released.items()
+                ],
+                "minimum_should_match": 1,
+            }
+        },
+        "_source": ["owner", "via"],
+        "sort": [{"owner": {"order": "asc"}}, {"feed_id": {"order": "asc"}}],
+    }
+    if search_after is not None:
+        body["search_after"] = search_after
+    return body
+
+
+def _released_ids(link_objects):
+    """
+    :param link_objects: Iterable of Link objects
+    :return: Dict mapping each actor ID to the set of the linked IDs of its links
+    """
+    released = {}
+    for link in link_objects:
+        released.setdefault(link.actor_id, set()).add(link.linked_activity.activity_id)
+    return released
+
+
+def _timeline_cleanup(es_result, link_objects):
+    """
+    Reads a page of _timeline_cleanup_query. A timeline copy is deleted once no link brings it to its owner;
+    otherwise only the ids of the removed links are taken out of its "via".
+    :param es_result: The search result
+    :param link_objects: The Link objects given to _timeline_cleanup_query
+    :return: A tuple (deletes, removals): the ids of the documents to delete and the (doc_id, values) pairs of
+             the ids to remove from the "via" of the others
+    """
+    released = _released_ids(link_objects)
+    deletes = []
+    removals = []
+    for hit in es_result["hits"]["hits"]:
+        via = hit["_source"]["via"]
+        if not isinstance(via, list):
+            via = [via]
+        gone = [value for value in via if value in released[hit["_source"]["owner"]]]
+        if len(gone) == len(via):
+            deletes.append(hit["_id"])
+        else:
+            removals.append((hit["_id"], gone))
+    return deletes, removals
+
+
+def _link_fields(link):
+    """
+    :param link: A Link object
+    :return: The activity components a link brings: the actor for an "actor" link, the object and the target for
+             an "object" link
+    """
+    if link.linked_activity.activity_class == "actor":
+        return ("actor",)
+    return ("object", "target")
+
+
+def _timeline_backfill_query(link_objects, size, search_after=None):
+    """
+    Finds, a page at a time, the fanned out activities that some new links bring to their actors: the ones of
+    the linked actors or objects published since the links were created, as in _followers_query. The others are
+    read from the feed index by the hybrid MaterializedFeedAggregator.
+    :param link_objects: The new Link objects
+    :param size: The number of activities per page
+    :param search_after: The sort values of the last activity of the previous page, or None for the first page
+    :return: A dict that will be passed to the backend
+    """
+    should = []
+    for link in link_objects:
+        linked_activity = link.linked_activity
+        for field in _link_fields(link):
+            should.append(
+                {
+                    "bool": {
+                        "filter": [
+                            {"term": {field + ".id": linked_activity.activity_id}},
+                            {"term": {field + ".type": linked_activity.activity_type}},
+                            {"range": {"published": {"gte": link.linked.isoformat()}}},
+                        ]
+                    }
+                }
+            )
+    body = {
+        "size": size,
+        "query": {
+            "bool": {
+                "should": should,
+                "minimum_should_match": 1,
+                "filter": [{"term": {"fanned_out": True}}],
+            }
+        },
+        "sort": [{"feed_id": {"order": "asc"}}],
+    }
+    if search_after is not None:
+        body["search_after"] = search_after
+    return body
+
+
+def _timeline_backfill(es_result, link_objects):
+    """
+    Reads a page of _timeline_backfill_query. An activity already in the timeline of an actor (through another
+    link) only gets the new linked ids added to its "via".
+    :param es_result: The search result
+    :param link_objects: The Link objects given to _timeline_backfill_query
+    :return: List of the (doc_id, via, document) additions of BaseBackend.bulk_add_to_set
+    """
+    additions = []
+    for hit in es_result["hits"]["hits"]:
+        document = hit["_source"]
+        published = _iso(document["published"])
+        followers = {}
+        for link in link_objects:
+            linked_activity = link.linked_activity
+            if published < link.linked.isoformat():
+                continue
+            for field in _link_fields(link):
+                component = document.get(field)
+                if (
+                    component is not None
+                    and component["id"] == linked_activity.activity_id
+                    and component["type"] == linked_activity.activity_type
+                ):
+                    via = followers.setdefault(link.actor_id, [])
+                    if linked_activity.activity_id not in via:
+                        via.append(linked_activity.activity_id)
+        for doc_id, copy in _timeline_documents(
+            [(document["feed_id"], document, followers)]
+        ):
+            additions.append((doc_id, copy["via"], copy))
+    return additions
+
+
+def _follower_clause(activity_class, component):
+    """
+    Matches the links that bring an activity component (actor, object or target) to a follower
+    :param activity_class: The class of the links: "actor" or "object"
+    :param component: The actor, object or target dict of the activity
+    :return: A bool query for the network index
+    """
+    return {
+        "bool": {
+            "must": [
+                {"term": {"linked_activity.activity_class": activity_class}},
+                {"term": {"linked_activity.id": component["id"]}},
+                {"term": {"linked_activity.type": component["type"]}},
+            ]
+        }
+    }
+
+
+def _followers_query(document, fanout_threshold):
+    """
+    Builds the search that finds the actors that receive an activity in their feed: the ones following its actor
+    or watching its object or target since before it was published. Uses a terms aggregation on actor_id.
+    :param document: The activity document
+    :param fanout_threshold: The maximum number of followers of an activity that is fanned out
+    :return: A dict that will be passed to the backend
+    """
+    should = [_follower_clause("actor", document["actor"])]
+    for component in ("object", "target"):
+        if component in document:
+            should.append(_follower_clause("object", document[component]))
+    return {
+        "size": 0,
+        "query": {
+            "bool": {
+                "should": should,
+                "minimum_should_match": 1,
+                "filter": [{"range": {"linked": {"lte": document["published"]}}}],
+            }
+        },
+        "aggs": {
+            "followers": {
+                "terms": {"field": "actor_id", "size": fanout_threshold + 1},
+                "aggs": {"via": {"terms": {"field": "linked_activity.id"}}},
+            }
+        },
+    }
+
+
+def _followers_from_result(es_result, fanout_threshold):
+    """
+    Reads the result of _followers_query
+    :param es_result: The search result
+    :param fanout_threshold: The maximum number of followers of an activity that is fanned out
+    :return: Dict mapping each follower ID to the list of linked IDs that bring them the activity, or None
+             when there are more than fanout_threshold followers
+    """
+    buckets = es_result["aggregations"]["followers"]["buckets"]
+    if len(buckets) > fanout_threshold:
+        return None
+    return {
+        bucket["key"]: [via["key"] for via in bucket["via"]["buckets"]]
+        for bucket in buckets
+    }
+
+
+def _timeline_documents(activities):
+    """
+    Turns activities into the (doc_id, document) pairs of their timeline copies
+    :param activities: Iterable of (feed_id, document, followers) tuples
+    :return: Generator of (doc_id, document) tuples
+    """
+    for feed_id, document, followers in activities:
+        activity = dict(document)
+        activity.pop("fanned_out", None)
+        for owner, via in followers.items():
+            yield owner + ":" + feed_id, {
+                "owner": owner,
+                "via": via,
+                "feed_id": feed_id,
+                "published": document["published"],
+                "activity": activity,
+            }
+
+
+def _get_feed_index_definition(
+    number_of_shards, number_of_replicas, mapping="default", refresh_interval=None
+):
     """
     Constructs the Feed index with a given number of shards and replicas. Feeds are stored in an atomic form and
        are based as much as possible on http://activitystrea.ms/
 
     :param number_of_shards: Number of shards for the feeds index.
     :param number_of_replicas: Number of replicas for the feeds index.
+    :param mapping: The mapping profile. "default" or "tuned" (see _tune_feed_index_definition)
+    :param refresh_interval: Optional index.refresh_interval, e.g. "30s". None keeps the backend's default
 
     The index has the following parts:
 
@@ -77,6 +922,10 @@ def _get_feed_index_definition(number_of_shards, number_of_replicas):
                IMPORTANT NOTE: This field is "non-analyzable" which means that ES does not perform any
                operations on it thus it cannot be used to order, aggregate, or filter query results.
 
+        fanned_out: Boolean. Only set when the Manager has a timeline index. True if the activity was copied to
+                    the timelines of its followers (see Manager(timeline_index=...)). False when it had no
+                    followers or too many; the feed index is then read for it.
+
     :return: Dict.
     """
     # noinspection SpellCheckingInspection
@@ -95,6 +944,7 @@ def _get_feed_index_definition(number_of_shards, number_of_replicas):
                 "published_year": {"type": "integer"},
                 "published_month": {"type": "integer"},
                 "feed_id": {"type": "keyword"},
+                "fanned_out": {"type": "boolean"},
                 "type": {"type": "keyword"},
                 "actor": {
                     "properties": {
@@ -128,9 +978,39 @@ def _get_feed_index_definition(number_of_shards, number_of_replicas):
             }
         },
     }
+    if mapping == "tuned":
+        _tune_feed_index_definition(_json)
+    if refresh_interval is not None:
+        _json["settings"]["index"]["refresh_interval"] = refresh_interval
     return _json
 
 
+def _tune_feed_index_definition(definition):
+    """
+    The "tuned" mapping profile of the feed index, for lower disk use and faster sorted reads:
+
+    * The index is sorted by published date, newest first, so the segments are already in the order of the
+      chronological feed queries and the search can stop early.
+    * published_date, published_month and feed_id are only aggregated on or sorted by, so they keep their doc
+      values but are not indexed. A term or range query on them needs doc-values search (see
+      Manager(feed_mapping=...)). published_time and origin are never searched: they are only kept in _source.
+    * The embedding vector is left out of _source. It is still indexed for kNN searches, but it is not returned
+      and an update or reindex of an activity drops it.
+
+    :param definition: The definition built by _get_feed_index_definition. Changed in place
+    """
+    definition["settings"]["index"]["sort"] = {"field": "published", "order": "desc"}
+    properties = definition["mappings"]["properties"]
+    for field in ("published_date", "published_month", "feed_id"):
+        properties[field]["index"] = False
+    properties["published_time"].update({"index": False, "doc_values": False})
+    for field in ("id", "type"):
+        properties["origin"]["properties"][field].update(
+            {"index": False, "doc_values": False}
+        )
+    definition["mappings"]["_source"] = {"excludes": ["embedding"]}
+
+
 def _get_network_index_definition(number_of_shards, number_of_replicas):
     """
     Constructs the Network index with a given number of shards and replicas.
@@ -161,6 +1041,11 @@ def _get_network_index_definition(number_of_shards, number_of_replicas):
                 IMPORTANT NOTE: This field is "non-analyzable" which means that ES does not perform any
                 operations on it thus it cannot be used to order, aggregate, or filter query results.
 
+    The network index also holds one lookup document per actor when the Manager maintains them (see
+    Manager(network_lookup=True)). They have no link fields, so link searches never match them:
+         lookup_actors: Array of the IDs of the actors the actor is linked to.
+         lookup_objects: Array of the IDs of the objects the actor is linked to.
+
     :return: A JSON object with the definition of the Network index.
     """
     _json = {
@@ -184,25 +1069,161 @@ def _get_network_index_definition(number_of_shards, number_of_replicas):
                 },
                 "link_weight": {"type": "float"},
                 "extra": {"type": "object", "enabled": "false"},
+                "lookup_actors": {"type": "keyword"},
+                "lookup_objects": {"type": "keyword"},
             }
         },
     }
     return _json
 
 
-class Manager(object):
+def _get_timeline_index_definition(number_of_shards, number_of_replicas):
     """
-    The Manager class handles all activity feed operations.
+    Constructs the Timeline index with a given number of shards and replicas. The timeline holds the feeds
+    materialized at write time (fan-out-on-write): one document per activity and follower.
+    :param number_of_shards: Number of shards for the timeline index.
+    :param number_of_replicas: Number of replicas for the timeline index.
 
-    By default it talks to ElasticSearch. Pass ``backend="opensearch"`` to use OpenSearch instead (requires
-    the ``opensearch-py`` package), or inject a pre-built client via ``connection`` (useful for AWS Lambda or
-    custom TLS/auth). ElasticSearch behaviour is unchanged regardless of these additions.
+    The index has the following parts:
+         owner: Single word. The actor who's feed the activity belongs to.
+         via: Array of IDs. The linked actors and objects that brought the activity to the owner.
+         feed_id: The ID of the activity in the feed index.
+         published: Date when the activity was published. Stored in ISO 8601 format.
+         activity: A copy of the activity as stored in the feed index.
+                   IMPORTANT NOTE: This field is "non-analyzable" which means that ES does not perform any
+                   operations on it thus it cannot be used to order, aggregate, or filter query results.
+
+    :return: A JSON object with the definition of the Timeline index.
     """
+    _json = {
+        "settings": {
+            "index": {
+                "number_of_shards": number_of_shards,
+                "number_of_replicas": number_of_replicas,
+            }
+        },
+        "mappings": {
+            "properties": {
+                "owner": {"type": "keyword"},
+                "via": {"type": "keyword"},
+                "feed_id": {"type": "keyword"},
+                "published": {"type": "date"},
+                "activity": {"type": "object", "enabled": "false"},
+            }
+        },
+    }
+    return _json
 
-    def create_connection(self):
+
+class BaseManager(object):
+    """
+    What Manager and AsyncManager share: their options, the keys of their caches and the construction of the
+    feed queries. Nothing here sends a request, so the two managers only differ in how they talk to the backend.
+    """
+
+    def _set_options(
+        self,
+        backend,
+        feed_index,
+        network_index,
+        host,
+        port,
+        user_name,
+        user_password,
+        scheme,
+        url_prefix,
+        use_ssl,
+        max_link_size,
+        backend_name,
+        serializer,
+        link_id_strategy,
+        network_cache,
+        query_cache,
+        feed_cache,
+        cache_hold,
+        network_lookup,
+        timeline_index,
+        fanout_threshold,
+        instrumentation,
+        feed_partitioning,
+        feed_retention,
+        feed_mapping,
+    ):
         """
-        Creates a connection to the configured backend and pings it.
-        :return: A tested (pinged) client, or None if the ping fails
+        Stores and checks the options of the constructors. See Manager for their meaning
+        :param backend: The backend adapter built from backend_name and serializer
+        """
+        self.host = host
+        self.port = port
+        self.user_name = user_name
+        self.user_password = user_password
+        self.scheme = scheme
+        self.url_prefix = url_prefix
+        self.use_ssl = use_ssl
+        self.feed_index = feed_index
+        self.network_index = network_index
+        self._max_link_size = max_link_size
+        self.backend = backend_name
+        self.serializer = serializer
+        self._backend = backend
+        if link_id_strategy not in _LINK_ID_STRATEGIES:
+            raise ValueError(
+                "Unknown link id strategy '%s'. Choose from: %s"
+                % (link_id_strategy, list(_LINK_ID_STRATEGIES))
+            )
+        self.link_id_strategy = link_id_strategy
+        self.network_cache = network_cache
+        self.query_cache = query_cache
+        self.feed_cache = feed_cache
+        if cache_hold is None:
+            cache_hold = self._backend.search_delay
+        self.cache_hold = cache_hold
+        self.network_lookup = network_lookup
+        self.timeline_index = timeline_index
+        self.fanout_threshold = fanout_threshold
+        self.instrumentation = instrumentation
+        if feed_partitioning not in _FEED_PARTITIONINGS:
+            raise ValueError(
+                "Unknown feed partitioning '%s'. Choose from: %s"
+                % (feed_partitioning, list(_FEED_PARTITIONINGS))
+            )
+        if feed_retention is not None and feed_partitioning is None:
+            raise ValueError("feed_retention needs feed_partitioning")
+        self.feed_partitioning = feed_partitioning
+        self.feed_retention = feed_retention
+        if feed_mapping not in _FEED_MAPPINGS:
+            raise ValueError(
+                "Unknown feed mapping '%s'. Choose from: %s"
+                % (feed_mapping, list(_FEED_MAPPINGS))
+            )
+        self.feed_mapping = feed_mapping
+
+    def _feed_definition(
+        self,
+        number_of_shards,
+        number_of_replicas,
+        feed_mapping,
+        feed_refresh_interval,
+        embedding_dims,
+        embedding_similarity,
+    ):
+        """
+        :return: The definition of a new feed index (or of its partitions), with the embedding field if
+                 embedding_dims is set
+        """
+        definition = _get_feed_index_definition(
+            number_of_shards, number_of_replicas, feed_mapping, feed_refresh_interval
+        )
+        if embedding_dims is not None:
+            self._backend.add_vector_field(
+                definition, "embedding", embedding_dims, embedding_similarity
+            )
+        return definition
+
+    def _client_options(self):
+        """
+        Checks the connection options
+        :return: The keyword arguments of create_client
         """
         if not isinstance(self.port, int):
             raise ValueError("Port must be an integer")
@@ -213,7 +1234,7 @@ class Manager(object):
                 raise ValueError("URL prefix must be string")
         if not isinstance(self.use_ssl, bool):
             raise ValueError("Use SSL must be boolean")
-        return self._backend.create_client(
+        return dict(
             host=self.host,
             port=self.port,
             scheme=self.scheme,
@@ -225,6 +1246,179 @@ class Manager(object):
             request_timeout=800,
         )
 
+    @property
+    def connection(self):
+        """
+        The shared backend connection (Elasticsearch or OpenSearch client, or their async versions) used by this
+        manager. None before AsyncManager.initialize()
+        :return: The backend client
+        """
+        return self._connection
+
+    @property
+    def max_link_size(self):
+        """
+        Maximum number of links to return from an actor
+        :return:
+        """
+        return self._max_link_size
+
+    @max_link_size.setter
+    def max_link_size(self, value):
+        if not isinstance(value, int):
+            raise MaxLinkError()
+        self._max_link_size = value
+
+    def _feed_write_index(self, document):
+        return _write_index(self.feed_index, self.feed_partitioning, document)
+
+    def _narrow_feed_index(self, aggregator):
+        """
+        With feed_partitioning, points an aggregator whose query is set at the partitions that overlap its
+        published_range. Drops the query when none can.
+        :param aggregator: Aggregator class
+        """
+        if self.feed_partitioning is None or aggregator.query_dict is None:
+            return
+        index = _partitions_expression(self.feed_index, *aggregator.published_range())
+        if index is None:
+            aggregator.query_dict = None
+        else:
+            aggregator.feed_index = index
+
+    def get_search_dict(self, actor_id):
+        """
+        Constructs a search that will be used to search for the network of actor_id
+        :param actor_id: The actor to search for its network links
+        :return: A dict that will be passed to the backend
+        """
+        _dict = {
+            "size": self.max_link_size,
+            "query": {"bool": {"must": {"term": {"actor_id": actor_id}}}},
+            "sort": [{"linked": {"order": "desc"}}],
+        }
+        return _dict
+
+    def _network_cache_key(self, actor_id):
+        return "network:%s:%s" % (self.max_link_size, actor_id)
+
+    def _links_invalidated(self, link_objects):
+        """
+        Drops the cached networks, queries and feeds of the actors of some links that were stored or removed
+        :param link_objects: The Link objects
+        """
+        actor_ids = set(link.actor_id for link in link_objects)
+        if self.network_cache is not None:
+            for actor_id in actor_ids:
+                _invalidate(
+                    self.network_cache,
+                    "network",
+                    actor_id,
+                    self._network_cache_key(actor_id),
+                    self.cache_hold,
+                )
+        if self.query_cache is not None:
+            for actor_id in actor_ids:
+                _invalidate(
+                    self.query_cache,
+                    "query",
+                    actor_id,
+                    _cache_version_key("query", actor_id),
+                    self.cache_hold,
+                )
+        self._feeds_invalidated(actor_ids)
+
+    def _feeds_invalidated(self, actor_ids):
+        """
+        Drops the cached feeds of some actors. Does nothing without a feed cache
+        :param actor_ids: The actor ids
+        """
+        if self.feed_cache is None:
+            return
+        for actor_id in actor_ids:
+            _invalidate(
+                self.feed_cache,
+                "feed",
+                actor_id,
+                _cache_version_key("feed", actor_id),
+                self.cache_hold,
+            )
+
+    def _feed_cache_key(self, aggregator):
+        """
+        :param aggregator: Aggregator class
+        :return: The key of the result of an aggregator in the feed cache, or None without a feed cache or when
+                 the aggregator cannot be cached (see BaseAggregator.feed_cacheable)
+        """
+        if self.feed_cache is None or not aggregator.feed_cacheable:
+            return None
+        return _cache_key(
+            self.feed_cache, "feed", self.feed_index, self.max_link_size, aggregator
+        )
+
+    def _cached_query(self, aggregator):
+        """
+        Looks an aggregator up in the query cache
+        :param aggregator: Aggregator class
+        :return: Tuple (key, compiled). key is None without a query cache and compiled is None when the query is
+                 not cached
+        """
+        if self.query_cache is None:
+            return None, None
+        key = _cache_key(
+            self.query_cache, "query", self.feed_index, self.max_link_size, aggregator
+        )
+        return key, self.query_cache.get(key)
+
+    def _compile_query(self, aggregator, key):
+        """
+        Builds the feed query of an aggregator from its network: set_query_dict, the feed partitions to read and
+        set_aggregation_section. Stores it in the query cache under key, unless key is None
+        :param aggregator: Aggregator class
+        :param key: The key returned by _cached_query
+        """
+        aggregator.set_query_dict()
+        self._narrow_feed_index(aggregator)
+        if aggregator.query_dict is not None:
+            aggregator.set_aggregation_section()
+        if key is not None and not _cache_held(
+            self.query_cache, "query", aggregator.actor_id
+        ):
+            self.query_cache.set(key, _compiled_query(aggregator))
+
+    def _prepare_aggregator(self, aggregator):
+        """
+        Gives an aggregator the connection and the indices of this manager
+        :param aggregator: Aggregator class
+        """
+        if not isinstance(aggregator, BaseAggregator):
+            raise AggregatorObjectError()
+        aggregator.connection = self._connection
+        aggregator.feed_index = self.feed_index
+        aggregator.network_index = self.network_index
+        aggregator.backend = self._backend
+        if isinstance(aggregator, MaterializedFeedAggregator):
+            if self.timeline_index is None:
+                raise TimelineIndexError()
+            aggregator.timeline_index = self.timeline_index
+
+
+class Manager(BaseManager):
+    """
+    The Manager class handles all activity feed operations.
+
+    By default it talks to ElasticSearch. Pass ``backend="opensearch"`` to use OpenSearch instead (requires
+    the ``opensearch-py`` package), or inject a pre-built client via ``connection`` (useful for AWS Lambda or
+    custom TLS/auth). ElasticSearch behaviour is unchanged regardless of these additions.
+    """
+
+    def create_connection(self):
+        """
+        Creates a connection to the configured backend and pings it.
+        :return: A tested (pinged) client, or None if the ping fails
+        """
+        return self._backend.create_client(**self._client_options())
+
     def __init__(
         self,
         feed_index="feeds",
@@ -247,6 +1441,23 @@ class Manager(object):
         max_link_size=1000,
         backend="elasticsearch",
         connection=None,
+        link_id_strategy="uuid",
+        network_cache=None,
+        query_cache=None,
+        feed_cache=None,
+        cache_hold=None,
+        network_lookup=False,
+        timeline_index=None,
+        fanout_threshold=10000,
+        number_of_shards_in_timeline=5,
+        number_of_replicas_in_timeline=1,
+        delete_timeline_if_exists=False,
+        instrumentation=None,
+        feed_partitioning=None,
+        feed_retention=None,
+        feed_mapping="default",
+        feed_refresh_interval=None,
+        serializer="json",
     ):
         """
         The constructor of the Manager. It creates the feeds and network indices if they don't exist. See
@@ -270,22 +1481,117 @@ class Manager(object):
         :param embedding_similarity: Similarity metric for the embedding field ("cosine", "dot_product",
                                      "l2_norm"). "cosine" by default. Only used when embedding_dims is set.
         :param max_link_size: Maximum number of links to fetch from an actor
-        :param backend: Which backend to use: "elasticsearch" (default) or "opensearch".
-        :param connection: Optional pre-built client to use instead of creating one (e.g. for AWS Lambda or
-                           custom TLS/auth). When provided it must match ``backend``.
-        """
-        self.host = host
-        self.port = port
-        self.user_name = user_name
-        self.user_password = user_password
-        self.scheme = scheme
-        self.url_prefix = url_prefix
-        self.use_ssl = use_ssl
-        self.feed_index = feed_index
-        self.network_index = network_index
-        self._max_link_size = max_link_size
-        self.backend = backend
-        self._backend = get_backend(backend)
+        :param backend: Which backend to use: "elasticsearch" (default), "opensearch" or "memory" (an
+                        in-process store for tests and benchmarks, see elasticfeeds.memory).
+        :param connection: Optional pre-built client to use instead of creating one (e.g. for AWS Lambda or
+                           custom TLS/auth). When provided it must match ``backend``.
+        :param link_id_strategy: How network links get their document ids. "uuid" (default) gives each link a
+                                 random id and checks for duplicates with a search before writing. "hash" uses
+                                 Link.get_id() (a hash of the link key), so duplicates are rejected by the
+                                 backend on write (op_type=create) and links are removed by id. Links stored
+                                 with "uuid" ids cannot be found by id, so pick "hash" for new networks.
+        :param network_cache: Optional cache (see elasticfeeds.caches) consulted by get_network before the
+                              network index, e.g. LRUCache(max_size=10000, ttl=60). Link changes made through
+                              this manager invalidate the affected actor. Changes made by other processes are
+                              seen once the entry expires, unless the cache is shared by all of them. None by
+                              default (no caching).
+        :param query_cache: Optional cache (see elasticfeeds.caches) of the compiled feed queries, keyed on the
+                            aggregator class and parameters, the actor and a version of its network. When
+                            get_feeds / get_feeds_many find the query of an aggregator there, they skip loading
+                            the network and building the query. Link changes made through this manager
+                            invalidate the actor's queries. A query may also depend on the current time (the
+                            exact_since_window of network_filter = "terms"), so give the cache a ttl. It can be
+                            the network cache. None by default (no caching).
+        :param feed_cache: Optional cache (see elasticfeeds.caches) of the results of get_feeds / get_feeds_many,
+                           keyed on the aggregator class and parameters (result_size, result_from, order,
+                           top_hits_size, year, search_after, ...) and a version per actor, e.g.
+                           LRUCache(max_size=10000, ttl=30). Adding activities through this manager replaces
+                           the version of every actor linked to their actors, objects or targets, and link
+                           changes replace the version of the actor who owns them. Activities added by other processes or with
+                           load_activity_feeds are seen once the entry expires. None by default (no caching).
+        :param cache_hold: Seconds after an invalidation during which the network, query and feed caches do not
+                           store new entries of the actor. Until the indices are refreshed a search may not see
+                           the write yet, and its result would otherwise stay cached until it expires. Set it
+                           to the refresh interval of the indices when it is longer (e.g. with
+                           feed_refresh_interval). None by default: the backend's default refresh interval
+                           (1 second, or 0 for the "memory" backend, whose writes are searchable at once)
+        :param network_lookup: When True, every link change made through this manager also updates a lookup
+                               document per actor in the network index, listing the ids of the actors and
+                               objects it is linked to. Aggregators with network_filter = "lookup" query
+                               against it, so get_feeds does not need to load the network first. Use
+                               rebuild_network_lookup to create it for links that already exist. False by
+                               default.
+        :param timeline_index: The name of the timeline index. When set, activities added through this manager
+                               are also copied to the timeline of every follower (fan-out-on-write) and the
+                               MaterializedFeedAggregator reads them back with a single term query. None by
+                               default (feeds are composed at read time only).
+        :param fanout_threshold: Activities reaching more followers than this are not copied to the timelines;
+                                 they are read from the feed index instead (fan-out-on-read). 10000 by default
+        :param number_of_shards_in_timeline: Number of shards for the timeline index. 5 by default
+        :param number_of_replicas_in_timeline: Number of replicas for the timeline index. 1 by default
+        :param delete_timeline_if_exists: Delete the timeline index if already exist. False by default
+        :param instrumentation: Optional instrumentation (see elasticfeeds.instrumentation) told about every
+                                call, with the duration of each of its phases, the request and response sizes,
+                                the server-side took, the hits and the network size, e.g.
+                                MetricsInstrumentation() or LoggingInstrumentation(threshold=0.5). None by
+                                default (no overhead).
+        :param feed_partitioning: None (default) keeps a single feed index. "monthly" stores the activities in
+                                  one index per month of their published date ("feeds-2024.05"), created from
+                                  an index template that adds them to an alias named after the feed index. Every
+                                  read goes through the alias, and get_feeds reads only the partitions that
+                                  overlap the actor's network (see BaseAggregator.published_range), so old,
+                                  cold months are skipped. Shards are sized per month, not for the whole
+                                  history. Do not name other indices "<feed_index>-...".
+        :param feed_retention: Only with feed_partitioning. When set (e.g. "400d") a lifecycle policy (ILM on
+                               ElasticSearch, ISM on OpenSearch) deletes each partition once it is this old.
+                               The age counts from the creation of the partition, i.e. the first activity of
+                               its month that was written. None by default (partitions are kept).
+        :param feed_mapping: The mapping profile of a new feed index. "default" or "tuned": the index is sorted
+                             by published date (newest first) so chronological reads can stop early, fields
+                             that are never searched are not indexed, and the embedding vector is not kept in
+                             _source (updating or reindexing an activity drops it). Only applied when the
+                             index (or the template of the partitions) is created. With "tuned",
+                             published_date, published_month and feed_id keep only their doc values: the
+                             aggregators bucket and sort on them, but a term or range query on them fails with
+                             a mapping error on clusters that cannot search doc values, so filter on published
+                             (or add indexed fields) instead. "default" by default
+        :param feed_refresh_interval: Optional refresh interval of a new feed index, e.g. "30s". A longer
+                                      interval makes writes cheaper, but activities take longer to appear in
+                                      the feeds. None by default (the backend's default, 1s)
+        :param serializer: The JSON serializer of the client: "json" (default) keeps the client's own, "orjson"
+                           gives it one that encodes and decodes with orjson (pip install
+                           elasticfeeds[orjson], see elasticfeeds.serializers) and writes the activities with
+                           native dates (Activity.get_dict(native_dates=True)). A pre-built ``connection``
+                           keeps its serializer, so build it with
+                           get_backend(backend, "orjson").client_serializer() to select "orjson" with one.
+        """
+        self._set_options(
+            get_backend(backend, serializer),
+            feed_index,
+            network_index,
+            host,
+            port,
+            user_name,
+            user_password,
+            scheme,
+            url_prefix,
+            use_ssl,
+            max_link_size,
+            backend,
+            serializer,
+            link_id_strategy,
+            network_cache,
+            query_cache,
+            feed_cache,
+            cache_hold,
+            network_lookup,
+            timeline_index,
+            fanout_threshold,
+            instrumentation,
+            feed_partitioning,
+            feed_retention,
+            feed_mapping,
+        )
 
         # A single, long-lived connection is created here and reused for every operation. The client maintains
         # its own connection pool and is safe to share, so re-creating it per call is wasteful. A pre-built
@@ -297,14 +1603,18 @@ class Manager(object):
             if self._connection is None:
                 raise ElasticFeedConnectionError()
 
-        feed_definition = _get_feed_index_definition(
-            number_of_shards_in_feeds, number_of_replicas_in_feeds
+        feed_definition = self._feed_definition(
+            number_of_shards_in_feeds,
+            number_of_replicas_in_feeds,
+            feed_mapping,
+            feed_refresh_interval,
+            embedding_dims,
+            embedding_similarity,
         )
-        if embedding_dims is not None:
-            self._backend.add_vector_field(
-                feed_definition, "embedding", embedding_dims, embedding_similarity
-            )
-        self._ensure_index(feed_index, feed_definition, delete_feeds_if_exists)
+        if feed_partitioning is None:
+            self._ensure_index(feed_index, feed_definition, delete_feeds_if_exists)
+        else:
+            self._ensure_feed_partitions(feed_definition, delete_feeds_if_exists)
         self._ensure_index(
             network_index,
             _get_network_index_definition(
@@ -312,6 +1622,14 @@ class Manager(object):
             ),
             delete_network_if_exists,
         )
+        if timeline_index is not None:
+            self._ensure_index(
+                timeline_index,
+                _get_timeline_index_definition(
+                    number_of_shards_in_timeline, number_of_replicas_in_timeline
+                ),
+                delete_timeline_if_exists,
+            )
 
     def _ensure_index(self, index_name, definition, delete_if_exists):
         """
@@ -328,34 +1646,63 @@ class Manager(object):
                 return
         self._backend.create_index(self._connection, index_name, definition)
 
-    @property
-    def connection(self):
-        """
-        The shared backend connection (Elasticsearch or OpenSearch client) used by this manager.
-        :return: The backend client
-        """
-        return self._connection
-
-    @property
-    def max_link_size(self):
+    def _ensure_feed_partitions(self, definition, delete_if_exists):
         """
-        Maximum number of links to return from an actor
-        :return:
+        The _ensure_index of a partitioned feed index. Creates the index template of the partitions (with the
+        retention policy) if it does not exist, and the partition of the current month if there is none yet, so
+        the alias exists before the first activity is written. If the template exists and ``delete_if_exists``
+        is True the partitions and the template are dropped and recreated.
+        :param definition: Dict with the "settings" and "mappings" of every partition
+        :param delete_if_exists: Whether to drop and recreate existing partitions
         """
-        return self._max_link_size
+        patterns = [self.feed_index + "-*"]
+        exists = self._backend.index_template_exists(self._connection, self.feed_index)
+        if exists and delete_if_exists:
+            self._delete_feed_partitions()
+            self._backend.delete_index_template(self._connection, self.feed_index)
+            exists = False
+        if not exists:
+            if self.feed_retention is not None:
+                policy = self.feed_index + "-retention"
+                self._backend.put_retention_policy(
+                    self._connection, policy, patterns, self.feed_retention
+                )
+                self._backend.add_lifecycle_policy(definition, policy)
+            self._backend.put_index_template(
+                self._connection,
+                self.feed_index,
+                patterns,
+                definition,
+                [self.feed_index],
+            )
+        if self._backend.alias_indices(self._connection, self.feed_index):
+            return
+        if self._backend.index_exists(self._connection, self.feed_index):
+            raise ValueError(
+                "The index '%s' is not partitioned. Its name is needed for the alias of the partitions"
+                % self.feed_index
+            )
+        today = datetime.date.today()
+        self._backend.create_index(
+            self._connection,
+            _partition_name(self.feed_index, today.year, today.month),
+            {"settings": {}, "mappings": {}},
+        )
 
-    @max_link_size.setter
-    def max_link_size(self, value):
-        if not isinstance(value, int):
-            raise MaxLinkError()
-        self._max_link_size = value
+    def _delete_feed_partitions(self):
+        partitions = self._backend.alias_indices(self._connection, self.feed_index)
+        if partitions:
+            self._backend.delete_index(self._connection, ",".join(partitions))
 
     def delete_feeds_index(self):
         """
-        Deletes the feed index
+        Deletes the feed index (with feed_partitioning, all its partitions)
         :return: True if the index was deleted successfully
         """
-        self._backend.delete_index(self._connection, self.feed_index)
+        if self.feed_partitioning is not None:
+            self._delete_feed_partitions()
+        else:
+            self._backend.delete_index(self._connection, self.feed_index)
         return True
 
     def delete_network_index(self):
@@ -366,6 +1713,16 @@ class Manager(object):
         self._backend.delete_index(self._connection, self.network_index)
         return True
 
+    def delete_timeline_index(self):
+        """
+        Deletes the timeline index
+        :return: True if the index was deleted successfully
+        """
+        if self.timeline_index is None:
+            raise TimelineIndexError()
+        self._backend.delete_index(self._connection, self.timeline_index)
+        return True
+
     def link_network_exists(self, link_object):
         """
         Check whether a link object already exists in the network index
@@ -374,6 +1731,10 @@ class Manager(object):
         """
         if not isinstance(link_object, Link):
             raise LinkObjectError()
+        if self.link_id_strategy == "hash":
+            return self._backend.document_exists(
+                self._connection, self.network_index, link_object.get_id()
+            )
         res = self._backend.search(
             self._connection, self.network_index, link_object.get_search_dict()
         )
@@ -389,14 +1750,39 @@ class Manager(object):
         """
         if not isinstance(link_object, Link):
             raise LinkObjectError()
-        if not self.link_network_exists(link_object):
+        with start_operation(
+            self.instrumentation, "add_network_link", actor_id=link_object.actor_id
+        ) as operation:
+            if self.link_id_strategy == "hash":
+                # The backend rejects a duplicate id, so no search is needed before the write
+                link_id = link_object.get_id()
+                with operation.phase("write"):
+                    created = self._backend.create_document(
+                        self._connection,
+                        self.network_index,
+                        link_id,
+                        link_object.get_dict(),
+                    )
+                if not created:
+                    raise LinkExistError()
+                with operation.phase("network_changed"):
+                    self._network_changed([link_object])
+                return link_id
+            with operation.phase("exists"):
+                exists = self.link_network_exists(link_object)
+            if exists:
+                raise LinkExistError()
             unique_id = str(uuid.uuid4())
-            self._backend.index_document(
-                self._connection, self.network_index, unique_id, link_object.get_dict()
-            )
+            with operation.phase("write"):
+                self._backend.index_document(
+                    self._connection,
+                    self.network_index,
+                    unique_id,
+                    link_object.get_dict(),
+                )
+            with operation.phase("network_changed"):
+                self._network_changed([link_object])
             return unique_id
-        else:
-            raise LinkExistError()
 
     def remove_network_link(self, link_object):
         """
@@ -406,13 +1792,179 @@ class Manager(object):
         """
         if not isinstance(link_object, Link):
             raise LinkObjectError()
-        if self.link_network_exists(link_object):
-            self._backend.delete_by_query(
-                self._connection, self.network_index, link_object.get_search_dict()
-            )
+        with start_operation(
+            self.instrumentation, "remove_network_link", actor_id=link_object.actor_id
+        ) as operation:
+            if self.link_id_strategy == "hash":
+                with operation.phase("write"):
+                    deleted = self._backend.delete_document(
+                        self._connection, self.network_index, link_object.get_id()
+                    )
+                if not deleted:
+                    raise LinkNotExistError()
+            else:
+                with operation.phase("search"):
+                    doc_ids = self._network_link_ids([link_object]).get(
+                        link_object.get_key()
+                    )
+                if not doc_ids:
+                    raise LinkNotExistError()
+                with operation.phase("write"):
+                    self._delete_network_documents(doc_ids)
+            with operation.phase("network_changed"):
+                self._network_changed([link_object], removed=True)
             return True
-        else:
-            raise LinkNotExistError()
+
+    def _network_link_ids(self, link_objects):
+        """
+        Resolves the document ids of a batch of links with a single search. The hits both prove that a link
+        exists and give the ids needed to delete it, so no separate existence check is needed.
+        :param link_objects: List of Link objects
+        :return: Dict mapping Link.get_key() to the list of document ids stored for that link
+        """
+        res = self._backend.search(
+            self._connection,
+            self.network_index,
+            _link_ids_query(link_objects, self.max_link_size),
+        )
+        return _link_ids_from_result(res)
+
+    def _delete_network_documents(self, doc_ids):
+        """
+        Deletes network documents by id: a single delete for one id, one _bulk request for many.
+        :param doc_ids: List of document ids
+        :return: A tuple (ids, failures) as returned by BaseBackend.bulk_delete
+        """
+        if len(doc_ids) == 1:
+            if self._backend.delete_document(
+                self._connection, self.network_index, doc_ids[0]
+            ):
+                return doc_ids, []
+            return [], [{"id": doc_ids[0], "status": 404, "error": "not_found"}]
+        return self._backend.bulk_delete(self._connection, self.network_index, doc_ids)
+
+    def _links_exist(self, link_objects):
+        """
+        Checks which of a batch of links already exist in the network index with a single request
+        :param link_objects: List of Link objects
+        :return: List of booleans, one per link
+        """
+        res = self._backend.search(
+            self._connection, self.network_index, _links_exist_query(link_objects)
+        )
+        return _links_exist_from_result(res, len(link_objects))
+
+    def add_network_links(self, link_objects):
+        """
+        Adds many links to the network index. Existence is checked for the whole batch in one request and the
+        new links are written in one _bulk request, instead of two round trips per link.
+        :param link_objects: List of Link objects
+        :return: Dict with the keys:
+            ids: The unique IDs given to the links that were added
+            existing: The Link objects that were skipped because they already exist (or repeat in the batch)
+            failures: A dict with "id", "status" and "error" for every link that was rejected
+        """
+        link_objects = _link_objects(link_objects)
+        if not link_objects:
+            return {"ids": [], "existing": [], "failures": []}
+        with start_operation(
+            self.instrumentation, "add_network_links", links=len(link_objects)
+        ) as operation:
+            with operation.phase("write"):
+                if self.link_id_strategy == "hash":
+                    result, stored = self._add_network_links_by_id(link_objects)
+                else:
+                    result, stored = self._add_network_links_by_search(link_objects)
+            with operation.phase("network_changed"):
+                self._network_changed(stored)
+            operation.set(
+                items=len(result["ids"]),
+                existing=len(result["existing"]),
+                failures=len(result["failures"]),
+            )
+            return result
+
+    def _add_network_links_by_search(self, link_objects):
+        """
+        add_network_links for the "uuid" id strategy: one existence check for the batch and one _bulk request.
+        :return: A tuple (result, stored): the result of add_network_links and the Link objects that were stored
+        """
+        existing, by_id, documents = _new_link_documents(
+            link_objects, "uuid", self._links_exist(link_objects)
+        )
+        ids, failures = self._backend.bulk_index(
+            self._connection, self.network_index, documents
+        )
+        return _added_links(existing, by_id, ids, failures)
+
+    def _add_network_links_by_id(self, link_objects):
+        """
+        add_network_links for the "hash" id strategy: a single _bulk create request. Links that already exist
+        are rejected by the backend (status 409), so no existence check is needed.
+        :return: A tuple (result, stored): the result of add_network_links and the Link objects that were stored
+        """
+        existing, by_id, documents = _new_link_documents(link_objects, "hash")
+        ids, failures = self._backend.bulk_index(
+            self._connection, self.network_index, documents, op_type="create"
+        )
+        return _added_links(existing, by_id, ids, failures)
+
+    def _remove_network_links_by_id(self, link_objects):
+        """
+        remove_network_links for the "hash" id strategy: a single _bulk delete request by id.
+        """
+        by_id = {}
+        for link_object in link_objects:
+            by_id.setdefault(link_object.get_id(), link_object)
+        ids, failures = self._backend.bulk_delete(
+            self._connection, self.network_index, list(by_id)
+        )
+        return _removed_links_by_id(by_id, ids, failures)
+
+    def remove_network_links(self, link_objects):
+        """
+        Removes many links from the network. The document ids of the whole batch are resolved in one search
+        and the existing links are then deleted by id in one request.
+        :param link_objects: List of Link objects
+        :return: Dict with the keys:
+            removed: The Link objects that were removed
+            missing: The Link objects that were not found in the network
+            failures: A dict with "id", "status" and "error" for every link that could not be removed
+        """
+        link_objects = _link_objects(link_objects)
+        if not link_objects:
+            return {"removed": [], "missing": [], "failures": []}
+        with start_operation(
+            self.instrumentation, "remove_network_links", links=len(link_objects)
+        ) as operation:
+            with operation.phase("write"):
+                if self.link_id_strategy == "hash":
+                    result = self._remove_network_links_by_id(link_objects)
+                else:
+                    result = self._remove_network_links_by_search(link_objects)
+            with operation.phase("network_changed"):
+                self._network_changed(result["removed"], removed=True)
+            operation.set(
+                items=len(result["removed"]),
+                missing=len(result["missing"]),
+                failures=len(result["failures"]),
+            )
+            return result
+
+    def _remove_network_links_by_search(self, link_objects):
+        """
+        remove_network_links for the "uuid" id strategy: one search resolves the ids, one request deletes them.
+        """
+        by_key = {}
+        for link_object in link_objects:
+            by_key.setdefault(link_object.get_key(), link_object)
+        found = self._network_link_ids(list(by_key.values()))
+        result, doc_ids = _removed_links_by_key(by_key, found)
+        if doc_ids:
+            ids, failures = self._delete_network_documents(doc_ids)
+            # A 404 here means a concurrent removal got there first, which is still a removal
+            result["failures"] = [f for f in failures if f["status"] != 404]
+        return result
 
     def follow(
         self,
@@ -482,33 +2034,458 @@ class Manager(object):
         if not isinstance(activity_object, Activity):
             raise ActivityObjectError()
         unique_id = str(uuid.uuid4())
-        document = activity_object.get_dict()
+        document = activity_object.get_dict(native_dates=self._backend.native_dates)
         # Store the id inside the document too so it can be used as a stable tie-breaker for
         # cursor (search_after) pagination without relying on _id fielddata.
         document["feed_id"] = unique_id
-        self._backend.index_document(
-            self._connection, self.feed_index, unique_id, document
+        with start_operation(
+            self.instrumentation,
+            "add_activity_feed",
+            actor_id=document["actor"]["id"],
+        ) as operation:
+            followers = None
+            if self.timeline_index is not None:
+                with operation.phase("followers") as phase:
+                    followers = self._prepare_fan_out(document)
+                    phase.set(followers=len(followers) if followers else 0)
+            with operation.phase("index") as phase:
+                if phase.measure_sizes:
+                    phase.set(request_bytes=body_size(document))
+                self._backend.index_document(
+                    self._connection,
+                    self._feed_write_index(document),
+                    unique_id,
+                    document,
+                )
+            if followers:
+                with operation.phase("fan_out"):
+                    self._fan_out([(unique_id, document, followers)])
+            if self.feed_cache is not None:
+                with operation.phase("invalidate"):
+                    self._feeds_changed([document], followers)
+            return unique_id
+
+    def _followers(self, document):
+        """
+        Finds the actors that receive an activity in their feed: the ones following its actor or watching its
+        object or target since before it was published. Uses a single search with a terms aggregation.
+        :param document: The activity document
+        :return: Dict mapping each follower ID to the list of linked IDs that bring them the activity, or None
+                 when there are more than fanout_threshold followers
+        """
+        es_result = self._backend.search(
+            self._connection,
+            self.network_index,
+            _followers_query(document, self.fanout_threshold),
         )
-        return unique_id
+        return _followers_from_result(es_result, self.fanout_threshold)
 
-    def get_search_dict(self, actor_id):
+    def _prepare_fan_out(self, document):
         """
-        Constructs a search that will be used to search for the network of actor_id
-        :param actor_id: The actor to search for its network links
-        :return: A dict that will be passed to the backend
+        Decides whether an activity is fanned out and marks its document accordingly. Does nothing without a
+        timeline index.
+        :param document: The activity document. Its "fanned_out" field is set
+        :return: The followers of the activity (see _followers), or None if it is read at read time
         """
-        _dict = {
-            "size": self.max_link_size,
-            "query": {"bool": {"must": {"term": {"actor_id": actor_id}}}},
-            "sort": [{"linked": {"order": "desc"}}],
+        if self.timeline_index is None:
+            return None
+        followers = self._followers(document)
+        # An activity nobody receives yet is read from the feed index, like the ones with too many followers
+        document["fanned_out"] = bool(followers)
+        return followers
+
+    def _prepare_fan_outs(self, documents):
+        """
+        _prepare_fan_out for many activities: their followers are found with a single _msearch request
+        :param documents: List of activity documents. Their "fanned_out" field is set
+        :return: List with the followers of each activity (see _followers), in the same order
+        """
+        responses = self._backend.search_many(
+            self._connection,
+            [
+                (self.network_index, _followers_query(document, self.fanout_threshold))
+                for document in documents
+            ],
+        )
+        result = []
+        for document, es_result in zip(documents, responses):
+            followers = _followers_from_result(es_result, self.fanout_threshold)
+            document["fanned_out"] = bool(followers)
+            result.append(followers)
+        return result
+
+    def _fan_out(self, activities):
+        """
+        Copies activities to the timelines of their followers with _bulk requests
+        :param activities: List of (feed_id, document, followers) tuples
+        :return: List of failures (see BaseBackend.bulk_index)
+        """
+        failures = []
+        for chunk in _chunk_documents(
+            _timeline_documents(activities),
+            500,
+            10 * 1024 * 1024,
+            self._backend.document_size,
+        ):
+            _, chunk_failures = self._backend.bulk_index(
+                self._connection, self.timeline_index, chunk
+            )
+            failures.extend(chunk_failures)
+        return failures
+
+    def _activity_documents(self, activity_objects):
+        """
+        Turns activities into (doc_id, document) pairs ready to be indexed, giving each a new unique id.
+        :param activity_objects: Iterable of Activity objects
+        :return: Generator of (doc_id, document) tuples
+        """
+        for activity_object in activity_objects:
+            if not isinstance(activity_object, Activity):
+                raise ActivityObjectError()
+            unique_id = str(uuid.uuid4())
+            document = activity_object.get_dict(native_dates=self._backend.native_dates)
+            document["feed_id"] = unique_id
+            yield unique_id, document
+
+    def add_activity_feeds(
+        self, activity_objects, chunk_size=500, max_bytes=10 * 1024 * 1024
+    ):
+        """
+        Adds many activities to the feed index using chunked _bulk requests instead of one request per
+        activity. The activities are consumed lazily, so a generator over a large import can be passed directly.
+        With a timeline index, the followers of the activities of a chunk are found with one _msearch request.
+        :param activity_objects: Iterable of Activity objects
+        :param chunk_size: Maximum number of activities per _bulk request. 500 by default
+        :param max_bytes: Maximum approximate size of a _bulk request in bytes. 10MB by default
+        :return: Dict with the keys:
+            ids: The unique IDs given to the activities that were stored
+            failures: A dict with "id", "status" and "error" for every activity that was rejected. With a
+                      timeline index it also lists the timeline copies that were rejected
+                      (id = "follower:activity_id")
+        """
+        result = {"ids": [], "failures": []}
+        with start_operation(self.instrumentation, "add_activity_feeds") as operation:
+            for chunk in _chunk_documents(
+                self._activity_documents(activity_objects),
+                chunk_size,
+                max_bytes,
+                self._backend.document_size,
+            ):
+                followers = {}
+                if self.timeline_index is not None:
+                    with operation.phase("followers", items=len(chunk)) as phase:
+                        chunk_followers = self._prepare_fan_outs(
+                            [document for _, document in chunk]
+                        )
+                        for (doc_id, _), activity_followers in zip(
+                            chunk, chunk_followers
+                        ):
+                            if activity_followers:
+                                followers[doc_id] = activity_followers
+                        phase.set(
+                            followers=sum(len(value) for value in followers.values())
+                        )
+                with operation.phase("bulk", items=len(chunk)) as phase:
+                    if phase.measure_sizes:
+                        phase.set(
+                            request_bytes=sum(
+                                body_size(document) for _, document in chunk
+                            )
+                        )
+                    ids, failures = self._backend.bulk_index(
+                        self._connection, self._feed_write_index, chunk
+                    )
+                result["ids"].extend(ids)
+                result["failures"].extend(failures)
+                if self.feed_cache is not None:
+                    stored = set(ids)
+                    with operation.phase("invalidate"):
+                        self._feeds_changed(
+                            [document for doc_id, document in chunk if doc_id in stored]
+                        )
+                if followers:
+                    stored = set(ids)
+                    fan_out = []
+                    for doc_id, document in chunk:
+                        activity_followers = followers.get(doc_id)
+                        if activity_followers and doc_id in stored:
+                            fan_out.append((doc_id, document, activity_followers))
+                    if fan_out:
+                        with operation.phase("fan_out", items=len(fan_out)):
+                            result["failures"].extend(self._fan_out(fan_out))
+            operation.set(items=len(result["ids"]), failures=len(result["failures"]))
+        return result
+
+    def load_activity_feeds(
+        self,
+        activity_objects,
+        workers=4,
+        chunk_size=500,
+        max_bytes=10 * 1024 * 1024,
+        max_retries=5,
+        initial_backoff=0.5,
+        max_backoff=30,
+        progress=None,
+    ):
+        """
+        Parallel version of add_activity_feeds for large imports. Up to ``workers`` _bulk requests are kept in
+        flight at once over the shared connection. The activities are read only when a worker becomes free, so
+        memory stays flat regardless of the size of the import.
+
+        Items the cluster rejects with 429 (e.g. a full write queue) are retried with exponential backoff. Whole
+        requests rejected with 429 are retried the same way, and their items are reported as failures once the
+        retries are exhausted. Any other failure is reported and not retried.
+
+        Imported activities are not copied to the timelines (see Manager(timeline_index=...)). They are not
+        marked as fanned out, so a hybrid MaterializedFeedAggregator still reads them from the feed index.
+
+        :param activity_objects: Iterable of Activity objects. A generator is consumed lazily
+        :param workers: Maximum number of _bulk requests in flight. 4 by default
+        :param chunk_size: Maximum number of activities per _bulk request. 500 by default
+        :param max_bytes: Maximum approximate size of a _bulk request in bytes. 10MB by default
+        :param max_retries: How many times rejected items are retried before being reported as failures
+        :param initial_backoff: Seconds to wait before the first retry. Doubled on every retry
+        :param max_backoff: Maximum number of seconds to wait between retries
+        :param progress: Optional callable. Called with a copy of the counters after every _bulk request
+        :return: Dict with the keys:
+            indexed: Number of activities stored
+            failed: Number of activities that could not be stored
+            retried: Number of activity writes that were retried
+            requests: Number of _bulk requests sent
+            failures: A dict with "id", "status" and "error" for every activity that could not be stored
+            elapsed: Seconds taken by the whole import
+            rate: Activities stored per second
+        """
+        stats = {
+            "indexed": 0,
+            "failed": 0,
+            "retried": 0,
+            "requests": 0,
+            "failures": [],
+            "elapsed": 0.0,
+            "rate": 0.0,
         }
-        return _dict
+        lock = threading.Lock()
+        start = time.perf_counter()
+
+        def send(chunk):
+            backoff = initial_backoff
+            attempt = 0
+            while True:
+                try:
+                    ids, failures = self._backend.bulk_index(
+                        self._connection, self._feed_write_index, chunk
+                    )
+                except Exception as e:
+                    if not _is_rejected(e):
+                        raise
+                    # Reported as failures once the retries are exhausted, so the import goes on
+                    ids, failures = [], [
+                        {"id": doc_id, "status": 429, "error": str(e)}
+                        for doc_id, _ in chunk
+                    ]
+                if attempt < max_retries:
+                    rejected = [item for item in failures if item["status"] == 429]
+                    final = [item for item in failures if item["status"] != 429]
+                else:
+                    rejected, final = [], failures
+                with lock:
+                    stats["requests"] += 1
+                    stats["indexed"] += len(ids)
+                    stats["failed"] += len(final)
+                    stats["failures"].extend(final)
+                    stats["retried"] += len(rejected)
+                    snapshot = None
+                    if progress is not None:
+                        snapshot = dict(stats, failures=list(stats["failures"]))
+                if snapshot is not None:
+                    progress(snapshot)
+                if not rejected:
+                    return
+                rejected_ids = set(item["id"] for item in rejected)
+                chunk = [pair for pair in chunk if pair[0] in rejected_ids]
+                time.sleep(min(backoff, max_backoff))
+                backoff *= 2
+                attempt += 1
+
+        # The requests overlap, so the operation has no phases: only the totals are reported
+        with start_operation(
+            self.instrumentation, "load_activity_feeds", workers=workers
+        ) as operation:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = set()
+                for chunk in _chunk_documents(
+                    self._activity_documents(activity_objects),
+                    chunk_size,
+                    max_bytes,
+                    self._backend.document_size,
+                ):
+                    if len(pending) >= workers:
+                        # Backpressure: do not read more activities until a request finishes
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    pending.add(executor.submit(send, chunk))
+                for future in pending:
+                    future.result()
+            operation.set(
+                items=stats["indexed"],
+                failures=stats["failed"],
+                retried=stats["retried"],
+                requests=stats["requests"],
+            )
+
+        stats["elapsed"] = time.perf_counter() - start
+        if stats["elapsed"] > 0:
+            stats["rate"] = stats["indexed"] / stats["elapsed"]
+        return stats
+
+    def _network_changed(self, link_objects, removed=False):
+        """
+        Called after links were stored or removed. Drops the cached networks of their actors and, when
+        network_lookup is on, updates the actors' lookup documents. With a timeline index, the fanned out
+        activities that new links bring are copied to the timelines of their actors, and the ones that removed
+        links brought are taken out. The id of a removed link stays in the lookup document and the timelines while
+        another link of the actor still references it.
+        :param link_objects: The Link objects that were stored or removed
+        :param removed: True if the links were removed
+        """
+        self._links_invalidated(link_objects)
+        if removed and (self.timeline_index is not None or self.network_lookup):
+            # The ids that another link of the same actor references stay in the timelines and lookups
+            link_objects = self._released_links(link_objects) if link_objects else []
+            if self.timeline_index is not None and link_objects:
+                self._clean_timelines(link_objects)
+        elif not removed and self.timeline_index is not None and link_objects:
+            self._backfill_timelines(link_objects)
+        if self.network_lookup and link_objects:
+            for (actor_id, field), values in _lookup_changes(link_objects).items():
+                if removed:
+                    self._backend.remove_from_set(
+                        self._connection,
+                        self.network_index,
+                        network_lookup_id(actor_id),
+                        field,
+                        values,
+                    )
+                else:
+                    self._backend.add_to_set(
+                        self._connection,
+                        self.network_index,
+                        network_lookup_id(actor_id),
+                        field,
+                        values,
+                    )
+
+    def _released_links(self, link_objects):
+        """
+        :param link_objects: List of the removed Link objects
+        :return: The removed links whose linked id no other link of their actor references
+        """
+        es_result = self._backend.search(
+            self._connection, self.network_index, _link_references_query(link_objects)
+        )
+        return _released_links(link_objects, es_result)
+
+    def _clean_timelines(self, link_objects):
+        """
+        Takes what some removed links brought out of the timelines of their actors, with targeted _bulk requests
+        :param link_objects: The removed Link objects whose linked ids no other link of their actor references
+        """
+        search_after = None
+        while True:
+            es_result = self._backend.search(
+                self._connection,
+                self.timeline_index,
+                _timeline_cleanup_query(link_objects, _CLEANUP_PAGE_SIZE, search_after),
+            )
+            hits = es_result["hits"]["hits"]
+            deletes, removals = _timeline_cleanup(es_result, link_objects)
+            self._backend.bulk_delete(self._connection, self.timeline_index, deletes)
+            self._backend.bulk_remove_from_set(
+                self._connection, self.timeline_index, "via", removals
+            )
+            if len(hits) < _CLEANUP_PAGE_SIZE:
+                return
+            search_after = hits[-1]["sort"]
+
+    def _backfill_timelines(self, link_objects):
+        """
+        Copies the fanned out activities that some new links bring into the timelines of their actors, with
+        targeted _bulk requests. Without it, an activity fanned out before a link was created would never reach
+        the new follower: the hybrid MaterializedFeedAggregator only reads the activities that were not fanned
+        out from the feed index.
+        :param link_objects: The new Link objects
+        """
+        search_after = None
+        while True:
+            es_result = self._backend.search(
+                self._connection,
+                self.feed_index,
+                _timeline_backfill_query(
+                    link_objects, _BACKFILL_PAGE_SIZE, search_after
+                ),
+            )
+            hits = es_result["hits"]["hits"]
+            self._backend.bulk_add_to_set(
+                self._connection,
+                self.timeline_index,
+                "via",
+                _timeline_backfill(es_result, link_objects),
+            )
+            if len(hits) < _BACKFILL_PAGE_SIZE:
+                return
+            search_after = hits[-1]["sort"]
+
+    def rebuild_network_lookup(self, actor_id):
+        """
+        Rewrites the lookup document of an actor from its links in the network index. Use it to create the
+        lookup documents of links that existed before network_lookup was turned on.
+        :param actor_id: The actor ID
+        :return: The lookup document
+        """
+        with start_operation(
+            self.instrumentation, "rebuild_network_lookup", actor_id=actor_id
+        ) as operation:
+            with operation.phase("search") as phase:
+                es_result = self._backend.search(
+                    self._connection, self.network_index, self.get_search_dict(actor_id)
+                )
+                phase.set(**search_stats([es_result], phase.measure_sizes))
+            document = _lookup_document(es_result)
+            with operation.phase("index"):
+                self._backend.index_document(
+                    self._connection,
+                    self.network_index,
+                    network_lookup_id(actor_id),
+                    document,
+                )
+            return document
 
     def get_network(self, actor_id):
         """
-        Creates an array of the current network.
+        Creates an array of the current network. When a network cache is configured it is consulted first.
+        :return: Dict array
+        """
+        with start_operation(
+            self.instrumentation, "get_network", actor_id=actor_id
+        ) as operation:
+            with operation.phase("network") as phase:
+                return self._load_network(actor_id, phase)
+
+    def _load_network(self, actor_id, phase):
+        """
+        get_network reporting to a phase of the running operation
+        :param actor_id: The actor ID
+        :param phase: The instrumentation Phase. Gets the cached and network_size attributes and, when the
+                      network index is searched, took_ms and hits
         :return: Dict array
         """
+        if self.network_cache is not None:
+            cached = self.network_cache.get(self._network_cache_key(actor_id))
+            if cached is not None:
+                phase.set(cached=True, network_size=len(cached))
+                return list(cached)
         result = []
         es_result = self._backend.search(
             self._connection, self.network_index, self.get_search_dict(actor_id)
@@ -516,27 +2493,391 @@ class Manager(object):
         if es_result["hits"]["total"]["value"] > 0:
             for hit in es_result["hits"]["hits"]:
                 result.append(hit["_source"])
+        if self.network_cache is not None and not _cache_held(
+            self.network_cache, "network", actor_id
+        ):
+            self.network_cache.set(self._network_cache_key(actor_id), list(result))
+        phase.set(
+            cached=False,
+            network_size=len(result),
+            **search_stats([es_result], phase.measure_sizes)
+        )
         return result
 
     def get_feeds(self, aggregator):
         """
-        Return an array of feeds. The structure of the elements will depend of the aggregator
+        Return an array of feeds. The structure of the elements will depend of the aggregator. When a feed cache
+        is configured it is consulted first.
         :param aggregator: Aggregator class
         :return: Array of feeds or empty array of the actor_id does not have any network links
         """
-        if not isinstance(aggregator, BaseAggregator):
-            raise AggregatorObjectError()
-        aggregator.connection = self._connection
-        aggregator.feed_index = self.feed_index
-        aggregator.backend = self._backend
-        aggregator.network_array = self.get_network(aggregator.actor_id)
-        aggregator.set_query_dict()
-        if aggregator.query_dict is not None:
-            aggregator.set_aggregation_section()
+        self._prepare_aggregator(aggregator)
+        with start_operation(
+            self.instrumentation,
+            "get_feeds",
+            aggregator=type(aggregator).__name__,
+            actor_id=aggregator.actor_id,
+        ) as operation:
+            feed_key = self._feed_cache_key(aggregator)
+            if feed_key is not None:
+                with operation.phase("cache") as phase:
+                    cached = self.feed_cache.get(feed_key)
+                    phase.set(cached=cached is not None)
+                if cached is not None:
+                    feeds = json.loads(cached)
+                    operation.set(results=len(feeds))
+                    return feeds
+            feeds = self._read_feeds(aggregator, operation)
+            if feed_key is not None and not _cache_held(
+                self.feed_cache, "feed", aggregator.actor_id
+            ):
+                self.feed_cache.set(feed_key, json.dumps(feeds))
+            operation.set(results=len(feeds))
+            return feeds
+
+    def _read_feeds(self, aggregator, operation):
+        """
+        get_feeds without the feed cache, reporting the network, query, search and process phases to the running
+        operation
+        :param aggregator: Aggregator class
+        :param operation: The instrumentation Operation
+        :return: Array of feeds
+        """
+        key, compiled = self._cached_query(aggregator)
+        if compiled is None:
+            if aggregator.uses_network:
+                with operation.phase("network") as phase:
+                    aggregator.network_array = self._load_network(
+                        aggregator.actor_id, phase
+                    )
+            else:
+                aggregator.network_array = []
+        with operation.phase("query") as phase:
+            if compiled is None:
+                self._compile_query(aggregator, key)
+            else:
+                _restore_compiled_query(aggregator, compiled)
+            if key is not None:
+                phase.set(cached=compiled is not None)
+            if aggregator.query_dict is not None:
+                aggregator.prepare_searches()
+                if phase.measure_sizes:
+                    phase.set(request_bytes=_searches_size(aggregator.feed_searches()))
+        if aggregator.query_dict is None:
+            return []
+        with operation.phase("search") as phase:
             aggregator.query_feeds()
+            phase.set(**search_stats(aggregator.feed_results(), phase.measure_sizes))
+        with operation.phase("process"):
             return aggregator.get_feeds()
+
+    def _feeds_changed(self, documents, followers=None):
+        """
+        Called after activities were added. Drops the cached feeds of the actors linked to their actors, objects
+        or targets. Does nothing without a feed cache.
+        :param documents: The activity documents that were stored
+        :param followers: The followers found for the fan-out of a single activity, if any. They are the actors to
+                          invalidate, so the network index is not searched again
+        """
+        if self.feed_cache is None or not documents:
+            return
+        if followers is not None:
+            self._feeds_invalidated(followers)
+            return
+        after = None
+        while True:
+            es_result = self._backend.search(
+                self._connection,
+                self.network_index,
+                _readers_query(documents, _READERS_PAGE_SIZE, after),
+            )
+            readers, after = _readers_from_result(es_result, _READERS_PAGE_SIZE)
+            self._feeds_invalidated(readers)
+            if after is None:
+                return
+
+    def get_networks(self, actor_ids):
+        """
+        Loads the networks of many actors. The ones not in the network cache are fetched with a single _msearch
+        request (one search per actor, so max_link_size applies to each actor).
+        :param actor_ids: Iterable of actor IDs
+        :return: Dict mapping each actor ID to its network (see get_network)
+        """
+        actor_ids = list(actor_ids)
+        with start_operation(
+            self.instrumentation, "get_networks", actors=len(actor_ids)
+        ) as operation:
+            with operation.phase("network") as phase:
+                return self._load_networks(actor_ids, phase)
+
+    def _load_networks(self, actor_ids, phase):
+        """
+        get_networks reporting to a phase of the running operation
+        :param actor_ids: Iterable of actor IDs
+        :param phase: The instrumentation Phase. Gets the cached and network_size (links loaded for all the
+                      actors) attributes and, when the network index is searched, took_ms and hits
+        :return: Dict mapping each actor ID to its network
+        """
+        result = {}
+        missing = []
+        for actor_id in actor_ids:
+            if actor_id in result or actor_id in missing:
+                continue
+            if self.network_cache is not None:
+                cached = self.network_cache.get(self._network_cache_key(actor_id))
+                if cached is not None:
+                    result[actor_id] = list(cached)
+                    continue
+            missing.append(actor_id)
+        responses = self._backend.search_many(
+            self._connection,
+            [
+                (self.network_index, self.get_search_dict(actor_id))
+                for actor_id in missing
+            ],
+        )
+        for actor_id, es_result in zip(missing, responses):
+            network = [hit["_source"] for hit in es_result["hits"]["hits"]]
+            if self.network_cache is not None and not _cache_held(
+                self.network_cache, "network", actor_id
+            ):
+                self.network_cache.set(self._network_cache_key(actor_id), list(network))
+            result[actor_id] = network
+        phase.set(
+            cached=len(result) - len(missing),
+            network_size=sum(len(network) for network in result.values()),
+            **search_stats(responses, phase.measure_sizes)
+        )
+        return result
+
+    def get_feeds_many(self, aggregators):
+        """
+        get_feeds for many aggregators (e.g. one per recipient of a digest) in two round trips instead of two per
+        aggregator: one _msearch loads every network (see get_networks) and a second one sends every feed query.
+        The feeds found in the feed cache, if any, are not queried.
+        :param aggregators: List of aggregator classes
+        :return: List with the result of get_feeds for each aggregator, in the same order
+        """
+        for aggregator in aggregators:
+            self._prepare_aggregator(aggregator)
+        with start_operation(
+            self.instrumentation, "get_feeds_many", aggregators=len(aggregators)
+        ) as operation:
+            feed_keys = [self._feed_cache_key(aggregator) for aggregator in aggregators]
+            feeds = {}
+            if self.feed_cache is not None:
+                with operation.phase("cache") as phase:
+                    for aggregator, feed_key in zip(aggregators, feed_keys):
+                        if feed_key is not None:
+                            cached_feeds = self.feed_cache.get(feed_key)
+                            if cached_feeds is not None:
+                                feeds[id(aggregator)] = json.loads(cached_feeds)
+                    phase.set(cached=len(feeds))
+            from_cache = set(feeds)
+            pending = [
+                aggregator for aggregator in aggregators if id(aggregator) not in feeds
+            ]
+            cached = [self._cached_query(aggregator) for aggregator in pending]
+            with operation.phase("network") as phase:
+                networks = self._load_networks(
+                    [
+                        aggregator.actor_id
+                        for aggregator, (_, compiled) in zip(pending, cached)
+                        if compiled is None and aggregator.uses_network
+                    ],
+                    phase,
+                )
+            searches = []
+            queried = []
+            with operation.phase("query") as phase:
+                for aggregator, (key, compiled) in zip(pending, cached):
+                    if compiled is not None:
+                        _restore_compiled_query(aggregator, compiled)
+                    else:
+                        if aggregator.uses_network:
+                            aggregator.network_array = networks[aggregator.actor_id]
+                        else:
+                            aggregator.network_array = []
+                        self._compile_query(aggregator, key)
+                    if aggregator.query_dict is not None:
+                        aggregator.prepare_searches()
+                        aggregator_searches = aggregator.feed_searches()
+                        queried.append(
+                            (aggregator, len(searches), len(aggregator_searches))
+                        )
+                        searches.extend(aggregator_searches)
+                if self.query_cache is not None:
+                    phase.set(
+                        cached=sum(compiled is not None for _, compiled in cached)
+                    )
+                if phase.measure_sizes:
+                    phase.set(request_bytes=_searches_size(searches))
+            with operation.phase("search") as phase:
+                responses = self._backend.search_many(self._connection, searches)
+                phase.set(**search_stats(responses, phase.measure_sizes))
+            with operation.phase("process"):
+                for aggregator, start, count in queried:
+                    finished = aggregator.set_feed_results(
+                        responses[start : start + count]
+                    )
+                    feeds[id(aggregator)] = aggregator.get_feeds()
+                    if finished is not None:
+                        self._backend.close_point_in_time(self._connection, finished)
+            for aggregator, feed_key in zip(aggregators, feed_keys):
+                if feed_key is None or id(aggregator) in from_cache:
+                    continue
+                if not _cache_held(self.feed_cache, "feed", aggregator.actor_id):
+                    self.feed_cache.set(
+                        feed_key, json.dumps(feeds.get(id(aggregator), []))
+                    )
+            operation.set(results=sum(len(feed) for feed in feeds.values()))
+            return [feeds.get(id(aggregator), []) for aggregator in aggregators]
+
+    def iter_feed(self, aggregator, page_size=1000, keep_alive="1m", slices=1):
+        """
+        Streams every activity of a feed, however long, for exports. The feed index is read through a point in
+        time with search_after, one page at a time, so memory stays flat and the export is a consistent
+        snapshot. It is not limited by max_result_window or result_size.
+
+        The aggregator only provides the query (the network filter and the order); its aggregations, result_size,
+        result_from and source filtering are ignored and the activities are yielded as stored. Use UnAggregated for the feed of a
+        MaterializedFeedAggregator: both hold the same activities.
+
+        :param aggregator: Aggregator class
+        :param page_size: Activities fetched per request. 1000 by default
+        :param keep_alive: How long the point in time is kept between two pages. "1m" by default
+        :param slices: With more than 1, the point in time is split into this many slices read in parallel
+                       threads. The activities are then yielded as the pages arrive, not in date order. 1 by default
+        :return: Generator of activity dicts
+        """
+        if isinstance(aggregator, MaterializedFeedAggregator):
+            raise ValueError(
+                "iter_feed reads the feed index. Use UnAggregated for a materialized feed"
+            )
+        self._prepare_aggregator(aggregator)
+        return self._iter_feed(aggregator, page_size, keep_alive, slices)
+
+    def _iter_feed(self, aggregator, page_size, keep_alive, slices):
+        if aggregator.uses_network:
+            aggregator.network_array = self.get_network(aggregator.actor_id)
         else:
-            return []
+            aggregator.network_array = []
+        aggregator.set_query_dict()
+        self._narrow_feed_index(aggregator)
+        if aggregator.query_dict is None:
+            return
+        for activity in self._export(
+            aggregator.feed_index,
+            aggregator.query_dict["query"],
+            aggregator.order,
+            page_size,
+            keep_alive,
+            slices,
+        ):
+            yield activity
+
+    def _export(self, index, query, order, page_size, keep_alive, slices):
+        """
+        Yields the source of every activity matching a query through a point in time of the feed index
+        :param index: The feed index, or the expression of the feed partitions to read
+        :param query: The query section
+        :param order: "asc" or "desc" by published date
+        :param page_size: Activities fetched per request
+        :param keep_alive: How long the point in time is kept between two pages
+        :param slices: Number of slices read in parallel. 1 for a single, ordered scroll
+        :return: Generator of activity dicts
+        """
+        tiebreaker = self._backend.point_in_time_tiebreaker(order)
+        bodies = [
+            _export_body(query, order, tiebreaker, page_size, slice_id, slices)
+            for slice_id in range(max(slices, 1))
+        ]
+        pit = {
+            "id": self._backend.open_point_in_time(self._connection, index, keep_alive),
+            "keep_alive": keep_alive,
+        }
+        try:
+            if len(bodies) == 1:
+                pages = self._export_pages(bodies[0], pit)
+            else:
+                pages = self._sliced_export_pages(bodies, pit)
+            for hits in pages:
+                for hit in hits:
+                    yield hit["_source"]
+        finally:
+            self._backend.close_point_in_time(self._connection, pit["id"])
+
+    def _export_pages(self, body, pit, lock=None):
+        """
+        Pages through one point-in-time search
+        :param body: The search body (see _export_body)
+        :param pit: Dict with the point in time "id" and "keep_alive". The id is updated from the responses
+        :param lock: Lock protecting ``pit`` when several slices share it
+        :return: Generator of non-empty lists of hits
+        """
+        page_size = body["size"]
+        while True:
+            body["pit"] = dict(pit)
+            response = self._backend.search(self._connection, None, body)
+            if lock is not None:
+                with lock:
+                    pit["id"] = _response_pit_id(response, pit["id"])
+            else:
+                pit["id"] = _response_pit_id(response, pit["id"])
+            hits = response["hits"]["hits"]
+            if hits:
+                yield hits
+            if len(hits) < page_size:
+                return
+            body["search_after"] = hits[-1]["sort"]
+
+    def _sliced_export_pages(self, bodies, pit):
+        """
+        Reads the slices of a point-in-time export in parallel threads. The pages are handed over through a queue
+        holding at most one page per slice, so the threads wait for the consumer instead of buffering the export.
+        :param bodies: One search body per slice
+        :param pit: See _export_pages
+        :return: Generator of non-empty lists of hits, in arrival order
+        """
+        pages = queue.Queue(maxsize=len(bodies))
+        stop = threading.Event()
+        lock = threading.Lock()
+        finished = object()
+
+        def offer(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def scroll(body):
+            try:
+                for hits in self._export_pages(body, pit, lock):
+                    if not offer(hits):
+                        return
+                offer(finished)
+            except Exception as e:
+                offer(e)
+
+        with ThreadPoolExecutor(max_workers=len(bodies)) as executor:
+            for body in bodies:
+                executor.submit(scroll, body)
+            try:
+                running = len(bodies)
+                while running:
+                    item = pages.get()
+                    if item is finished:
+                        running -= 1
+                    elif isinstance(item, Exception):
+                        raise item
+                    else:
+                        yield item
+            finally:
+                # Also reached when the consumer stops early: the threads give up their next hand-over
+                stop.set()
 
     def get_activities(
         self,
@@ -558,7 +2899,8 @@ class Manager(object):
         ordered by published date. This is the building block for graph exploration / REST-style lookups such
         as "all activities by actor X" or "X did <verb> to <object>".
 
-        Unlike get_feeds(), results are NOT restricted to a follower network.
+        Unlike get_feeds(), results are NOT restricted to a follower network. For deep pagination use
+        get_activities_page (cursor) or iter_activities (every match).
 
         :param actor_id: Match activities whose actor has this id
         :param actor_type: Match activities whose actor has this type
@@ -573,31 +2915,137 @@ class Manager(object):
         :param order: "desc" (default) or "asc" by published date
         :return: Dict array of matching activities
         """
-        must = []
-        for field, value in (
-            ("actor.id", actor_id),
-            ("actor.type", actor_type),
-            ("type", verb),
-            ("object.id", object_id),
-            ("object.type", object_type),
-            ("target.id", target_id),
-            ("target.type", target_type),
-        ):
-            if value is not None:
-                must.append({"term": {field: value}})
-        if since is not None:
-            if isinstance(since, datetime.datetime):
-                since = since.isoformat()
-            must.append({"range": {"published": {"gte": since}}})
-        query = {"bool": {"must": must}} if must else {"match_all": {}}
         body = {
-            "query": query,
+            "query": _activities_query(
+                actor_id,
+                actor_type,
+                verb,
+                object_id,
+                object_type,
+                target_id,
+                target_type,
+                since,
+            ),
             "sort": [{"published": {"order": order}}],
             "size": size,
             "from": result_from,
         }
-        es_result = self._backend.search(self._connection, self.feed_index, body)
-        return [hit["_source"] for hit in es_result["hits"]["hits"]]
+        return self._search_activities(body, "get_activities")
+
+    def get_activities_page(
+        self,
+        actor_id=None,
+        actor_type=None,
+        verb=None,
+        object_id=None,
+        object_type=None,
+        target_id=None,
+        target_type=None,
+        since=None,
+        size=100,
+        order="desc",
+        search_after=None,
+    ):
+        """
+        get_activities with cursor (search_after) pagination: the cost of a page does not grow with its depth
+        and there is no max_result_window limit. Activities are sorted by published date, then by feed_id.
+        The constraints are the ones of get_activities.
+        :param size: Page size. 100 by default
+        :param order: "desc" (default) or "asc" by published date
+        :param search_after: The ``next_cursor`` returned by the previous page, or None for the first page
+        :return: Dict with the keys:
+            activities: The activities of this page
+            next_cursor: The cursor of the next page, or None when the end is reached
+        """
+        body = {
+            "query": _activities_query(
+                actor_id,
+                actor_type,
+                verb,
+                object_id,
+                object_type,
+                target_id,
+                target_type,
+                since,
+            ),
+            "sort": [
+                {"published": {"order": order}},
+                {"feed_id": {"order": order}},
+            ],
+            "size": size,
+            "track_total_hits": False,
+        }
+        if search_after is not None:
+            body["search_after"] = search_after
+        hits = []
+        activities = self._search_activities(body, "get_activities_page", hits)
+        next_cursor = hits[-1]["sort"] if hits and len(hits) == size else None
+        return {"activities": activities, "next_cursor": next_cursor}
+
+    def iter_activities(
+        self,
+        actor_id=None,
+        actor_type=None,
+        verb=None,
+        object_id=None,
+        object_type=None,
+        target_id=None,
+        target_type=None,
+        since=None,
+        order="desc",
+        page_size=1000,
+        keep_alive="1m",
+        slices=1,
+    ):
+        """
+        Streams every activity matching the constraints of get_activities, through a point in time of the feed
+        index (see iter_feed): flat memory and a consistent snapshot, however many activities match.
+        :param order: "desc" (default) or "asc" by published date
+        :param page_size: Activities fetched per request. 1000 by default
+        :param keep_alive: How long the point in time is kept between two pages. "1m" by default
+        :param slices: Number of slices read in parallel threads (activities then arrive out of order). 1 by
+                       default
+        :return: Generator of activity dicts
+        """
+        return self._export(
+            self.feed_index,
+            _activities_query(
+                actor_id,
+                actor_type,
+                verb,
+                object_id,
+                object_type,
+                target_id,
+                target_type,
+                since,
+            ),
+            order,
+            page_size,
+            keep_alive,
+            slices,
+        )
+
+    def _search_activities(self, body, name, hits=None):
+        """
+        Sends an activity search
+        :param body: The search body
+        :param name: The name of the operation reported to the instrumentation
+        :param hits: Optional list that receives the raw hits (for their sort values)
+        :return: The sources of the hits
+        """
+        with start_operation(self.instrumentation, name) as operation:
+            with operation.phase("search") as phase:
+                if phase.measure_sizes:
+                    phase.set(request_bytes=body_size(body))
+                es_result = self._backend.search(
+                    self._connection, self.feed_index, body
+                )
+                phase.set(**search_stats([es_result], phase.measure_sizes))
+            if hits is not None:
+                hits.extend(es_result["hits"]["hits"])
+            result = [hit["_source"] for hit in es_result["hits"]["hits"]]
+            operation.set(results=len(result))
+            return result
 
     def execute_raw_network_query(self, query_dict):
         return self._backend.search(self._connection, self.network_index, query_dict)
@@ -0,0 +1,1773 @@
+"""
+An in-memory stand-in for an Elasticsearch cluster, used by the "memory" backend (see backends.InMemoryBackend).
+
+``InMemoryClient`` exposes the subset of the Elasticsearch 9 client API that ElasticFeeds calls (``index``,
+``create``, ``update``, ``bulk``, ``search``, ``msearch``, ``delete_by_query``, ``indices.*`` including index templates
+and aliases, ``ilm.*``...) and evaluates the
+part of the query DSL that the manager and the aggregators emit:
+
+* queries: match_all, bool (must / filter / should / must_not / minimum_should_match), term, terms (including
+  terms lookups), range (with ``now`` date math), exists, ids, constant_score and function_score (gauss decay,
+  filter + weight and the connection-weight script);
+* search options: sort (fields, _score, _doc, _shard_doc and the connection-weight script), from / size,
+  search_after, collapse, _source filtering, top-level knn, slice and points in time
+  (``open_point_in_time`` / ``close_point_in_time`` and ``pit``);
+* aggregations: terms, composite (terms and daily date_histogram sources), max, min, cardinality, value_count,
+  top_hits and filters.
+
+Every index keeps per-field inverted indexes (value -> document ids) for term, terms, exists and range lookups,
+and per-document values for sorting and aggregations. A point in time hides the documents indexed (or updated)
+after it was opened; documents deleted since then are gone from it too, unlike on a cluster. Documents go through a JSON round trip on the way in and
+out, like they would over HTTP, so callers never share state with the store.
+
+It is meant for benchmarks, load tests and examples that must run without a cluster. It is not a search engine:
+there is no text analysis or relevance scoring (every match scores 1 unless function_score is used), and
+anything outside the subset above raises ``ApiError`` with status 400 instead of being silently ignored.
+"""
+
+import bisect
+import calendar
+import datetime
+import fnmatch
+import functools
+import json
+import math
+import re
+import threading
+import time
+import uuid
+import zlib
+
+__all__ = ["InMemoryClient", "ApiError"]
+
+_DEFAULT_RESULT_WINDOW = 10000
+
+_DURATION_UNITS = {
+    "ms": 1,
+    "s": 1000,
+    "m": 60 * 1000,
+    "h": 60 * 60 * 1000,
+    "H": 60 * 60 * 1000,
+    "d": 24 * 60 * 60 * 1000,
+    "w": 7 * 24 * 60 * 60 * 1000,
+    "M": 30 * 24 * 60 * 60 * 1000,
+    "y": 365 * 24 * 60 * 60 * 1000,
+}
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)(ms|s|m|h|H|d|w|M|y)$")
+_DATE_MATH = re.compile(r"([+-])(\d+)(ms|s|m|h|H|d|w|M|y)")
+
+
+class ApiError(Exception):
+    """
+    Raised for the requests a cluster would reject. Like the errors of the real clients it carries the HTTP status
+    as ``status_code``.
+    """
+
+    def __init__(self, status_code, error_type, reason):
+        Exception.__init__(self, status_code, error_type, reason)
+        self.status_code = status_code
+        self.error = {"type": error_type, "reason": reason}
+        self.body = {"error": self.error, "status": status_code}
+
+    def __str__(self):
+        return "ApiError(%s, '%s', '%s')" % (
+            self.status_code,
+            self.error["type"],
+            self.error["reason"],
+        )
+
+
+def _unsupported(what):
+    return ApiError(
+        400, "parsing_exception", "%s is not supported by the memory backend" % what
+    )
+
+
+def _json_default(value):
+    # Dates and times are written in ISO 8601, as the client serializers write them
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _copy(value):
+    """A JSON round trip, as a request or response would go through"""
+    return json.loads(json.dumps(value, default=_json_default))
+
+
+def _now_millis():
+    return int(
+        (
+            datetime.datetime.now(datetime.timezone.utc)
+            - datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+        ).total_seconds()
+        * 1000
+    )
+
+
+def _duration_millis(value):
+    """Milliseconds of a time value such as "7d" or "1h" (numbers are taken as milliseconds)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _DURATION.match(str(value).strip())
+    if match is None:
+        raise ApiError(400, "parse_exception", "Invalid time value [%s]" % value)
+    return float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+def _date_millis(value, date_format=None):
+    """
+    Converts a date to milliseconds since the epoch. Accepts epoch numbers, ISO 8601 strings, the "yyyy-MM-dd" and
+    "HH:mm:ss" formats used by the feed index and "now" date math ("now-7d"). Naive dates are taken as UTC.
+    """
+    if isinstance(value, bool):
+        raise ApiError(400, "parse_exception", "Invalid date [%s]" % value)
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime.datetime):
+        moment = value
+    else:
+        text = str(value).strip()
+        if text.startswith("now"):
+            millis = _now_millis()
+            for sign, amount, unit in _DATE_MATH.findall(text):
+                delta = int(amount) * _DURATION_UNITS[unit]
+                millis += delta if sign == "+" else -delta
+            return millis
+        try:
+            if date_format == "HH:mm:ss":
+                moment = datetime.datetime.combine(
+                    datetime.date(1970, 1, 1), datetime.time.fromisoformat(text)
+                )
+            else:
+                moment = datetime.datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            raise ApiError(400, "parse_exception", "Invalid date [%s]" % text)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return calendar.timegm(moment.timetuple()) * 1000 + moment.microsecond // 1000
+
+
+def _format_date(millis, date_format=None):
+    moment = datetime.datetime(1970, 1, 1) + datetime.timedelta(milliseconds=millis)
+    if date_format == "yyyy-MM-dd":
+        return moment.strftime("%Y-%m-%d")
+    if date_format == "HH:mm:ss":
+        return moment.strftime("%H:%M:%S")
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + "%03dZ" % (
+        moment.microsecond // 1000
+    )
+
+
+def _leaves(source, prefix=""):
+    """Yields (path, value) for every scalar in a document. Lists are flattened like Elasticsearch does."""
+    for key, value in source.items():
+        path = prefix + key
+        if isinstance(value, dict):
+            yield path, value
+            for leaf in _leaves(value, path + "."):
+                yield leaf
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    yield path, item
+                    for leaf in _leaves(item, path + "."):
+                        yield leaf
+                else:
+                    yield path, item
+        else:
+            yield path, value
+
+
+def _path_values(source, path):
+    """The values of a dotted path in a document, flattening lists"""
+    values = [source]
+    for part in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict) and part in value:
+                child = value[part]
+                if isinstance(child, list):
+                    found.extend(child)
+                else:
+                    found.append(child)
+        values = found
+    return [value for value in values if value is not None]
+
+
+def _wildcard(pattern):
+    return "*" in pattern or "?" in pattern
+
+
+def _pattern_covers(pattern, path):
+    if path == pattern or path.startswith(pattern + "."):
+        return True
+    return _wildcard(pattern) and fnmatch.fnmatchcase(path, pattern)
+
+
+def _pattern_below(pattern, path):
+    return pattern.startswith(path + ".") or (
+        "*" in pattern and fnmatch.fnmatchcase(path + ".", pattern.split("*")[0] + "*")
+    )
+
+
+class _SourceFilter(object):
+    """
+    Applies _source includes / excludes. The decision for each path is worked out once and reused for every
+    hit of the search.
+    """
+
+    _DROP, _KEEP, _DESCEND = range(3)
+
+    def __init__(self, includes, excludes):
+        self.includes = includes
+        self.excludes = excludes
+        self._decisions = {}
+
+    def _decide(self, path, included):
+        """
+        :param included: True when an include pattern covers the parent (or there are no includes)
+        :return: (action, whether the children are included)
+        """
+        if any(_pattern_covers(pattern, path) for pattern in self.excludes):
+            return self._DROP, False
+        if not included:
+            if any(_pattern_covers(pattern, path) for pattern in self.includes):
+                included = True
+            elif any(_pattern_below(pattern, path) for pattern in self.includes):
+                return self._DESCEND, False
+            else:
+                return self._DROP, False
+        if any(_pattern_below(pattern, path) for pattern in self.excludes):
+            return self._DESCEND, True
+        return self._KEEP, True
+
+    def apply(self, source, prefix="", included=None):
+        if included is None:
+            included = not self.includes
+        result = {}
+        for key, value in source.items():
+            path = prefix + key
+            decision = self._decisions.get((path, included))
+            if decision is None:
+                decision = self._decide(path, included)
+                self._decisions[(path, included)] = decision
+            action, children_included = decision
+            if action == self._KEEP:
+                result[key] = value
+            elif action == self._DESCEND:
+                if isinstance(value, dict):
+                    value = self.apply(value, path + ".", children_included)
+                    if value:
+                        result[key] = value
+                elif isinstance(value, list):
+                    items = [
+                        (
+                            self.apply(item, path + ".", children_included)
+                            if isinstance(item, dict)
+                            else item
+                        )
+                        for item in value
+                        if children_included or isinstance(item, dict)
+                    ]
+                    items = [item for item in items if item != {}]
+                    if items:
+                        result[key] = items
+                elif children_included:
+                    result[key] = value
+        return result
+
+
+def _source_filter(spec):
+    """
+    Reads a _source option
+    :return: (whether the source is returned, a _SourceFilter or None for the whole source)
+    """
+    if spec is None or spec is True:
+        return True, None
+    if spec is False:
+        return False, None
+    if isinstance(spec, str):
+        return True, _SourceFilter([spec], [])
+    if isinstance(spec, list):
+        return True, _SourceFilter(list(spec), [])
+    includes = spec.get("includes", spec.get("include", []))
+    excludes = spec.get("excludes", spec.get("exclude", []))
+    if isinstance(includes, str):
+        includes = [includes]
+    if isinstance(excludes, str):
+        excludes = [excludes]
+    if not includes and not excludes:
+        return True, None
+    return True, _SourceFilter(list(includes), list(excludes))
+
+
+def _compare(left, right):
+    """Orders two values of the same field. Values of different types are ordered by type name."""
+    try:
+        if left < right:
+            return -1
+        if left > right:
+            return 1
+        return 0
+    except TypeError:
+        return _compare(type(left).__name__, type(right).__name__)
+
+
+class _Index(object):
+    """
+    One index: the documents, their per-document values and the per-field inverted indexes
+    """
+
+    def __init__(self, name, settings=None, mappings=None):
+        self.name = name
+        self.settings = _copy(settings or {})
+        self.mappings = _copy(mappings or {})
+        index_settings = self.settings.get("index", self.settings)
+        self.max_result_window = int(
+            index_settings.get("max_result_window", _DEFAULT_RESULT_WINDOW)
+        )
+        self.types = {}
+        self.formats = {}
+        self.disabled = set()
+        self._read_properties(self.mappings.get("properties", {}), "")
+        self.sources = {}
+        self.sequence = {}
+        self.doc_values = {}
+        self.vectors = {}
+        self.postings = {}
+        self._next_sequence = 0
+        self._skipped = {}
+        self._sorted = {}
+        _, self._stored = _source_filter(self.mappings.get("_source"))
+
+    def _read_properties(self, properties, prefix):
+        for name, definition in properties.items():
+            path = prefix + name
+            if str(definition.get("enabled", True)).lower() == "false":
+                self.disabled.add(path)
+                continue
+            if "type" in definition:
+                self.types[path] = definition["type"]
+                if "format" in definition:
+                    self.formats[path] = definition["format"]
+            if "properties" in definition:
+                self._read_properties(definition["properties"], path + ".")
+
+    # --- values -------------------------------------------------------------
+    def normalize(self, path, value):
+        """Converts a value to the form it is indexed and compared in"""
+        field_type = self.types.get(path)
+        if field_type == "date":
+            return _date_millis(value, self.formats.get(path))
+        if field_type in ("integer", "long", "short", "byte"):
+            return int(value)
+        if field_type in ("float", "double", "half_float", "scaled_float"):
+            return float(value)
+        if field_type == "boolean":
+            if isinstance(value, str):
+                return value == "true"
+            return bool(value)
+        if field_type == "keyword" and not isinstance(value, str):
+            if isinstance(value, bool):
+                return "true" if value else "false"
+            return str(value)
+        return value
+
+    def is_vector(self, path):
+        return self.types.get(path) in ("dense_vector", "knn_vector")
+
+    def _skip(self, path):
+        """True for the paths that are not indexed: disabled objects and vectors"""
+        skipped = self._skipped.get(path)
+        if skipped is None:
+            skipped = self.is_vector(path) or any(
+                path == d or path.startswith(d + ".") for d in self.disabled
+            )
+            self._skipped[path] = skipped
+        return skipped
+
+    def sorted_values(self, path):
+        """
+        The distinct values of a field in order, for range lookups. Kept until a value is added or removed.
+        :return: A list, or None when the values can not be ordered (mixed types)
+        """
+        if path not in self._sorted:
+            try:
+                self._sorted[path] = sorted(self.postings.get(path, {}))
+            except TypeError:
+                self._sorted[path] = None
+        return self._sorted[path]
+
+    # --- documents ------------------------------------------------------------
+    def put(self, doc_id, source):
+        if doc_id in self.sources:
+            self.remove(doc_id)
+        source = _copy(source)
+        values = {}
+        for path, value in _leaves(source):
+            if value is None or isinstance(value, dict) or self._skip(path):
+                continue
+            value = self.normalize(path, value)
+            values.setdefault(path, []).append(value)
+            postings = self.postings.setdefault(path, {})
+            if value not in postings:
+                postings[value] = set()
+                self._sorted.pop(path, None)
+            postings[value].add(doc_id)
+        for path in self.types:
+            if self.is_vector(path):
+                vector = _path_values(source, path)
+                if vector:
+                    self.vectors.setdefault(path, {})[doc_id] = [
+                        float(v) for v in vector
+                    ]
+        if self._stored is not None:
+            # Mapping-level _source includes / excludes: the fields are indexed but not kept
+            source = self._stored.apply(source)
+        self.sources[doc_id] = source
+        self.doc_values[doc_id] = values
+        self.sequence[doc_id] = self._next_sequence
+        self._next_sequence += 1
+
+    def remove(self, doc_id):
+        for path, values in self.doc_values.pop(doc_id).items():
+            postings = self.postings[path]
+            for value in values:
+                ids = postings.get(value)
+                if ids is not None:
+                    ids.discard(doc_id)
+                    if not ids:
+                        del postings[value]
+                        self._sorted.pop(path, None)
+        for vectors in self.vectors.values():
+            vectors.pop(doc_id, None)
+        del self.sources[doc_id]
+        del self.sequence[doc_id]
+
+
+class _Indices(object):
+    """The ``client.indices`` namespace"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def exists(self, index, **kwargs):
+        with self._client.lock:
+            return all(
+                name in self._client.store or name in self._client.aliases
+                for name in self._client.split_names(index)
+            )
+
+    def create(self, index, settings=None, mappings=None, body=None, **kwargs):
+        if body is not None:
+            settings = body.get("settings", settings)
+            mappings = body.get("mappings", mappings)
+        with self._client.lock:
+            if index in self._client.store:
+                raise ApiError(
+                    400,
+                    "resource_already_exists_exception",
+                    "index [%s] already exists" % index,
+                )
+            self._client.new_index(index, settings, mappings)
+        return {"acknowledged": True, "index": index}
+
+    def delete(self, index, **kwargs):
+        with self._client.lock:
+            for name in self._client.resolve(index):
+                del self._client.store[name]
+                for members in self._client.aliases.values():
+                    if name in members:
+                        members.remove(name)
+            for alias in [
+                alias for alias, members in self._client.aliases.items() if not members
+            ]:
+                del self._client.aliases[alias]
+        return {"acknowledged": True}
+
+    def refresh(self, index=None, **kwargs):
+        # Writes are visible immediately
+        return {"_shards": {"failed": 0}}
+
+    def get_mapping(self, index, **kwargs):
+        with self._client.lock:
+            return {
+                name: {"mappings": _copy(self._client.store[name].mappings)}
+                for name in self._client.resolve(index)
+            }
+
+    def get_alias(self, name=None, index=None, **kwargs):
+        with self._client.lock:
+            aliases = self._client.aliases
+            if name is not None:
+                if name not in aliases:
+                    raise ApiError(
+                        404, "aliases_not_found_exception", "alias [%s] missing" % name
+                    )
+                aliases = {name: aliases[name]}
+            result = {}
+            for alias, members in aliases.items():
+                for member in members:
+                    result.setdefault(member, {"aliases": {}})["aliases"][alias] = {}
+            return result
+
+    def put_index_template(
+        self,
+        name,
+        index_patterns=None,
+        template=None,
+        priority=None,
+        body=None,
+        **kwargs
+    ):
+        if body is not None:
+            index_patterns = body.get("index_patterns", index_patterns)
+            template = body.get("template", template)
+            priority = body.get("priority", priority)
+        with self._client.lock:
+            self._client.templates[name] = {
+                "index_patterns": list(index_patterns),
+                "template": _copy(template or {}),
+                "priority": priority or 0,
+            }
+        return {"acknowledged": True}
+
+    def exists_index_template(self, name, **kwargs):
+        with self._client.lock:
+            return name in self._client.templates
+
+    def delete_index_template(self, name, **kwargs):
+        with self._client.lock:
+            if self._client.templates.pop(name, None) is None:
+                raise ApiError(
+                    404,
+                    "resource_not_found_exception",
+                    "index template matching [%s] not found" % name,
+                )
+        return {"acknowledged": True}
+
+
+class _Lifecycle(object):
+    """The ``client.ilm`` namespace. Policies are stored but never run"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def put_lifecycle(self, name, policy=None, body=None, **kwargs):
+        if body is not None:
+            policy = body.get("policy", policy)
+        with self._client.lock:
+            self._client.policies[name] = _copy(policy)
+        return {"acknowledged": True}
+
+    def get_lifecycle(self, name=None, **kwargs):
+        with self._client.lock:
+            if name is not None and name not in self._client.policies:
+                raise ApiError(
+                    404,
+                    "resource_not_found_exception",
+                    "Lifecycle policy not found: %s" % name,
+                )
+            return {
+                policy_name: {"policy": _copy(policy)}
+                for policy_name, policy in self._client.policies.items()
+                if name is None or policy_name == name
+            }
+
+    def delete_lifecycle(self, name, **kwargs):
+        with self._client.lock:
+            self._client.policies.pop(name, None)
+        return {"acknowledged": True}
+
+
+class InMemoryClient(object):
+    """
+    A client-compatible in-memory store. Pass one instance as ``connection`` to several managers to share the data,
+    or let Manager(backend="memory") create a fresh one.
+    """
+
+    def __init__(self):
+        self.store = {}
+        self.lock = threading.RLock()
+        self.indices = _Indices(self)
+        self.ilm = _Lifecycle(self)
+        #: Index templates: name -> {"index_patterns", "template", "priority"}
+        self.templates = {}
+        #: Aliases: name -> list of index names
+        self.aliases = {}
+        #: Lifecycle policies: name -> policy
+        self.policies = {}
+        #: Open points in time: id -> [{index name: first hidden sequence}, expiry (time.monotonic())]
+        self.pits = {}
+
+    # --- connection -----------------------------------------------------------
+    def ping(self, **kwargs):
+        return True
+
+    def close(self):
+        pass
+
+    # --- index names ----------------------------------------------------------
+    @staticmethod
+    def split_names(index):
+        if isinstance(index, (list, tuple)):
+            return list(index)
+        return [name.strip() for name in str(index).split(",") if name.strip()]
+
+    def resolve(self, index, ignore_unavailable=False):
+        """
+        The names of the indices an index expression (names, aliases, commas, wildcards and ``-`` exclusions)
+        points to
+        """
+        names = []
+        for expression in self.split_names(index):
+            if expression.startswith("-") and names:
+                names = [
+                    name
+                    for name in names
+                    if not fnmatch.fnmatchcase(name, expression[1:])
+                ]
+                continue
+            if expression in ("_all", "*"):
+                matched = sorted(self.store)
+            elif "*" in expression or "?" in expression:
+                matched = sorted(
+                    name for name in self.store if fnmatch.fnmatchcase(name, expression)
+                )
+            elif expression in self.store:
+                matched = [expression]
+            elif expression in self.aliases:
+                matched = sorted(self.aliases[expression])
+            elif ignore_unavailable:
+                matched = []
+            else:
+                raise ApiError(
+                    404, "index_not_found_exception", "no such index [%s]" % expression
+                )
+            for name in matched:
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def _index(self, index):
+        if index not in self.store:
+            raise ApiError(
+                404, "index_not_found_exception", "no such index [%s]" % index
+            )
+        return self.store[index]
+
+    def _writable(self, index):
+        # Like a cluster with automatic index creation, writes create missing indices from the matching index
+        # template, or with dynamic mappings
+        if index not in self.store:
+            if index in self.aliases:
+                raise ApiError(
+                    400,
+                    "illegal_argument_exception",
+                    "no write index is defined for alias [%s]" % index,
+                )
+            self.new_index(index)
+        return self.store[index]
+
+    def new_index(self, index, settings=None, mappings=None):
+        """
+        Creates an index. The index template with the highest priority whose patterns match its name provides
+        the settings and mappings not given, and the aliases the index is added to
+        """
+        templates = [
+            template
+            for template in self.templates.values()
+            if any(
+                fnmatch.fnmatchcase(index, pattern)
+                for pattern in template["index_patterns"]
+            )
+        ]
+        aliases = {}
+        if templates:
+            template = max(templates, key=lambda item: item["priority"])["template"]
+            settings = settings or template.get("settings")
+            mappings = mappings or template.get("mappings")
+            aliases = template.get("aliases") or {}
+        self.store[index] = _Index(index, settings, mappings)
+        for alias in aliases:
+            self.aliases.setdefault(alias, []).append(index)
+        return self.store[index]
+
+    # --- documents --------------------------------------------------------------
+    def index(self, index, id, document=None, body=None, op_type=None, **kwargs):
+        if op_type == "create":
+            return self.create(index=index, id=id, document=document, body=body)
+        with self.lock:
+            target = self._writable(index)
+            result = "updated" if id in target.sources else "created"
+            target.put(id, document if document is not None else body)
+        return {"_index": index, "_id": id, "result": result}
+
+    def create(self, index, id, document=None, body=None, **kwargs):
+        with self.lock:
+            target = self._writable(index)
+            if id in target.sources:
+                raise ApiError(
+                    409,
+                    "version_conflict_engine_exception",
+                    "[%s]: version conflict, document already exists" % id,
+                )
+            target.put(id, document if document is not None else body)
+        return {"_index": index, "_id": id, "result": "created"}
+
+    def exists(self, index, id, **kwargs):
+        with self.lock:
+            return index in self.store and id in self.store[index].sources
+
+    def get(self, index, id, **kwargs):
+        with self.lock:
+            target = self._index(index)
+            if id not in target.sources:
+                raise ApiError(404, "not_found", "document [%s] not found" % id)
+            return {
+                "_index": index,
+                "_id": id,
+                "found": True,
+                "_source": _copy(target.sources[id]),
+            }
+
+    def delete(self, index, id, **kwargs):
+        with self.lock:
+            target = self._index(index)
+            if id not in target.sources:
+                raise ApiError(404, "not_found", "document [%s] not found" % id)
+            target.remove(id)
+        return {"_index": index, "_id": id, "result": "deleted"}
+
+    def update(
+        self, index, id, script=None, upsert=None, doc=None, body=None, **kwargs
+    ):
+        if body is not None:
+            script = body.get("script", script)
+            upsert = body.get("upsert", upsert)
+            doc = body.get("doc", doc)
+        with self.lock:
+            target = self._writable(index)
+            if id not in target.sources:
+                if upsert is None and not kwargs.get("doc_as_upsert"):
+                    raise ApiError(
+                        404, "document_missing_exception", "[%s]: document missing" % id
+                    )
+                target.put(id, upsert if upsert is not None else doc)
+                return {"_index": index, "_id": id, "result": "created"}
+            source = _copy(target.sources[id])
+            if doc is not None:
+                source.update(doc)
+                changed = True
+            else:
+                changed = self._run_update_script(source, script)
+            if not changed:
+                return {"_index": index, "_id": id, "result": "noop"}
+            target.put(id, source)
+        return {"_index": index, "_id": id, "result": "updated"}
+
+    @staticmethod
+    def _run_update_script(source, script):
+        """
+        Runs the set scripts of BaseBackend.add_to_set / remove_from_set
+        :return: True if the document changed
+        """
+        text = script.get("source", "") if isinstance(script, dict) else str(script)
+        params = script.get("params", {}) if isinstance(script, dict) else {}
+        if "field" not in params or "values" not in params:
+            raise _unsupported("The update script")
+        current = source.get(params["field"])
+        if current is None:
+            current = []
+        elif not isinstance(current, list):
+            current = [current]
+        if ".add(" in text:
+            added = [value for value in params["values"] if value not in current]
+            source[params["field"]] = current + added
+            return bool(added)
+        if "removeIf" in text:
+            kept = [value for value in current if value not in params["values"]]
+            source[params["field"]] = kept
+            return len(kept) != len(current)
+        raise _unsupported("The update script")
+
+    def bulk(self, operations=None, body=None, **kwargs):
+        lines = operations if operations is not None else body
+        items = []
+        errors = False
+        position = 0
+        with self.lock:
+            while position < len(lines):
+                action = lines[position]
+                op_type, meta = next(iter(action.items()))
+                position += 1
+                source = None
+                if op_type != "delete":
+                    source = lines[position]
+                    position += 1
+                item = {"_index": meta.get("_index"), "_id": meta.get("_id")}
+                try:
+                    if op_type == "index":
+                        result = self.index(
+                            meta["_index"], meta["_id"], document=source
+                        )
+                        item["status"] = 201 if result["result"] == "created" else 200
+                    elif op_type == "create":
+                        self.create(meta["_index"], meta["_id"], document=source)
+                        item["status"] = 201
+                    elif op_type == "delete":
+                        self.delete(meta["_index"], meta["_id"])
+                        item["status"] = 200
+                    elif op_type == "update":
+                        self.update(meta["_index"], meta["_id"], body=source)
+                        item["status"] = 200
+                    else:
+                        raise _unsupported("The bulk action %s" % op_type)
+                    item["result"] = "deleted" if op_type == "delete" else "created"
+                except ApiError as e:
+                    errors = True
+                    item["status"] = e.status_code
+                    if e.status_code == 404 and op_type == "delete":
+                        item["result"] = "not_found"
+                    else:
+                        item["error"] = e.error
+                items.append({op_type: item})
+        return {"took": 0, "errors": errors, "items": items}
+
+    # --- points in time ---------------------------------------------------------------
+    def open_point_in_time(self, index, keep_alive, **kwargs):
+        with self.lock:
+            snapshot = dict(
+                (name, self.store[name]._next_sequence) for name in self.resolve(index)
+            )
+            pit_id = uuid.uuid4().hex
+            self.pits[pit_id] = [
+                snapshot,
+                time.monotonic() + _duration_millis(keep_alive) / 1000,
+            ]
+            return {"id": pit_id}
+
+    def close_point_in_time(self, id=None, body=None, **kwargs):
+        if id is None:
+            id = (body or {}).get("id")
+        with self.lock:
+            freed = 1 if self.pits.pop(id, None) is not None else 0
+        return {"succeeded": True, "num_freed": freed}
+
+    def _point_in_time(self, pit):
+        """The snapshot of an open point in time. Extends its life by its keep_alive"""
+        entry = self.pits.get(pit.get("id"))
+        if entry is None or entry[1] < time.monotonic():
+            self.pits.pop(pit.get("id"), None)
+            raise ApiError(
+                404,
+                "search_context_missing_exception",
+                "No search context found for id [%s]" % pit.get("id"),
+            )
+        if "keep_alive" in pit:
+            entry[1] = time.monotonic() + _duration_millis(pit["keep_alive"]) / 1000
+        return entry[0]
+
+    # --- search ---------------------------------------------------------------------
+    def search(self, index=None, body=None, **kwargs):
+        body = dict(body or {})
+        for key, value in kwargs.items():
+            if key not in ("ignore_unavailable", "allow_no_indices", "request_timeout"):
+                body[key] = value
+        with self.lock:
+            if "pit" in body:
+                if index is not None:
+                    raise ApiError(
+                        400,
+                        "action_request_validation_exception",
+                        "[indices] cannot be used with point in time",
+                    )
+                pit = body.pop("pit")
+                snapshot = self._point_in_time(pit)
+                indices = [self._index(name) for name in snapshot]
+                response = _Search(self, indices, body, snapshot).run()
+                response["pit_id"] = pit["id"]
+                return _copy(response)
+            names = self.resolve(
+                index if index is not None else "_all",
+                kwargs.get("ignore_unavailable", False),
+            )
+            return _copy(
+                _Search(self, [self.store[name] for name in names], body).run()
+            )
+
+    def msearch(self, searches=None, body=None, **kwargs):
+        lines = searches if searches is not None else body
+        responses = []
+        for position in range(0, len(lines), 2):
+            header, search_body = lines[position], lines[position + 1]
+            try:
+                response = self.search(index=header.get("index"), body=search_body)
+                response["status"] = 200
+            except ApiError as e:
+                response = {"error": e.error, "status": e.status_code}
+            responses.append(response)
+        return {"took": 0, "responses": responses}
+
+    def count(self, index=None, body=None, **kwargs):
+        with self.lock:
+            names = self.resolve(index if index is not None else "_all")
+            search = _Search(self, [self.store[name] for name in names], body or {})
+            return {"count": len(search.matches())}
+
+    def delete_by_query(self, index, body=None, query=None, **kwargs):
+        body = dict(body or {})
+        if query is not None:
+            body["query"] = query
+        with self.lock:
+            deleted = 0
+            for name in self.resolve(index):
+                target = self.store[name]
+                for doc_id in _Search(self, [target], body).matches():
+                    target.remove(doc_id[1])
+                    deleted += 1
+        return {"took": 0, "deleted": deleted, "failures": []}
+
+
+class _Search(object):
+    """Evaluates one search body against one or more indices"""
+
+    def __init__(self, client, indices, body, snapshot=None):
+        self.client = client
+        self.indices = indices
+        self.body = body
+        #: For point-in-time searches: index name -> first sequence number hidden from the search
+        self.snapshot = snapshot
+
+    # --- field helpers ------------------------------------------------------------
+    def _normalize(self, path, value):
+        for index in self.indices:
+            if path in index.types:
+                return index.normalize(path, value)
+        return value
+
+    def _field_type(self, path):
+        for index in self.indices:
+            if path in index.types:
+                return index.types[path], index.formats.get(path)
+        return None, None
+
+    def _values(self, doc, path):
+        index, doc_id = doc
+        return index.doc_values[doc_id].get(path, [])
+
+    def _all(self):
+        return set(
+            (index, doc_id) for index in self.indices for doc_id in index.sources
+        )
+
+    # --- queries ----------------------------------------------------------------------
+    def matches(self, query=None):
+        """The set of (index, doc_id) pairs matching a query (the body's query by default)"""
+        if query is None:
+            query = self.body.get("query", {"match_all": {}})
+        return self._match(query)
+
+    def _match(self, query):
+        if not isinstance(query, dict) or len(query) != 1:
+            raise _unsupported("The query %r" % (query,))
+        kind, spec = next(iter(query.items()))
+        handler = getattr(self, "_match_" + kind, None)
+        if handler is None:
+            raise _unsupported("The [%s] query" % kind)
+        return handler(spec)
+
+    def _match_match_all(self, spec):
+        return self._all()
+
+    def _match_match_none(self, spec):
+        return set()
+
+    @staticmethod
+    def _clauses(value):
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [value]
+        return list(value)
+
+    def _match_bool(self, spec):
+        must = self._clauses(spec.get("must")) + self._clauses(spec.get("filter"))
+        should = self._clauses(spec.get("should"))
+        must_not = self._clauses(spec.get("must_not"))
+        minimum = spec.get("minimum_should_match")
+        if minimum is None:
+            minimum = 0 if must else 1
+        elif str(minimum).endswith("%"):
+            minimum = len(should) * int(str(minimum)[:-1]) // 100
+        minimum = int(minimum) if should else 0
+        result = None
+        # The most selective clause first. The field clauses after it are checked on the remaining documents
+        # instead of being expanded to every document they match
+        for clause in sorted(must, key=self._estimate):
+            if result is None:
+                result = self._match(clause)
+            else:
+                result = self._filter(clause, result)
+            if not result:
+                return set()
+        if minimum == 1:
+            matched = set().union(*[self._match(clause) for clause in should])
+            result = matched if result is None else result & matched
+        elif minimum > 1:
+            counts = {}
+            for clause in should:
+                for doc in self._match(clause):
+                    counts[doc] = counts.get(doc, 0) + 1
+            matched = set(doc for doc, count in counts.items() if count >= minimum)
+            result = matched if result is None else result & matched
+        if result is None:
+            result = self._all()
+        for clause in must_not:
+            if not result:
+                break
+            result = result - self._match(clause)
+        return result
+
+    def _field_spec(self, spec, what):
+        fields = [key for key in spec if key not in ("boost", "_name")]
+        if len(fields) != 1:
+            raise _unsupported("A [%s] query on several fields" % what)
+        return fields[0], spec[fields[0]]
+
+    def _posting_ids(self, path, value):
+        """Yields (index, ids) for each index with documents where the field has the value"""
+        for index in self.indices:
+            if path in index.types:
+                normalized = index.normalize(path, value)
+            else:
+                normalized = value
+            ids = index.postings.get(path, {}).get(normalized)
+            if ids:
+                yield index, ids
+
+    def _postings(self, path, value):
+        result = set()
+        for index, ids in self._posting_ids(path, value):
+            result.update((index, doc_id) for doc_id in ids)
+        return result
+
+    def _match_term(self, spec):
+        path, value = self._field_spec(spec, "term")
+        if isinstance(value, dict):
+            value = value["value"]
+        return self._postings(path, value)
+
+    def _match_terms(self, spec):
+        path, values = self._field_spec(spec, "terms")
+        if isinstance(values, dict):
+            values = self._lookup_terms(values)
+        result = set()
+        for value in values:
+            result |= self._postings(path, value)
+        return result
+
+    def _lookup_terms(self, lookup):
+        index = self.client.store.get(lookup["index"])
+        if index is None or lookup["id"] not in index.sources:
+            return []
+        return _path_values(index.sources[lookup["id"]], lookup["path"])
+
+    def _match_ids(self, spec):
+        values = set(spec.get("values", []))
+        return set(doc for doc in self._all() if doc[1] in values)
+
+    def _match_exists(self, spec):
+        path = spec["field"]
+        result = set()
+        for index in self.indices:
+            for ids in index.postings.get(path, {}).values():
+                result.update((index, doc_id) for doc_id in ids)
+            for doc_id in index.vectors.get(path, {}):
+                result.add((index, doc_id))
+        return result
+
+    def _match_range(self, spec):
+        path, bounds = self._field_spec(spec, "range")
+        result = set()
+        for index in self.indices:
+            checks = self._range_checks(index, path, bounds)
+            postings = index.postings.get(path, {})
+            for value in self._range_values(
+                index.sorted_values(path), postings, checks
+            ):
+                result.update((index, doc_id) for doc_id in postings[value])
+        return result
+
+    @staticmethod
+    def _range_checks(index, path, bounds):
+        """The (operator, normalized bound) pairs of a range query on one index"""
+        checks = []
+        for operator in ("gt", "gte", "lt", "lte"):
+            if bounds.get(operator) is not None:
+                value = bounds[operator]
+                if index.types.get(path) == "date":
+                    value = _date_millis(value, index.formats.get(path))
+                else:
+                    value = index.normalize(path, value)
+                checks.append((operator, value))
+        return checks
+
+    def _range_values(self, ordered, postings, checks):
+        if ordered is None:
+            return [
+                value
+                for value in postings
+                if all(self._in_range(value, op, bound) for op, bound in checks)
+            ]
+        low, high = 0, len(ordered)
+        try:
+            for operator, bound in checks:
+                if operator == "gt":
+                    low = max(low, bisect.bisect_right(ordered, bound))
+                elif operator == "gte":
+                    low = max(low, bisect.bisect_left(ordered, bound))
+                elif operator == "lt":
+                    high = min(high, bisect.bisect_left(ordered, bound))
+                else:
+                    high = min(high, bisect.bisect_right(ordered, bound))
+        except TypeError:
+            return self._range_values(None, postings, checks)
+        return ordered[low:high]
+
+    def _estimate(self, clause):
+        """Roughly how many documents a clause matches, to order the clauses of a bool query"""
+        kind, spec = next(iter(clause.items()))
+        if kind == "term":
+            path, value = self._field_spec(spec, "term")
+            if isinstance(value, dict):
+                value = value["value"]
+            return sum(len(ids) for _, ids in self._posting_ids(path, value))
+        if kind == "terms":
+            path, values = self._field_spec(spec, "terms")
+            if not isinstance(values, dict):
+                return sum(
+                    len(ids)
+                    for value in values
+                    for _, ids in self._posting_ids(path, value)
+                )
+        total = sum(len(index.sources) for index in self.indices)
+        return total + 1 if kind == "range" else total
+
+    def _filter(self, clause, docs):
+        """The documents of ``docs`` that match a clause"""
+        kind, spec = next(iter(clause.items()))
+        if kind in ("term", "terms"):
+            path, values = self._field_spec(spec, kind)
+            if kind == "term":
+                values = [values["value"] if isinstance(values, dict) else values]
+            elif isinstance(values, dict):
+                values = self._lookup_terms(values)
+            wanted = {}
+            result = set()
+            for doc in docs:
+                index = doc[0]
+                if index not in wanted:
+                    wanted[index] = set(index.normalize(path, v) for v in values)
+                if not wanted[index].isdisjoint(self._values(doc, path)):
+                    result.add(doc)
+            return result
+        if kind == "range":
+            path, bounds = self._field_spec(spec, "range")
+            checks = {}
+            result = set()
+            for doc in docs:
+                index = doc[0]
+                if index not in checks:
+                    checks[index] = self._range_checks(index, path, bounds)
+                if any(
+                    all(self._in_range(value, op, bound) for op, bound in checks[index])
+                    for value in self._values(doc, path)
+                ):
+                    result.add(doc)
+            return result
+        return docs & self._match(clause)
+
+    @staticmethod
+    def _in_range(value, operator, bound):
+        order = _compare(value, bound)
+        if operator == "gt":
+            return order > 0
+        if operator == "gte":
+            return order >= 0
+        if operator == "lt":
+            return order < 0
+        return order <= 0
+
+    def _match_constant_score(self, spec):
+        return self._match(spec["filter"])
+
+    def _match_function_score(self, spec):
+        return self._match(spec.get("query", {"match_all": {}}))
+
+    # --- scores ---------------------------------------------------------------------------
+    def scores(self, docs):
+        """Scores of the matching documents. Only function_score and knn produce scores other than 1"""
+        query = self.body.get("query", {})
+        if isinstance(query, dict) and "function_score" in query:
+            return self._function_scores(query["function_score"], docs)
+        return dict((doc, 1.0) for doc in docs)
+
+    def _function_scores(self, spec, docs):
+        score_mode = spec.get("score_mode", "multiply")
+        boost_mode = spec.get("boost_mode", "multiply")
+        functions = spec.get("functions", [])
+        filters = [
+            self._match(function["filter"]) if "filter" in function else None
+            for function in functions
+        ]
+        scores = {}
+        for doc in docs:
+            values = []
+            for function, matched in zip(functions, filters):
+                if matched is not None and doc not in matched:
+                    continue
+                values.append(self._function_value(function, doc))
+            if not values:
+                function_score = 1.0
+            elif score_mode == "sum":
+                function_score = sum(values)
+            elif score_mode == "avg":
+                function_score = sum(values) / len(values)
+            elif score_mode == "max":
+                function_score = max(values)
+            elif score_mode == "min":
+                function_score = min(values)
+            elif score_mode == "first":
+                function_score = values[0]
+            else:
+                function_score = functools.reduce(lambda a, b: a * b, values, 1.0)
+            if boost_mode == "sum":
+                scores[doc] = 1.0 + function_score
+            else:
+                # replace, multiply (query score is 1), max / min (with 1)
+                if boost_mode == "max":
+                    scores[doc] = max(1.0, function_score)
+                elif boost_mode == "min":
+                    scores[doc] = min(1.0, function_score)
+                else:
+                    scores[doc] = function_score
+        return scores
+
+    def _function_value(self, function, doc):
+        weight = float(function.get("weight", 1.0))
+        if "gauss" in function:
+            return self._gauss(function["gauss"], doc) * weight
+        if "script_score" in function:
+            return self._script_value(function["script_score"]["script"], doc) * weight
+        if "weight" in function:
+            return weight
+        raise _unsupported("The score function %r" % sorted(function))
+
+    def _gauss(self, spec, doc):
+        path, params = next(
+            (key, value) for key, value in spec.items() if key != "multi_value_mode"
+        )
+        values = self._values(doc, path)
+        if not values:
+            return 1.0
+        field_type, _ = self._field_type(path)
+        if field_type == "date":
+            origin = _date_millis(params.get("origin", "now"))
+            scale = _duration_millis(params["scale"])
+            offset = _duration_millis(params.get("offset", 0))
+        else:
+            origin = float(params["origin"])
+            scale = float(params["scale"])
+            offset = float(params.get("offset", 0))
+        decay = float(params.get("decay", 0.5))
+        sigma_squared = -(scale**2) / (2.0 * math.log(decay))
+        distance = max(0.0, min(abs(value - origin) for value in values) - offset)
+        return math.exp(-(distance**2) / (2.0 * sigma_squared))
+
+    def _script_value(self, script, doc):
+        """
+        The painless scripts ElasticFeeds sends: the connection weight of the activity's actor and reading the
+        published date.
+        """
+        if isinstance(script, str):
+            script = {"source": script}
+        source = script.get("source", "")
+        params = script.get("params", {})
+        if "weights" in params:
+            actor_ids = self._values(doc, "actor.id")
+            if isinstance(params["weights"], dict):
+                for actor_id in actor_ids:
+                    if actor_id in params["weights"]:
+                        return float(params["weights"][actor_id])
+                return 1.0
+            for weight in params["weights"]:
+                if weight["id"] in actor_ids:
+                    return float(weight["weight"])
+            return 1.0
+        if "published" in source:
+            values = self._values(doc, "published")
+            return values[0] if values else None
+        raise _unsupported("The script [%s]" % source)
+
+    # --- sorting ------------------------------------------------------------------------------
+    def _sort_clauses(self, sort):
+        if sort is None:
+            return [("_score", "desc", None), ("_doc", "asc", None)]
+        if isinstance(sort, (str, dict)):
+            sort = [sort]
+        clauses = []
+        for item in sort:
+            if isinstance(item, str):
+                order = "desc" if item == "_score" else "asc"
+                clauses.append((item, order, None))
+                continue
+            key, spec = next(iter(item.items()))
+            if isinstance(spec, str):
+                clauses.append((key, spec, None))
+            elif key == "_script":
+                clauses.append((key, spec.get("order", "asc"), spec["script"]))
+            else:
+                default = "desc" if key == "_score" else "asc"
+                clauses.append((key, spec.get("order", default), None))
+        return clauses
+
+    def _sort_value(self, clause, doc, scores):
+        key, order, script = clause
+        if key == "_score":
+            return scores.get(doc, 1.0)
+        if key in ("_doc", "_shard_doc"):
+            index, doc_id = doc
+            return self.indices.index(index) * (1 << 40) + index.sequence[doc_id]
+        if key == "_script":
+            return self._script_value(script, doc)
+        values = self._values(doc, key)
+        if not values:
+            return None
+        return max(values) if order == "desc" else min(values)
+
+    def sort_key(self, clauses, scores):
+        def compare(left, right):
+            for (key, order, script), a, b in zip(clauses, left[1], right[1]):
+                if a is None or b is None:
+                    if a is None and b is None:
+                        continue
+                    # Missing values sort last in both directions
+                    return 1 if a is None else -1
+                order_value = _compare(a, b)
+                if order_value:
+                    return order_value if order == "asc" else -order_value
+            return 0
+
+        return functools.cmp_to_key(compare)
+
+    def _sorted(self, docs, sort, scores):
+        clauses = self._sort_clauses(sort)
+        rows = [
+            (doc, [self._sort_value(clause, doc, scores) for clause in clauses])
+            for doc in docs
+        ]
+        rows.sort(key=self.sort_key(clauses, scores))
+        return clauses, rows
+
+    def _after(self, clauses, rows, search_after, scores):
+        after = []
+        for (key, order, script), value in zip(clauses, search_after):
+            if (
+                key not in ("_score", "_doc", "_shard_doc", "_script")
+                and value is not None
+            ):
+                field_type, date_format = self._field_type(key)
+                if field_type == "date" and not isinstance(value, (int, float)):
+                    value = _date_millis(value, date_format)
+                else:
+                    value = self._normalize(key, value)
+            after.append(value)
+        key = self.sort_key(clauses, scores)
+        cursor = key((None, after))
+        return [row for row in rows if key(row) > cursor]
+
+    # --- hits ---------------------------------------------------------------------------------------
+    def _hit(self, doc, score, sort_values, source_spec):
+        index, doc_id = doc
+        hit = {"_index": index.name, "_id": doc_id, "_score": score}
+        enabled, source_filter = source_spec
+        if enabled:
+            source = index.sources[doc_id]
+            if source_filter is not None:
+                source = source_filter.apply(source)
+            hit["_source"] = source
+        if sort_values is not None:
+            hit["sort"] = sort_values
+        return hit
+
+    def hits(
+        self,
+        docs,
+        scores,
+        sort,
+        size,
+        start=0,
+        search_after=None,
+        collapse=None,
+        source=None,
+    ):
+        clauses, rows = self._sorted(docs, sort, scores)
+        if search_after is not None:
+            rows = self._after(clauses, rows, search_after, scores)
+        if collapse is not None:
+            seen = set()
+            collapsed = []
+            for row in rows:
+                values = self._values(row[0], collapse["field"])
+                group = values[0] if values else None
+                if group in seen:
+                    continue
+                seen.add(group)
+                collapsed.append(row)
+            rows = collapsed
+        source_spec = _source_filter(source)
+        # Like Elasticsearch, an explicit sort returns the sort values and drops the score unless it sorts on it
+        explicit_sort = sort is not None
+        by_score = any(key == "_score" for key, _, _ in clauses)
+        hits = []
+        for doc, sort_values in rows[start : start + size]:
+            score = scores.get(doc, 1.0)
+            hits.append(
+                self._hit(
+                    doc,
+                    score if not explicit_sort or by_score else None,
+                    sort_values if explicit_sort else None,
+                    source_spec,
+                )
+            )
+        return hits
+
+    # --- knn ----------------------------------------------------------------------------------
+    def _knn(self, spec):
+        field = spec["field"]
+        query_vector = [float(v) for v in spec["query_vector"]]
+        candidates = (
+            self._match(spec["filter"])
+            if spec.get("filter") is not None
+            else self._all()
+        )
+        similarity = "cosine"
+        for index in self.indices:
+            for path, definition in index.mappings.get("properties", {}).items():
+                if path == field:
+                    similarity = definition.get("similarity", "cosine")
+        scores = {}
+        for doc in candidates:
+            index, doc_id = doc
+            vector = index.vectors.get(field, {}).get(doc_id)
+            if vector is None or len(vector) != len(query_vector):
+                continue
+            dot = sum(a * b for a, b in zip(vector, query_vector))
+            if similarity == "l2_norm":
+                distance = math.sqrt(
+                    sum((a - b) ** 2 for a, b in zip(vector, query_vector))
+                )
+                scores[doc] = 1.0 / (1.0 + distance**2)
+            elif similarity == "dot_product":
+                scores[doc] = (1.0 + dot) / 2.0
+            else:
+                norm = math.sqrt(sum(a * a for a in vector)) * math.sqrt(
+                    sum(b * b for b in query_vector)
+                )
+                scores[doc] = (1.0 + (dot / norm if norm else 0.0)) / 2.0
+        best = sorted(scores, key=lambda doc: -scores[doc])[: int(spec.get("k", 10))]
+        return dict((doc, scores[doc]) for doc in best)
+
+    # --- aggregations -----------------------------------------------------------------------------
+    def aggregate(self, aggs, docs):
+        result = {}
+        for name, spec in aggs.items():
+            sub_aggs = spec.get("aggs", spec.get("aggregations"))
+            kinds = [key for key in spec if key not in ("aggs", "aggregations", "meta")]
+            if len(kinds) != 1:
+                raise _unsupported("The aggregation [%s]" % name)
+            kind = kinds[0]
+            handler = getattr(self, "_agg_" + kind, None)
+            if handler is None:
+                raise _unsupported("The [%s] aggregation" % kind)
+            result[name] = handler(spec[kind], docs, sub_aggs)
+        return result
+
+    def _agg_terms(self, spec, docs, sub_aggs):
+        path = spec["field"]
+        size = int(spec.get("size", 10))
+        groups = {}
+        for doc in docs:
+            for value in set(self._values(doc, path)):
+                groups.setdefault(value, []).append(doc)
+        field_type, date_format = self._field_type(path)
+        buckets = []
+        for key, members in groups.items():
+            if len(members) < int(spec.get("min_doc_count", 1)):
+                continue
+            bucket = {"key": key, "doc_count": len(members)}
+            if field_type == "date":
+                bucket["key_as_string"] = _format_date(key, date_format)
+            if sub_aggs:
+                bucket.update(self.aggregate(sub_aggs, members))
+            buckets.append(bucket)
+        orders = spec.get("order", [{"_count": "desc"}, {"_key": "asc"}])
+        if isinstance(orders, dict):
+            orders = [orders, {"_key": "asc"}]
+
+        def compare(left, right):
+            for order in orders:
+                key, direction = next(iter(order.items()))
+                a = self._bucket_value(left, key)
+                b = self._bucket_value(right, key)
+                if a is None or b is None:
+                    if a is None and b is None:
+                        continue
+                    return 1 if a is None else -1
+                order_value = _compare(a, b)
+                if order_value:
+                    return order_value if direction == "asc" else -order_value
+            return 0
+
+        buckets.sort(key=functools.cmp_to_key(compare))
+        other = sum(bucket["doc_count"] for bucket in buckets[size:])
+        return {
+            "doc_count_error_upper_bound": 0,
+            "sum_other_doc_count": other,
+            "buckets": buckets[:size],
+        }
+
+    def _agg_composite(self, spec, docs, sub_aggs):
+        sources = []
+        for source in spec["sources"]:
+            name, definition = next(iter(source.items()))
+            kind, params = next(iter(definition.items()))
+            if kind == "date_histogram":
+                if params.get("calendar_interval") not in ("1d", "day"):
+                    raise _unsupported("A date_histogram source that is not daily")
+            elif kind != "terms":
+                raise _unsupported("The [%s] composite source" % kind)
+            sources.append((name, kind, params))
+        groups = {}
+        for doc in docs:
+            keys = [()]
+            for _, kind, params in sources:
+                values = set(self._values(doc, params["field"]))
+                if kind == "date_histogram":
+                    values = set(
+                        value - value % _DURATION_UNITS["d"] for value in values
+                    )
+                keys = [key + (value,) for key in keys for value in values]
+            for key in keys:
+                groups.setdefault(key, []).append(doc)
+
+        def compare(left, right):
+            for position, (_, _, params) in enumerate(sources):
+                order_value = _compare(left[position], right[position])
+                if order_value:
+                    return (
+                        order_value if params.get("order") != "desc" else -order_value
+                    )
+            return 0
+
+        def bucket_key(key):
+            result = {}
+            for position, (name, kind, params) in enumerate(sources):
+                value = key[position]
+                if kind == "date_histogram" and "format" in params:
+                    value = _format_date(value, params["format"])
+                result[name] = value
+            return result
+
+        keys = sorted(groups, key=functools.cmp_to_key(compare))
+        after = spec.get("after")
+        if after is not None:
+            after_key = []
+            for name, kind, params in sources:
+                value = after[name]
+                if kind == "date_histogram":
+                    value = _date_millis(value, params.get("format"))
+                after_key.append(value)
+            after_key = tuple(after_key)
+            keys = [key for key in keys if compare(key, after_key) > 0]
+        buckets = []
+        for key in keys[: int(spec.get("size", 10))]:
+            bucket = {"key": bucket_key(key), "doc_count": len(groups[key])}
+            if sub_aggs:
+                bucket.update(self.aggregate(sub_aggs, groups[key]))
+            buckets.append(bucket)
+        result = {"buckets": buckets}
+        if buckets:
+            result["after_key"] = buckets[-1]["key"]
+        return result
+
+    @staticmethod
+    def _bucket_value(bucket, key):
+        if key == "_count":
+            return bucket["doc_count"]
+        if key == "_key":
+            return bucket["key"]
+        path = key.split(".")
+        value = bucket[path[0]]
+        if len(path) > 1:
+            return value[path[1]]
+        return value.get("value")
+
+    def _metric_values(self, spec, docs):
+        if "field" in spec:
+            path = spec["field"]
+            values = []
+            for doc in docs:
+                values.extend(self._values(doc, path))
+            return path, values
+        if "script" in spec:
+            values = [self._script_value(spec["script"], doc) for doc in docs]
+            return "published", [value for value in values if value is not None]
+        raise _unsupported("A metric aggregation without field or script")
+
+    def _metric(self, path, value):
+        result = {"value": value}
+        field_type, _ = self._field_type(path)
+        if value is not None and field_type == "date":
+            result["value_as_string"] = _format_date(value)
+        return result
+
+    def _agg_max(self, spec, docs, sub_aggs):
+        path, values = self._metric_values(spec, docs)
+        return self._metric(path, max(values) if values else None)
+
+    def _agg_min(self, spec, docs, sub_aggs):
+        path, values = self._metric_values(spec, docs)
+        return self._metric(path, min(values) if values else None)
+
+    def _agg_cardinality(self, spec, docs, sub_aggs):
+        _, values = self._metric_values(spec, docs)
+        return {"value": len(set(values))}
+
+    def _agg_value_count(self, spec, docs, sub_aggs):
+        _, values = self._metric_values(spec, docs)
+        return {"value": len(values)}
+
+    def _agg_top_hits(self, spec, docs, sub_aggs):
+        scores = self.scores(docs)
+        hits = self.hits(
+            docs,
+            scores,
+            spec.get("sort"),
+            int(spec.get("size", 3)),
+            int(spec.get("from", 0)),
+            source=spec.get("_source"),
+        )
+        return {
+            "hits": {
+                "total": {"value": len(docs), "relation": "eq"},
+                "max_score": None,
+                "hits": hits,
+            }
+        }
+
+    def _agg_filters(self, spec, docs, sub_aggs):
+        members = set(docs)
+        filters = spec["filters"]
+        if isinstance(filters, dict):
+            buckets = {}
+            for name, query in filters.items():
+                matched = self._match(query) & members
+                bucket = {"doc_count": len(matched)}
+                if sub_aggs:
+                    bucket.update(self.aggregate(sub_aggs, list(matched)))
+                buckets[name] = bucket
+        else:
+            buckets = []
+            for query in filters:
+                matched = self._match(query) & members
+                bucket = {"doc_count": len(matched)}
+                if sub_aggs:
+                    bucket.update(self.aggregate(sub_aggs, list(matched)))
+                buckets.append(bucket)
+        return {"buckets": buckets}
+
+    # --- run ------------------------------------------------------------------------------------
+    def run(self):
+        body = self.body
+        unknown = set(body) - {
+            "query",
+            "sort",
+            "size",
+            "from",
+            "search_after",
+            "collapse",
+            "_source",
+            "aggs",
+            "aggregations",
+            "knn",
+            "track_total_hits",
+            "slice",
+        }
+        if unknown:
+            raise _unsupported("The search option(s) %s" % sorted(unknown))
+        size = int(body.get("size", 10))
+        start = int(body.get("from", 0))
+        for index in self.indices:
+            if start + size > index.max_result_window:
+                raise ApiError(
+                    400,
+                    "illegal_argument_exception",
+                    "Result window is too large, from + size must be less than or equal to: [%s]"
+                    % index.max_result_window,
+                )
+        if "knn" in body:
+            scores = self._knn(body["knn"])
+            docs = set(scores)
+            if "query" in body:
+                docs &= self.matches()
+        else:
+            docs = self.matches()
+            scores = self.scores(docs)
+        if self.snapshot is not None:
+            docs = set(
+                doc
+                for doc in docs
+                if doc[0].sequence[doc[1]] < self.snapshot[doc[0].name]
+            )
+        if "slice" in body:
+            slice_id, slices = int(body["slice"]["id"]), int(body["slice"]["max"])
+            if not 0 <= slice_id < slices:
+                raise ApiError(
+                    400,
+                    "illegal_argument_exception",
+                    "The slice id must be lower than max",
+                )
+            docs = set(
+                doc
+                for doc in docs
+                if zlib.crc32(doc[1].encode("utf-8")) % slices == slice_id
+            )
+        hits = []
+        if size > 0:
+            hits = self.hits(
+                docs,
+                scores,
+                body.get("sort"),
+                size,
+                start,
+                body.get("search_after"),
+                body.get("collapse"),
+                body.get("_source"),
+            )
+        response = {
+            "took": 0,
+            "timed_out": False,
+            "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+            "hits": {
+                "total": {"value": len(docs), "relation": "eq"},
+                "max_score": max(scores.values()) if scores else None,
+                "hits": hits,
+            },
+        }
+        aggs = body.get("aggs", body.get("aggregations"))
+        if aggs:
+            response["aggregations"] = self.aggregate(aggs, list(docs))
+        return response
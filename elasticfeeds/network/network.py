@@ -1,4 +1,5 @@
 import datetime
+import hashlib
 from elasticfeeds.exceptions import (
     KeyWordError,
     ExtraTypeError,
@@ -9,7 +10,17 @@ from elasticfeeds.exceptions import (
 )
 from .activity import LinkedActivity
 
-__all__ = ["Link"]
+__all__ = ["Link", "network_lookup_id"]
+
+
+def network_lookup_id(actor_id):
+    """
+    The id of the document in the network index that lists everything an actor is linked to (see
+    Manager(network_lookup=True)). Feed queries can point a terms lookup at it.
+    :param actor_id: The actor ID
+    :return: String
+    """
+    return "lookup-" + actor_id
 
 
 class Link(object):
@@ -166,6 +177,27 @@ class Link(object):
             _dict["extra"] = self._extra
         return _dict
 
+    def get_key(self):
+        """
+        The fields that identify a link in the network. Two links with the same key are the same link.
+        :return: Tuple (actor_id, link_type, activity_class, activity_type, activity_id)
+        """
+        return (
+            self.actor_id,
+            self.link_type,
+            self.linked_activity.activity_class,
+            self.linked_activity.activity_type,
+            self.linked_activity.activity_id,
+        )
+
+    def get_id(self):
+        """
+        A deterministic document id for this link: the SHA-1 of its key. The same link always gets the same id,
+        which lets the network index detect duplicates on write and delete links by id.
+        :return: String
+        """
+        return hashlib.sha1("\x1f".join(self.get_key()).encode("utf-8")).hexdigest()
+
     def get_search_dict(self):
         """
         Creates a dict that is used for searching if a link already exist
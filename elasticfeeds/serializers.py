@@ -0,0 +1,139 @@
+"""
+Client serializers built on orjson (``pip install elasticfeeds[orjson]``).
+
+The Elasticsearch and OpenSearch clients encode every request body and decode every response with the stdlib
+json module, which dominates the client side of a search returning thousands of hits. Selecting
+``serializer="orjson"`` (``Manager(serializer="orjson")`` or ``get_backend(name, serializer="orjson")``) gives
+the client a subclass of its own JSON serializer that encodes and decodes with orjson instead. orjson encodes
+datetime, date and time values natively, so the manager then writes the activities as
+``Activity.get_dict(native_dates=True)`` builds them, without formatting their dates first.
+
+The subclasses keep the ``default`` hook of the client serializer, so the values orjson does not know (Decimal,
+...) are still converted the way the client converts them. They are built on first use: neither client needs
+to be installed to import this module.
+"""
+
+import functools
+import json
+
+__all__ = [
+    "SERIALIZERS",
+    "document_size",
+    "elasticsearch_serializer",
+    "opensearch_serializer",
+]
+
+#: The serializer names accepted by get_backend and the managers. "json" leaves the client's own serializer.
+SERIALIZERS = ("json", "orjson")
+
+
+def _orjson():
+    try:
+        import orjson
+    except ImportError as e:  # pragma: no cover - import guard
+        raise ImportError(
+            "orjson is required for serializer='orjson'. "
+            "Install it with: pip install elasticfeeds[orjson]"
+        ) from e
+    return orjson
+
+
+def _options(orjson):
+    # The stdlib serializers accept non-string keys and the clients convert numpy values in their default hook
+    return orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def document_size(serializer, document):
+    """
+    Measures a document the way a serializer encodes it, so sizing a _bulk request with orjson does not pay
+    for a stdlib encoding as well
+    :param serializer: "json" or "orjson"
+    :param document: The document
+    :return: Its approximate size in bytes
+    """
+    if serializer == "orjson":
+        orjson = _orjson()
+        return len(orjson.dumps(document, default=str, option=_options(orjson)))
+    return len(json.dumps(document, default=str))
+
+
+@functools.lru_cache(maxsize=None)
+def _elasticsearch_class():
+    orjson = _orjson()
+    from elasticsearch.exceptions import SerializationError
+    from elasticsearch.serializer import JsonSerializer
+
+    options = _options(orjson)
+
+    class OrjsonSerializer(JsonSerializer):
+        """The JsonSerializer of the Elasticsearch client, encoding and decoding with orjson"""
+
+        def dumps(self, data):
+            # Bodies that are already encoded are sent as they are
+            if isinstance(data, bytes):
+                return data
+            if isinstance(data, str):
+                return data.encode("utf-8", "surrogatepass")
+            try:
+                return orjson.dumps(data, default=self.default, option=options)
+            except TypeError as e:
+                raise SerializationError(
+                    message="Unable to serialize to JSON: %r (type: %s)"
+                    % (data, type(data).__name__),
+                    errors=(e,),
+                )
+
+        def loads(self, data):
+            try:
+                return orjson.loads(data)
+            except ValueError as e:
+                raise SerializationError(
+                    message="Unable to deserialize as JSON: %r" % (data,), errors=(e,)
+                )
+
+    return OrjsonSerializer
+
+
+@functools.lru_cache(maxsize=None)
+def _opensearch_class():
+    orjson = _orjson()
+    from opensearchpy.exceptions import SerializationError
+    from opensearchpy.serializer import JSONSerializer
+
+    options = _options(orjson)
+
+    class OrjsonSerializer(JSONSerializer):
+        """The JSONSerializer of the OpenSearch client, encoding and decoding with orjson"""
+
+        def dumps(self, data):
+            # The client joins the _bulk / _msearch lines as strings, so this returns a string too
+            if isinstance(data, str):
+                return data
+            try:
+                return orjson.dumps(data, default=self.default, option=options).decode(
+                    "utf-8"
+                )
+            except TypeError as e:
+                raise SerializationError(data, e)
+
+        def loads(self, s):
+            try:
+                return orjson.loads(s)
+            except ValueError as e:
+                raise SerializationError(s, e)
+
+    return OrjsonSerializer
+
+
+def elasticsearch_serializer():
+    """
+    :return: A serializer for Elasticsearch(serializer=...) that encodes and decodes with orjson
+    """
+    return _elasticsearch_class()()
+
+
+def opensearch_serializer():
+    """
+    :return: A serializer for OpenSearch(serializer=...) that encodes and decodes with orjson
+    """
+    return _opensearch_class()()
@@ -8,11 +8,12 @@ the aggregators a fake ``network_array`` / ``es_feed_result``.
 """
 
 import datetime
+from unittest.mock import MagicMock
 
 import pytest
 
 from elasticfeeds.activity import Actor, Object, Activity
-from elasticfeeds.exceptions import EmbeddingTypeError
+from elasticfeeds.exceptions import EmbeddingTypeError, CursorError
 from elasticfeeds.manager.manager import _get_feed_index_definition
 from elasticfeeds.backends import ElasticsearchBackend
 from elasticfeeds.aggregators import (
@@ -185,6 +186,48 @@ def test_cursor_next_cursor_logic():
     assert page2["next_cursor"] is None
 
 
+def test_cursor_point_in_time():
+    backend = MagicMock()
+    backend.point_in_time_tiebreaker.return_value = {"_shard_doc": {"order": "desc"}}
+    backend.open_point_in_time.return_value = "pit1"
+    connection = MagicMock()
+    connection.search.return_value = {
+        "pit_id": "pit2",
+        "hits": {"hits": [{"_source": {"a": 1}, "sort": [10, 7]}]},
+    }
+    aggregator = CursorAggregator("carlos", point_in_time=True, keep_alive="2m")
+    aggregator.result_size = 1
+    aggregator.network_array = _actor_network()
+    aggregator.backend = backend
+    aggregator.connection = connection
+    aggregator.feed_index = "feeds"
+    aggregator.set_query_dict()
+    aggregator.set_aggregation_section()
+    assert aggregator.query_dict["sort"][1] == {"_shard_doc": {"order": "desc"}}
+    assert "pit" not in aggregator.query_dict
+    aggregator.prepare_searches()
+    backend.open_point_in_time.assert_called_once_with(connection, "feeds", "2m")
+    assert aggregator.query_dict["pit"] == {"id": "pit1", "keep_alive": "2m"}
+    aggregator.query_feeds()
+    assert connection.search.call_args.kwargs["index"] is None
+    cursor = aggregator.get_feeds()["next_cursor"]
+    assert isinstance(cursor, str)
+    backend.close_point_in_time.assert_not_called()
+
+    # The next page resumes the renewed point in time after the last hit
+    following = CursorAggregator("carlos", search_after=cursor, point_in_time=True)
+    assert following.pit_id == "pit2"
+    assert following.search_after == [10, 7]
+    following.network_array = _actor_network()
+    following.set_query_dict()
+    following.set_aggregation_section()
+    assert following.query_dict["pit"] == {"id": "pit2", "keep_alive": "1m"}
+    assert following.query_dict["search_after"] == [10, 7]
+
+    with pytest.raises(CursorError):
+        CursorAggregator("carlos", search_after="not a cursor", point_in_time=True)
+
+
 # --------------------------------------------------------------------------- collapse
 
 
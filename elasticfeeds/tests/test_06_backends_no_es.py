@@ -59,6 +59,26 @@ def test_opensearch_backend_calls():
     c.search.assert_called_once_with(index="f", body={"q": 1})
 
 
+def test_point_in_time_calls():
+    b = ElasticsearchBackend()
+    c = MagicMock()
+    c.open_point_in_time.return_value = {"id": "pit1"}
+    assert b.open_point_in_time(c, "f", "1m") == "pit1"
+    c.open_point_in_time.assert_called_once_with(index="f", keep_alive="1m")
+    b.close_point_in_time(c, "pit1")
+    c.close_point_in_time.assert_called_once_with(id="pit1")
+    assert b.point_in_time_tiebreaker("desc") == {"_shard_doc": {"order": "desc"}}
+
+    b = OpenSearchBackend()
+    c = MagicMock()
+    c.create_point_in_time.return_value = {"pit_id": "pit2"}
+    assert b.open_point_in_time(c, "f", "1m") == "pit2"
+    c.create_point_in_time.assert_called_once_with(index="f", keep_alive="1m")
+    b.close_point_in_time(c, "pit2")
+    c.delete_point_in_time.assert_called_once_with(body={"pit_id": ["pit2"]})
+    assert b.point_in_time_tiebreaker("asc") == {"feed_id": {"order": "asc"}}
+
+
 # --------------------------------------------------------------------------- vector field mapping
 
 
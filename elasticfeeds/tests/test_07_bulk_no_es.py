@@ -0,0 +1,417 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the bulk write paths (activity ingestion and network links).
+
+A MagicMock stands in for the client and returns canned _bulk responses, so only the request shapes and the
+per-item result handling are exercised.
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.backends import ElasticsearchBackend, OpenSearchBackend
+from elasticfeeds.exceptions import (
+    ActivityObjectError,
+    LinkObjectError,
+    LinkExistError,
+    LinkNotExistError,
+)
+from elasticfeeds.manager import Manager
+from elasticfeeds.network import Link, LinkedActivity
+
+
+def _bulk_ok(operations=None, body=None):
+    """Fake _bulk response that accepts every item."""
+    lines = operations if operations is not None else body
+    items = []
+    for action in lines[::2]:
+        op_type, meta = next(iter(action.items()))
+        items.append({op_type: {"_id": meta["_id"], "status": 201}})
+    return {"errors": False, "items": items}
+
+
+def _activities(count):
+    for i in range(count):
+        yield Activity("add", Actor("mark", "person"), Object("p%d" % i, "project"))
+
+
+# --------------------------------------------------------------------------- backend bulk_index
+
+
+def test_bulk_index_request_shapes():
+    documents = [("id1", {"a": 1}), ("id2", {"a": 2})]
+    expected = [
+        {"index": {"_index": "f", "_id": "id1"}},
+        {"a": 1},
+        {"index": {"_index": "f", "_id": "id2"}},
+        {"a": 2},
+    ]
+
+    es_client = MagicMock()
+    es_client.bulk.side_effect = _bulk_ok
+    ids, failures = ElasticsearchBackend().bulk_index(es_client, "f", documents)
+    es_client.bulk.assert_called_once_with(operations=expected)
+    assert ids == ["id1", "id2"] and failures == []
+
+    os_client = MagicMock()
+    os_client.bulk.side_effect = _bulk_ok
+    OpenSearchBackend().bulk_index(os_client, "f", documents)
+    os_client.bulk.assert_called_once_with(body=expected)
+
+
+def test_bulk_index_reports_failures():
+    client = MagicMock()
+    client.bulk.return_value = {
+        "errors": True,
+        "items": [
+            {"index": {"_id": "id1", "status": 201}},
+            {
+                "index": {
+                    "_id": "id2",
+                    "status": 429,
+                    "error": {"type": "es_rejected_execution_exception"},
+                }
+            },
+        ],
+    }
+    ids, failures = ElasticsearchBackend().bulk_index(
+        client, "f", [("id1", {}), ("id2", {})]
+    )
+    assert ids == ["id1"]
+    assert failures == [
+        {
+            "id": "id2",
+            "status": 429,
+            "error": {"type": "es_rejected_execution_exception"},
+        }
+    ]
+
+
+def test_bulk_index_empty_does_not_call_client():
+    client = MagicMock()
+    assert ElasticsearchBackend().bulk_index(client, "f", []) == ([], [])
+    client.bulk.assert_not_called()
+
+
+# --------------------------------------------------------------------------- Manager.add_activity_feeds
+
+
+def test_add_activity_feeds_chunks_requests():
+    client = MagicMock()
+    client.bulk.side_effect = _bulk_ok
+    manager = Manager(feed_index="f", network_index="n", connection=client)
+    result = manager.add_activity_feeds(_activities(5), chunk_size=2)
+    assert client.bulk.call_count == 3  # 2 + 2 + 1
+    assert len(result["ids"]) == 5 and result["failures"] == []
+    first_batch = client.bulk.call_args_list[0].kwargs["operations"]
+    assert first_batch[0]["index"]["_index"] == "f"
+    # feed_id mirrors the document id, as in add_activity_feed
+    assert first_batch[1]["feed_id"] == first_batch[0]["index"]["_id"]
+
+
+def test_add_activity_feeds_respects_max_bytes():
+    client = MagicMock()
+    client.bulk.side_effect = _bulk_ok
+    manager = Manager(feed_index="f", network_index="n", connection=client)
+    manager.add_activity_feeds(_activities(3), chunk_size=100, max_bytes=1)
+    # a single document is bigger than max_bytes, so every request carries one document
+    assert client.bulk.call_count == 3
+
+
+def test_add_activity_feeds_rejects_non_activities():
+    manager = Manager(feed_index="f", network_index="n", connection=MagicMock())
+    with pytest.raises(ActivityObjectError):
+        manager.add_activity_feeds(["not an activity"])
+
+
+# --------------------------------------------------------------------------- Manager.load_activity_feeds
+
+
+def test_load_activity_feeds_counts_and_retries_rejections():
+    client = MagicMock()
+    calls = []
+
+    def bulk(operations):
+        calls.append(operations)
+        if len(calls) == 1:
+            # first request: reject the second item with 429
+            first_id = operations[0]["index"]["_id"]
+            second_id = operations[2]["index"]["_id"]
+            return {
+                "errors": True,
+                "items": [
+                    {"index": {"_id": first_id, "status": 201}},
+                    {"index": {"_id": second_id, "status": 429, "error": {}}},
+                ],
+            }
+        return _bulk_ok(operations)
+
+    client.bulk.side_effect = bulk
+    manager = Manager(feed_index="f", network_index="n", connection=client)
+    seen = []
+    stats = manager.load_activity_feeds(
+        _activities(2),
+        workers=1,
+        chunk_size=2,
+        initial_backoff=0,
+        progress=seen.append,
+    )
+    assert stats["indexed"] == 2
+    assert stats["retried"] == 1
+    assert stats["failed"] == 0
+    assert stats["requests"] == 2
+    # the retry only resends the rejected item
+    assert len(calls[1]) == 2
+    assert [s["requests"] for s in seen] == [1, 2]
+
+
+def test_load_activity_feeds_gives_up_after_max_retries():
+    client = MagicMock()
+
+    def bulk(operations):
+        return {
+            "errors": True,
+            "items": [
+                {"index": {"_id": a["index"]["_id"], "status": 429, "error": {}}}
+                for a in operations[::2]
+            ],
+        }
+
+    client.bulk.side_effect = bulk
+    manager = Manager(feed_index="f", network_index="n", connection=client)
+    stats = manager.load_activity_feeds(
+        _activities(3), workers=2, chunk_size=1, max_retries=2, initial_backoff=0
+    )
+    assert stats["indexed"] == 0
+    assert stats["failed"] == 3
+    assert client.bulk.call_count == 9  # 3 chunks x (1 + 2 retries)
+
+
+class _Rejected(Exception):
+    status_code = 429
+
+
+def test_load_activity_feeds_reports_rejected_requests():
+    client = MagicMock()
+    client.bulk.side_effect = _Rejected("es_rejected_execution_exception")
+    manager = Manager(feed_index="f", network_index="n", connection=client)
+    seen = []
+    stats = manager.load_activity_feeds(
+        _activities(3),
+        workers=1,
+        chunk_size=1,
+        max_retries=1,
+        initial_backoff=0,
+        progress=seen.append,
+    )
+    # the whole requests kept being rejected: reported, and the import went on
+    assert stats["indexed"] == 0
+    assert stats["failed"] == 3
+    assert [f["status"] for f in stats["failures"]] == [429, 429, 429]
+    assert client.bulk.call_count == 6
+    # every snapshot has its own copy of the failures
+    assert [len(s["failures"]) for s in seen] == [0, 1, 1, 2, 2, 3]
+
+
+# --------------------------------------------------------------------------- batch network links
+
+
+def _exists_response(*flags):
+    return {
+        "hits": {"total": {"value": 0}, "hits": []},
+        "aggregations": {
+            "links": {
+                "buckets": {
+                    str(i): {"doc_count": 1 if flag else 0}
+                    for i, flag in enumerate(flags)
+                }
+            }
+        },
+    }
+
+
+def test_add_network_links_checks_once_and_writes_once():
+    client = MagicMock()
+    client.search.return_value = _exists_response(False, True, False)
+    client.bulk.side_effect = _bulk_ok
+    manager = Manager(feed_index="f", network_index="n", connection=client)
+    links = [
+        Link("carlos", LinkedActivity("mark")),
+        Link("carlos", LinkedActivity("jane")),
+        Link("carlos", LinkedActivity("mark")),  # repeated in the batch
+    ]
+    result = manager.add_network_links(links)
+    assert client.search.call_count == 1
+    assert client.bulk.call_count == 1
+    filters = client.search.call_args.kwargs["body"]["aggs"]["links"]["filters"]
+    assert sorted(filters["filters"]) == ["0", "1", "2"]
+    assert len(result["ids"]) == 1
+    assert result["existing"] == [links[1], links[2]]
+    operations = client.bulk.call_args.kwargs["operations"]
+    assert operations[1]["linked_activity"]["id"] == "mark"
+
+
+def _link_hit(doc_id, link):
+    source = link.get_dict()
+    return {"_id": doc_id, "_source": source}
+
+
+def test_remove_network_link_deletes_by_id():
+    client = MagicMock()
+    link = Link("carlos", LinkedActivity("mark"))
+    client.search.return_value = {
+        "hits": {"total": {"value": 1}, "hits": [_link_hit("id1", link)]}
+    }
+    manager = Manager(feed_index="f", network_index="n", connection=client)
+    assert manager.remove_network_link(link) is True
+    assert client.search.call_count == 1  # no separate existence check
+    client.delete.assert_called_once_with(index="n", id="id1")
+    client.delete_by_query.assert_not_called()
+
+    client.search.return_value = {"hits": {"total": {"value": 0}, "hits": []}}
+    with pytest.raises(LinkNotExistError):
+        manager.remove_network_link(link)
+
+
+def test_remove_network_links_bulk_deletes_resolved_ids():
+    client = MagicMock()
+    mark = Link("carlos", LinkedActivity("mark"))
+    jane = Link("carlos", LinkedActivity("jane"))
+    client.search.return_value = {
+        "hits": {
+            "total": {"value": 2},
+            # the same link stored twice (e.g. a past race) is cleaned up as well
+            "hits": [_link_hit("id1", mark), _link_hit("id2", mark)],
+        }
+    }
+    client.bulk.side_effect = lambda operations: {
+        "errors": False,
+        "items": [
+            {"delete": {"_id": op["delete"]["_id"], "status": 200}} for op in operations
+        ],
+    }
+    manager = Manager(feed_index="f", network_index="n", connection=client)
+    result = manager.remove_network_links([mark, jane, mark])
+    # the repeated link is reported once
+    assert result == {"removed": [mark], "missing": [jane], "failures": []}
+    assert client.bulk.call_args.kwargs["operations"] == [
+        {"delete": {"_index": "n", "_id": "id1"}},
+        {"delete": {"_index": "n", "_id": "id2"}},
+    ]
+    client.delete_by_query.assert_not_called()
+
+
+def test_batch_links_reject_non_links():
+    manager = Manager(feed_index="f", network_index="n", connection=MagicMock())
+    with pytest.raises(LinkObjectError):
+        manager.add_network_links(["nope"])
+    with pytest.raises(LinkObjectError):
+        manager.remove_network_links(["nope"])
+
+
+# --------------------------------------------------------------------------- deterministic link ids
+
+
+def test_link_id_is_deterministic():
+    a = Link("carlos", LinkedActivity("mark"))
+    b = Link("carlos", LinkedActivity("mark"), link_weight=3)
+    c = Link("carlos", LinkedActivity("mark"), link_type="watch")
+    assert a.get_id() == b.get_id()
+    assert a.get_id() != c.get_id()
+
+
+def test_unknown_link_id_strategy():
+    with pytest.raises(ValueError):
+        Manager(connection=MagicMock(), link_id_strategy="nope")
+
+
+class _Conflict(Exception):
+    status_code = 409
+
+
+class _NotFound(Exception):
+    status_code = 404
+
+
+def test_hash_strategy_add_and_remove_skip_the_search():
+    client = MagicMock()
+    manager = Manager(
+        feed_index="f", network_index="n", connection=client, link_id_strategy="hash"
+    )
+    link = Link("carlos", LinkedActivity("mark"))
+    assert manager.add_network_link(link) == link.get_id()
+    client.create.assert_called_once_with(
+        index="n", id=link.get_id(), document=link.get_dict()
+    )
+    assert manager.remove_network_link(link) is True
+    client.delete.assert_called_once_with(index="n", id=link.get_id())
+    client.search.assert_not_called()
+    client.delete_by_query.assert_not_called()
+
+    client.create.side_effect = _Conflict()
+    with pytest.raises(LinkExistError):
+        manager.add_network_link(link)
+    client.delete.side_effect = _NotFound()
+    with pytest.raises(LinkNotExistError):
+        manager.remove_network_link(link)
+
+
+def test_hash_strategy_batch_links():
+    client = MagicMock()
+    mark = Link("carlos", LinkedActivity("mark"))
+    jane = Link("carlos", LinkedActivity("jane"))
+    client.bulk.return_value = {
+        "errors": True,
+        "items": [
+            {"create": {"_id": mark.get_id(), "status": 201}},
+            {"create": {"_id": jane.get_id(), "status": 409, "error": {}}},
+        ],
+    }
+    manager = Manager(
+        feed_index="f", network_index="n", connection=client, link_id_strategy="hash"
+    )
+    result = manager.add_network_links([mark, jane])
+    assert result["ids"] == [mark.get_id()]
+    assert result["existing"] == [jane]
+    operations = client.bulk.call_args.kwargs["operations"]
+    assert operations[0] == {"create": {"_index": "n", "_id": mark.get_id()}}
+    client.search.assert_not_called()
+
+    client.bulk.return_value = {
+        "errors": False,
+        "items": [
+            {"delete": {"_id": mark.get_id(), "status": 200, "result": "deleted"}},
+            {"delete": {"_id": jane.get_id(), "status": 404, "result": "not_found"}},
+        ],
+    }
+    result = manager.remove_network_links([mark, jane])
+    assert result == {"removed": [mark], "missing": [jane], "failures": []}
+
+
+def test_batch_links_update_the_lookup_of_stored_links_only():
+    client = MagicMock()
+    mark = Link("carlos", LinkedActivity("mark"))
+    jane = Link("carlos", LinkedActivity("jane"))
+    star = Link("carlos", LinkedActivity("star"))
+    client.bulk.return_value = {
+        "errors": True,
+        "items": [
+            {"create": {"_id": mark.get_id(), "status": 201}},
+            {"create": {"_id": jane.get_id(), "status": 409, "error": {}}},
+            {"create": {"_id": star.get_id(), "status": 400, "error": {}}},
+        ],
+    }
+    manager = Manager(
+        feed_index="f",
+        network_index="n",
+        connection=client,
+        link_id_strategy="hash",
+        network_lookup=True,
+    )
+    result = manager.add_network_links([mark, jane, star])
+    assert [failure["id"] for failure in result["failures"]] == [star.get_id()]
+    # only mark was stored, so only mark joins the lookup document
+    assert client.update.call_args.kwargs["script"]["params"]["values"] == ["mark"]
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the caches and how the Manager uses and invalidates them.
+"""
+
+import time
+from unittest.mock import MagicMock
+
+from elasticfeeds.caches import LRUCache
+from elasticfeeds.manager import Manager
+
+
+def _network_response(*ids):
+    hits = [
+        {
+            "_id": "link_%s" % an_id,
+            "_source": {
+                "linked": "2020-01-01T00:00:00",
+                "actor_id": "carlos",
+                "link_type": "follow",
+                "linked_activity": {
+                    "activity_class": "actor",
+                    "id": an_id,
+                    "type": "person",
+                },
+                "link_weight": 1,
+            },
+        }
+        for an_id in ids
+    ]
+    return {"hits": {"total": {"value": len(hits)}, "hits": hits}}
+
+
+# --------------------------------------------------------------------------- LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2, ttl=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" becomes the most recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    cache.delete("a")
+    assert cache.get("a") is None
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_lru_cache_ttl():
+    cache = LRUCache(ttl=0.01)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+
+# --------------------------------------------------------------------------- network cache
+
+
+def test_get_network_uses_cache_and_follow_invalidates():
+    client = MagicMock()
+    client.search.return_value = _network_response("mark")
+    manager = Manager(
+        feed_index="f", network_index="n", connection=client, network_cache=LRUCache()
+    )
+    first = manager.get_network("carlos")
+    assert manager.get_network("carlos") == first
+    assert client.search.call_count == 1
+
+    # follow (hash strategy avoids the existence search) invalidates carlos only
+    manager.link_id_strategy = "hash"
+    manager.get_network("jane")
+    manager.follow("carlos", "jane")
+    calls = client.search.call_count
+    manager.get_network("jane")
+    assert client.search.call_count == calls  # jane still cached
+    manager.get_network("carlos")
+    assert client.search.call_count == calls + 1
+
+
+def test_un_follow_invalidates_network_cache():
+    client = MagicMock()
+    client.search.return_value = _network_response("mark")
+    manager = Manager(
+        feed_index="f", network_index="n", connection=client, network_cache=LRUCache()
+    )
+    manager.get_network("carlos")
+    manager.un_follow("carlos", "mark")
+    client.search.reset_mock()
+    manager.get_network("carlos")
+    assert client.search.call_count == 1
+
+
+def test_cached_network_is_not_shared_with_the_caller():
+    client = MagicMock()
+    client.search.return_value = _network_response("mark")
+    manager = Manager(
+        feed_index="f", network_index="n", connection=client, network_cache=LRUCache()
+    )
+    manager.get_network("carlos").append({"bogus": True})
+    assert len(manager.get_network("carlos")) == 1
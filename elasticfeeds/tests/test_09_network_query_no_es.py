@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for how the network is compiled into the feed query (the network_filter modes).
+"""
+
+import datetime
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from elasticfeeds.aggregators import (
+    UnAggregated,
+    YearMonthAggregator,
+    DateWeightAggregator,
+)
+from elasticfeeds.exceptions import (
+    NetworkFilterError,
+    SinceGranularityError,
+    SinceWindowError,
+)
+from elasticfeeds.manager import Manager
+
+
+def _link(an_id, linked, activity_class="actor", activity_type="person"):
+    return {
+        "linked": linked,
+        "actor_id": "carlos",
+        "link_type": "follow" if activity_class == "actor" else "watch",
+        "linked_activity": {
+            "activity_class": activity_class,
+            "id": an_id,
+            "type": activity_type,
+        },
+        "link_weight": 1,
+    }
+
+
+def test_year_is_added_to_every_clause():
+    aggregator = YearMonthAggregator("carlos", year=2020)
+    aggregator.network_array = [
+        _link("mark", "2020-01-01T00:00:00"),
+        _link("proj_a", "2020-01-01T00:00:00", "object", "project"),
+    ]
+    aggregator.set_query_dict()
+    should = aggregator.query_dict["query"]["bool"]["should"]
+    assert should[0] == {
+        "bool": {
+            "must": [
+                {"term": {"actor.id": "mark"}},
+                {"term": {"actor.type": "person"}},
+                {"range": {"published": {"gte": "2020-01-01T00:00:00"}}},
+                {"term": {"published_year": 2020}},
+            ]
+        }
+    }
+    assert len(should) == 3
+    assert {"term": {"target.id": "proj_a"}} in should[2]["bool"]["must"]
+
+
+def test_date_weight_only_uses_actor_links():
+    aggregator = DateWeightAggregator("carlos")
+    aggregator.network_array = [
+        _link("mark", "2020-01-01T00:00:00"),
+        _link("proj_a", "2020-01-01T00:00:00", "object", "project"),
+    ]
+    aggregator.set_query_dict()
+    should = aggregator.query_dict["query"]["bool"]["should"]
+    assert len(should) == 1
+    assert {"term": {"actor.id": "mark"}} in should[0]["bool"]["must"]
+
+
+def test_terms_filter_groups_links_by_type_and_day():
+    recent = (datetime.datetime.now() - datetime.timedelta(hours=1)).isoformat()
+    aggregator = UnAggregated("carlos")
+    aggregator.network_filter = "terms"
+    aggregator.network_array = [
+        _link("mark", "2020-01-01T10:00:00"),
+        _link("jane", "2020-01-01T08:00:00"),
+        _link("katie", "2020-01-02T08:00:00"),
+        _link("bot", "2020-01-01T08:00:00", activity_type="service"),
+        _link("proj_a", "2020-01-01T09:00:00", "object", "project"),
+        _link("new", recent),
+    ]
+    aggregator.set_query_dict()
+    should = aggregator.query_dict["query"]["bool"]["should"]
+    # persons on 01-01, persons on 01-02, services on 01-01, project (object + target), recent link
+    assert len(should) == 6
+    assert should[0] == {
+        "bool": {
+            "must": [
+                {"terms": {"actor.id": ["mark", "jane"]}},
+                {"term": {"actor.type": "person"}},
+                # the earliest link of the group is used for the whole group
+                {"range": {"published": {"gte": "2020-01-01T08:00:00"}}},
+            ]
+        }
+    }
+    assert {"term": {"target.id": "proj_a"}} in should[4]["bool"]["must"]
+    # the recent link keeps its exact since date
+    assert should[5]["bool"]["must"][2] == {"range": {"published": {"gte": recent}}}
+
+
+def test_terms_filter_month_granularity():
+    aggregator = UnAggregated("carlos")
+    aggregator.network_filter = "terms"
+    aggregator.since_granularity = "month"
+    aggregator.network_array = [
+        _link("mark", "2020-01-01T10:00:00"),
+        _link("jane", "2020-01-20T08:00:00"),
+    ]
+    aggregator.set_query_dict()
+    should = aggregator.query_dict["query"]["bool"]["should"]
+    assert len(should) == 1
+    assert should[0]["bool"]["must"][0] == {"terms": {"actor.id": ["mark", "jane"]}}
+
+
+def test_unknown_network_filter():
+    with pytest.raises(NetworkFilterError):
+        UnAggregated("carlos").network_filter = "nope"
+
+
+def test_unknown_since_options():
+    aggregator = UnAggregated("carlos")
+    with pytest.raises(SinceGranularityError):
+        aggregator.since_granularity = "week"
+    with pytest.raises(SinceWindowError):
+        aggregator.exact_since_window = 86400
+    assert aggregator.since_granularity == "day"
+    assert aggregator.exact_since_window == datetime.timedelta(days=1)
+
+
+def test_lookup_filter_uses_the_lookup_document():
+    aggregator = UnAggregated("carlos")
+    aggregator.network_filter = "lookup"
+    aggregator.network_index = "net"
+    aggregator.set_query_dict()
+    should = aggregator.query_dict["query"]["bool"]["should"]
+    assert len(should) == 3
+    assert should[0] == {
+        "bool": {
+            "must": [
+                {
+                    "terms": {
+                        "actor.id": {
+                            "index": "net",
+                            "id": "lookup-carlos",
+                            "path": "lookup_actors",
+                        }
+                    }
+                }
+            ]
+        }
+    }
+    assert should[2]["bool"]["must"][0]["terms"]["target.id"]["path"] == (
+        "lookup_objects"
+    )
+
+
+def test_manager_keeps_lookup_documents_in_sync():
+    client = MagicMock()
+    manager = Manager(
+        feed_index="f",
+        network_index="n",
+        connection=client,
+        link_id_strategy="hash",
+        network_lookup=True,
+    )
+    manager.follow("carlos", "mark")
+    kwargs = client.update.call_args.kwargs
+    assert kwargs["id"] == "lookup-carlos"
+    assert kwargs["script"]["params"] == {
+        "field": "lookup_actors",
+        "values": ["mark"],
+    }
+    assert kwargs["upsert"] == {"lookup_actors": ["mark"]}
+
+    manager.un_follow("carlos", "mark")
+    kwargs = client.update.call_args.kwargs
+    assert kwargs["id"] == "lookup-carlos"
+    assert kwargs["script"]["params"]["values"] == ["mark"]
+    assert (
+        kwargs["script"]["source"]
+        != client.update.call_args_list[0].kwargs["script"]["source"]
+    )
+
+
+def test_get_feeds_skips_the_network_search_with_lookup():
+    client = MagicMock()
+    client.search.return_value = {"hits": {"total": {"value": 0}, "hits": []}}
+    manager = Manager(feed_index="f", network_index="n", connection=client)
+    aggregator = UnAggregated("carlos")
+    aggregator.network_filter = "lookup"
+    manager.get_feeds(aggregator)
+    # only the feed search runs
+    assert client.search.call_count == 1
+    assert client.search.call_args.kwargs["index"] == "f"
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the fan-out-on-write mode (timeline index and MaterializedFeedAggregator).
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.aggregators import MaterializedFeedAggregator
+from elasticfeeds.exceptions import TimelineIndexError
+from elasticfeeds.manager import Manager
+
+
+def _bulk_ok(operations=None, body=None):
+    lines = operations if operations is not None else body
+    items = []
+    for action in lines[::2]:
+        op_type, meta = next(iter(action.items()))
+        items.append({op_type: {"_id": meta["_id"], "status": 201}})
+    return {"errors": False, "items": items}
+
+
+def _followers_response(*followers):
+    buckets = [
+        {"key": follower, "doc_count": 1, "via": {"buckets": [{"key": "mark"}]}}
+        for follower in followers
+    ]
+    return {
+        "hits": {"total": {"value": 0}, "hits": []},
+        "aggregations": {"followers": {"buckets": buckets}},
+    }
+
+
+def _manager(client, **kwargs):
+    client.bulk.side_effect = _bulk_ok
+    return Manager(
+        feed_index="f",
+        network_index="n",
+        connection=client,
+        timeline_index="t",
+        **kwargs
+    )
+
+
+def _activity():
+    return Activity("add", Actor("mark", "person"), Object("proj_a", "project"))
+
+
+def test_add_activity_feed_fans_out_to_followers():
+    client = MagicMock()
+    client.search.return_value = _followers_response("carlos", "jane")
+    manager = _manager(client)
+    feed_id = manager.add_activity_feed(_activity())
+
+    body = client.search.call_args.kwargs["body"]
+    assert client.search.call_args.kwargs["index"] == "n"
+    assert len(body["query"]["bool"]["should"]) == 2  # actor + object links
+    assert body["aggs"]["followers"]["terms"]["size"] == 10001
+
+    document = client.index.call_args.kwargs["document"]
+    assert document["fanned_out"] is True
+
+    operations = client.bulk.call_args.kwargs["operations"]
+    assert operations[0] == {"index": {"_index": "t", "_id": "carlos:" + feed_id}}
+    assert operations[1]["owner"] == "carlos"
+    assert operations[1]["via"] == ["mark"]
+    assert operations[1]["feed_id"] == feed_id
+    assert "fanned_out" not in operations[1]["activity"]
+    assert operations[2]["index"]["_id"] == "jane:" + feed_id
+
+
+def test_popular_activity_is_not_fanned_out():
+    client = MagicMock()
+    client.search.return_value = _followers_response("carlos", "jane", "katie")
+    manager = _manager(client, fanout_threshold=2)
+    manager.add_activity_feed(_activity())
+    assert client.index.call_args.kwargs["document"]["fanned_out"] is False
+    client.bulk.assert_not_called()
+
+
+def test_add_activity_feeds_fans_out_every_chunk():
+    client = MagicMock()
+    client.msearch.side_effect = lambda searches: {
+        "responses": [_followers_response("carlos")] * (len(searches) // 2)
+    }
+    manager = _manager(client)
+    result = manager.add_activity_feeds([_activity() for _ in range(3)], chunk_size=2)
+    assert len(result["ids"]) == 3 and result["failures"] == []
+    # the followers of each chunk are found with one _msearch request
+    assert client.msearch.call_count == 2
+    client.search.assert_not_called()
+    timeline_ids = []
+    for call in client.bulk.call_args_list:
+        operations = call.kwargs["operations"]
+        if operations[0]["index"]["_index"] == "t":
+            timeline_ids.extend(action["index"]["_id"] for action in operations[::2])
+    assert timeline_ids == ["carlos:" + feed_id for feed_id in result["ids"]]
+
+
+def test_unfollow_clears_the_timeline():
+    client = MagicMock()
+    references = {
+        "hits": {"total": {"value": 0}, "hits": []},
+        "aggregations": {"references": {"buckets": []}},
+    }
+    timeline = {
+        "hits": {
+            "total": {"value": 2},
+            "hits": [
+                {"_id": "carlos:a1", "_source": {"owner": "carlos", "via": ["mark"]}},
+                # also brought by the watch of proj_a, so only "mark" is removed
+                {
+                    "_id": "carlos:a2",
+                    "_source": {"owner": "carlos", "via": ["mark", "proj_a"]},
+                },
+            ],
+        }
+    }
+    manager = _manager(client, link_id_strategy="hash")
+    client.search.side_effect = [references, timeline]
+    client.bulk.side_effect = lambda operations: {"errors": False, "items": []}
+    manager.un_follow("carlos", "mark")
+    kwargs = client.search.call_args.kwargs
+    assert kwargs["index"] == "t"
+    assert kwargs["body"]["query"]["bool"]["should"][0]["bool"]["filter"] == [
+        {"term": {"owner": "carlos"}},
+        {"terms": {"via": ["mark"]}},
+    ]
+    (deletes,), (updates,) = [
+        call.kwargs.values() for call in client.bulk.call_args_list
+    ]
+    assert deletes == [{"delete": {"_index": "t", "_id": "carlos:a1"}}]
+    assert updates[0] == {"update": {"_index": "t", "_id": "carlos:a2"}}
+    assert updates[1]["script"]["params"] == {"field": "via", "values": ["mark"]}
+    client.delete_by_query.assert_not_called()
+
+
+def test_materialized_feed_only_reads_the_timeline():
+    client = MagicMock()
+    client.search.return_value = {
+        "hits": {
+            "total": {"value": 1},
+            "hits": [{"_source": {"activity": {"published": "2020-01-01"}}}],
+        }
+    }
+    manager = _manager(client)
+    feeds = manager.get_feeds(MaterializedFeedAggregator("carlos", hybrid=False))
+    assert feeds == [{"published": "2020-01-01"}]
+    client.search.assert_called_once()
+    kwargs = client.search.call_args.kwargs
+    assert kwargs["index"] == "t"
+    assert kwargs["body"]["query"]["bool"]["filter"] == [{"term": {"owner": "carlos"}}]
+
+
+def test_hybrid_feed_merges_the_activities_read_at_read_time():
+    timeline = {
+        "hits": {
+            "total": {"value": 2},
+            "hits": [
+                {"_source": {"activity": {"published": "2020-01-03"}}, "sort": [3]},
+                {"_source": {"activity": {"published": "2020-01-01"}}, "sort": [1]},
+            ],
+        }
+    }
+    feeds = {
+        "hits": {
+            "total": {"value": 1},
+            "hits": [{"_source": {"published": "2020-01-02"}, "sort": [2]}],
+        }
+    }
+    aggregator = MaterializedFeedAggregator("carlos")
+    aggregator.result_size = 2
+    aggregator.network_array = [
+        {
+            "linked": "2019-01-01T00:00:00",
+            "actor_id": "carlos",
+            "link_type": "follow",
+            "linked_activity": {
+                "activity_class": "actor",
+                "id": "star",
+                "type": "person",
+            },
+            "link_weight": 1,
+        }
+    ]
+    aggregator.timeline_index = "t"
+    aggregator.feed_index = "f"
+    aggregator.connection = MagicMock()
+    aggregator.connection.search.side_effect = [timeline, feeds]
+    aggregator.set_query_dict()
+    aggregator.set_aggregation_section()
+    assert aggregator.network_query_dict["query"]["bool"]["must_not"] == [
+        {"term": {"fanned_out": True}}
+    ]
+    aggregator.query_feeds()
+    assert [activity["published"] for activity in aggregator.get_feeds()] == [
+        "2020-01-03",
+        "2020-01-02",
+    ]
+
+
+def test_materialized_feed_needs_a_timeline_index():
+    manager = Manager(feed_index="f", network_index="n", connection=MagicMock())
+    with pytest.raises(TimelineIndexError):
+        manager.get_feeds(MaterializedFeedAggregator("carlos"))
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for AsyncManager and the async backend adapters. An AsyncMock stands in for the
+AsyncElasticsearch / AsyncOpenSearch client.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.aggregators import UnAggregated, MaterializedFeedAggregator
+from elasticfeeds.backends import (
+    get_async_backend,
+    AsyncElasticsearchBackend,
+    AsyncOpenSearchBackend,
+)
+from elasticfeeds.caches import LRUCache
+from elasticfeeds.exceptions import LinkExistError, LinkObjectError
+from elasticfeeds.manager import AsyncManager
+from elasticfeeds.network import Link, LinkedActivity
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def _network_response(*ids):
+    hits = [
+        {
+            "_id": "link_%s" % an_id,
+            "_source": {
+                "linked": "2020-01-01T00:00:00",
+                "actor_id": "carlos",
+                "link_type": "follow",
+                "linked_activity": {
+                    "activity_class": "actor",
+                    "id": an_id,
+                    "type": "person",
+                },
+                "link_weight": 1,
+            },
+        }
+        for an_id in ids
+    ]
+    return {"hits": {"total": {"value": len(hits)}, "hits": hits}}
+
+
+def test_get_async_backend():
+    assert isinstance(get_async_backend("elasticsearch"), AsyncElasticsearchBackend)
+    assert isinstance(get_async_backend("opensearch"), AsyncOpenSearchBackend)
+    assert get_async_backend("opensearch").name == "opensearch"
+    with pytest.raises(ValueError):
+        get_async_backend("solr")
+
+
+def test_async_backends_send_the_sync_request_shapes():
+    es_client = AsyncMock()
+    os_client = AsyncMock()
+    _run(AsyncElasticsearchBackend().index_document(es_client, "f", "1", {"a": 1}))
+    _run(AsyncOpenSearchBackend().index_document(os_client, "f", "1", {"a": 1}))
+    es_client.index.assert_awaited_once_with(index="f", id="1", document={"a": 1})
+    os_client.index.assert_awaited_once_with(index="f", id="1", body={"a": 1})
+
+    es_client.bulk.return_value = {
+        "errors": False,
+        "items": [{"delete": {"_id": "1", "status": 200}}],
+    }
+    ids, failures = _run(AsyncElasticsearchBackend().bulk_delete(es_client, "n", ["1"]))
+    es_client.bulk.assert_awaited_once_with(
+        operations=[{"delete": {"_index": "n", "_id": "1"}}]
+    )
+    assert ids == ["1"] and failures == []
+
+
+def test_initialize_creates_missing_indices():
+    client = AsyncMock()
+    client.indices.exists.return_value = False
+    manager = AsyncManager(
+        feed_index="f", network_index="n", connection=client, timeline_index="t"
+    )
+    client.indices.exists.assert_not_called()  # nothing is sent before initialize
+    _run(manager.initialize())
+    created = sorted(c.kwargs["index"] for c in client.indices.create.await_args_list)
+    assert created == ["f", "n", "t"]
+
+
+def test_get_feeds_awaits_the_network_and_the_feed_query():
+    client = AsyncMock()
+    feeds = {
+        "hits": {
+            "total": {"value": 1},
+            "hits": [{"_source": {"published": "2020-01-02"}}],
+        }
+    }
+    client.search.side_effect = [_network_response("mark"), feeds]
+    manager = AsyncManager(
+        feed_index="f", network_index="n", connection=client, network_cache=LRUCache()
+    )
+    result = _run(manager.get_feeds(UnAggregated("carlos")))
+    assert result == [{"published": "2020-01-02"}]
+    assert [c.kwargs["index"] for c in client.search.await_args_list] == ["n", "f"]
+
+    # the network now comes from the cache
+    client.search.side_effect = [feeds]
+    _run(manager.get_feeds(UnAggregated("carlos")))
+    assert client.search.await_count == 3
+
+
+def test_hybrid_materialized_feed_sends_both_searches():
+    client = AsyncMock()
+    client.search.side_effect = [
+        _network_response("star"),
+        {"hits": {"total": {"value": 0}, "hits": []}},
+        {"hits": {"total": {"value": 0}, "hits": []}},
+    ]
+    manager = AsyncManager(
+        feed_index="f", network_index="n", connection=client, timeline_index="t"
+    )
+    assert _run(manager.get_feeds(MaterializedFeedAggregator("carlos"))) == []
+    assert sorted(c.kwargs["index"] for c in client.search.await_args_list) == [
+        "f",
+        "n",
+        "t",
+    ]
+
+
+def test_async_link_operations():
+    client = AsyncMock()
+    manager = AsyncManager(
+        feed_index="f",
+        network_index="n",
+        connection=client,
+        link_id_strategy="hash",
+        network_lookup=True,
+    )
+    _run(manager.follow("carlos", "mark"))
+    client.create.assert_awaited_once()
+    assert client.update.await_args.kwargs["id"] == "lookup-carlos"
+
+    client.create.side_effect = type("Conflict", (Exception,), {"status_code": 409})
+    with pytest.raises(LinkExistError):
+        _run(manager.follow("carlos", "mark"))
+
+    assert _run(manager.un_follow("carlos", "mark")) is True
+    client.delete.assert_awaited_once()
+
+
+def _bulk_response(operations, status=201):
+    items = []
+    for operation in operations:
+        if isinstance(operation, dict) and len(operation) == 1:
+            action, meta = next(iter(operation.items()))
+            if isinstance(meta, dict) and "_id" in meta:
+                items.append({action: {"_id": meta["_id"], "status": status}})
+    return {"errors": False, "items": items}
+
+
+def test_async_batch_link_operations():
+    client = AsyncMock()
+    cache = LRUCache()
+    manager = AsyncManager(
+        feed_index="f", network_index="n", connection=client, network_cache=cache
+    )
+    mark = Link("carlos", LinkedActivity("mark"))
+    jane = Link("carlos", LinkedActivity("jane"))
+    cache.set(manager._network_cache_key("carlos"), [])
+    client.search.return_value = {
+        "aggregations": {
+            "links": {
+                "buckets": {
+                    "0": {"doc_count": 0},
+                    "1": {"doc_count": 1},
+                    "2": {"doc_count": 0},
+                }
+            }
+        }
+    }
+    client.bulk.side_effect = lambda operations: _bulk_response(operations)
+    result = _run(manager.add_network_links([mark, jane, mark]))
+    assert client.search.await_count == 1 and client.bulk.await_count == 1
+    assert len(result["ids"]) == 1
+    assert result["existing"] == [jane, mark] and result["failures"] == []
+    assert cache.get(manager._network_cache_key("carlos")) is None
+
+    client.search.return_value = _network_response("mark", "mark")
+    client.bulk.side_effect = lambda operations: _bulk_response(operations, 200)
+    result = _run(manager.remove_network_links([mark, jane, mark]))
+    assert result == {"removed": [mark], "missing": [jane], "failures": []}
+    assert client.bulk.await_args.kwargs["operations"] == [
+        {"delete": {"_index": "n", "_id": "link_mark"}},
+        {"delete": {"_index": "n", "_id": "link_mark"}},
+    ]
+    assert _run(manager.add_network_links([])) == {
+        "ids": [],
+        "existing": [],
+        "failures": [],
+    }
+    with pytest.raises(LinkObjectError):
+        _run(manager.remove_network_links(["nope"]))
+
+
+def test_async_batch_links_with_hash_ids():
+    client = AsyncMock()
+    manager = AsyncManager(
+        feed_index="f", network_index="n", connection=client, link_id_strategy="hash"
+    )
+    mark = Link("carlos", LinkedActivity("mark"))
+    jane = Link("carlos", LinkedActivity("jane"))
+    client.bulk.return_value = {
+        "errors": True,
+        "items": [
+            {"create": {"_id": mark.get_id(), "status": 201}},
+            {"create": {"_id": jane.get_id(), "status": 409, "error": {}}},
+        ],
+    }
+    result = _run(manager.add_network_links([mark, jane]))
+    client.search.assert_not_awaited()
+    assert client.bulk.await_args.kwargs["operations"][0] == {
+        "create": {"_index": "n", "_id": mark.get_id()}
+    }
+    assert result == {"ids": [mark.get_id()], "existing": [jane], "failures": []}
+
+    client.bulk.return_value = {
+        "errors": True,
+        "items": [
+            {"delete": {"_id": mark.get_id(), "status": 200}},
+            {"delete": {"_id": jane.get_id(), "status": 404}},
+        ],
+    }
+    result = _run(manager.remove_network_links([mark, jane, mark]))
+    assert result == {"removed": [mark], "missing": [jane], "failures": []}
+
+
+def test_async_add_activity_feed_fans_out():
+    client = AsyncMock()
+    client.search.return_value = {
+        "hits": {"total": {"value": 0}, "hits": []},
+        "aggregations": {
+            "followers": {
+                "buckets": [
+                    {
+                        "key": "carlos",
+                        "doc_count": 1,
+                        "via": {"buckets": [{"key": "mark"}]},
+                    }
+                ]
+            }
+        },
+    }
+    client.bulk.return_value = {"errors": False, "items": []}
+    manager = AsyncManager(
+        feed_index="f", network_index="n", connection=client, timeline_index="t"
+    )
+    feed_id = _run(
+        manager.add_activity_feed(
+            Activity("add", Actor("mark", "person"), Object("proj_a", "project"))
+        )
+    )
+    assert client.index.await_args.kwargs["document"]["fanned_out"] is True
+    operations = client.bulk.await_args.kwargs["operations"]
+    assert operations[0] == {"index": {"_index": "t", "_id": "carlos:" + feed_id}}
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the batched feed retrieval (Manager.get_feeds_many) and the backend multi search.
+"""
+
+import asyncio
+from unittest.mock import MagicMock, AsyncMock
+
+import pytest
+
+from elasticfeeds.aggregators import UnAggregated, MaterializedFeedAggregator
+from elasticfeeds.backends import ElasticsearchBackend, OpenSearchBackend
+from elasticfeeds.caches import LRUCache
+from elasticfeeds.exceptions import MultiSearchError
+from elasticfeeds.manager import Manager, AsyncManager
+
+
+def _network(actor_id, *ids):
+    hits = [
+        {
+            "_source": {
+                "linked": "2020-01-01T00:00:00",
+                "actor_id": actor_id,
+                "link_type": "follow",
+                "linked_activity": {
+                    "activity_class": "actor",
+                    "id": an_id,
+                    "type": "person",
+                },
+                "link_weight": 1,
+            }
+        }
+        for an_id in ids
+    ]
+    return {"hits": {"total": {"value": len(hits)}, "hits": hits}}
+
+
+def _feed(*published):
+    hits = [{"_source": {"published": value}, "sort": [value]} for value in published]
+    return {"hits": {"total": {"value": len(hits)}, "hits": hits}}
+
+
+def test_search_many_request_shapes():
+    searches = [("a", {"size": 1}), ("b", {"size": 2})]
+    lines = [{"index": "a"}, {"size": 1}, {"index": "b"}, {"size": 2}]
+
+    es_client = MagicMock()
+    es_client.msearch.return_value = {"responses": [{"hits": 1}, {"hits": 2}]}
+    assert ElasticsearchBackend().search_many(es_client, searches) == [
+        {"hits": 1},
+        {"hits": 2},
+    ]
+    es_client.msearch.assert_called_once_with(searches=lines)
+
+    os_client = MagicMock()
+    os_client.msearch.return_value = {"responses": []}
+    OpenSearchBackend().search_many(os_client, searches)
+    os_client.msearch.assert_called_once_with(body=lines)
+
+    assert ElasticsearchBackend().search_many(es_client, []) == []
+    assert es_client.msearch.call_count == 1
+
+
+def test_search_many_raises_on_a_failed_search():
+    client = MagicMock()
+    client.msearch.return_value = {
+        "responses": [
+            {"hits": {}},
+            {"error": {"type": "index_not_found"}, "status": 404},
+        ]
+    }
+    with pytest.raises(MultiSearchError) as error:
+        ElasticsearchBackend().search_many(client, [("a", {}), ("b", {})])
+    assert error.value.error == {"type": "index_not_found"}
+
+
+def test_get_feeds_many_uses_two_round_trips():
+    client = MagicMock()
+    client.msearch.side_effect = [
+        {"responses": [_network("carlos", "mark"), _network("jane")]},
+        {"responses": [_feed("2020-01-02"), _feed("2020-01-02")]},
+    ]
+    manager = Manager(feed_index="f", network_index="n", connection=client)
+    result = manager.get_feeds_many(
+        [UnAggregated("carlos"), UnAggregated("jane"), UnAggregated("carlos")]
+    )
+    # jane has no network, so her feed is empty without a query
+    assert result[1] == []
+    assert client.msearch.call_count == 2
+    client.search.assert_not_called()
+
+    networks = client.msearch.call_args_list[0].kwargs["searches"]
+    # carlos is loaded once
+    assert [line for line in networks[::2]] == [{"index": "n"}, {"index": "n"}]
+    feeds = client.msearch.call_args_list[1].kwargs["searches"]
+    assert len(feeds) == 4  # both carlos aggregators
+    assert feeds[0] == {"index": "f"}
+
+
+def test_get_feeds_many_maps_responses_back():
+    client = MagicMock()
+    client.msearch.side_effect = [
+        {"responses": [_network("carlos", "mark"), _network("jane", "mark")]},
+        {"responses": [_feed("2020-01-01"), _feed("2020-01-02", "2020-01-03")]},
+    ]
+    manager = Manager(feed_index="f", network_index="n", connection=client)
+    carlos, jane = manager.get_feeds_many(
+        [UnAggregated("carlos"), UnAggregated("jane")]
+    )
+    assert carlos == [{"published": "2020-01-01"}]
+    assert jane == [{"published": "2020-01-02"}, {"published": "2020-01-03"}]
+
+
+def test_get_feeds_many_uses_the_network_cache():
+    client = MagicMock()
+    client.msearch.side_effect = [
+        {"responses": [_network("carlos", "mark")]},
+        {"responses": [_feed("2020-01-01")]},
+        {"responses": [_feed("2020-01-01")]},
+    ]
+    manager = Manager(
+        feed_index="f", network_index="n", connection=client, network_cache=LRUCache()
+    )
+    manager.get_feeds_many([UnAggregated("carlos")])
+    manager.get_feeds_many([UnAggregated("carlos")])
+    assert client.msearch.call_count == 3  # the second call only sends the feed query
+
+
+def test_get_feeds_many_with_a_materialized_feed():
+    client = MagicMock()
+    timeline = {
+        "hits": {
+            "total": {"value": 1},
+            "hits": [
+                {
+                    "_source": {"activity": {"published": "2020-01-03"}},
+                    "sort": ["2020-01-03"],
+                }
+            ],
+        }
+    }
+    client.msearch.side_effect = [
+        {"responses": [_network("carlos", "star"), _network("jane", "mark")]},
+        {"responses": [timeline, _feed("2020-01-02"), _feed("2020-01-01")]},
+    ]
+    manager = Manager(
+        feed_index="f", network_index="n", connection=client, timeline_index="t"
+    )
+    materialized, unaggregated = manager.get_feeds_many(
+        [MaterializedFeedAggregator("carlos"), UnAggregated("jane")]
+    )
+    assert [a["published"] for a in materialized] == ["2020-01-03", "2020-01-02"]
+    assert unaggregated == [{"published": "2020-01-01"}]
+
+
+def test_async_get_feeds_many():
+    client = AsyncMock()
+    client.msearch.side_effect = [
+        {"responses": [_network("carlos", "mark")]},
+        {"responses": [_feed("2020-01-01")]},
+    ]
+    manager = AsyncManager(feed_index="f", network_index="n", connection=client)
+    result = asyncio.run(manager.get_feeds_many([UnAggregated("carlos")]))
+    assert result == [[{"published": "2020-01-01"}]]
+    assert client.msearch.await_count == 2
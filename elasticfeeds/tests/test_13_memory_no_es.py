@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the in-memory backend. These run a real Manager against InMemoryClient, so they also check
+that the store evaluates the query DSL the aggregators send the way a cluster would.
+"""
+
+import datetime
+
+import pytest
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.aggregators import (
+    UnAggregated,
+    RecentTypeAggregator,
+    NotificationAggregator,
+    MaterializedFeedAggregator,
+    CursorAggregator,
+)
+from elasticfeeds.backends import get_backend, InMemoryBackend
+from elasticfeeds.exceptions import LinkExistError
+from elasticfeeds.manager import Manager
+from elasticfeeds.memory import InMemoryClient, ApiError
+from elasticfeeds.network import Link, LinkedActivity, network_lookup_id
+
+NOW = datetime.datetime(2020, 1, 1, 12, 0, 0)
+
+
+def _manager(**kwargs):
+    manager = Manager("f", "n", backend="memory", **kwargs)
+    manager.follow("carlos", "mark", NOW)
+    manager.follow("carlos", "jane", NOW)
+    manager.watch("carlos", "proj_a", "project", NOW)
+    return manager
+
+
+def _add(manager, actor, object_id, minutes):
+    return manager.add_activity_feed(
+        Activity(
+            "add",
+            Actor(actor, "person"),
+            Object(object_id, "project"),
+            published=NOW + datetime.timedelta(minutes=minutes),
+        )
+    )
+
+
+def _people(feeds):
+    return [(activity["actor"]["id"], activity["object"]["id"]) for activity in feeds]
+
+
+def test_get_backend():
+    assert isinstance(get_backend("memory"), InMemoryBackend)
+    manager = Manager("f", "n", backend="memory")
+    assert isinstance(manager.connection, InMemoryClient)
+    assert manager.connection.indices.exists(index="f")
+    assert manager.connection.indices.exists(index="n")
+
+
+def test_feeds_follow_the_network():
+    manager = _manager()
+    _add(manager, "mark", "proj_b", 1)
+    _add(manager, "stranger", "proj_a", 2)
+    _add(manager, "stranger", "proj_b", 3)
+    _add(manager, "jane", "proj_c", 4)
+    # Published before carlos followed mark
+    _add(manager, "mark", "proj_c", -10)
+    assert _people(manager.get_feeds(UnAggregated("carlos"))) == [
+        ("jane", "proj_c"),
+        ("stranger", "proj_a"),
+        ("mark", "proj_b"),
+    ]
+
+    manager.un_follow("carlos", "jane")
+    assert _people(manager.get_feeds(UnAggregated("carlos"))) == [
+        ("stranger", "proj_a"),
+        ("mark", "proj_b"),
+    ]
+
+
+def test_aggregations():
+    manager = _manager()
+    _add(manager, "mark", "proj_a", 1)
+    _add(manager, "jane", "proj_a", 2)
+    _add(manager, "jane", "proj_b", 3)
+    [group] = manager.get_feeds(RecentTypeAggregator("carlos"))
+    assert group["type"] == "add"
+    assert len(group["activities"]) == 3
+
+    notifications = manager.get_feeds(NotificationAggregator("carlos"))
+    assert [n["object_id"] for n in notifications] == ["proj_b", "proj_a"]
+    assert notifications[1]["actor_count"] == 2
+    assert notifications[1]["latest"]["actor"]["id"] == "jane"
+
+
+def test_duplicate_links_and_network_lookup():
+    manager = _manager(link_id_strategy="hash", network_lookup=True)
+    with pytest.raises(LinkExistError):
+        manager.follow("carlos", "mark", NOW)
+    _add(manager, "mark", "proj_b", 1)
+    _add(manager, "jane", "proj_b", 2)
+
+    aggregator = UnAggregated("carlos")
+    aggregator.network_filter = "lookup"
+    assert len(manager.get_feeds(aggregator)) == 2
+
+    manager.un_follow("carlos", "mark")
+    aggregator = UnAggregated("carlos")
+    aggregator.network_filter = "lookup"
+    assert _people(manager.get_feeds(aggregator)) == [("jane", "proj_b")]
+
+
+def test_network_lookup_keeps_ids_still_linked():
+    for strategy in ("uuid", "hash"):
+        manager = _manager(link_id_strategy=strategy, network_lookup=True)
+        # mark is also followed as a "user": removing the "person" link keeps him in the lookup
+        manager.follow("carlos", "mark", NOW, activity_type="user")
+        manager.un_follow("carlos", "mark")
+        lookup = manager.connection.get(index="n", id=network_lookup_id("carlos"))
+        assert lookup["_source"]["lookup_actors"] == ["mark", "jane"]
+        manager.un_follow("carlos", "mark", activity_type="user")
+        lookup = manager.connection.get(index="n", id=network_lookup_id("carlos"))
+        assert lookup["_source"]["lookup_actors"] == ["jane"]
+
+        # A batch that removes both links releases the id at once
+        links = [
+            Link("carlos", LinkedActivity("jane", activity_type=activity_type))
+            for activity_type in ("person", "user")
+        ]
+        manager.add_network_links(links[1:])
+        assert len(manager.remove_network_links(links)["removed"]) == 2
+        lookup = manager.connection.get(index="n", id=network_lookup_id("carlos"))
+        assert lookup["_source"]["lookup_actors"] == []
+
+
+def test_fan_out_on_write():
+    manager = _manager(timeline_index="t")
+    _add(manager, "mark", "proj_b", 1)
+    _add(manager, "jane", "proj_a", 2)
+    feeds = manager.get_feeds(MaterializedFeedAggregator("carlos", hybrid=False))
+    assert _people(feeds) == [("jane", "proj_a"), ("mark", "proj_b")]
+
+    manager.un_follow("carlos", "mark")
+    feeds = manager.get_feeds(MaterializedFeedAggregator("carlos", hybrid=False))
+    assert _people(feeds) == [("jane", "proj_a")]
+
+
+def test_unlink_keeps_what_another_link_brings(monkeypatch):
+    # one timeline document per clean-up request
+    monkeypatch.setattr("elasticfeeds.manager.manager._CLEANUP_PAGE_SIZE", 1)
+    manager = _manager(timeline_index="t")
+    # carlos gets these through both mark and the watch of proj_a
+    _add(manager, "mark", "proj_a", 1)
+    _add(manager, "jane", "proj_a", 2)
+    _add(manager, "mark", "proj_b", 3)
+    manager.un_follow("carlos", "mark")
+    feeds = manager.get_feeds(MaterializedFeedAggregator("carlos", hybrid=False))
+    assert _people(feeds) == [("jane", "proj_a"), ("mark", "proj_a")]
+    hits = manager.connection.search(index="t", body={"size": 10})["hits"]["hits"]
+    assert sorted(hit["_source"]["via"] for hit in hits) == [
+        ["jane", "proj_a"],
+        ["proj_a"],
+    ]
+
+    manager.un_watch("carlos", "proj_a", "project")
+    feeds = manager.get_feeds(MaterializedFeedAggregator("carlos", hybrid=False))
+    assert _people(feeds) == [("jane", "proj_a")]
+
+
+def test_links_created_after_the_activities(monkeypatch):
+    # one activity per backfill request
+    monkeypatch.setattr("elasticfeeds.manager.manager._BACKFILL_PAGE_SIZE", 1)
+    manager = Manager("f", "n", backend="memory", timeline_index="t")
+    month_ago = NOW - datetime.timedelta(days=30)
+    manager.follow("dave", "jane", NOW - datetime.timedelta(days=60))
+    manager.watch("carlos", "proj_a", "project", month_ago)
+    _add(manager, "jane", "proj_old", -60 * 24 * 40)
+    _add(manager, "jane", "proj_a", 1)
+    _add(manager, "jane", "proj_b", 2)
+    _add(manager, "lone", "proj_c", 3)
+    fanned_out = manager.connection.search(
+        index="f", body={"size": 10, "query": {"term": {"fanned_out": True}}}
+    )["hits"]["hits"]
+    assert len(fanned_out) == 3  # nobody received the activity of lone
+
+    expected = [("lone", "proj_c"), ("jane", "proj_b"), ("jane", "proj_a")]
+    for _ in range(2):
+        manager.follow("carlos", "jane", month_ago)
+        manager.follow("carlos", "lone", month_ago)
+        assert _people(manager.get_feeds(UnAggregated("carlos"))) == expected
+        feeds = manager.get_feeds(MaterializedFeedAggregator("carlos"))
+        assert _people(feeds) == expected
+        # the activity carlos already had through proj_a gained jane in its via
+        copy = manager.connection.get(index="t", id="carlos:" + feeds[2]["feed_id"])
+        assert copy["_source"]["via"] == ["proj_a", "jane"]
+        manager.un_follow("carlos", "jane")
+        manager.un_follow("carlos", "lone")
+        feeds = manager.get_feeds(MaterializedFeedAggregator("carlos"))
+        assert _people(feeds) == [("jane", "proj_a")]
+
+
+def test_search_options():
+    client = InMemoryClient()
+    client.indices.create(index="i", mappings={"properties": {"day": {"type": "date"}}})
+    for doc_id, day, group in [
+        ("1", "2020-01-01", "a"),
+        ("2", "2020-01-03", "b"),
+        ("3", "2020-01-02", "a"),
+    ]:
+        client.index(
+            index="i", id=doc_id, document={"day": day, "group": group, "x": doc_id}
+        )
+    client.index(index="i", id="4", document={"group": "c"})
+
+    response = client.search(
+        index="i",
+        body={
+            "query": {"range": {"day": {"gte": "2020-01-02"}}},
+            "sort": [{"day": {"order": "asc"}}],
+            "_source": {"excludes": ["x"]},
+        },
+    )
+    assert [hit["_id"] for hit in response["hits"]["hits"]] == ["3", "2"]
+    assert response["hits"]["hits"][0]["_source"] == {
+        "day": "2020-01-02",
+        "group": "a",
+    }
+
+    # Missing values sort last; search_after continues after the sort values returned
+    body = {"sort": [{"day": "desc"}], "size": 2}
+    first = client.search(index="i", body=body)["hits"]["hits"]
+    assert [hit["_id"] for hit in first] == ["2", "3"]
+    body["search_after"] = first[-1]["sort"]
+    assert [h["_id"] for h in client.search(index="i", body=body)["hits"]["hits"]] == [
+        "1",
+        "4",
+    ]
+
+    body = {"sort": [{"day": "desc"}], "collapse": {"field": "group"}}
+    hits = client.search(index="i", body=body)["hits"]["hits"]
+    assert [hit["_id"] for hit in hits] == ["2", "3", "4"]
+
+    body = {
+        "size": 0,
+        "aggs": {
+            "groups": {
+                "terms": {"field": "group", "order": {"last": "desc"}},
+                "aggs": {"last": {"max": {"field": "day"}}},
+            }
+        },
+    }
+    buckets = client.search(index="i", body=body)["aggregations"]["groups"]["buckets"]
+    assert [bucket["key"] for bucket in buckets] == ["b", "a", "c"]
+    assert buckets[1]["doc_count"] == 2
+
+
+def test_errors_carry_a_status_code():
+    client = InMemoryClient()
+    client.indices.create(index="i")
+    client.create(index="i", id="1", document={})
+    with pytest.raises(ApiError) as error:
+        client.create(index="i", id="1", document={})
+    assert error.value.status_code == 409
+    with pytest.raises(ApiError) as error:
+        client.search(index="missing")
+    assert error.value.status_code == 404
+    with pytest.raises(ApiError) as error:
+        client.search(index="i", body={"query": {"match": {"a": "b"}}})
+    assert error.value.status_code == 400
+    with pytest.raises(ApiError) as error:
+        client.search(index="i", body={"from": 9999, "size": 2})
+    assert error.value.status_code == 400
+
+    response = client.bulk(
+        operations=[
+            {"create": {"_index": "i", "_id": "1"}},
+            {},
+            {"delete": {"_index": "i", "_id": "2"}},
+        ]
+    )
+    assert response["errors"] is True
+    assert [item[next(iter(item))]["status"] for item in response["items"]] == [
+        409,
+        404,
+    ]
+
+
+def test_cursor_pages_through_a_point_in_time():
+    manager = _manager()
+    for minutes in range(1, 6):
+        _add(manager, "mark", "proj_%d" % minutes, minutes)
+    client = manager.connection
+    pages = []
+    cursor = None
+    while True:
+        aggregator = CursorAggregator("carlos", search_after=cursor, point_in_time=True)
+        aggregator.result_size = 2
+        page = manager.get_feeds(aggregator)
+        pages.append(_people(page["activities"]))
+        if not pages[1:]:
+            # Added after the point in time was opened: not part of this scroll
+            _add(manager, "jane", "proj_new", 10)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [object_id for page in pages for _, object_id in page] == [
+        "proj_5",
+        "proj_4",
+        "proj_3",
+        "proj_2",
+        "proj_1",
+    ]
+    assert client.pits == {}  # closed after the last page
+
+    # A new scroll sees the new activity
+    first = manager.get_feeds(CursorAggregator("carlos", point_in_time=True))
+    assert _people(first["activities"])[0] == ("jane", "proj_new")
+
+
+def test_get_feeds_many_closes_the_point_in_time():
+    manager = _manager()
+    for minutes in range(1, 4):
+        _add(manager, "mark", "proj_%d" % minutes, minutes)
+    client = manager.connection
+    cursor = None
+    pages = 0
+    while True:
+        aggregator = CursorAggregator("carlos", search_after=cursor, point_in_time=True)
+        aggregator.result_size = 2
+        (page,) = manager.get_feeds_many([aggregator])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        assert len(client.pits) == 1
+    assert pages == 2
+    assert client.pits == {}
+
+
+def test_point_in_time_errors():
+    client = InMemoryClient()
+    client.indices.create(index="i")
+    pit_id = client.open_point_in_time(index="i", keep_alive="1m")["id"]
+    with pytest.raises(ApiError) as error:
+        client.search(index="i", body={"pit": {"id": pit_id}})
+    assert error.value.status_code == 400
+    assert client.close_point_in_time(id=pit_id)["num_freed"] == 1
+    with pytest.raises(ApiError) as error:
+        client.search(body={"pit": {"id": pit_id}})
+    assert error.value.status_code == 404
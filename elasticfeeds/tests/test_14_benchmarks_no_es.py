@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the benchmark harness (benchmarks/, run from the repository root).
+"""
+
+import json
+
+from benchmarks.cli import main
+from benchmarks.measure import percentile, Measurement, RecordingClient
+from benchmarks.suite import Suite, create_client
+from benchmarks.workload import Workload
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([3.0], 0.95) == 3.0
+    assert percentile([], 0.5) is None
+
+
+def test_workload_is_reproducible():
+    first = Workload(actors=20, follows=3, watches=2, objects=10, activities=30)
+    second = Workload(
+        actors=20, follows=3, watches=2, objects=10, activities=30, start=first.start
+    )
+    links = [link.get_dict() for link in first.links()]
+    assert links == [link.get_dict() for link in second.links()]
+    assert len(links) == 20 * (3 + 2)
+    assert all(
+        link["actor_id"] != link["linked_activity"]["id"] for link in links
+    )  # nobody follows themselves
+    activities = list(first.activity_stream())
+    assert len(activities) == 30
+    assert len(activities[0].get_dict()["embedding"]) == 8
+
+
+def test_recording_client_counts_requests_and_bytes():
+    recorder = RecordingClient(create_client("memory"))
+    recorder.indices.create(index="i")  # not counted
+    measurement = Measurement("index")
+    measurement.time(recorder, recorder.index, index="i", id="1", document={"a": 1})
+    summary = measurement.summary()
+    assert summary["calls"] == 1
+    assert summary["requests_per_call"] == 1
+    assert summary["bytes_per_call"] == len('{"a": 1}')
+
+
+def test_suite_runs_every_scenario():
+    workload = Workload(actors=20, follows=3, watches=2, objects=10, activities=40)
+    suite = Suite(
+        workload,
+        create_client("memory"),
+        samples=3,
+        single_ingest=10,
+        chunk_size=10,
+        timeline=True,
+    )
+    summaries = {summary["name"]: summary for summary in suite.run()}
+    assert summaries["add_activity_feed"]["calls"] == 10
+    assert summaries["add_activity_feeds (chunk)"]["items"] == 30
+    assert summaries["get_feeds Semantic"]["calls"] == 3
+    assert summaries["get_feeds Materialized"]["calls"] == 3
+    assert summaries["get_network"]["requests_per_call"] == 1
+
+
+def test_cli_writes_json(tmp_path, capsys):
+    output = tmp_path / "results.json"
+    main(
+        [
+            "--actors",
+            "10",
+            "--follows",
+            "2",
+            "--objects",
+            "5",
+            "--watches",
+            "1",
+            "--activities",
+            "20",
+            "--samples",
+            "2",
+            "--aggregators",
+            "UnAggregated,Cursor",
+            "--json",
+            str(output),
+        ]
+    )
+    assert "get_feeds Cursor" in capsys.readouterr().out
+    results = json.loads(output.read_text())["results"]
+    assert [r["name"] for r in results][-2:] == [
+        "get_feeds UnAggregated",
+        "get_feeds Cursor",
+    ]
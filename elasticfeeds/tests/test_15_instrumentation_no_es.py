@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the Manager instrumentation hooks, run against the in-memory backend.
+"""
+
+import asyncio
+import datetime
+import logging
+from unittest.mock import MagicMock
+
+import pytest
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.aggregators import UnAggregated, RecentTypeAggregator
+from elasticfeeds.caches import LRUCache
+from elasticfeeds.exceptions import LinkExistError
+from elasticfeeds.instrumentation import (
+    BaseInstrumentation,
+    MetricsInstrumentation,
+    LoggingInstrumentation,
+    CompositeInstrumentation,
+    start_operation,
+    search_stats,
+)
+from elasticfeeds.manager import Manager, AsyncManager
+
+NOW = datetime.datetime(2020, 1, 1, 12, 0, 0)
+
+
+class Recorder(BaseInstrumentation):
+    measure_sizes = True
+
+    def __init__(self):
+        self.operations = []
+
+    def operation_finished(self, operation):
+        self.operations.append(operation)
+
+    def last(self, name):
+        return [op for op in self.operations if op.name == name][-1]
+
+
+def _manager(instrumentation, **kwargs):
+    manager = Manager(
+        "f", "n", backend="memory", instrumentation=instrumentation, **kwargs
+    )
+    manager.follow("carlos", "mark", NOW)
+    manager.watch("carlos", "proj_a", "project", NOW)
+    for minutes, actor in enumerate(["mark", "mark", "jane"]):
+        manager.add_activity_feed(
+            Activity(
+                "add",
+                Actor(actor, "person"),
+                Object("proj_b", "project"),
+                published=NOW + datetime.timedelta(minutes=minutes + 1),
+            )
+        )
+    return manager
+
+
+def test_get_feeds_phases():
+    recorder = Recorder()
+    manager = _manager(recorder)
+    assert len(manager.get_feeds(UnAggregated("carlos"))) == 2
+    operation = recorder.last("get_feeds")
+    assert operation.attributes == {
+        "aggregator": "UnAggregated",
+        "actor_id": "carlos",
+        "results": 2,
+    }
+    assert [phase.name for phase in operation.phases] == [
+        "network",
+        "query",
+        "search",
+        "process",
+    ]
+    network, query, search, _ = operation.phases
+    assert network.attributes["network_size"] == 2
+    assert network.attributes["cached"] is False
+    assert query.attributes["request_bytes"] > 0
+    assert search.attributes["hits"] == 2
+    assert search.attributes["took_ms"] == 0
+    assert search.attributes["response_bytes"] > 0
+    assert operation.duration >= sum(phase.duration for phase in operation.phases)
+    assert operation.error is None
+
+
+def test_writes_and_cached_networks():
+    recorder = Recorder()
+    manager = _manager(recorder, network_cache=LRUCache())
+    add = recorder.last("add_activity_feed")
+    assert add.attributes["actor_id"] == "jane"
+    assert [phase.name for phase in add.phases] == ["index"]
+    assert add.phases[0].attributes["request_bytes"] > 0
+
+    manager.get_network("carlos")
+    manager.get_network("carlos")
+    assert recorder.last("get_network").phases[0].attributes == {
+        "cached": True,
+        "network_size": 2,
+    }
+    with pytest.raises(LinkExistError):
+        manager.follow("carlos", "mark", NOW)
+    failed = recorder.last("add_network_link")
+    assert isinstance(failed.error, LinkExistError)
+    assert [phase.name for phase in failed.phases] == ["exists"]
+
+
+def test_no_instrumentation():
+    manager = _manager(None)
+    assert manager.instrumentation is None
+    operation = start_operation(None, "get_feeds", actor_id="carlos")
+    with operation as running, running.phase("search") as phase:
+        phase.set(hits=1)
+    assert operation is start_operation(None, "get_network")
+    assert not phase.measure_sizes
+    assert len(manager.get_feeds(UnAggregated("carlos"))) == 2
+
+
+def test_search_stats():
+    response = MagicMock()
+    response.body = {"took": 7, "hits": {"total": {"value": 3}, "hits": []}}
+    assert search_stats([response, {"took": 1, "hits": {"total": 2}}]) == {
+        "took_ms": 8,
+        "hits": 5,
+    }
+
+
+def test_metrics():
+    metrics = MetricsInstrumentation(buckets=(0.001, 10))
+    manager = _manager(metrics)
+    manager.get_feeds(UnAggregated("carlos"))
+    manager.get_feeds(RecentTypeAggregator("carlos"))
+    collected = metrics.collect()
+    ok = (
+        "operations_total",
+        (
+            ("operation", "get_feeds"),
+            ("aggregator", "UnAggregated"),
+            ("status", "ok"),
+        ),
+    )
+    assert collected["counters"][ok] == 1
+    assert (
+        collected["counters"][
+            ("hits_total", (("operation", "get_feeds"), ("phase", "search")))
+        ]
+        == 4
+    )
+    network = collected["histograms"][("network_size", (("operation", "get_feeds"),))]
+    assert network["count"] == 2
+    assert network["sum"] == 4
+    text = metrics.render()
+    assert "# TYPE elasticfeeds_operations_total counter" in text
+    assert (
+        'elasticfeeds_operations_total{operation="get_feeds",aggregator="UnAggregated",'
+        'status="ok"} 1' in text
+    )
+    assert (
+        'elasticfeeds_operation_seconds_bucket{operation="get_feeds",'
+        'aggregator="RecentTypeAggregator",le="+Inf"} 1' in text
+    )
+
+
+def test_sizes_are_opt_in(caplog):
+    assert BaseInstrumentation.measure_sizes is False
+    metrics = MetricsInstrumentation()
+    logged = LoggingInstrumentation(threshold=0)
+    manager = _manager(CompositeInstrumentation(metrics, logged))
+    with caplog.at_level(logging.WARNING, logger="elasticfeeds"):
+        caplog.clear()
+        manager.get_feeds(UnAggregated("carlos"))
+    names = set(name for name, _ in metrics.collect()["counters"])
+    assert "hits_total" in names
+    assert not names & {"request_bytes_total", "response_bytes_total"}
+    assert "_bytes" not in caplog.records[-1].getMessage()
+
+    metrics = MetricsInstrumentation(measure_sizes=True)
+    _manager(metrics).get_feeds(UnAggregated("carlos"))
+    names = set(name for name, _ in metrics.collect()["counters"])
+    assert {"request_bytes_total", "response_bytes_total"} <= names
+
+
+def test_logging_threshold(caplog):
+    slow = LoggingInstrumentation(threshold=0)
+    fast = LoggingInstrumentation(threshold=60)
+    manager = _manager(CompositeInstrumentation(slow, fast))
+    with caplog.at_level(logging.WARNING, logger="elasticfeeds"):
+        caplog.clear()
+        manager.get_feeds(UnAggregated("carlos"))
+    assert len(caplog.records) == 1
+    message = caplog.records[0].getMessage()
+    assert message.startswith("get_feeds ")
+    assert "| network " in message and "network_size=2" in message
+    assert "hits=2" in message
+
+
+def test_composite_measures_sizes_if_any_does():
+    quiet = BaseInstrumentation()
+    quiet.measure_sizes = False
+    recorder = Recorder()
+    recorder.measure_sizes = False
+    manager = _manager(CompositeInstrumentation(quiet, recorder))
+    manager.get_feeds(UnAggregated("carlos"))
+    search = recorder.last("get_feeds").phases[2]
+    assert "response_bytes" not in search.attributes
+    assert search.attributes["hits"] == 2
+
+
+def test_async_manager():
+    recorder = Recorder()
+
+    async def run():
+        async_manager = AsyncManager(
+            "f", "n", connection=MagicMock(), instrumentation=recorder
+        )
+        backend = MagicMock()
+
+        async def search(connection, index, body):
+            return {
+                "took": 3,
+                "hits": {"total": {"value": 1}, "hits": [{"_source": {}}]},
+            }
+
+        backend.search = search
+        async_manager._backend = backend
+        return await async_manager.get_network("carlos")
+
+    assert asyncio.run(run()) == [{}]
+    phase = recorder.last("get_network").phases[0]
+    assert phase.attributes["took_ms"] == 3
+    assert phase.attributes["network_size"] == 1
+
+
+def test_open_telemetry():
+    pytest.importorskip("opentelemetry")
+    from elasticfeeds.instrumentation import OpenTelemetryInstrumentation
+
+    tracer = MagicMock()
+    manager = _manager(OpenTelemetryInstrumentation(tracer))
+    manager.get_feeds(UnAggregated("carlos"))
+    names = [call.args[0] for call in tracer.start_span.call_args_list]
+    assert names[-5:] == [
+        "elasticfeeds.get_feeds",
+        "network",
+        "query",
+        "search",
+        "process",
+    ]
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the streaming exports (Manager.iter_feed, Manager.iter_activities) and the cursor
+pagination of Manager.get_activities_page, run against the in-memory backend. An
+AsyncMock stands in for the AsyncElasticsearch client of AsyncManager.iter_feed.
+"""
+
+import asyncio
+import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.aggregators import UnAggregated, MaterializedFeedAggregator
+from elasticfeeds.manager import Manager, AsyncManager
+
+NOW = datetime.datetime(2020, 1, 1, 12, 0, 0)
+
+
+def _manager(activities=25):
+    manager = Manager("f", "n", backend="memory")
+    manager.follow("carlos", "mark", NOW)
+    manager.watch("carlos", "proj_a", "project", NOW)
+    manager.add_activity_feeds(
+        Activity(
+            "add",
+            Actor("mark" if number % 3 else "stranger", "person"),
+            Object("proj_a" if number % 3 == 0 else "proj_%d" % number, "project"),
+            published=NOW + datetime.timedelta(minutes=number + 1),
+        )
+        for number in range(activities)
+    )
+    return manager
+
+
+def _published(activities):
+    return [activity["published"] for activity in activities]
+
+
+def test_iter_feed_walks_the_whole_feed_in_order():
+    manager = _manager()
+    expected = _published(manager.get_feeds(UnAggregated("carlos")))
+    assert len(expected) == 25
+    exported = manager.iter_feed(UnAggregated("carlos"), page_size=4)
+    assert _published(exported) == expected
+    assert manager.connection.pits == {}
+
+    aggregator = UnAggregated("carlos")
+    aggregator.order = "asc"
+    aggregator.network_filter = "terms"
+    assert _published(manager.iter_feed(aggregator, page_size=7)) == expected[::-1]
+
+
+def test_iter_feed_is_a_snapshot():
+    manager = _manager()
+    exported = manager.iter_feed(UnAggregated("carlos"), page_size=5)
+    first = next(exported)
+    manager.add_activity_feed(
+        Activity(
+            "add",
+            Actor("mark", "person"),
+            Object("proj_z", "project"),
+            published=NOW + datetime.timedelta(days=1),
+        )
+    )
+    assert len([first] + list(exported)) == 25
+
+    # Stopping early closes the point in time
+    exported = manager.iter_feed(UnAggregated("carlos"), page_size=5)
+    next(exported)
+    assert len(manager.connection.pits) == 1
+    exported.close()
+    assert manager.connection.pits == {}
+
+
+def test_iter_feed_slices():
+    manager = _manager(60)
+    expected = sorted(_published(manager.iter_feed(UnAggregated("carlos"))))
+    sliced = manager.iter_feed(UnAggregated("carlos"), page_size=3, slices=4)
+    assert sorted(_published(sliced)) == expected
+    assert manager.connection.pits == {}
+
+    sliced = manager.iter_feed(UnAggregated("carlos"), page_size=3, slices=4)
+    next(sliced)
+    sliced.close()
+    assert manager.connection.pits == {}
+
+
+def test_iter_feed_without_network_or_timeline():
+    manager = _manager(3)
+    assert list(manager.iter_feed(UnAggregated("nobody"))) == []
+    with pytest.raises(ValueError):
+        manager.iter_feed(MaterializedFeedAggregator("carlos"))
+
+
+def test_async_iter_feed():
+    client = AsyncMock()
+    link = {
+        "linked": "2020-01-01T00:00:00",
+        "actor_id": "carlos",
+        "link_type": "follow",
+        "linked_activity": {"activity_class": "actor", "id": "mark", "type": "person"},
+        "link_weight": 1,
+    }
+    client.open_point_in_time.return_value = {"id": "pit1"}
+    client.search.side_effect = [
+        {"hits": {"total": {"value": 1}, "hits": [{"_source": link}]}},
+        {
+            "pit_id": "pit2",
+            "hits": {"hits": [{"_source": {"n": 1}, "sort": [2, 1]}] * 2},
+        },
+        {"pit_id": "pit2", "hits": {"hits": [{"_source": {"n": 2}, "sort": [1, 1]}]}},
+    ]
+    manager = AsyncManager(feed_index="f", network_index="n", connection=client)
+
+    async def export():
+        return [
+            activity
+            async for activity in manager.iter_feed(UnAggregated("carlos"), page_size=2)
+        ]
+
+    assert asyncio.run(export()) == [{"n": 1}, {"n": 1}, {"n": 2}]
+    last = client.search.await_args_list[-1].kwargs
+    assert last["index"] is None
+    assert last["body"]["pit"] == {"id": "pit2", "keep_alive": "1m"}
+    assert last["body"]["search_after"] == [2, 1]
+    client.close_point_in_time.assert_awaited_once_with(id="pit2")
+
+
+def test_get_activities_page():
+    manager = _manager()
+    expected = _published(manager.get_activities(actor_id="mark"))
+    assert len(expected) == 16
+    pages = []
+    cursor = None
+    while True:
+        page = manager.get_activities_page(actor_id="mark", size=5, search_after=cursor)
+        pages.append(_published(page["activities"]))
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [5, 5, 5, 1]
+    assert [published for page in pages for published in page] == expected
+
+    page = manager.get_activities_page(verb="add", size=2, order="asc")
+    assert page["next_cursor"][1] == page["activities"][-1]["feed_id"]
+
+
+def test_iter_activities():
+    manager = _manager()
+    expected = _published(manager.get_activities(object_id="proj_a", order="asc"))
+    assert (
+        _published(
+            manager.iter_activities(object_id="proj_a", order="asc", page_size=2)
+        )
+        == expected
+    )
+    sliced = manager.iter_activities(verb="add", page_size=3, slices=3)
+    assert len(list(sliced)) == 25
+    assert manager.connection.pits == {}
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the monthly feed partitions (Manager(feed_partitioning="monthly")), run against the in-memory
+backend. MagicMock / AsyncMock stand in for the OpenSearch and AsyncElasticsearch clients.
+"""
+
+import asyncio
+import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.aggregators import (
+    UnAggregated,
+    YearMonthAggregator,
+    YearMonthTypeAggregator,
+    CursorAggregator,
+)
+from elasticfeeds.backends import get_backend
+from elasticfeeds.manager import Manager, AsyncManager
+from elasticfeeds.manager.manager import _partitions_expression
+from elasticfeeds.memory import InMemoryClient
+
+LINKED = datetime.datetime(2019, 11, 3)
+MONTHS = [(2019, 10), (2019, 12), (2020, 2), (2020, 3)]
+
+
+def _activity(year, month, actor="mark"):
+    return Activity(
+        "add",
+        Actor(actor, "person"),
+        Object("proj_%d_%d" % (year, month), "project"),
+        published=datetime.datetime(year, month, 5),
+    )
+
+
+def _manager(**kwargs):
+    manager = Manager("f", "n", backend="memory", feed_partitioning="monthly", **kwargs)
+    manager.follow("carlos", "mark", LINKED)
+    manager.add_activity_feed(_activity(*MONTHS[0]))
+    manager.add_activity_feeds(_activity(*month) for month in MONTHS[1:])
+    return manager
+
+
+def test_partitions_expression():
+    assert _partitions_expression("f", None, None) == "f"
+    assert _partitions_expression(
+        "f", datetime.datetime(2019, 3, 1), datetime.datetime(2020, 12, 31)
+    ) == (
+        "f-2019.03*,f-2019.04*,f-2019.05*,f-2019.06*,f-2019.07*,f-2019.08*,f-2019.09*,"
+        "f-2019.10*,f-2019.11*,f-2019.12*,f-2020.*"
+    )
+    assert (
+        _partitions_expression(
+            "f", datetime.datetime(2021, 1, 1), datetime.datetime(2020, 12, 31)
+        )
+        is None
+    )
+    open_ended = _partitions_expression("f", datetime.datetime(2019, 3, 1), None)
+    assert open_ended.split(",") == [
+        "f-*",
+        "-f-0*",
+        "-f-1*",
+        "-f-200*",
+    ] + [
+        "-f-201%d*" % digit for digit in range(9)
+    ] + ["-f-2019.01*", "-f-2019.02*"]
+
+    client = InMemoryClient()
+    for name in ["f-1999.12", "f-2018.12", "f-2019.02", "f-2019.03", "f-2031.01"]:
+        client.indices.create(index=name)
+    assert client.resolve(open_ended) == ["f-2019.03", "f-2031.01"]
+
+
+def test_writes_go_to_monthly_partitions():
+    manager = _manager()
+    client = manager.connection
+    today = datetime.date.today()
+    assert sorted(client.aliases["f"]) == sorted(
+        ["f-%04d.%02d" % month for month in MONTHS]
+        + ["f-%04d.%02d" % (today.year, today.month)]
+    )
+    assert client.store["f-2019.10"].mappings == client.store["f-2020.03"].mappings
+    assert "feed_id" in client.store["f-2019.10"].mappings["properties"]
+    assert len(manager.get_activities(actor_id="mark")) == 4
+
+
+def test_reads_skip_partitions_before_the_network():
+    plain = Manager("f", "n", backend="memory")
+    plain.follow("carlos", "mark", LINKED)
+    plain.add_activity_feeds(_activity(*month) for month in MONTHS)
+    manager = _manager()
+
+    aggregator = UnAggregated("carlos")
+    feeds = manager.get_feeds(aggregator)
+    assert [feed["published"] for feed in feeds] == [
+        feed["published"] for feed in plain.get_feeds(UnAggregated("carlos"))
+    ]
+    assert len(feeds) == 3
+    assert aggregator.feed_index.startswith("f-*,")
+    assert manager.connection.resolve(aggregator.feed_index)[:3] == [
+        "f-2019.12",
+        "f-2020.02",
+        "f-2020.03",
+    ]
+
+    lookup = UnAggregated("carlos")
+    lookup.network_filter = "lookup"
+    manager.get_feeds(lookup)
+    assert lookup.feed_index == "f"
+
+    pages = manager.get_feeds_many([CursorAggregator("carlos"), UnAggregated("nobody")])
+    assert len(pages[0]["activities"]) == 3
+    assert pages[1] == []
+    assert len(list(manager.iter_feed(UnAggregated("carlos"), page_size=2))) == 3
+
+
+def test_year_aggregators_read_the_year():
+    manager = _manager()
+    for aggregator_class in (YearMonthAggregator, YearMonthTypeAggregator):
+        aggregator = aggregator_class("carlos", 2020)
+        feeds = manager.get_feeds(aggregator)
+        assert aggregator.feed_index == "f-2020.*"
+        assert [year["year"] for year in feeds] == [2020]
+
+        aggregator = aggregator_class("carlos", 2019)
+        manager.get_feeds(aggregator)
+        assert aggregator.feed_index == "f-2019.11*,f-2019.12*"
+
+        # The network starts after the year: nothing is searched
+        search = MagicMock(wraps=manager.connection.search)
+        manager.connection.search = search
+        assert manager.get_feeds(aggregator_class("carlos", 2018)) == []
+        assert [call.kwargs["index"] for call in search.call_args_list] == ["n"]
+        del manager.connection.search
+
+
+def test_retention_policy_and_recreation():
+    manager = _manager(feed_retention="400d")
+    client = manager.connection
+    assert client.policies["f-retention"]["phases"]["delete"]["min_age"] == "400d"
+    settings = client.templates["f"]["template"]["settings"]
+    assert settings["index"]["lifecycle"] == {"name": "f-retention"}
+
+    again = Manager(
+        "f",
+        "n",
+        backend="memory",
+        connection=client,
+        feed_partitioning="monthly",
+        delete_feeds_if_exists=True,
+    )
+    assert len(client.aliases["f"]) == 1
+    assert "lifecycle" not in client.templates["f"]["template"]["settings"]["index"]
+    again.delete_feeds_index()
+    assert "f" not in client.aliases
+    assert not [name for name in client.store if name.startswith("f-")]
+
+
+def test_invalid_configurations():
+    with pytest.raises(ValueError):
+        Manager("f", "n", backend="memory", feed_partitioning="weekly")
+    with pytest.raises(ValueError):
+        Manager("f", "n", backend="memory", feed_retention="30d")
+    plain = Manager("f", "n", backend="memory")
+    with pytest.raises(ValueError):
+        Manager(
+            "f",
+            "n",
+            backend="memory",
+            connection=plain.connection,
+            feed_partitioning="monthly",
+        )
+
+
+def test_opensearch_requests():
+    backend = get_backend("opensearch")
+    client = MagicMock()
+    definition = {"settings": {"index": {}}, "mappings": {"properties": {}}}
+    backend.add_lifecycle_policy(definition, "f-retention")
+    backend.put_index_template(client, "f", ["f-*"], definition, ["f"])
+    body = client.indices.put_index_template.call_args.kwargs["body"]
+    assert body["index_patterns"] == ["f-*"]
+    assert body["template"]["aliases"] == {"f": {}}
+    assert body["template"]["settings"] == {"index": {}}
+
+    backend.put_retention_policy(client, "f-retention", ["f-*"], "30d")
+    method, path = client.transport.perform_request.call_args.args
+    policy = client.transport.perform_request.call_args.kwargs["body"]["policy"]
+    assert (method, path) == ("PUT", "/_plugins/_ism/policies/f-retention")
+    assert policy["ism_template"] == [{"index_patterns": ["f-*"], "priority": 100}]
+    assert policy["states"][0]["transitions"][0]["conditions"] == {
+        "min_index_age": "30d"
+    }
+
+    conflict = Exception("exists")
+    conflict.status_code = 409
+    client.transport.perform_request.side_effect = conflict
+    backend.put_retention_policy(client, "f-retention", ["f-*"], "30d")
+
+
+def test_async_manager():
+    client = AsyncMock()
+    client.indices.exists_index_template.return_value = False
+    client.indices.get_alias.return_value = {}
+    client.indices.exists.return_value = False
+
+    async def run():
+        manager = AsyncManager(
+            "f",
+            "n",
+            connection=client,
+            feed_partitioning="monthly",
+            feed_retention="90d",
+        )
+        await manager.initialize()
+        await manager.add_activity_feed(_activity(2020, 2))
+        return manager
+
+    asyncio.run(run())
+    template = client.indices.put_index_template.await_args.kwargs
+    assert template["index_patterns"] == ["f-*"]
+    assert template["template"]["settings"]["index"]["lifecycle"] == {
+        "name": "f-retention"
+    }
+    client.ilm.put_lifecycle.assert_awaited_once()
+    created = [call.kwargs["index"] for call in client.indices.create.await_args_list]
+    today = datetime.date.today()
+    assert "f-%04d.%02d" % (today.year, today.month) in created
+    assert "f" not in created
+    assert client.index.await_args.kwargs["index"] == "f-2020.02"
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the feed index mapping profiles (Manager(feed_mapping=..., feed_refresh_interval=...)), run
+against the in-memory backend.
+"""
+
+import datetime
+
+import pytest
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.aggregators import (
+    UnAggregated,
+    DateWeightAggregator,
+    YearMonthAggregator,
+    SemanticAggregator,
+)
+from elasticfeeds.manager import Manager, AsyncManager
+from elasticfeeds.manager.manager import _get_feed_index_definition
+
+NOW = datetime.datetime(2020, 1, 1, 12, 0, 0)
+
+
+def _manager(**kwargs):
+    manager = Manager("f", "n", backend="memory", embedding_dims=2, **kwargs)
+    manager.follow("carlos", "mark", NOW)
+    manager.add_activity_feeds(
+        Activity(
+            "add",
+            Actor("mark", "person"),
+            Object("proj_%d" % number, "project"),
+            published=NOW + datetime.timedelta(days=number),
+            embedding=[1.0, float(number)],
+        )
+        for number in range(1, 6)
+    )
+    return manager
+
+
+def test_tuned_definition():
+    default = _get_feed_index_definition(1, 0)
+    assert "sort" not in default["settings"]["index"]
+    assert "_source" not in default["mappings"]
+
+    tuned = _get_feed_index_definition(1, 0, "tuned", "30s")
+    settings = tuned["settings"]["index"]
+    assert settings["sort"] == {"field": "published", "order": "desc"}
+    assert settings["refresh_interval"] == "30s"
+    properties = tuned["mappings"]["properties"]
+    assert properties["published_date"]["index"] is False
+    assert "doc_values" not in properties["published_date"]
+    assert properties["published_time"]["doc_values"] is False
+    assert properties["origin"]["properties"]["id"]["index"] is False
+    assert "index" not in properties["published"]
+    assert "index" not in properties["actor"]["properties"]["id"]
+    assert tuned["mappings"]["_source"] == {"excludes": ["embedding"]}
+
+
+def test_tuned_feeds_match_default_feeds():
+    default = _manager()
+    tuned = _manager(feed_mapping="tuned", feed_refresh_interval="5s")
+    assert default.feed_mapping == "default" and tuned.feed_mapping == "tuned"
+    stored = tuned.connection.store["f"]
+    assert stored.settings["index"]["refresh_interval"] == "5s"
+    for aggregator_class in (UnAggregated, DateWeightAggregator, YearMonthAggregator):
+        expected = default.get_feeds(aggregator_class("carlos"))
+        feeds = tuned.get_feeds(aggregator_class("carlos"))
+        assert len(feeds) == len(expected) > 0
+    assert [activity["published"] for activity in tuned.get_activities()] == [
+        activity["published"] for activity in default.get_activities()
+    ]
+
+    # The vector is still searchable, but it is not kept in _source
+    assert "embedding" in default.get_activities()[0]
+    assert "embedding" not in tuned.get_activities()[0]
+    nearest = tuned.get_feeds(
+        SemanticAggregator("carlos", query_vector=[1.0, 5.0], k=1)
+    )
+    assert nearest[0]["object"]["id"] == "proj_5"
+
+
+def test_unknown_mapping():
+    assert AsyncManager("f", "n", feed_mapping="tuned").feed_mapping == "tuned"
+    with pytest.raises(ValueError):
+        Manager("f", "n", backend="memory", feed_mapping="fast")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the connection weight lookups of the ranked aggregators (BaseAggregator.weight_lookup), run
+against the in-memory backend.
+"""
+
+import datetime
+
+import pytest
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.aggregators import DecayRankedAggregator, DateWeightAggregator
+from elasticfeeds.exceptions import WeightLookupError
+from elasticfeeds.manager import Manager
+from elasticfeeds.network import Link, LinkedActivity
+
+NOW = datetime.datetime(2020, 1, 1, 12, 0, 0)
+WEIGHTS = {"mark": 3, "jane": 2, "bob": 1, "anna": 3}
+
+
+def _manager(start=NOW):
+    manager = Manager("f", "n", backend="memory")
+    for actor_id, weight in WEIGHTS.items():
+        manager.add_network_link(
+            Link("carlos", LinkedActivity(actor_id), linked=start, link_weight=weight)
+        )
+    manager.add_activity_feeds(
+        Activity(
+            "add",
+            Actor(actor_id, "person"),
+            Object("proj_%s_%d" % (actor_id, number), "project"),
+            published=start + datetime.timedelta(days=number // 4, minutes=number),
+        )
+        for number, actor_id in enumerate(sorted(WEIGHTS) * 2)
+    )
+    return manager
+
+
+def _aggregator(aggregator_class, weight_lookup):
+    aggregator = aggregator_class("carlos")
+    aggregator.weight_lookup = weight_lookup
+    return aggregator
+
+
+def test_weight_functions():
+    aggregator = DecayRankedAggregator("carlos")
+    aggregator.network_array = [
+        {
+            "linked_activity": {"activity_class": "actor", "id": actor_id},
+            "link_weight": weight,
+        }
+        for actor_id, weight in [("mark", 3), ("jane", 2), ("bob", 1), ("anna", 3)]
+    ] + [
+        {
+            "linked_activity": {"activity_class": "object", "id": "proj_a"},
+            "link_weight": 5,
+        },
+        {
+            "linked_activity": {"activity_class": "actor", "id": "jane"},
+            "link_weight": 4,
+        },
+    ]
+    assert aggregator._weight_functions() == [
+        {"filter": {"terms": {"actor.id": ["mark", "anna"]}}, "weight": 3},
+        {"filter": {"terms": {"actor.id": ["jane"]}}, "weight": 2},
+    ]
+    aggregator.weight_lookup = "map"
+    assert aggregator._weight_script()["params"]["weights"] == {
+        "mark": 3,
+        "jane": 2,
+        "bob": 1,
+        "anna": 3,
+    }
+    with pytest.raises(WeightLookupError):
+        aggregator.weight_lookup = "loop"
+
+
+def test_decay_ranked_lookups_rank_alike():
+    # The recency decay starts from now
+    manager = _manager(datetime.datetime.now() - datetime.timedelta(days=3))
+    ranked = {}
+    for weight_lookup in ("script", "map", "filter"):
+        aggregator = _aggregator(DecayRankedAggregator, weight_lookup)
+        feeds = manager.get_feeds(aggregator)
+        ranked[weight_lookup] = [feed["object"]["id"] for feed in feeds]
+        functions = aggregator.query_dict["query"]["function_score"]["functions"]
+        scripted = [function for function in functions if "script_score" in function]
+        assert bool(scripted) == (weight_lookup != "filter")
+    assert len(ranked["script"]) == 8
+    assert ranked["map"] == ranked["script"]
+    assert ranked["filter"] == ranked["script"]
+    assert ranked["filter"][0].split("_")[1] in ("mark", "anna")
+
+
+def test_date_weight_lookups_rank_alike():
+    manager = _manager()
+    dates = {}
+    for weight_lookup in ("script", "map", "filter"):
+        aggregator = _aggregator(DateWeightAggregator, weight_lookup)
+        feeds = manager.get_feeds(aggregator)
+        dates[weight_lookup] = [
+            [WEIGHTS[activity["actor"]["id"]] for activity in date["activities"]]
+            for date in feeds
+        ]
+    assert dates["script"] == [[3, 3, 2, 1]] * 2
+    assert dates["map"] == dates["script"]
+    assert dates["filter"] == dates["script"]
+
+    aggregator = _aggregator(DateWeightAggregator, "filter")
+    manager.get_feeds(aggregator)
+    top_hits = aggregator.query_dict["aggs"]["dates"]["aggs"]["top_date_hits"]
+    assert top_hits["top_hits"]["sort"] == [
+        {"_score": {"order": "desc"}},
+        {"published": {"order": "desc"}},
+    ]
+    function_score = aggregator.query_dict["query"]["function_score"]
+    assert function_score["score_mode"] == "first"
+    assert "constant_score" in function_score["query"]
+
+
+def test_date_weight_lookups_rank_equal_weights_alike():
+    manager = Manager("f", "n", backend="memory")
+    for actor_id in ("mark", "jane"):
+        manager.follow("carlos", actor_id, NOW)
+    for minutes, (actor_id, object_id) in enumerate(
+        [("mark", "proj_a"), ("jane", "proj_b"), ("mark", "proj_c")]
+    ):
+        manager.add_activity_feed(
+            Activity(
+                "add",
+                Actor(actor_id, "person"),
+                Object(object_id, "project"),
+                published=NOW + datetime.timedelta(minutes=minutes + 1),
+            )
+        )
+    ranked = {}
+    for weight_lookup in ("script", "map", "filter"):
+        aggregator = _aggregator(DateWeightAggregator, weight_lookup)
+        feeds = manager.get_feeds(aggregator)
+        ranked[weight_lookup] = [
+            activity["object"]["id"] for activity in feeds[0]["activities"]
+        ]
+    assert ranked["script"] == ["proj_c", "proj_b", "proj_a"]
+    assert ranked["map"] == ranked["filter"] == ranked["script"]
+    # Without weights there is no function_score, and constant_score keeps the query scores out of the ranking
+    assert aggregator.query_dict["query"] == {
+        "constant_score": {
+            "filter": {
+                "bool": {"should": aggregator._network_should_clauses(("actor",))}
+            }
+        }
+    }
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the compiled query cache (Manager(query_cache=...)), run against the in-memory backend. An
+AsyncMock stands in for the AsyncElasticsearch client of AsyncManager.
+"""
+
+import asyncio
+import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.aggregators import (
+    UnAggregated,
+    RecentTypeAggregator,
+    RecentTypeObjectAggregator,
+    RecentObjectTypeAggregator,
+    DateWeightAggregator,
+    YearMonthAggregator,
+    YearMonthTypeAggregator,
+    NotificationAggregator,
+    DecayRankedAggregator,
+    CursorAggregator,
+    CollapseAggregator,
+    SemanticAggregator,
+    MaterializedFeedAggregator,
+)
+from elasticfeeds.caches import LRUCache
+from elasticfeeds.manager import Manager, AsyncManager
+
+NOW = datetime.datetime(2020, 1, 1, 12, 0, 0)
+
+AGGREGATORS = [
+    lambda: UnAggregated("carlos"),
+    lambda: RecentTypeAggregator("carlos"),
+    lambda: RecentTypeObjectAggregator("carlos"),
+    lambda: RecentObjectTypeAggregator("carlos"),
+    lambda: DateWeightAggregator("carlos"),
+    lambda: YearMonthAggregator("carlos", 2020),
+    lambda: YearMonthTypeAggregator("carlos"),
+    lambda: NotificationAggregator("carlos"),
+    lambda: DecayRankedAggregator("carlos"),
+    lambda: CursorAggregator("carlos"),
+    lambda: CursorAggregator("carlos", point_in_time=True),
+    lambda: CollapseAggregator("carlos"),
+    lambda: SemanticAggregator("carlos", query_vector=[1.0, 2.0], k=3),
+    lambda: MaterializedFeedAggregator("carlos"),
+]
+
+
+def _manager(**kwargs):
+    manager = Manager(
+        "f",
+        "n",
+        backend="memory",
+        embedding_dims=2,
+        timeline_index="t",
+        query_cache=LRUCache(),
+        **kwargs
+    )
+    manager.follow("carlos", "mark", NOW)
+    manager.watch("carlos", "proj_a", "project", NOW)
+    manager.add_activity_feeds(
+        Activity(
+            "add" if number % 2 else "update",
+            Actor("mark" if number % 3 else "jane", "person"),
+            Object("proj_a" if number % 4 == 0 else "proj_%d" % number, "project"),
+            published=NOW + datetime.timedelta(hours=number + 1),
+            embedding=[1.0, float(number)],
+        )
+        for number in range(12)
+    )
+    return manager
+
+
+def _spy(manager):
+    search = MagicMock(wraps=manager.connection.search)
+    manager.connection.search = search
+    return search
+
+
+def _network_searches(search):
+    return [call for call in search.call_args_list if call.kwargs["index"] == "n"]
+
+
+def test_cached_queries_give_the_same_feeds():
+    manager = _manager()
+    for factory in AGGREGATORS:
+        expected = manager.get_feeds(factory())
+        search = _spy(manager)
+        aggregator = factory()
+        assert manager.get_feeds(aggregator) == expected
+        assert _network_searches(search) == []
+        del manager.connection.search
+    assert len(manager.connection.pits) == 0
+
+
+def test_link_changes_invalidate_the_actor():
+    manager = _manager()
+    assert len(manager.get_feeds(UnAggregated("carlos"))) == 9
+    manager.get_feeds(UnAggregated("jane"))
+    manager.follow("carlos", "jane", NOW)
+    search = _spy(manager)
+    assert len(manager.get_feeds(UnAggregated("carlos"))) == 12
+    assert len(_network_searches(search)) == 1
+
+    # Other actors and other parameters keep their own entries
+    manager.get_feeds(UnAggregated("jane"))
+    assert len(_network_searches(search)) == 1
+    aggregator = UnAggregated("carlos")
+    aggregator.result_size = 5
+    assert len(manager.get_feeds(aggregator)) == 5
+    assert len(_network_searches(search)) == 2
+
+    manager.un_follow("carlos", "jane")
+    assert len(manager.get_feeds(UnAggregated("carlos"))) == 9
+
+
+def test_get_feeds_many_and_empty_networks():
+    manager = _manager()
+    manager.get_feeds(UnAggregated("carlos"))
+    msearch = MagicMock(wraps=manager.connection.msearch)
+    manager.connection.msearch = msearch
+    feeds = manager.get_feeds_many(
+        [UnAggregated("carlos"), RecentTypeAggregator("carlos"), UnAggregated("nobody")]
+    )
+    assert len(feeds[0]) == 9
+    assert len(feeds[1]) > 0
+    assert feeds[2] == []
+    # The network is only loaded for the queries that were not cached
+    bodies = msearch.call_args_list[0].kwargs["searches"][1::2]
+    assert [body["query"]["bool"]["must"]["term"]["actor_id"] for body in bodies] == [
+        "carlos",
+        "nobody",
+    ]
+    msearch.reset_mock()
+    manager.get_feeds_many([UnAggregated("carlos"), RecentTypeAggregator("carlos")])
+    assert msearch.call_args_list[0].kwargs["searches"][::2] == [{"index": "f"}] * 2
+
+    search = _spy(manager)
+    assert manager.get_feeds(UnAggregated("nobody")) == []
+    assert manager.get_feeds_many([UnAggregated("nobody")]) == [[]]
+    assert _network_searches(search) == []
+
+
+def test_async_manager():
+    client = AsyncMock()
+    link = {
+        "linked": "2020-01-01T00:00:00",
+        "actor_id": "carlos",
+        "link_type": "follow",
+        "linked_activity": {"activity_class": "actor", "id": "mark", "type": "person"},
+        "link_weight": 1,
+    }
+    network = {"hits": {"total": {"value": 1}, "hits": [{"_source": link}]}}
+    feed = {"hits": {"total": {"value": 1}, "hits": [{"_source": {"n": 1}}]}}
+    client.search.side_effect = [network, feed, feed]
+    manager = AsyncManager("f", "n", connection=client, query_cache=LRUCache())
+
+    async def run():
+        first = await manager.get_feeds(UnAggregated("carlos"))
+        second = await manager.get_feeds(UnAggregated("carlos"))
+        return first, second
+
+    assert asyncio.run(run()) == ([{"n": 1}], [{"n": 1}])
+    indices = [call.kwargs["index"] for call in client.search.await_args_list]
+    assert indices == ["n", "f", "f"]
+    bodies = [call.kwargs["body"] for call in client.search.await_args_list[1:]]
+    assert bodies[0] == bodies[1]
+    assert bodies[0] is not bodies[1]
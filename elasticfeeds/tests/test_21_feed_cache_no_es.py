@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the feed result cache (Manager(feed_cache=...)), run against the in-memory backend. An
+AsyncMock stands in for the AsyncElasticsearch client of AsyncManager.
+"""
+
+import asyncio
+import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.aggregators import (
+    UnAggregated,
+    YearMonthAggregator,
+    CursorAggregator,
+    MaterializedFeedAggregator,
+)
+from elasticfeeds.caches import LRUCache
+from elasticfeeds.manager import Manager, AsyncManager
+from elasticfeeds.manager.manager import _readers_query
+
+NOW = datetime.datetime(2020, 1, 1, 12, 0, 0)
+
+
+def _activity(actor_id, object_id, minutes):
+    return Activity(
+        "add",
+        Actor(actor_id, "person"),
+        Object(object_id, "project"),
+        published=NOW + datetime.timedelta(minutes=minutes),
+    )
+
+
+def _manager(**kwargs):
+    manager = Manager("f", "n", backend="memory", feed_cache=LRUCache(), **kwargs)
+    manager.follow("carlos", "mark", NOW)
+    manager.watch("carlos", "proj_a", "project", NOW)
+    manager.follow("dave", "zed", NOW)
+    manager.add_activity_feeds(
+        _activity("mark" if number % 2 else "zed", "proj_%d" % number, number + 1)
+        for number in range(6)
+    )
+    return manager
+
+
+def _spy(manager):
+    search = MagicMock(wraps=manager.connection.search)
+    manager.connection.search = search
+    return search
+
+
+def test_repeated_reads_are_served_from_the_cache():
+    manager = _manager()
+    feeds = manager.get_feeds(UnAggregated("carlos"))
+    assert len(feeds) == 3
+    search = _spy(manager)
+    cached = manager.get_feeds(UnAggregated("carlos"))
+    assert cached == feeds
+    assert search.call_count == 0
+
+    # Callers get their own copy
+    cached.pop()
+    assert len(manager.get_feeds(UnAggregated("carlos"))) == 3
+
+    # Other parameters are other entries
+    aggregator = UnAggregated("carlos")
+    aggregator.result_size = 2
+    assert len(manager.get_feeds(aggregator)) == 2
+    aggregator = UnAggregated("carlos")
+    aggregator.order = "asc"
+    assert manager.get_feeds(aggregator) == feeds[::-1]
+    assert len(manager.get_feeds(YearMonthAggregator("carlos", 2020))) == 1
+    assert search.call_count == 6
+
+
+def test_new_activities_invalidate_their_readers():
+    manager = _manager()
+    manager.get_feeds(UnAggregated("carlos"))
+    manager.get_feeds(UnAggregated("dave"))
+    manager.add_activity_feed(_activity("jane", "proj_a", 10))
+    search = _spy(manager)
+    assert len(manager.get_feeds(UnAggregated("carlos"))) == 4
+    assert len(manager.get_feeds(UnAggregated("dave"))) == 3
+    assert [call.kwargs["index"] for call in search.call_args_list] == ["n", "f"]
+
+    manager.add_activity_feeds([_activity("zed", "proj_z", 11)])
+    assert len(manager.get_feeds(UnAggregated("carlos"))) == 4
+    assert len(manager.get_feeds(UnAggregated("dave"))) == 4
+
+
+def test_link_changes_invalidate_the_owner():
+    manager = _manager()
+    assert len(manager.get_feeds(UnAggregated("carlos"))) == 3
+    manager.follow("carlos", "zed", NOW)
+    assert len(manager.get_feeds(UnAggregated("carlos"))) == 6
+    manager.un_follow("carlos", "zed")
+    assert len(manager.get_feeds(UnAggregated("carlos"))) == 3
+
+
+def test_no_entry_is_stored_right_after_an_invalidation(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("elasticfeeds.manager.manager.time.time", lambda: clock[0])
+    cache = LRUCache(ttl=None)
+    manager = _manager(network_cache=cache, query_cache=cache, cache_hold=5)
+    assert manager.cache_hold == 5
+    assert Manager("f", "n", backend="memory").cache_hold == 0
+    manager.get_feeds(UnAggregated("carlos"))
+    manager.follow("carlos", "zed", NOW)
+    search = _spy(manager)
+    # The searches may not see the new link yet, so nothing is cached for 5 seconds
+    reads = []
+    for _ in range(2):
+        reads.append(search.call_count)
+        manager.get_feeds(UnAggregated("carlos"))
+        manager.get_network("carlos")
+    assert search.call_count == 2 * reads[1] > 0
+    clock[0] += 6
+    manager.get_feeds(UnAggregated("carlos"))
+    manager.get_network("carlos")
+    stored = search.call_count
+    assert stored > 2 * reads[1]
+    manager.get_feeds(UnAggregated("carlos"))
+    manager.get_network("carlos")
+    assert search.call_count == stored
+
+
+def test_cursor_pages_and_get_feeds_many():
+    manager = _manager()
+    first = manager.get_feeds(CursorAggregator("carlos"))
+    search = _spy(manager)
+    assert manager.get_feeds(CursorAggregator("carlos")) == first
+    assert search.call_count == 0
+
+    # Pages of a point in time are never cached
+    assert not CursorAggregator("carlos", point_in_time=True).feed_cacheable
+    manager.get_feeds(CursorAggregator("carlos", point_in_time=True))
+    assert search.call_count == 2
+
+    msearch = MagicMock(wraps=manager.connection.msearch)
+    manager.connection.msearch = msearch
+    feeds = manager.get_feeds_many([UnAggregated("carlos"), UnAggregated("dave")])
+    assert [len(feed) for feed in feeds] == [3, 3]
+    assert msearch.call_count == 2
+    assert manager.get_feeds_many([UnAggregated("dave"), UnAggregated("carlos")]) == [
+        feeds[1],
+        feeds[0],
+    ]
+    assert manager.get_feeds(UnAggregated("dave")) == feeds[1]
+    assert msearch.call_count == 2
+
+
+def test_timeline_followers_are_reused():
+    manager = _manager(timeline_index="t")
+    assert len(manager.get_feeds(MaterializedFeedAggregator("carlos"))) == 3
+    search = _spy(manager)
+    manager.add_activity_feed(_activity("mark", "proj_b", 10))
+    # The followers search of the fan-out is the only search of the network index
+    assert [call.kwargs["index"] for call in search.call_args_list] == ["n"]
+    assert len(manager.get_feeds(MaterializedFeedAggregator("carlos"))) == 4
+
+
+def test_readers_query():
+    query = _readers_query(
+        [
+            {"actor": {"id": "mark"}, "object": {"id": "proj_a"}},
+            {
+                "actor": {"id": "jane"},
+                "object": {"id": "proj_a"},
+                "target": {"id": "t"},
+            },
+        ],
+        10,
+    )
+    should = query["query"]["bool"]["should"]
+    assert should[0]["bool"]["filter"][1] == {
+        "terms": {"linked_activity.id": ["jane", "mark"]}
+    }
+    assert should[1]["bool"]["filter"][1] == {
+        "terms": {"linked_activity.id": ["proj_a", "t"]}
+    }
+    assert query["aggs"]["readers"]["composite"] == {
+        "size": 10,
+        "sources": [{"actor_id": {"terms": {"field": "actor_id"}}}],
+    }
+    query = _readers_query([{"actor": {"id": "mark"}}], 10, {"actor_id": "carlos"})
+    assert query["aggs"]["readers"]["composite"]["after"] == {"actor_id": "carlos"}
+
+
+def test_every_reader_is_invalidated(monkeypatch):
+    # two readers per request
+    monkeypatch.setattr("elasticfeeds.manager.manager._READERS_PAGE_SIZE", 2)
+    manager = _manager()
+    for reader in ("ana", "bob", "eve"):
+        manager.follow(reader, "mark", NOW)
+    readers = ["ana", "bob", "carlos", "eve"]
+    before = dict(
+        (reader, len(manager.get_feeds(UnAggregated(reader)))) for reader in readers
+    )
+    search = _spy(manager)
+    manager.add_activity_feeds([_activity("mark", "proj_b", 10)])
+    assert search.call_count == 3
+    for reader in readers:
+        assert len(manager.get_feeds(UnAggregated(reader))) == before[reader] + 1
+
+
+def test_async_manager():
+    client = AsyncMock()
+    link = {
+        "linked": "2020-01-01T00:00:00",
+        "actor_id": "carlos",
+        "link_type": "follow",
+        "linked_activity": {"activity_class": "actor", "id": "mark", "type": "person"},
+        "link_weight": 1,
+    }
+    network = {"hits": {"total": {"value": 1}, "hits": [{"_source": link}]}}
+    feed = {"hits": {"total": {"value": 1}, "hits": [{"_source": {"n": 1}}]}}
+    readers = {
+        "aggregations": {"readers": {"buckets": [{"key": {"actor_id": "carlos"}}]}}
+    }
+    client.search.side_effect = [network, feed, readers, network, feed]
+    manager = AsyncManager("f", "n", connection=client, feed_cache=LRUCache())
+
+    async def run():
+        results = [await manager.get_feeds(UnAggregated("carlos"))]
+        results.append(await manager.get_feeds(UnAggregated("carlos")))
+        await manager.add_activity_feed(_activity("mark", "proj_b", 1))
+        results.append(await manager.get_feeds(UnAggregated("carlos")))
+        return results
+
+    assert asyncio.run(run()) == [[{"n": 1}]] * 3
+    indices = [call.kwargs["index"] for call in client.search.await_args_list]
+    assert indices == ["n", "f", "n", "n", "f"]
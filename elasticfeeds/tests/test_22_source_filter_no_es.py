@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the source filtering of the aggregators (BaseAggregator.source_includes /
+source_excludes), run against the in-memory backend.
+"""
+
+import datetime
+
+import pytest
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.aggregators import (
+    UnAggregated,
+    CursorAggregator,
+    CollapseAggregator,
+    DecayRankedAggregator,
+    RecentTypeAggregator,
+    DateWeightAggregator,
+    YearMonthAggregator,
+    NotificationAggregator,
+    SemanticAggregator,
+    MaterializedFeedAggregator,
+)
+from elasticfeeds.exceptions import SourceFilterError
+from elasticfeeds.manager import Manager
+
+NOW = datetime.datetime(2020, 1, 1, 12, 0, 0)
+
+
+def _manager():
+    manager = Manager("f", "n", backend="memory", embedding_dims=2, timeline_index="t")
+    manager.follow("carlos", "mark", NOW)
+    manager.add_activity_feeds(
+        Activity(
+            "add",
+            Actor("mark", "person"),
+            Object("proj_%d" % number, "project"),
+            published=NOW + datetime.timedelta(hours=number + 1),
+            embedding=[1.0, float(number)],
+            extra={"blob": "x" * 100},
+        )
+        for number in range(3)
+    )
+    return manager
+
+
+def _activities(feeds):
+    if isinstance(feeds, dict):
+        return feeds["activities"]
+    if feeds and "activities" in feeds[0]:
+        return [activity for group in feeds for activity in group["activities"]]
+    if feeds and "months" in feeds[0]:
+        return [
+            activity
+            for year in feeds
+            for month in year["months"]
+            for activity in month["activities"]
+        ]
+    return feeds
+
+
+CHRONOLOGICAL = [
+    UnAggregated,
+    CursorAggregator,
+    CollapseAggregator,
+    DecayRankedAggregator,
+    MaterializedFeedAggregator,
+]
+
+
+def test_embedding_is_excluded_by_default():
+    manager = _manager()
+    for aggregator_class in CHRONOLOGICAL:
+        aggregator = aggregator_class("carlos")
+        activities = _activities(manager.get_feeds(aggregator))
+        assert len(activities) == 3
+        assert all("embedding" not in activity for activity in activities)
+        assert all(activity["extra"]["blob"] for activity in activities)
+    assert aggregator.query_dict["_source"] == {"excludes": ["activity.embedding"]}
+
+    aggregator = UnAggregated("carlos")
+    aggregator.source_excludes = None
+    activities = manager.get_feeds(aggregator)
+    assert aggregator.query_dict["_source"] is True
+    assert all("embedding" in activity for activity in activities)
+
+
+def test_every_aggregator_honors_includes():
+    manager = _manager()
+    classes = CHRONOLOGICAL + [
+        RecentTypeAggregator,
+        DateWeightAggregator,
+        YearMonthAggregator,
+    ]
+    for aggregator_class in classes:
+        aggregator = aggregator_class("carlos")
+        aggregator.source_includes = ["published", "actor.id"]
+        activities = _activities(manager.get_feeds(aggregator))
+        assert len(activities) == 3, aggregator_class
+        for activity in activities:
+            assert activity == {
+                "published": activity["published"],
+                "actor": {"id": "mark"},
+            }
+
+    aggregator = NotificationAggregator("carlos")
+    aggregator.source_includes = ["object.id"]
+    notifications = manager.get_feeds(aggregator)
+    assert notifications[0]["latest"] == {"object": {"id": "proj_2"}}
+
+    aggregator = SemanticAggregator("carlos", query_vector=[1.0, 2.0], k=1)
+    manager.get_feeds(aggregator)
+    assert "embedding" not in aggregator.query_dict["_source"]["includes"]
+    aggregator = SemanticAggregator("carlos", query_vector=[1.0, 2.0], k=1)
+    aggregator.source_includes = ["object"]
+    assert manager.get_feeds(aggregator) == [
+        {"object": {"id": "proj_2", "type": "project"}}
+    ]
+
+
+def test_hybrid_materialized_feed_without_published():
+    manager = Manager(
+        "f", "n", backend="memory", timeline_index="t", fanout_threshold=1
+    )
+    manager.follow("carlos", "mark", NOW)
+    manager.follow("carlos", "star", NOW)
+    manager.follow("jane", "star", NOW)
+    # mark's activities are copied to the timeline, star's are read at read time
+    manager.add_activity_feeds(
+        Activity(
+            "add",
+            Actor("mark" if number % 2 else "star", "person"),
+            Object("proj_%d" % number, "project"),
+            published=NOW + datetime.timedelta(hours=number + 1),
+        )
+        for number in range(4)
+    )
+    aggregator = MaterializedFeedAggregator("carlos")
+    aggregator.source_includes = ["actor"]
+    assert manager.get_feeds(aggregator) == [
+        {"actor": {"id": actor_id, "type": "person"}}
+        for actor_id in ("mark", "star", "mark", "star")
+    ]
+
+
+def test_top_hits_keep_their_fields():
+    aggregator = RecentTypeAggregator("carlos")
+    assert aggregator._source_filter(["published", "actor"]) == {
+        "includes": ["published", "actor"],
+        "excludes": ["embedding"],
+    }
+    aggregator.source_excludes = []
+    assert aggregator._source_filter(["published"]) == {"includes": ["published"]}
+
+
+def test_invalid_fields():
+    aggregator = UnAggregated("carlos")
+    with pytest.raises(SourceFilterError):
+        aggregator.source_includes = "published"
+    with pytest.raises(SourceFilterError):
+        aggregator.source_excludes = [1]
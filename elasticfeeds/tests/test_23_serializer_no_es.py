@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the client serializers (Manager(serializer="orjson"), elasticfeeds.serializers) and the
+native dates of Activity.get_dict, run against the in-memory backend. An AsyncMock stands in for the
+AsyncElasticsearch client. The serializer classes are only checked when their client is installed.
+"""
+
+import asyncio
+import datetime
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.aggregators import UnAggregated, DateWeightAggregator
+from elasticfeeds.backends import (
+    get_backend,
+    get_async_backend,
+    ElasticsearchBackend,
+    OpenSearchBackend,
+)
+from elasticfeeds.manager import Manager, AsyncManager
+from elasticfeeds.memory import _copy
+
+NOW = datetime.datetime(2020, 1, 1, 12, 0, 0)
+OPTIONS = dict(
+    host="localhost",
+    port=9200,
+    scheme="http",
+    url_prefix=None,
+    use_ssl=False,
+    user_name="elastic",
+    user_password="",
+    max_retries=1,
+    request_timeout=10,
+)
+
+
+def _activity(published):
+    return Activity(
+        "add",
+        Actor("mark", "person"),
+        Object("proj_a", "project"),
+        published=published,
+    )
+
+
+def _without_ids(value):
+    # feed_id is a random uuid per write
+    if isinstance(value, dict):
+        return dict(
+            (key, _without_ids(item)) for key, item in value.items() if key != "feed_id"
+        )
+    if isinstance(value, list):
+        return [_without_ids(item) for item in value]
+    return value
+
+
+def test_native_dates():
+    orjson = pytest.importorskip("orjson")
+    plus_two = datetime.timezone(datetime.timedelta(hours=2))
+    for published in (
+        NOW,
+        datetime.datetime(2020, 5, 6, 7, 8, 9, 123456),
+        datetime.datetime(2020, 5, 6, 23, 30, tzinfo=plus_two),
+    ):
+        activity = _activity(published)
+        native = activity.get_dict(native_dates=True)
+        assert native["published"] is published
+        assert isinstance(native["published_date"], datetime.date)
+        assert orjson.loads(orjson.dumps(native)) == activity.get_dict()
+        assert _copy(native) == activity.get_dict()
+
+
+def test_backend_serializers():
+    assert get_backend("elasticsearch").native_dates is False
+    assert get_backend("opensearch", "orjson").native_dates is True
+    assert get_async_backend("elasticsearch", "orjson").serializer == "orjson"
+    assert get_backend("memory", "orjson").client_serializer() is None
+    assert ElasticsearchBackend().client_serializer() is None
+    with pytest.raises(ValueError):
+        get_backend("elasticsearch", "ujson")
+
+    for backend in (ElasticsearchBackend("orjson"), OpenSearchBackend("orjson")):
+        marker = object()
+        backend.client_serializer = lambda: marker
+        assert backend._client_options(**OPTIONS)["serializer"] is marker
+    assert "serializer" not in ElasticsearchBackend()._client_options(**OPTIONS)
+    assert "serializer" not in OpenSearchBackend()._client_options(**OPTIONS)
+
+
+def test_document_size():
+    orjson = pytest.importorskip("orjson")
+    document = _activity(NOW).get_dict()
+    assert ElasticsearchBackend().document_size(document) == len(json.dumps(document))
+    native = _activity(NOW).get_dict(native_dates=True)
+    calls = []
+
+    def measure(value):
+        calls.append(value)
+        return len(orjson.dumps(value))
+
+    # the chunks of an orjson backend are measured without a stdlib encoding
+    backend = OpenSearchBackend("orjson")
+    assert backend.document_size(native) == len(orjson.dumps(document))
+    manager = Manager("f", "n", backend="memory", serializer="orjson")
+    manager._backend.document_size = measure
+    manager.add_activity_feeds(_activity(NOW) for _ in range(3))
+    assert len(calls) == 3
+
+
+def test_memory_manager_with_native_dates():
+    managers = []
+    for serializer in ("json", "orjson"):
+        manager = Manager("f", "n", backend="memory", serializer=serializer)
+        manager.follow("carlos", "mark", NOW)
+        manager.add_activity_feed(_activity(NOW + datetime.timedelta(hours=1)))
+        manager.add_activity_feeds(
+            _activity(NOW + datetime.timedelta(days=number)) for number in range(1, 4)
+        )
+        managers.append(manager)
+    plain, native = managers
+    assert native.serializer == "orjson"
+    assert _without_ids(native.get_activities()) == _without_ids(plain.get_activities())
+    for aggregator_class in (UnAggregated, DateWeightAggregator):
+        feeds = native.get_feeds(aggregator_class("carlos"))
+        assert len(feeds) > 0
+        assert _without_ids(feeds) == _without_ids(
+            plain.get_feeds(aggregator_class("carlos"))
+        )
+
+
+def test_elasticsearch_serializer():
+    pytest.importorskip("orjson")
+    pytest.importorskip("elasticsearch")
+    from elasticsearch.exceptions import SerializationError
+    from elasticfeeds.serializers import elasticsearch_serializer
+
+    serializer = elasticsearch_serializer()
+    assert serializer.mimetype == "application/json"
+    document = _activity(NOW).get_dict(native_dates=True)
+    assert json.loads(serializer.dumps(document)) == _activity(NOW).get_dict()
+    assert serializer.dumps({1: "a"}) == b'{"1":"a"}'
+    assert serializer.dumps("{}") == b"{}"
+    assert serializer.loads(b'{"hits": []}') == {"hits": []}
+    with pytest.raises(SerializationError):
+        serializer.loads(b"{")
+    assert ElasticsearchBackend("orjson").client_serializer().__class__ is (
+        serializer.__class__
+    )
+
+
+def test_opensearch_serializer():
+    pytest.importorskip("orjson")
+    pytest.importorskip("opensearchpy")
+    from opensearchpy.exceptions import SerializationError
+    from elasticfeeds.serializers import opensearch_serializer
+
+    serializer = opensearch_serializer()
+    document = _activity(NOW).get_dict(native_dates=True)
+    assert json.loads(serializer.dumps(document)) == _activity(NOW).get_dict()
+    assert serializer.dumps("{}") == "{}"
+    assert serializer.loads('{"hits": []}') == {"hits": []}
+    with pytest.raises(SerializationError):
+        serializer.loads("{")
+
+
+def test_async_manager_writes_native_dates():
+    client = AsyncMock()
+    client.indices.exists.return_value = True
+
+    async def run():
+        manager = AsyncManager("f", "n", connection=client, serializer="orjson")
+        await manager.initialize()
+        await manager.add_activity_feed(_activity(NOW))
+
+    asyncio.run(run())
+    document = client.index.await_args.kwargs["document"]
+    assert document["published"] == NOW
+    assert document["published_time"] == datetime.time(12, 0, 0)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server-free tests for the paged groups of the grouping aggregators (bucket_size / after_key, composite
+aggregations) and the top_hits_from window, run against the in-memory backend.
+"""
+
+import datetime
+
+import pytest
+
+from elasticfeeds.activity import Actor, Object, Activity
+from elasticfeeds.aggregators import (
+    UnAggregated,
+    DateWeightAggregator,
+    RecentTypeAggregator,
+    RecentObjectTypeAggregator,
+    RecentTypeObjectAggregator,
+)
+from elasticfeeds.exceptions import SizeError, FromError, CursorError
+from elasticfeeds.manager import Manager
+
+NOW = datetime.datetime(2020, 1, 1, 12, 0, 0)
+TYPES = ["add", "edit", "remove"]
+
+
+def _manager():
+    manager = Manager("f", "n", backend="memory")
+    manager.follow("carlos", "mark", NOW)
+    manager.add_activity_feeds(
+        Activity(
+            TYPES[number % 3],
+            Actor("mark", "person"),
+            Object("proj_%d" % (number % 7), "project"),
+            published=NOW + datetime.timedelta(days=number // 2, minutes=number),
+        )
+        for number in range(30)
+    )
+    return manager
+
+
+def _paged(aggregator_class, bucket_size, after_key=None):
+    aggregator = aggregator_class("carlos")
+    aggregator.bucket_size = bucket_size
+    aggregator.after_key = after_key
+    return aggregator
+
+
+def _walk(manager, aggregator_class, bucket_size):
+    pages = []
+    cursor = None
+    while True:
+        page = manager.get_feeds(_paged(aggregator_class, bucket_size, cursor))
+        pages.append(page["groups"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_defaults_and_validation():
+    aggregator = UnAggregated("carlos")
+    assert aggregator.result_size == 100
+    assert aggregator.top_hits_from == 0
+    assert aggregator.bucket_size is None and aggregator.after_key is None
+    with pytest.raises(FromError):
+        aggregator.top_hits_from = "1"
+    for size in (0, "10", 1.5):
+        with pytest.raises(SizeError):
+            aggregator.bucket_size = size
+    with pytest.raises(CursorError):
+        aggregator.after_key = ["add"]
+
+
+def test_composite_query():
+    aggregator = _paged(DateWeightAggregator, 5, {"date": "2020-01-03"})
+    aggregator.network_array = [
+        {
+            "linked": NOW.isoformat(),
+            "link_type": "follow",
+            "linked_activity": {"activity_class": "actor", "id": "mark", "type": "p"},
+            "link_weight": 1,
+        }
+    ]
+    aggregator.set_query_dict()
+    aggregator.set_aggregation_section()
+    dates = aggregator.query_dict["aggs"]["dates"]
+    assert "terms" not in dates
+    assert dates["composite"] == {
+        "size": 5,
+        "sources": [
+            {
+                "date": {
+                    "date_histogram": {
+                        "field": "published_date",
+                        "calendar_interval": "1d",
+                        "format": "yyyy-MM-dd",
+                        "order": "desc",
+                    }
+                }
+            }
+        ],
+        "after": {"date": "2020-01-03"},
+    }
+    assert "top_date_hits" in dates["aggs"]
+
+
+def test_pages_cover_every_group():
+    manager = _manager()
+    pages = _walk(manager, RecentObjectTypeAggregator, 3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    ids = [group["id"] for page in pages for group in page]
+    assert ids == ["proj_%d" % number for number in range(7)]
+    unpaged = manager.get_feeds(RecentObjectTypeAggregator("carlos"))
+    assert sorted(ids) == sorted(group["id"] for group in unpaged)
+    by_id = dict((group["id"], group) for group in unpaged)
+    for page in pages:
+        for group in page:
+            assert group == by_id[group["id"]]
+
+    pages = _walk(manager, RecentTypeAggregator, 2)
+    assert [[group["type"] for group in page] for page in pages] == [
+        ["add", "edit"],
+        ["remove"],
+    ]
+    pages = _walk(manager, RecentTypeObjectAggregator, 4)
+    assert [[group["type"] for group in page] for page in pages] == [TYPES]
+
+    # A page that is exactly full needs one more request to find the end
+    pages = _walk(manager, RecentTypeAggregator, 3)
+    assert [len(page) for page in pages] == [3, 0]
+
+
+def test_date_pages_are_newest_first():
+    manager = _manager()
+    pages = _walk(manager, DateWeightAggregator, 4)
+    dates = [group["date"] for page in pages for group in page]
+    assert [len(page) for page in pages] == [4, 4, 4, 3]
+    assert dates == sorted(dates, reverse=True)
+    assert dates[0] == "2020-01-15" and dates[-1] == "2020-01-01"
+    # The terms aggregation only returns its 10 biggest buckets
+    unpaged = manager.get_feeds(DateWeightAggregator("carlos"))
+    assert len(unpaged) == 10
+    assert set(group["date"] for group in unpaged) < set(dates)
+
+
+def test_top_hits_window():
+    manager = _manager()
+    everything = manager.get_feeds(RecentTypeAggregator("carlos"))
+    window = RecentTypeAggregator("carlos")
+    window.top_hits_from = 2
+    window.top_hits_size = 3
+    for group, expected in zip(manager.get_feeds(window), everything):
+        assert group["type"] == expected["type"]
+        assert group["activities"] == expected["activities"][2:5]
+
+
+def test_empty_page():
+    manager = _manager()
+    page = manager.get_feeds(_paged(RecentTypeAggregator, 2, {"type": "zzz"}))
+    assert page == {"groups": [], "next_cursor": None}
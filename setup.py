@@ -30,7 +30,7 @@ setup(
     author_email="cquiros@qlands.com",
     url="",
     keywords="Elasticsearch Feeds",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     include_package_data=True,
     package_data={"": ["README.md", "LICENSE.txt"]},
     package_dir={"elasticfeeds": "elasticfeeds"},
@@ -38,6 +38,10 @@ setup(
     extras_require={
         "testing": tests_require,
         "opensearch": ["opensearch-py>=2,<4"],
+        "async": ["elasticsearch[async]>=9.2,<10"],
+        "opensearch-async": ["opensearch-py[async]>=2,<4"],
+        "opentelemetry": ["opentelemetry-api>=1.20"],
+        "orjson": ["orjson>=3.9"],
         "dev": ["black"],
     },
     install_requires=requires,